@@ -0,0 +1,251 @@
+import json
+import math
+import re
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from incremental_scoring import SCORING_CRITERIA
+from llm_gateway import PRIORITY_SCORING, as_gateway
+from metrics import metrics
+from slide_index import tokenize
+
+# The criterion computed from the graded answers
+QUESTION_CRITERION = 'Handling of Questions'
+
+# Answers that admit not knowing score at most this much, whatever words they contain
+HEDGE_CAP = 0.2
+HEDGES = re.compile(r"\b(i don'?t know|not sure|no idea|can'?t remember|don'?t remember|i forget|skip)\b")
+
+# A keypoint counts as covered when this share of its words appear in the answer
+KEYPOINT_SHARE = 0.5
+# Words are matched on this many leading letters, so 'regularize' covers 'regularization'
+STEM_LETTERS = 6
+# Trigram similarity to the question and keypoints that already reads as fully on topic
+FULL_SIMILARITY = 0.35
+# Answers this many content words long that miss keypoints may be making them in other words
+PARAPHRASE_WORDS = 12
+
+def _stems(text):
+    return set(word[:STEM_LETTERS] for word in tokenize(text))
+
+def _trigrams(text):
+    grams = Counter()
+    for word in tokenize(text):
+        padded = f' {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def similarity(a, b):
+    """Cosine similarity of the character trigrams of two texts' content words, 0-1"""
+    left, right = _trigrams(a), _trigrams(b)
+    dot = sum(count * right[gram] for gram, count in left.items() if gram in right)
+    norm = math.sqrt(sum(c * c for c in left.values())) * math.sqrt(sum(c * c for c in right.values()))
+    return dot / norm if norm else 0.0
+
+def keypoint_coverage(answer, keypoints):
+    """Share of keypoints the answer covers, None without keypoints"""
+    keypoints = [point for point in keypoints or [] if _stems(point)]
+    if not keypoints:
+        return None
+    said = _stems(answer)
+    covered = 0
+    for point in keypoints:
+        stems = _stems(point)
+        if len(stems & said) >= max(1, math.ceil(len(stems) * KEYPOINT_SHARE)):
+            covered += 1
+    return covered / len(keypoints)
+
+def grade_locally(question, answer, keypoints=None):
+    """{'score' 0-1, 'coverage', 'similarity'} of an answer, from its words alone
+
+    Keypoint coverage carries most of the score; similarity to the question
+    and keypoints credits answers that stay on topic in other words.
+    Without keypoints similarity is all there is, which tells an off-topic
+    answer but not a wrong one. Answers of a couple of words, or that admit
+    not knowing, score low.
+    """
+    coverage = keypoint_coverage(answer, keypoints)
+    on_topic = min(1.0, similarity(answer, f"{question} {' '.join(keypoints or [])}") / FULL_SIMILARITY)
+    score = on_topic if coverage is None else 0.7 * coverage + 0.3 * on_topic
+    words = len(tokenize(answer))
+    if words < 3:
+        score = min(score, HEDGE_CAP / 2)
+    elif HEDGES.search(answer.lower()):
+        score = min(score, HEDGE_CAP)
+    return {'score': round(score, 3), 'coverage': None if coverage is None else round(coverage, 3),
+            'similarity': round(on_topic, 3), 'words': words}
+
+def last_question(reply):
+    """The last question in a reply, None if it asks nothing"""
+    questions = re.findall(r'[^.!?\n]*\?', reply or '')
+    return questions[-1].strip() if questions else None
+
+class AnswerGrader:
+    """Records the evaluator's questions and grades the student's answers
+
+    ask() notes the question a reply ended on; the student's next turn is
+    its answer, which answer() stores with add_question_answer and grades
+    at once on CPU (grade_locally). record() does the same for a question
+    asked outside the live turns. Only ambiguous answers go to the LLM, in
+    the background, its grade then replacing the local one: those scoring
+    between `low` and `high`, long answers that miss keypoints (perhaps
+    paraphrasing them) and on-topic answers to questions with no keypoints
+    to check them against. The open question is kept with the
+    evaluation, so the next turn may be served by any worker process.
+
+    apply() turns the grades into the "Handling of Questions" points of a
+    final result, waiting up to `finalize_wait` seconds for escalations of
+    this process still in flight.
+    """
+
+    def __init__(self, llm, db=None, low=0.3, high=0.7, workers=2, finalize_wait=2.0):
+        self.llm = as_gateway(llm)
+        self.db = db
+        self.low = low
+        self.high = high
+        self.finalize_wait = finalize_wait
+
+        self._open = {}  # session_id -> open question, without a database
+        self._answers = {}  # session_id -> graded answers, without a database
+        self._in_flight = Counter()  # session_id -> escalations running here
+        self._condition = threading.Condition()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='answer-grading')
+
+    def ask(self, session_id, question, keypoints=None):
+        """Note the question the student is to answer next, None when the reply asked nothing"""
+        open_question = {'question': question, 'keypoints': list(keypoints or [])} if question else None
+        if self.db is None:
+            with self._condition:
+                self._open[session_id] = open_question
+        elif open_question is not None or self._open_question(session_id) is not None:
+            self.db.update_evaluation_fields(session_id, open_question=open_question)
+
+    def _open_question(self, session_id):
+        if self.db is None:
+            with self._condition:
+                return self._open.get(session_id)
+        value = (self.db.get_evaluation_fields(session_id, 'open_question') or {}).get('open_question')
+        return json.loads(value) if isinstance(value, str) else value
+
+    def answer(self, session_id, transcript):
+        """Grade `transcript` as the answer to the open question, returning the grade or None"""
+        open_question = self._open_question(session_id)
+        if open_question is None:
+            return None
+        self.ask(session_id, None)
+        return self.record(session_id, open_question['question'], transcript, open_question.get('keypoints'))
+
+    def record(self, session_id, question, answer, keypoints=None):
+        """Store a question and its answer with the answer's grade, escalating an ambiguous one"""
+        keypoints = list(keypoints or [])
+        grade = dict(grade_locally(question, answer, keypoints), method='local')
+        ambiguous = self.escalates(grade)
+        metrics.inc('answers_graded_total', method='llm' if ambiguous else 'local')
+
+        if self.db is None:
+            with self._condition:
+                entries = self._answers.setdefault(session_id, [])
+                entries.append({'question': question, 'answer': answer, 'grade': grade})
+                entry_id = len(entries) - 1
+        else:
+            entry_id = self.db.add_question_answer(session_id, question, answer, grade)
+
+        if ambiguous:
+            with self._condition:
+                self._in_flight[session_id] += 1
+            self._pool.submit(self._escalate, session_id, entry_id, question, answer, keypoints, grade)
+        return grade
+
+    def escalates(self, grade):
+        """Whether a local grade is ambiguous enough to ask the LLM"""
+        if self.low <= grade['score'] <= self.high:
+            return True
+        if grade['score'] <= HEDGE_CAP:
+            return grade['coverage'] is not None and grade['coverage'] < 1 and grade['words'] >= PARAPHRASE_WORDS \
+                and grade['similarity'] > 0
+        return grade['coverage'] is None
+
+    def grade_with_llm(self, question, answer, keypoints=None):
+        """The LLM's grade of an answer, 0-1, raising if the call fails"""
+        expected = f"\nA good answer covers: {', '.join(keypoints)}" if keypoints else ''
+        response = self.llm.complete(
+            purpose='answers',
+            priority=PRIORITY_SCORING,
+            messages=[
+                {"role": "system", "content": "You are an expert evaluator grading a student's answer to an examiner's question."},
+                {"role": "user", "content": f"""
+                Question: {question}{expected}
+                Student's answer: {answer}
+
+                Grade how well the answer addresses the question, from 0 (wrong or no answer) to 10 (complete and correct).
+                Format as JSON with keys: answer_score, reason
+                """}
+            ],
+            temperature=0
+        )
+        result = json.loads(response.choices[0].message.content)
+        return min(1.0, max(0.0, float(result.get('answer_score', 0)) / 10))
+
+    def _escalate(self, session_id, entry_id, question, answer, keypoints, grade):
+        try:
+            grade = dict(grade, score=round(self.grade_with_llm(question, answer, keypoints), 3),
+                         local_score=grade['score'], method='llm')
+            if self.db is None:
+                with self._condition:
+                    self._answers[session_id][entry_id]['grade'] = grade
+            else:
+                self.db.update_answer_grade(session_id, entry_id, grade)
+        except Exception as e:
+            # The local grade stands
+            metrics.inc('errors_total', stage='answers', type=type(e).__name__)
+        finally:
+            with self._condition:
+                self._in_flight[session_id] -= 1
+                if not self._in_flight[session_id]:
+                    del self._in_flight[session_id]
+                self._condition.notify_all()
+
+    def grades(self, session_id, wait=0):
+        """Grades of a session's answers, oldest first, after up to `wait` seconds for escalations"""
+        with self._condition:
+            self._condition.wait_for(lambda: not self._in_flight.get(session_id), wait)
+            if self.db is None:
+                return [entry['grade'] for entry in self._answers.get(session_id, [])]
+        return [entry['grade'] for entry in self.db.get_question_answers(session_id) if entry.get('grade')]
+
+    def apply(self, session_id, result):
+        """Replace a final result's "Handling of Questions" points with ones from the graded answers
+
+        Left as the scoring call gave it when no answer was graded.
+        """
+        grades = self.grades(session_id, self.finalize_wait)
+        if not grades or QUESTION_CRITERION not in result.get('scores', {}):
+            return result
+
+        points = dict((name, maximum) for name, maximum, _ in SCORING_CRITERIA)[QUESTION_CRITERION]
+        mean = sum(grade['score'] for grade in grades) / len(grades)
+        result['scores'][QUESTION_CRITERION] = round(mean * points)
+        result['total_score'] = sum(result['scores'].values())
+
+        strong = sum(1 for grade in grades if grade['score'] > self.high)
+        weak = sum(1 for grade in grades if grade['score'] < self.low)
+        summary = (f"{len(grades)} questions answered: {strong} well, {weak} poorly, "
+                   f"{len(grades) - strong - weak} partly (average {mean:.0%}).")
+        feedback = result.setdefault('feedback', {})
+        feedback[QUESTION_CRITERION] = f"{feedback[QUESTION_CRITERION]} {summary}" \
+            if isinstance(feedback.get(QUESTION_CRITERION), str) else summary
+        return result
+
+    def entries(self, session_id):
+        """A session's questions and answers with their grades, oldest first"""
+        if self.db is None:
+            with self._condition:
+                return [dict(entry) for entry in self._answers.get(session_id, [])]
+        return self.db.get_question_answers(session_id)
+
+    def forget(self, session_id):
+        """Drop what is kept in memory for a session without a database"""
+        with self._condition:
+            self._open.pop(session_id, None)
+            self._answers.pop(session_id, None)
@@ -1,37 +1,288 @@
 import os
-from flask import Flask, request, jsonify, render_template, send_from_directory
+import sys
+
+if __name__ == '__main__':
+    # Serve through serve.py: the extraction workers are spawned processes
+    # that import the main module again, and this one sets up the whole app
+    import runpy
+    runpy.run_path(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'serve.py'), run_name='__main__')
+    sys.exit()
+
+from flask import Flask, Request, Response, g, request, jsonify, render_template, send_from_directory
 from flask_cors import CORS
-import openai
+from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.utils import secure_filename
-import tempfile
-import shutil
 from datetime import datetime
 import json
 import uuid
-import threading
-import asyncio
+import gzip
+import io
+import hashlib
+import math
+import multiprocessing
+import time
 from presentation_evaluator import PresentationEvaluator
 from database import Database
+from job_queue import JobQueue, QueueFullError
+from slide_extractor import ExtractionEngine, SlideVisuals
+from result_cache import ResultCache
+from live_pipeline import LiveTurnProcessor
+from ws_server import AudioStreamServer
+from speech_engine import create_speech_engine
+from conversation_context import ConversationContext
+from incremental_scoring import IncrementalScorer
+from question_bank import QuestionBank
+from answer_grading import AnswerGrader
+from llm_gateway import LLMGateway, create_openai_client
+from slide_index import SlideIndex
+from status_events import StatusBroadcaster
+from upload_store import UploadError, UploadStore
+from retention import Janitor, SessionArchive
+from metrics import metrics
+from shared_state import create_shared_state, worker_id
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+class UploadRequest(Request):
+    """Streams uploaded decks to storage while the form is parsed (see UploadStore)"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.endpoint == 'submit_presentation' and filename:
+            return upload_store.ingest(filename)
+        if self.endpoint == 'upload_audio':
+            # Audio chunks are small and go to speech-to-text straight from memory
+            return io.BytesIO()
+        return super()._get_file_stream(total_content_length, content_type, filename, content_length)
 
 app = Flask(__name__)
+app.request_class = UploadRequest
 CORS(app)
 
 # Configuration
-app.config['UPLOAD_FOLDER'] = 'uploads'
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['UPLOAD_FOLDER'] = os.getenv('UPLOAD_FOLDER', 'uploads')
+app.config['DATA_DIR'] = os.getenv('DATA_DIR', 'data')
+app.config['MAX_UPLOAD_MB'] = int(os.getenv('MAX_UPLOAD_MB', 100))  # largest deck
+app.config['UPLOAD_CHUNK_MB'] = int(os.getenv('UPLOAD_CHUNK_MB', 8))  # chunk size for resumable uploads
+app.config['MAX_AUDIO_MB'] = int(os.getenv('MAX_AUDIO_MB', 10))  # largest audio chunk upload
+# Any one request: a deck or chunk plus its form fields
+app.config['MAX_CONTENT_LENGTH'] = (max(app.config['MAX_UPLOAD_MB'], app.config['UPLOAD_CHUNK_MB']) + 1) * 1024 * 1024
 app.config['SECRET_KEY'] = 'your-secret-key-here'
 
+# Background processing
+app.config['JOB_WORKERS'] = int(os.getenv('JOB_WORKERS', 4))
+app.config['JOB_QUEUE_SIZE'] = int(os.getenv('JOB_QUEUE_SIZE', 200))
+app.config['JOB_MAX_ATTEMPTS'] = int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+app.config['EXTRACTION_PROCESSES'] = int(os.getenv('EXTRACTION_PROCESSES', os.cpu_count() or 1))
+app.config['EXTRACTION_TIME_BUDGET'] = int(os.getenv('EXTRACTION_TIME_BUDGET', 120))  # seconds per file
+app.config['EXTRACTION_MEMORY_BUDGET'] = int(os.getenv('EXTRACTION_MEMORY_BUDGET', 1024 ** 3))  # bytes per worker
+
+# Live presentation audio
+app.config['LIVE_WORKERS'] = int(os.getenv('LIVE_WORKERS', 16))
+AUDIO_SYNC_TIMEOUT = 60  # seconds a ?sync=1 upload waits for its result
+AUDIO_MAX_WAIT = 25  # longest long-poll on /api/audio-result
+app.config['WS_PORT'] = int(os.getenv('WS_PORT', 5001))  # 0 disables audio streaming
+
+# Speech-to-text
+app.config['STT_BACKEND'] = os.getenv('STT_BACKEND', 'google')  # google, whisper (local) or fake
+app.config['STT_MODEL'] = os.getenv('STT_MODEL', 'openai/whisper-base.en')
+app.config['STT_BATCH_SIZE'] = int(os.getenv('STT_BATCH_SIZE', 16))
+app.config['STT_BATCH_WAIT'] = float(os.getenv('STT_BATCH_WAIT', 0.05))  # seconds a batch waits to fill
+app.config['STT_WORKERS'] = int(os.getenv('STT_WORKERS', 0))  # 0 picks the backend's default
+
+# LLM gateway
+app.config['LLM_MAX_CONCURRENCY'] = int(os.getenv('LLM_MAX_CONCURRENCY', 16))  # calls in flight
+app.config['LLM_REQUESTS_PER_MINUTE'] = int(os.getenv('LLM_REQUESTS_PER_MINUTE', 500))  # 0 disables the limit
+app.config['LLM_TOKENS_PER_MINUTE'] = int(os.getenv('LLM_TOKENS_PER_MINUTE', 150000))  # 0 disables the limit
+app.config['LLM_MAX_RETRIES'] = int(os.getenv('LLM_MAX_RETRIES', 3))
+app.config['LLM_TIMEOUT'] = float(os.getenv('LLM_TIMEOUT', 60))  # seconds per call, queueing and retries included
+
+# Presentation analysis
+app.config['ANALYSIS_MAX_PROMPT_TOKENS'] = int(os.getenv('ANALYSIS_MAX_PROMPT_TOKENS', 6000))  # longer decks are map-reduced
+app.config['ANALYSIS_GROUP_TOKENS'] = int(os.getenv('ANALYSIS_GROUP_TOKENS', 3000))
+app.config['ANALYSIS_CONCURRENCY'] = int(os.getenv('ANALYSIS_CONCURRENCY', 4))  # concurrent analysis calls
+
+# Conversation context for live replies
+app.config['CONTEXT_TOKEN_BUDGET'] = int(os.getenv('CONTEXT_TOKEN_BUDGET', 1500))  # prompt tokens per reply
+app.config['CONTEXT_RECENT_TURNS'] = int(os.getenv('CONTEXT_RECENT_TURNS', 4))  # exchanges kept verbatim
+
+# Question bank prepared during processing and served as live replies
+app.config['QUESTION_BANK'] = os.getenv('QUESTION_BANK', '1') == '1'
+app.config['QUESTION_BANK_PER_SLIDE'] = int(os.getenv('QUESTION_BANK_PER_SLIDE', 2))  # questions written per slide
+app.config['QUESTION_BANK_MIN_SCORE'] = float(os.getenv('QUESTION_BANK_MIN_SCORE', 2.0))  # slide match needed to use one
+
+# Answers to the evaluator's questions, graded on CPU with the LLM only for ambiguous ones
+app.config['ANSWER_GRADING'] = os.getenv('ANSWER_GRADING', '1') == '1'
+app.config['ANSWER_GRADING_LOW'] = float(os.getenv('ANSWER_GRADING_LOW', 0.3))  # local scores from here...
+app.config['ANSWER_GRADING_HIGH'] = float(os.getenv('ANSWER_GRADING_HIGH', 0.7))  # ...to here go to the LLM
+app.config['ANSWER_GRADING_WAIT'] = float(os.getenv('ANSWER_GRADING_WAIT', 2.0))  # seconds completion waits for them
+
+# Incremental scoring
+app.config['SCORING_SEGMENT_TURNS'] = int(os.getenv('SCORING_SEGMENT_TURNS', 3))  # turns per background scoring call
+app.config['SCORING_FINALIZE_WAIT'] = float(os.getenv('SCORING_FINALIZE_WAIT', 0.5))  # seconds
+
+# Scale-out: app worker processes sharing DATA_DIR (see gunicorn.conf.py)
+app.config['WEB_WORKERS'] = int(os.getenv('WEB_WORKERS', 1))
+# Turn leases and counts across workers: sqlite (one host) or memory (a single worker)
+app.config['SHARED_STATE'] = os.getenv('SHARED_STATE', 'sqlite' if app.config['WEB_WORKERS'] > 1 else 'memory')
+app.config['JOB_POLL_INTERVAL'] = float(os.getenv('JOB_POLL_INTERVAL', 1))  # seconds; jobs queued by other workers
+app.config['FAKE_LLM_LATENCY'] = float(os.getenv('FAKE_LLM_LATENCY', 0))  # seconds per call with LLM_BACKEND=fake
+app.config['FAKE_STT_LATENCY'] = float(os.getenv('FAKE_STT_LATENCY', 0))  # seconds per batch with STT_BACKEND=fake
+
+# Status stream
+STATUS_HEARTBEAT = 15  # seconds between keep-alives on /api/status-stream
+# Seconds between database reads for changes made by other workers
+app.config['STATUS_POLL_INTERVAL'] = float(os.getenv(
+    'STATUS_POLL_INTERVAL', 1 if app.config['WEB_WORKERS'] > 1 else STATUS_HEARTBEAT))
+
+# Response size
+COMPRESS_MIN_BYTES = 1024  # smaller JSON responses are sent uncompressed
+STATUS_FIELDS = ('session_id', 'status', 'queue_position', 'analysis', 'content')
+RESULT_FIELDS = ('session_id', 'student_info', 'scores', 'total_score', 'feedback', 'pending_turns', 'completed_at')
+
+# Result cache
+app.config['CACHE_MAX_BYTES'] = int(os.getenv('CACHE_MAX_BYTES', 256 * 1024 * 1024))
+app.config['CACHE_TTL'] = int(os.getenv('CACHE_TTL', 30 * 24 * 3600))  # seconds
+
+# Retention (0 keeps forever)
+app.config['RETENTION_INCOMPLETE_DAYS'] = int(os.getenv('RETENTION_INCOMPLETE_DAYS', 14))  # never completed
+app.config['RETENTION_ERROR_DAYS'] = int(os.getenv('RETENTION_ERROR_DAYS', 7))  # failed processing
+app.config['RETENTION_COMPLETED_DAYS'] = int(os.getenv('RETENTION_COMPLETED_DAYS', 30))  # then archived
+app.config['RETENTION_ARCHIVE_DAYS'] = int(os.getenv('RETENTION_ARCHIVE_DAYS', 0))
+app.config['RETENTION_AUDIO_CHUNK_HOURS'] = int(os.getenv('RETENTION_AUDIO_CHUNK_HOURS', 24))
+app.config['RETENTION_PARTIAL_UPLOAD_HOURS'] = int(os.getenv('RETENTION_PARTIAL_UPLOAD_HOURS', 24))
+app.config['JANITOR_INTERVAL'] = int(os.getenv('JANITOR_INTERVAL', 3600))  # seconds between sweeps, 0 disables
+
+# Instrumentation
+app.config['METRICS_ENABLED'] = int(os.getenv('METRICS_ENABLED', 1))  # 0 turns recording and /metrics off
+app.config['TRACE_REQUESTS'] = int(os.getenv('TRACE_REQUESTS', 0))  # Server-Timing on every response, not only on X-Trace: 1
+metrics.enabled = bool(app.config['METRICS_ENABLED'])
+# Each worker process serves its own figures; the label keeps their series apart
+metrics.labels['worker'] = worker_id()
+
 # Ensure upload directory exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs('static', exist_ok=True)
 os.makedirs('templates', exist_ok=True)
 
-# Initialize OpenAI
-client = openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+# Initialize OpenAI (LLM_BACKEND=fake runs fully offline)
+if os.getenv('LLM_BACKEND') == 'fake':
+    from fake_llm import FakeOpenAIClient
+    client = FakeOpenAIClient(latency=app.config['FAKE_LLM_LATENCY'])
+else:
+    # OPENAI_BASE_URL can point at a local mock server (python fake_llm.py)
+    client = create_openai_client(
+        api_key=os.getenv('OPENAI_API_KEY'),
+        base_url=os.getenv('OPENAI_BASE_URL'),
+        timeout=app.config['LLM_TIMEOUT']
+    )
+# Each worker process gets its share of the account's rate limits
+llm = LLMGateway(
+    client,
+    max_concurrency=app.config['LLM_MAX_CONCURRENCY'],
+    requests_per_minute=app.config['LLM_REQUESTS_PER_MINUTE'] // app.config['WEB_WORKERS'],
+    tokens_per_minute=app.config['LLM_TOKENS_PER_MINUTE'] // app.config['WEB_WORKERS'],
+    max_retries=app.config['LLM_MAX_RETRIES'],
+    timeout=app.config['LLM_TIMEOUT']
+)
 
 # Initialize database and evaluator
-db = Database()
-evaluator = PresentationEvaluator(client)
+db = Database(app.config['DATA_DIR'])
+shared = create_shared_state(app.config['SHARED_STATE'], db.data_dir)
+cache = ResultCache(
+    db.data_dir,
+    max_bytes=app.config['CACHE_MAX_BYTES'],
+    ttl=app.config['CACHE_TTL']
+)
+extractor = ExtractionEngine(
+    max_workers=app.config['EXTRACTION_PROCESSES'],
+    time_budget=app.config['EXTRACTION_TIME_BUDGET'],
+    memory_budget=app.config['EXTRACTION_MEMORY_BUDGET']
+)
+# Slide images are only decoded when scoring looks at the design slides
+visuals = SlideVisuals(extractor, cache)
+speech = create_speech_engine(
+    app.config['STT_BACKEND'],
+    model=app.config['STT_MODEL'],
+    batch_size=app.config['STT_BATCH_SIZE'],
+    max_wait=app.config['STT_BATCH_WAIT'],
+    workers=app.config['STT_WORKERS'],
+    latency=app.config['FAKE_STT_LATENCY']
+)
+context = ConversationContext(
+    llm,
+    db,
+    token_budget=app.config['CONTEXT_TOKEN_BUDGET'],
+    recent_turns=app.config['CONTEXT_RECENT_TURNS']
+)
+answers = AnswerGrader(
+    llm,
+    db,
+    low=app.config['ANSWER_GRADING_LOW'],
+    high=app.config['ANSWER_GRADING_HIGH'],
+    finalize_wait=app.config['ANSWER_GRADING_WAIT']
+) if app.config['ANSWER_GRADING'] else None
+scorer = IncrementalScorer(
+    llm,
+    db,
+    segment_turns=app.config['SCORING_SEGMENT_TURNS'],
+    finalize_wait=app.config['SCORING_FINALIZE_WAIT'],
+    visuals=visuals,
+    answers=answers
+)
+questions = QuestionBank(
+    llm,
+    db,
+    cache,
+    per_slide=app.config['QUESTION_BANK_PER_SLIDE'],
+    group_tokens=app.config['ANALYSIS_GROUP_TOKENS'],
+    concurrency=app.config['ANALYSIS_CONCURRENCY'],
+    min_score=app.config['QUESTION_BANK_MIN_SCORE']
+) if app.config['QUESTION_BANK'] else None
+evaluator = PresentationEvaluator(
+    llm,
+    cache=cache,
+    speech=speech,
+    context=context,
+    scorer=scorer,
+    shared=shared,
+    visuals=visuals,
+    questions=questions,
+    answers=answers,
+    max_prompt_tokens=app.config['ANALYSIS_MAX_PROMPT_TOKENS'],
+    group_tokens=app.config['ANALYSIS_GROUP_TOKENS'],
+    analysis_concurrency=app.config['ANALYSIS_CONCURRENCY']
+)
+status_events = StatusBroadcaster()
+live_turns = LiveTurnProcessor(db, evaluator, workers=app.config['LIVE_WORKERS'],
+                               poll_interval=min(0.5, app.config['STATUS_POLL_INTERVAL']))
+audio_streams = AudioStreamServer(db, evaluator, port=app.config['WS_PORT'],
+                                  workers=app.config['LIVE_WORKERS'])
+upload_store = UploadStore(
+    app.config['UPLOAD_FOLDER'],
+    max_bytes=app.config['MAX_UPLOAD_MB'] * 1024 * 1024,
+    chunk_bytes=app.config['UPLOAD_CHUNK_MB'] * 1024 * 1024
+)
+archive = SessionArchive(db.data_dir)
+janitor = Janitor(
+    db,
+    upload_store,
+    archive,
+    ttls={
+        'uploaded': app.config['RETENTION_INCOMPLETE_DAYS'] * 86400,
+        'processing': app.config['RETENTION_INCOMPLETE_DAYS'] * 86400,
+        'ready': app.config['RETENTION_INCOMPLETE_DAYS'] * 86400,
+        'error': app.config['RETENTION_ERROR_DAYS'] * 86400,
+        'completed': app.config['RETENTION_COMPLETED_DAYS'] * 86400
+    },
+    archive_ttl=app.config['RETENTION_ARCHIVE_DAYS'] * 86400,
+    audio_chunk_ttl=app.config['RETENTION_AUDIO_CHUNK_HOURS'] * 3600,
+    partial_upload_ttl=app.config['RETENTION_PARTIAL_UPLOAD_HOURS'] * 3600,
+    interval=app.config['JANITOR_INTERVAL'],
+    shared=shared
+)
 
 # Allowed file extensions
 ALLOWED_EXTENSIONS = {'ppt', 'pptx', 'pdf'}
@@ -41,10 +292,16 @@ def allowed_file(filename):
 
 @app.route('/')
 def index():
-    return render_template('index.html')
+    return render_template('index.html', ws_port=app.config['WS_PORT'])
 
 @app.route('/api/submit', methods=['POST'])
 def submit_presentation():
+    """Register a student's presentation and queue it for processing
+
+    The deck is either the `file` field, written to storage as it is
+    received, or the `upload_id` of a completed chunked upload (see
+    /api/uploads).
+    """
     try:
         # Get student information
         roll_no = request.form.get('roll_no')
@@ -53,23 +310,37 @@ def submit_presentation():
         if not roll_no or not name:
             return jsonify({'error': 'Roll number and name are required'}), 400
         
-        # Check if file was uploaded
-        if 'file' not in request.files:
-            return jsonify({'error': 'No file uploaded'}), 400
-        
-        file = request.files['file']
-        
-        if file.filename == '':
-            return jsonify({'error': 'No file selected'}), 400
+        upload_id = request.form.get('upload_id')
+        if upload_id:
+            upload = upload_store.status(upload_id)
+            if upload is None:
+                return jsonify({'error': 'Upload not found'}), 404
+            filename = secure_filename(upload['filename'])
+        else:
+            # Check if file was uploaded
+            if 'file' not in request.files:
+                return jsonify({'error': 'No file uploaded'}), 400
+            
+            file = request.files['file']
+            
+            if file.filename == '':
+                return jsonify({'error': 'No file selected'}), 400
+            
+            if not allowed_file(file.filename):
+                return jsonify({'error': 'Only PPT, PPTX, and PDF files are allowed'}), 400
+            filename = secure_filename(file.filename)
         
-        if not allowed_file(file.filename):
-            return jsonify({'error': 'Only PPT, PPTX, and PDF files are allowed'}), 400
+        # Reject early rather than storing a file we cannot process
+        if job_queue.is_full():
+            return queue_full_response()
         
-        # Save the file
-        filename = secure_filename(file.filename)
+        # Move the received file into place, checked and hashed on the way in
         session_id = str(uuid.uuid4())
         file_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{session_id}_{filename}")
-        file.save(file_path)
+        if upload_id:
+            _, file_hash = upload_store.finish(upload_id, file_path)
+        else:
+            file_hash = upload_store.commit(file.stream, file_path)
         
         # Create session record
         session_data = {
@@ -84,51 +355,367 @@ def submit_presentation():
         
         db.create_session(session_data)
         
-        # Start processing the presentation in background
-        threading.Thread(target=process_presentation, args=(session_id, file_path)).start()
+        # Queue the presentation for background processing
+        try:
+            job_queue.submit(session_id, file_path=file_path, file_hash=file_hash)
+        except QueueFullError:
+            db.delete_session(session_id)
+            os.remove(file_path)
+            return queue_full_response()
         
         return jsonify({
             'session_id': session_id,
             'message': 'Presentation uploaded successfully. Processing...',
-            'status': 'uploaded'
+            'status': 'uploaded',
+            'queue_position': job_queue.position(session_id)
         })
         
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+    except RequestEntityTooLarge:
+        return upload_too_large_response()
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-def process_presentation(session_id, file_path):
+def upload_too_large_response():
+    return jsonify({'error': f"Uploads are limited to {app.config['MAX_UPLOAD_MB']} MB; "
+                             f"send larger files through /api/uploads"}), 413
+
+@app.route('/api/uploads', methods=['POST'])
+def start_upload():
+    """Start a resumable chunked upload from JSON {filename, size}
+
+    Chunks are then PUT to the returned upload_url, and the finished upload
+    is submitted with its upload_id in place of the file.
+    """
+    data = request.get_json(silent=True) or {}
     try:
-        # Update status to processing
-        db.update_session_status(session_id, 'processing')
-        
-        # Extract content from presentation
-        content = evaluator.extract_presentation_content(file_path)
-        
-        # Analyze content and generate evaluation criteria
-        analysis = evaluator.analyze_presentation(content)
-        
-        # Update session with analysis
-        db.update_session_analysis(session_id, content, analysis)
-        
-        # Update status to ready
-        db.update_session_status(session_id, 'ready')
-        
-    except Exception as e:
-        db.update_session_status(session_id, f'error: {str(e)}')
+        upload = upload_store.start(data.get('filename') or '', int(data.get('size') or 0))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'filename and size are required'}), 400
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+    return jsonify(dict(upload, upload_url=f"/api/uploads/{upload['upload_id']}")), 201
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+def get_upload(upload_id):
+    """How far a chunked upload got: the next chunk goes at `offset`"""
+    upload = upload_store.status(upload_id)
+    if upload is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    return jsonify(upload)
+
+@app.route('/api/uploads/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    """Append the raw request body to a chunked upload at ?offset=N
+
+    N must be the upload's current offset; a 409 answer carries the right one.
+    """
+    try:
+        offset = int(request.args.get('offset', ''))
+    except ValueError:
+        return jsonify({'error': 'offset is required'}), 400
+    if request.content_length is None:
+        return jsonify({'error': 'Content-Length is required'}), 411
+    
+    try:
+        return jsonify(upload_store.append(upload_id, offset, request.stream, request.content_length))
+    except UploadError as e:
+        body = {'error': str(e)}
+        upload = upload_store.status(upload_id)
+        if upload is not None:
+            body['offset'] = upload['offset']
+        return jsonify(body), e.status
+    except RequestEntityTooLarge:
+        return upload_too_large_response()
+
+def process_presentation(session_id, file_path, file_hash=None):
+    """Job handler: extract and analyze an uploaded presentation
+
+    Exceptions propagate so that the job queue can retry the job; the session
+    is only marked as failed once every attempt is used up.
+    """
+    # Update status to processing
+    set_session_status(session_id, 'processing')
+    
+    # Extract slides on the process pool (CPU-bound) while analysis consumes them;
+    # re-uploads of the same file skip extraction entirely
+    content, analysis = evaluator.process_file(file_path, extractor, file_hash)
+    
+    # Questions for each slide, so live turns can ask them without waiting on the LLM
+    question_bank = None
+    if questions is not None:
+        with metrics.timer('stage_seconds', stage='question_bank'):
+            question_bank = questions.build(content, analysis)
+    
+    # Update session with analysis and the index live turns and scoring retrieve slides from
+    db.update_session_analysis(session_id, content, analysis, SlideIndex.build(content).to_dict(), question_bank)
+    
+    # Update status to ready
+    set_session_status(session_id, 'ready')
+
+def processing_failed(session_id, error):
+    metrics.inc('errors_total', stage='processing', type=type(error).__name__)
+    set_session_status(session_id, f'error: {str(error)}')
+
+def set_session_status(session_id, status):
+    """Store a status transition and push it to clients on /api/status-stream"""
+    db.update_session_status(session_id, status)
+    status_events.publish(session_id, status)
+
+job_queue = JobQueue(
+    db,
+    process_presentation,
+    on_failure=processing_failed,
+    workers=app.config['JOB_WORKERS'],
+    max_queued=app.config['JOB_QUEUE_SIZE'],
+    max_attempts=app.config['JOB_MAX_ATTEMPTS'],
+    poll_interval=app.config['JOB_POLL_INTERVAL']
+)
+
+def register_metrics():
+    """Read the figures the components already keep when /metrics is scraped"""
+    metrics.describe('http_request_seconds', 'Time to produce a response, by endpoint')
+    metrics.describe('stage_seconds', 'Time spent in each processing stage')
+    metrics.describe('db_seconds', 'Database transactions and field reads, lock waits included')
+    metrics.describe('llm_call_seconds', 'LLM calls from submission to the last token, queueing and retries included')
+    metrics.describe('llm_queue_seconds', 'Time LLM calls waited for a slot or the rate limits')
+    metrics.describe('errors_total', 'Failures by stage and exception type')
+    metrics.describe('replies_total', 'Live replies by source: a prepared question or the LLM')
+    metrics.describe('answers_graded_total', 'Answers to questions by how they were graded: locally or escalated to the LLM')
+
+    metrics.collect('job_queue_depth', job_queue.depth, help_text='Presentations waiting to be processed')
+    metrics.collect('live_turn_backlog', live_turns.backlog, help_text='Audio chunks queued or in progress')
+    metrics.collect('stt_pending', lambda: speech.stats()['pending'], help_text='Clips waiting for speech-to-text')
+    metrics.collect('llm_calls_in_flight', lambda: [({'state': state}, value) for state, value in llm.load().items()],
+                    help_text='LLM calls running and waiting')
+
+    def llm_counter(key):
+        return lambda: [({'purpose': purpose}, stats[key]) for purpose, stats in llm.stats().items()]
+    metrics.collect('llm_calls_total', llm_counter('calls'), 'counter', 'LLM calls completed')
+    metrics.collect('llm_errors_total', llm_counter('errors'), 'counter', 'LLM calls failed')
+    metrics.collect('llm_retries_total', llm_counter('retries'), 'counter', 'LLM call retries')
+    metrics.collect('llm_rate_limited_total', llm_counter('rate_limited'), 'counter', 'LLM calls rate limited by the API')
+    metrics.collect('llm_tokens_total', lambda: [
+        ({'purpose': purpose, 'kind': kind}, stats[f'{kind}_tokens'])
+        for purpose, stats in llm.stats().items() for kind in ('prompt', 'completion')
+    ], 'counter', 'LLM tokens used')
+
+    metrics.collect('cache_requests_total', lambda: [
+        ({'namespace': namespace, 'result': result}, stats[key])
+        for namespace, stats in cache.stats()['namespaces'].items()
+        for result, key in (('hit', 'hits'), ('miss', 'misses'))
+    ], 'counter', 'Result cache lookups')
+    metrics.collect('cache_bytes', lambda: cache.stats()['bytes'], help_text='Result cache size')
+    metrics.collect('stt_clips_total', lambda: speech.stats()['clips'], 'counter', 'Clips transcribed')
+    metrics.collect('stt_batches_total', lambda: speech.stats()['batches'], 'counter', 'Speech-to-text backend calls')
+    metrics.collect('database_bytes', db.size, help_text='Database file size')
+    metrics.collect('retention_removed_total', lambda: [
+        ({'kind': kind}, value) for kind, value in janitor.stats().items()
+        if kind not in ('last_sweep', 'database_bytes', 'archive')
+    ], 'counter', 'Sweeps run and sessions, uploads and records removed by the retention janitor')
+
+register_metrics()
+
+@app.before_request
+def start_request_timer():
+    if not metrics.enabled:
+        return
+    g.request_start = time.perf_counter()
+    if app.config['TRACE_REQUESTS'] or request.headers.get('X-Trace') == '1':
+        g.trace = metrics.start_trace()
+
+@app.after_request
+def record_request(response):
+    """Time the request and, when traced, report its spans in a Server-Timing header"""
+    start = g.pop('request_start', None)
+    if start is None:
+        return response
+    elapsed = time.perf_counter() - start
+    trace = g.pop('trace', None)
+    if trace is not None:
+        timings = [f'{span};dur={total * 1000:.2f}' + (f';desc="x{count}"' if count > 1 else '')
+                   for span, total, count in metrics.end_trace(trace)]
+        response.headers['Server-Timing'] = ', '.join(timings + [f'total;dur={elapsed * 1000:.2f}'])
+    metrics.observe('http_request_seconds', elapsed, endpoint=request.endpoint or 'unmatched',
+                    method=request.method, status=response.status_code)
+    return response
+
+@app.after_request
+def tag_worker(response):
+    """Name the worker process that served the request when there are several"""
+    if app.config['WEB_WORKERS'] > 1:
+        response.headers['X-Served-By'] = worker_id()
+    return response
+
+@app.teardown_request
+def end_request_trace(error=None):
+    # A request that never reached record_request must not leave its thread tracing
+    trace = g.pop('trace', None)
+    if trace is not None:
+        metrics.end_trace(trace)
+
+@app.route('/metrics')
+def get_metrics():
+    """Prometheus scrape endpoint"""
+    if not metrics.enabled:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+def start_background_workers():
+    """Start the job workers, resuming leftover jobs, the retention janitor and the audio streaming server"""
+    job_queue.recover()
+    job_queue.start()
+    janitor.start()
+    if app.config['WS_PORT']:
+        audio_streams.start()
+
+def queue_full_response():
+    response = jsonify({
+        'error': 'Too many presentations are being processed. Please try again shortly.',
+        'queue_depth': job_queue.depth()
+    })
+    response.headers['Retry-After'] = '30'
+    return response, 429
 
 @app.route('/api/status/<session_id>')
 def get_status(session_id):
-    session = db.get_session(session_id)
+    """Processing status; ?fields=status,queue_position limits the response to those keys"""
+    fields = requested_fields(STATUS_FIELDS)
+    if fields is None:
+        return unknown_fields_response(STATUS_FIELDS)
+    
+    session = db.get_session_fields(session_id, 'status', 'created_at', 'updated_at')
     if not session:
         return jsonify({'error': 'Session not found'}), 404
     
-    return jsonify({
-        'session_id': session_id,
-        'status': session['status'],
-        'analysis': session.get('analysis'),
-        'content': session.get('content')
+    queue_position = job_queue.position(session_id)
+    
+    def payload():
+        status = {
+            'session_id': session_id,
+            'status': session['status'],
+            'queue_position': queue_position
+        }
+        # Only decode the stored slides when they were asked for
+        if 'analysis' in fields or 'content' in fields:
+            full_session = db.get_session(session_id) or {}
+            status['analysis'] = lean_analysis(full_session.get('analysis'))
+            status['content'] = full_session.get('content')
+        return {field: status[field] for field in fields}
+    
+    version = session['updated_at'] or session['created_at']
+    return conditional_json(make_etag(version, queue_position, *fields), payload)
+
+def requested_fields(available):
+    """Fields listed in ?fields=, all of `available` when absent, None if any is unknown"""
+    fields = request.args.get('fields')
+    if not fields:
+        return available
+    fields = tuple(field.strip() for field in fields.split(',') if field.strip())
+    if not set(fields) <= set(available):
+        return None
+    return fields
+
+def unknown_fields_response(available):
+    return jsonify({'error': f"Unknown field; choose from: {', '.join(available)}"}), 400
+
+def make_etag(*parts):
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+def conditional_json(etag, payload):
+    """JSON response built from payload(), or 304 when the client already has this version"""
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(payload())
+    # Weak because the bytes differ between compressed and identity encodings
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def lean_analysis(analysis):
+    """Drop the copy of the slides that older analyses embedded; they are in `content`"""
+    if analysis and 'slides' in analysis:
+        analysis = {key: value for key, value in analysis.items() if key != 'slides'}
+    return analysis
+
+@app.after_request
+def compress_response(response):
+    """Brotli- or gzip-encode large JSON responses the client accepts compressed"""
+    if (response.mimetype != 'application/json' or response.is_streamed or
+            response.status_code != 200 or 'Content-Encoding' in response.headers):
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+    
+    if brotli is not None and 'br' in request.accept_encodings:
+        response.set_data(brotli.compress(body, quality=5))
+        response.headers['Content-Encoding'] = 'br'
+    elif 'gzip' in request.accept_encodings:
+        response.set_data(gzip.compress(body, compresslevel=6))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+@app.route('/api/status-stream/<session_id>')
+def stream_status(session_id):
+    """Server-sent events for a session's processing status
+
+    A `status` event is sent on connect and on every transition (plus queue
+    position changes), with a comment line every STATUS_HEARTBEAT seconds in
+    between. Once the session is ready a single `ready` event carries the
+    analysis and content, and the stream ends; it also ends on an error.
+    Transitions made by this process are pushed at once, those made by
+    another worker are read every STATUS_POLL_INTERVAL seconds.
+    """
+    version = status_events.version(session_id)
+    status = db.get_session_status(session_id)
+    if status is None:
+        return jsonify({'error': 'Session not found'}), 404
+    
+    def events(version, status):
+        last = None
+        sent = 0
+        while True:
+            message = {'status': status, 'queue_position': job_queue.position(session_id)}
+            if message != last:
+                yield server_sent_event('status', message)
+                last = message
+                sent = time.monotonic()
+            elif time.monotonic() - sent >= STATUS_HEARTBEAT:
+                yield ': keep-alive\n\n'
+                sent = time.monotonic()
+            
+            if status == 'ready':
+                session = db.get_session(session_id)
+                yield server_sent_event('ready', {
+                    'session_id': session_id,
+                    'status': status,
+                    'analysis': lean_analysis(session.get('analysis')),
+                    'content': session.get('content')
+                })
+                return
+            if status.startswith('error'):
+                return
+            
+            update = status_events.wait(session_id, version, app.config['STATUS_POLL_INTERVAL'])
+            if update is not None:
+                version, status = update
+            else:
+                # Nothing published here; pick up changes made by another process
+                status = db.get_session_status(session_id) or 'error: session deleted'
+    
+    return Response(events(version, status), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
     })
 
+def server_sent_event(event, data):
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
 @app.route('/api/start-presentation/<session_id>', methods=['POST'])
 def start_presentation(session_id):
     session = db.get_session(session_id)
@@ -159,57 +746,165 @@ def start_presentation(session_id):
 
 @app.route('/api/audio-upload/<session_id>', methods=['POST'])
 def upload_audio(session_id):
+    """Hand an audio chunk to the live pipeline and return its chunk ID immediately
+
+    The transcript and evaluator reply are fetched from
+    /api/audio-result/<session_id>/<chunk_id>, or followed word by word from
+    /api/audio-stream/<session_id>/<chunk_id>. Pass ?sync=1 to wait for them
+    in this request instead.
+    """
     try:
+        if (request.content_length or 0) > app.config['MAX_AUDIO_MB'] * 1024 * 1024:
+            return jsonify({'error': f"Audio uploads are limited to {app.config['MAX_AUDIO_MB']} MB"}), 413
+        
         if 'audio' not in request.files:
             return jsonify({'error': 'No audio file provided'}), 400
         
-        audio_file = request.files['audio']
+        if not db.get_evaluation(session_id):
+            return jsonify({'error': 'Evaluation session not found'}), 404
         
-        # Save audio temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as tmp_file:
-            audio_file.save(tmp_file.name)
-            
-            # Process audio - convert speech to text
-            transcript = evaluator.speech_to_text(tmp_file.name)
-            
-            # Add to transcript
-            db.add_transcript_entry(session_id, transcript)
-            
-            # Generate AI response or question
-            response = evaluator.generate_response(transcript, session_id)
-            
-            # Clean up
-            os.unlink(tmp_file.name)
-            
-            return jsonify({
-                'transcript': transcript,
-                'response': response,
-                'continue': True
-            })
+        chunk_id = live_turns.submit(session_id, request.files['audio'].read())
+        
+        if request.args.get('sync'):
+            return audio_result_response(live_turns.wait(chunk_id, AUDIO_SYNC_TIMEOUT))
+        
+        return jsonify({
+            'chunk_id': chunk_id,
+            'status': 'pending',
+            'result_url': f'/api/audio-result/{session_id}/{chunk_id}',
+            'stream_url': f'/api/audio-stream/{session_id}/{chunk_id}'
+        }), 202
             
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/audio-result/<session_id>/<chunk_id>')
+def get_audio_result(session_id, chunk_id):
+    """Transcript and reply for an audio chunk; ?wait=N long-polls up to N seconds"""
+    wait = request.args.get('wait', type=float)
+    if (wait is None and 'wait' in request.args) or (wait is not None and math.isnan(wait)):
+        return jsonify({'error': 'wait must be a number of seconds'}), 400
+    chunk = live_turns.wait(chunk_id, max(0.0, min(wait or 0.0, AUDIO_MAX_WAIT)))
+    if not chunk or chunk['session_id'] != session_id:
+        return jsonify({'error': 'Audio chunk not found'}), 404
+    return audio_result_response(chunk)
+
+@app.route('/api/audio-stream/<session_id>/<chunk_id>')
+def stream_audio_result(session_id, chunk_id):
+    """Server-sent events for an audio chunk as it is processed
+
+    A `transcript` event is sent once speech-to-text is done, then a `delta`
+    event for each piece of the evaluator's reply as the LLM generates it,
+    and finally `done` with the /api/audio-result body (per-turn timings
+    included) or `error`. A client connecting after the chunk finished only
+    gets the final event.
+    """
+    turn = live_turns.events(chunk_id)
+    chunk = db.get_audio_chunk(chunk_id)
+    if not chunk or chunk['session_id'] != session_id:
+        return jsonify({'error': 'Audio chunk not found'}), 404
+    
+    def events():
+        if turn is not None:
+            for item in turn.follow(STATUS_HEARTBEAT):
+                if item is None:
+                    yield ': keep-alive\n\n'
+                elif item[0] in ('transcript', 'delta'):
+                    yield server_sent_event(item[0], {'text': item[1]})
+        
+        chunk = live_turns.wait(chunk_id, AUDIO_MAX_WAIT)
+        if chunk['status'] == 'done':
+            yield server_sent_event('done', audio_result(chunk))
+        else:
+            yield server_sent_event('error', {'chunk_id': chunk_id,
+                                              'error': chunk.get('error') or 'Audio chunk is still being processed'})
+    
+    return Response(events(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+def audio_result(chunk):
+    return {
+        'chunk_id': chunk['chunk_id'],
+        'status': 'done',
+        'transcript': chunk['transcript'],
+        'response': chunk['response'],
+        'timings': chunk.get('timings'),
+        'continue': True
+    }
+
+def audio_result_response(chunk):
+    if chunk['status'] == 'pending':
+        return jsonify({'chunk_id': chunk['chunk_id'], 'status': 'pending'}), 202
+    
+    if chunk['status'] == 'error':
+        return jsonify({'chunk_id': chunk['chunk_id'], 'status': 'error', 'error': chunk.get('error')}), 500
+    
+    return jsonify(audio_result(chunk))
+
+@app.route('/api/question-answer/<session_id>', methods=['POST'])
+def question_answer(session_id):
+    """Record a question put to the student outside the live turns, and their answer, graded"""
+    if answers is None:
+        return jsonify({'error': 'Answer grading is disabled'}), 404
+    
+    data = request.get_json(silent=True) or {}
+    question = str(data.get('question') or '').strip()
+    answer = str(data.get('answer') or '').strip()
+    if not question or not answer:
+        return jsonify({'error': 'Both question and answer are required'}), 400
+    keypoints = data.get('keypoints') or []
+    if not isinstance(keypoints, list):
+        return jsonify({'error': 'keypoints must be a list'}), 400
+    
+    if not db.get_evaluation_fields(session_id, 'status'):
+        return jsonify({'error': 'Evaluation session not found'}), 404
+    
+    grade = answers.record(session_id, question, answer, [str(point) for point in keypoints])
+    return jsonify({'grade': grade, 'escalated': answers.escalates(grade)})
+
+@app.route('/api/question-answer/<session_id>', methods=['GET'])
+def question_answers(session_id):
+    """Questions asked in a session and the graded answers"""
+    if not db.get_evaluation_fields(session_id, 'status'):
+        return jsonify({'error': 'Evaluation session not found'}), 404
+    entries = answers.entries(session_id) if answers is not None else db.get_question_answers(session_id)
+    return jsonify({'session_id': session_id, 'entries': entries})
+
 @app.route('/api/complete-evaluation/<session_id>', methods=['POST'])
 def complete_evaluation(session_id):
     try:
-        # Get all evaluation data
-        evaluation = db.get_evaluation(session_id)
-        session = db.get_session(session_id)
-        
-        if not evaluation or not session:
-            return jsonify({'error': 'Evaluation session not found'}), 404
-        
-        # Generate final scores and feedback
-        final_scores = evaluator.calculate_final_scores(evaluation, session)
-        
-        # Update evaluation with final results
-        db.complete_evaluation(session_id, final_scores)
+        # Waits out a turn in progress on another worker and catches up on the turns served there
+        with evaluator.turn(session_id):
+            # Get all evaluation data
+            evaluation = db.get_evaluation(session_id)
+            session = db.get_session(session_id)
+            
+            if not evaluation or not session:
+                return jsonify({'error': 'Evaluation session not found'}), 404
+            
+            # Scores were kept up to date during the talk; merging them is quick
+            final_scores = scorer.finalize(session_id, evaluation)
+            if final_scores is None:
+                # Nothing was scored along the way (a very short talk, or the scoring calls failed)
+                final_scores = evaluator.calculate_final_scores(evaluation, session)
+            
+            # Update evaluation with final results, then fold in any turns still being scored
+            db.complete_evaluation(session_id, final_scores)
+            scorer.close(session_id)
+            context.forget(session_id)
+            if questions is not None:
+                questions.forget(session_id)
+            if answers is not None:
+                answers.forget(session_id)
         
         return jsonify({
             'message': 'Evaluation completed successfully',
-            'scores': final_scores,
-            'total_score': sum(final_scores.values())
+            'scores': final_scores['scores'],
+            'feedback': final_scores.get('feedback', {}),
+            'total_score': final_scores['total_score'],
+            'pending_turns': final_scores.get('pending_turns', 0)
         })
         
     except Exception as e:
@@ -217,11 +912,29 @@ def complete_evaluation(session_id):
 
 @app.route('/api/results/<session_id>')
 def get_results(session_id):
-    evaluation = db.get_evaluation(session_id)
+    """Final scores of a completed evaluation; supports ?fields= like /api/status"""
+    fields = requested_fields(RESULT_FIELDS)
+    if fields is None:
+        return unknown_fields_response(RESULT_FIELDS)
+    
+    evaluation = db.get_evaluation_fields(session_id, 'status', 'completed_at', 'updated_at')
+    if evaluation is None:
+        # Evaluations past their retention period are kept compressed in the archive
+        archived = archive.get(session_id)
+        if archived is not None:
+            record = archived['evaluation']
+            return conditional_json(make_etag(record.get('updated_at') or record.get('completed_at'), *fields),
+                                    lambda: results_payload(session_id, record, fields))
     if not evaluation or evaluation.get('status') != 'completed':
         return jsonify({'error': 'Results not available'}), 404
     
-    return jsonify({
+    version = evaluation['updated_at'] or evaluation['completed_at']
+    return conditional_json(make_etag(version, *fields),
+                            lambda: results_payload(session_id, db.get_evaluation(session_id), fields))
+
+def results_payload(session_id, evaluation, fields):
+    """The /api/results body for an evaluation record, limited to `fields`"""
+    results = {
         'session_id': session_id,
         'student_info': {
             'roll_no': evaluation.get('roll_no'),
@@ -230,8 +943,12 @@ def get_results(session_id):
         'scores': evaluation.get('final_scores'),
         'total_score': evaluation.get('total_score'),
         'feedback': evaluation.get('feedback'),
+        'pending_turns': evaluation.get('pending_turns', 0),
         'completed_at': evaluation.get('completed_at')
-    })
+    }
+    return {field: results[field] for field in fields}
 
-if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+# Processes spawned by a script that imports this module import it again;
+# only the serving process runs the job workers
+if multiprocessing.parent_process() is None:
+    start_background_workers()
\ No newline at end of file
@@ -0,0 +1,5 @@
+"""Benchmarks for the presentation evaluator hot paths, one module per feature
+
+Run them all through one command line with `python -m benchmarks <benchmark> [options]`,
+or a feature's own with `python -m benchmarks.<module> <benchmark> [options]`.
+"""
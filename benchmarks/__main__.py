@@ -0,0 +1,10 @@
+"""Usage: python -m benchmarks <benchmark> [options]"""
+
+from benchmarks import storage, extraction, analysis, audio, web, conversation, gateway, housekeeping, load
+from benchmarks.common import run
+
+# In the order `python -m benchmarks --help` lists them
+MODULES = [storage, extraction, analysis, audio, web, conversation, gateway, housekeeping, load]
+
+if __name__ == "__main__":
+    run(*(module.add_parsers for module in MODULES))
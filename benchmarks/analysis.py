@@ -0,0 +1,163 @@
+"""Deck analysis benchmarks: result cache, map-reduce of long decks and offline batches
+
+Usage: python -m benchmarks.analysis <cache|mapreduce|batch> [options]
+"""
+
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.common import slide_lines, make_synthetic_pdf, make_synthetic_pptx, run
+
+def bench_cache(args):
+    """Cold vs repeated vs one-slide-edited submissions through the result cache"""
+    from fake_llm import FakeOpenAIClient
+    from presentation_evaluator import PresentationEvaluator
+    from result_cache import ResultCache, hash_file
+    from slide_content import records_key
+
+    work_dir = tempfile.mkdtemp(prefix='bench_cache_')
+    try:
+        client = FakeOpenAIClient(latency=args.llm_latency)
+        cache = ResultCache(work_dir)
+        evaluator = PresentationEvaluator(client, cache=cache)
+
+        original = make_synthetic_pptx(os.path.join(work_dir, 'deck.pptx'), args.slides)
+        reupload = os.path.join(work_dir, 'deck_again.pptx')
+        shutil.copy(original, reupload)
+        edited = make_synthetic_pptx(os.path.join(work_dir, 'deck_edited.pptx'), args.slides)
+        from pptx import Presentation
+        prs = Presentation(edited)
+        prs.slides[0].shapes.title.text = 'An updated title slide'
+        prs.save(edited)
+
+        def submit(path):
+            start = time.perf_counter()
+            file_hash = hash_file(path)
+            content = cache.get('slides', records_key(file_hash))
+            if content is None:
+                content = PresentationEvaluator.extract_presentation_content(path)
+                cache.put('slides', records_key(file_hash), content)
+            evaluator.analyze_presentation(content)
+            return time.perf_counter() - start
+
+        for label, path in (('cold upload', original), ('identical re-upload', reupload),
+                            ('one slide edited', edited)):
+            calls_before = client.calls
+            elapsed = submit(path)
+            print(f"  {label:<22} {elapsed * 1000:8.1f}ms   LLM calls {client.calls - calls_before}")
+
+        print(f"\n  cache stats: {cache.stats()}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def bench_mapreduce(args):
+    """Single-call vs map-reduce analysis wall clock on large synthetic decks"""
+    from fake_llm import FakeOpenAIClient
+    from presentation_evaluator import PresentationEvaluator
+    from speech_engine import FakeSpeechBackend, SpeechEngine
+
+    for slides in args.slides:
+        content = [{'slide_number': number,
+                    'content': '\n'.join(slide_lines(number, 12) + [f'Experiment {number} uses dataset{number}.'])}
+                   for number in range(1, slides + 1)]
+        print(f"\n{slides} slides:")
+        for label, max_prompt_tokens in (('single call', 10 ** 9), ('map-reduce', args.max_prompt_tokens)):
+            client = FakeOpenAIClient(latency=args.llm_latency, latency_per_1k_tokens=args.latency_per_1k,
+                                      context_window=args.context_window)
+            evaluator = PresentationEvaluator(client, speech=SpeechEngine(FakeSpeechBackend()),
+                                              max_prompt_tokens=max_prompt_tokens, group_tokens=args.group_tokens,
+                                              analysis_concurrency=args.concurrency)
+            start = time.perf_counter()
+            try:
+                analysis = evaluator.analyze_presentation(content)
+            except Exception as e:
+                print(f"  {label:<12} failed after {(time.perf_counter() - start) * 1000:8.1f}ms: {str(e)[:70]}")
+                continue
+            print(f"  {label:<12} {(time.perf_counter() - start) * 1000:8.1f}ms   LLM calls {client.calls:3d}   "
+                  f"prompt tokens {client.prompt_tokens:7d}   concepts {len(analysis['concepts'])}")
+
+def bench_batch(args):
+    """Grading a class offline: one submission at a time vs the parallel batch pipeline, and resuming"""
+    from database import Database
+    from fake_llm import FakeOpenAIClient
+    from grade_batch import BatchGrader, find_submissions, grade_all
+    from llm_gateway import LLMGateway
+    from presentation_evaluator import PresentationEvaluator
+    from result_cache import ResultCache
+    from slide_extractor import ExtractionEngine
+    from speech_engine import create_speech_engine
+
+    work_dir = tempfile.mkdtemp(prefix='bench_batch_')
+    try:
+        decks = os.path.join(work_dir, 'decks')
+        os.makedirs(decks)
+        for i in range(args.submissions):
+            # Different page counts so no two decks share a cache entry
+            make_synthetic_pdf(os.path.join(decks, f'student{i:03d}.pdf'), args.slides + i)
+            with open(os.path.join(decks, f'student{i:03d}.txt'), 'w') as f:
+                f.write('\n\n'.join(' '.join(slide_lines(i + turn, 3)[1:]) for turn in range(args.turns)))
+        submissions = find_submissions(decks)
+        extractor = ExtractionEngine(max_workers=os.cpu_count())
+
+        def make_grader(name):
+            llm = LLMGateway(FakeOpenAIClient(latency=args.llm_latency), max_concurrency=args.workers,
+                             requests_per_minute=0, tokens_per_minute=0)
+            db = Database(os.path.join(work_dir, name))
+            evaluator = PresentationEvaluator(llm, cache=ResultCache(db.data_dir),
+                                              speech=create_speech_engine('fake'))
+            return BatchGrader(db, evaluator, extractor)
+
+        def run(grader, workers, submissions):
+            start = time.perf_counter()
+            counts, _ = grade_all(grader, submissions, workers, log=lambda line: None)
+            return time.perf_counter() - start, counts
+
+        print(f"\n{args.submissions} submissions of {args.slides}+ slides, "
+              f"LLM {args.llm_latency}s per call, {os.cpu_count()} extraction processes:")
+        sequential, counts = run(make_grader('sequential'), 1, submissions)
+        print(f"  one at a time           {sequential:7.1f}s   {sequential / args.submissions * 1000:6.0f}ms each   "
+              f"({counts['graded']} graded)")
+
+        grader = make_grader('parallel')
+        half = args.submissions // 2
+        first_half, _ = run(grader, args.workers, submissions[:half])
+        rest, counts = run(grader, args.workers, submissions)
+        print(f"  {args.workers} workers              {first_half + rest:7.1f}s   "
+              f"{(first_half + rest) / args.submissions * 1000:6.0f}ms each   "
+              f"(stopped after {half}, resumed: {counts['skipped']} skipped, {counts['graded']} graded)")
+
+        again, counts = run(grader, args.workers, submissions)
+        print(f"  rerun, all graded       {again:7.2f}s   ({counts['skipped']} skipped)")
+        extractor.shutdown()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def add_parsers(subparsers):
+    cache_parser = subparsers.add_parser('cache', help=bench_cache.__doc__)
+    cache_parser.add_argument('--slides', type=int, default=30)
+    cache_parser.add_argument('--llm-latency', type=float, default=2.0, help='simulated seconds per LLM call')
+    cache_parser.set_defaults(run=bench_cache)
+
+    mapreduce_parser = subparsers.add_parser('mapreduce', help=bench_mapreduce.__doc__)
+    mapreduce_parser.add_argument('--slides', type=int, nargs='+', default=[50, 200, 500])
+    mapreduce_parser.add_argument('--max-prompt-tokens', type=int, default=6000)
+    mapreduce_parser.add_argument('--group-tokens', type=int, default=3000)
+    mapreduce_parser.add_argument('--concurrency', type=int, default=4)
+    mapreduce_parser.add_argument('--context-window', type=int, default=None,
+                                  help='reject longer prompts like the real model (e.g. 8192)')
+    mapreduce_parser.add_argument('--llm-latency', type=float, default=1.0)
+    mapreduce_parser.add_argument('--latency-per-1k', type=float, default=0.2, help='simulated seconds per 1k prompt tokens')
+    mapreduce_parser.set_defaults(run=bench_mapreduce)
+
+    batch_parser = subparsers.add_parser('batch', help=bench_batch.__doc__)
+    batch_parser.add_argument('--submissions', type=int, default=40)
+    batch_parser.add_argument('--slides', type=int, default=20)
+    batch_parser.add_argument('--turns', type=int, default=20, help='transcript paragraphs per submission')
+    batch_parser.add_argument('--workers', type=int, default=16)
+    batch_parser.add_argument('--llm-latency', type=float, default=0.5)
+    batch_parser.set_defaults(run=bench_batch)
+
+if __name__ == "__main__":
+    run(add_parsers)
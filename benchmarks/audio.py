@@ -0,0 +1,365 @@
+"""Audio benchmarks: chunk uploads, the streaming socket, batched STT and streamed replies
+
+Usage: python -m benchmarks.audio <audio|stream|stt|replies> [options]
+"""
+
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.common import (percentile, make_pcm, make_wav, start_app, http_request, start_live_session,
+                               free_port, run)
+
+def bench_audio(args):
+    """Concurrent live presenters against /api/audio-upload in blocking vs hand-off mode"""
+    import threading
+
+    work_dir = tempfile.mkdtemp(prefix='bench_audio_')
+    try:
+        app_module, server = start_app(work_dir, server_threads=args.server_threads,
+                                       llm_latency=args.llm_latency, stt_latency=args.stt_latency,
+                                       LIVE_WORKERS=args.presenters)
+        port = server.server_port
+        audio = make_wav(1.0)
+
+        for mode in ('sync', 'async'):
+            upload_times = []
+            turn_times = []
+            errors = []
+            lock = threading.Lock()
+
+            def presenter():
+                session_id = start_live_session(app_module)
+                for _ in range(args.chunks):
+                    start = time.perf_counter()
+                    if mode == 'sync':
+                        status, body = http_request(port, 'POST', f'/api/audio-upload/{session_id}?sync=1',
+                                                    files={'audio': ('chunk.wav', audio)})
+                        uploaded = time.perf_counter()
+                    else:
+                        status, body = http_request(port, 'POST', f'/api/audio-upload/{session_id}',
+                                                    files={'audio': ('chunk.wav', audio)})
+                        uploaded = time.perf_counter()
+                        while status == 202:
+                            time.sleep(args.poll_interval)
+                            status, body = http_request(port, 'GET', body['result_url'] if 'result_url' in body
+                                                        else f'/api/audio-result/{session_id}/{body["chunk_id"]}')
+                    with lock:
+                        if status != 200:
+                            errors.append(status)
+                        upload_times.append(uploaded - start)
+                        turn_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            presenters = [threading.Thread(target=presenter) for _ in range(args.presenters)]
+            for thread in presenters:
+                thread.start()
+            for thread in presenters:
+                thread.join()
+            elapsed = time.perf_counter() - start
+
+            print(f"\n{mode} mode, {args.presenters} presenters x {args.chunks} chunks, "
+                  f"{args.server_threads} server threads:")
+            print(f"  throughput {len(turn_times) / elapsed:8.1f} turns/s   errors {len(errors)}")
+            print(f"  upload request   p50 {percentile(upload_times, 50) * 1000:8.1f}ms   "
+                  f"p99 {percentile(upload_times, 99) * 1000:8.1f}ms")
+            print(f"  speech to reply  p50 {percentile(turn_times, 50) * 1000:8.1f}ms   "
+                  f"p99 {percentile(turn_times, 99) * 1000:8.1f}ms")
+
+        server.shutdown()
+        app_module.live_turns.shutdown()
+        app_module.job_queue.shutdown()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def bench_stream(args):
+    """End-of-speech to reply latency: chunk uploads vs the WebSocket audio stream"""
+    import asyncio
+    import json
+    import threading
+    import websockets
+
+    work_dir = tempfile.mkdtemp(prefix='bench_stream_')
+    ws_port = free_port()
+    try:
+        app_module, server = start_app(work_dir, llm_latency=args.llm_latency, stt_latency=args.stt_latency,
+                                       WS_PORT=ws_port, LIVE_WORKERS=args.presenters * 2)
+        port = server.server_port
+        frame_seconds = 0.1
+        speech = make_pcm(args.speech_seconds)
+        silence = make_pcm(1.5, amplitude=0)
+        frame_bytes = int(16000 * 2 * frame_seconds)
+
+        def http_presenter(latencies, lock):
+            session_id = start_live_session(app_module)
+            wav = make_wav(args.speech_seconds)
+            for _ in range(args.utterances):
+                # The student talks, then presses stop and the recording is uploaded
+                time.sleep(args.speech_seconds)
+                start = time.perf_counter()
+                status, body = http_request(port, 'POST', f'/api/audio-upload/{session_id}',
+                                            files={'audio': ('recording.wav', wav)})
+                while status == 202:
+                    time.sleep(args.poll_interval)
+                    status, body = http_request(port, 'GET', f'/api/audio-result/{session_id}/{body["chunk_id"]}')
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+
+        async def ws_presenter(latencies, press_stop):
+            session_id = start_live_session(app_module)
+            async with websockets.connect(f'ws://127.0.0.1:{ws_port}/ws/{session_id}') as socket:
+                await socket.send(json.dumps({'type': 'start', 'sample_rate': 16000}))
+                audio = speech + (b'' if press_stop else silence)
+                for _ in range(args.utterances):
+                    for offset in range(0, len(audio), frame_bytes):
+                        await socket.send(audio[offset:offset + frame_bytes])
+                        if offset + frame_bytes >= len(speech) and offset < len(speech):
+                            start = time.perf_counter()
+                        await asyncio.sleep(frame_seconds)
+                    if press_stop:
+                        start = time.perf_counter()
+                        await socket.send(json.dumps({'type': 'end'}))
+                    while True:
+                        message = json.loads(await socket.recv())
+                        if message['type'] in ('response', 'error'):
+                            break
+                    latencies.append(time.perf_counter() - start)
+
+        results = {}
+
+        latencies, lock = [], threading.Lock()
+        presenters = [threading.Thread(target=http_presenter, args=(latencies, lock))
+                      for _ in range(args.presenters)]
+        for thread in presenters:
+            thread.start()
+        for thread in presenters:
+            thread.join()
+        results['HTTP chunk upload'] = latencies
+
+        for label, press_stop in (('WebSocket, stop pressed', True), ('WebSocket, silence detected', False)):
+            latencies = []
+
+            async def run_all():
+                await asyncio.gather(*(ws_presenter(latencies, press_stop) for _ in range(args.presenters)))
+
+            asyncio.run(run_all())
+            results[label] = latencies
+
+        print(f"\n{args.presenters} presenters x {args.utterances} utterances of {args.speech_seconds}s "
+              f"(STT {args.stt_latency}s, LLM {args.llm_latency}s):")
+        for label, latencies in results.items():
+            print(f"  {label:<28} end of speech to reply  p50 {percentile(latencies, 50) * 1000:7.0f}ms   "
+                  f"p95 {percentile(latencies, 95) * 1000:7.0f}ms")
+
+        server.shutdown()
+        app_module.audio_streams.stop()
+        app_module.live_turns.shutdown()
+        app_module.job_queue.shutdown()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def bench_stt(args):
+    """Speech-to-text throughput and latency with and without cross-session batching"""
+    import glob
+    import io
+    import threading
+    from speech_engine import FakeSpeechBackend, SpeechEngine, WhisperBackend
+
+    if args.wav_dir:
+        clips = []
+        for path in sorted(glob.glob(os.path.join(args.wav_dir, '*.wav'))):
+            with open(path, 'rb') as f:
+                clips.append(f.read())
+        if not clips:
+            raise Exception(f"No .wav files in {args.wav_dir}")
+    else:
+        clips = [make_wav(args.clip_seconds)]
+
+    if args.backend == 'whisper':
+        backend = WhisperBackend(args.model)
+        backend.pipeline  # loads the model before anything is timed
+    else:
+        backend = FakeSpeechBackend(batch_latency=args.batch_latency, clip_latency=args.clip_latency)
+
+    print(f"{args.backend} backend, {args.sessions} sessions x {args.clips} clips, {len(clips)} distinct WAVs")
+    for batch_size in args.batch_sizes:
+        backend.batch_size = batch_size
+        engine = SpeechEngine(backend, workers=args.workers, max_wait=args.max_wait if batch_size > 1 else 0)
+        latencies = []
+        lock = threading.Lock()
+
+        def session(index):
+            for i in range(args.clips):
+                start = time.perf_counter()
+                engine.transcribe(io.BytesIO(clips[(index + i) % len(clips)]))
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=session, args=(i,)) for i in range(args.sessions)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        engine.shutdown()
+
+        stats = engine.stats()
+        print(f"  batch {batch_size:3d}  {len(latencies) / elapsed:8.1f} clips/s   "
+              f"p50 {percentile(latencies, 50) * 1000:8.1f}ms   p99 {percentile(latencies, 99) * 1000:8.1f}ms   "
+              f"mean batch {stats['mean_batch_size']:5.1f}")
+
+def bench_replies(args):
+    """Time until the student sees the evaluator's first words vs the whole reply, streamed and blocking"""
+    import asyncio
+    import http.client
+    import json
+    import threading
+    import websockets
+
+    work_dir = tempfile.mkdtemp(prefix='bench_replies_')
+    ws_port = free_port()
+    try:
+        app_module, server = start_app(work_dir, llm_latency=args.llm_latency, stt_latency=args.stt_latency,
+                                       WS_PORT=ws_port, LIVE_WORKERS=args.presenters * 2)
+        app_module.client.token_latency = args.token_latency
+        port = server.server_port
+        speech = make_pcm(1.0)
+        wav = make_wav(1.0)
+        results = {}
+        turn_timings = []
+        lock = threading.Lock()
+
+        def record(label, first, full, timings=None):
+            with lock:
+                samples = results.setdefault(label, {'first': [], 'full': []})
+                samples['first'].append(first)
+                samples['full'].append(full)
+                if timings:
+                    turn_timings.append(timings)
+
+        async def ws_presenter():
+            session_id = start_live_session(app_module)
+            async with websockets.connect(f'ws://127.0.0.1:{ws_port}/ws/{session_id}') as socket:
+                await socket.send(json.dumps({'type': 'start', 'sample_rate': 16000}))
+                for _ in range(args.utterances):
+                    await socket.send(speech)
+                    start = time.perf_counter()
+                    await socket.send(json.dumps({'type': 'end'}))
+                    first = None
+                    while True:
+                        message = json.loads(await socket.recv())
+                        if message['type'] == 'response_delta' and first is None:
+                            first = time.perf_counter() - start
+                        if message['type'] in ('response', 'error'):
+                            break
+                    full = time.perf_counter() - start
+                    record('WebSocket, streamed', first or full, full, message.get('timings'))
+
+        def sse_presenter():
+            session_id = start_live_session(app_module)
+            for _ in range(args.utterances):
+                start = time.perf_counter()
+                _, body = http_request(port, 'POST', f'/api/audio-upload/{session_id}',
+                                       files={'audio': ('recording.wav', wav)})
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=300)
+                conn.request('GET', body['stream_url'])
+                response = conn.getresponse()
+                first = None
+                event = None
+                while True:
+                    line = response.readline().decode()
+                    if not line:
+                        break
+                    if line.startswith('event: '):
+                        event = line[7:].strip()
+                        if event == 'delta' and first is None:
+                            first = time.perf_counter() - start
+                    elif line.startswith('data: ') and event in ('done', 'error'):
+                        done = json.loads(line[6:])
+                        break
+                conn.close()
+                full = time.perf_counter() - start
+                record('HTTP upload + SSE', first or full, full, done.get('timings'))
+
+        def blocking_presenter():
+            # Before: nothing is shown until the whole reply is back
+            session_id = start_live_session(app_module)
+            for _ in range(args.utterances):
+                start = time.perf_counter()
+                http_request(port, 'POST', f'/api/audio-upload/{session_id}?sync=1',
+                             files={'audio': ('recording.wav', wav)})
+                full = time.perf_counter() - start
+                record('HTTP upload, blocking', full, full)
+
+        async def run_ws():
+            await asyncio.gather(*(ws_presenter() for _ in range(args.presenters)))
+
+        asyncio.run(run_ws())
+        for target in (sse_presenter, blocking_presenter):
+            threads = [threading.Thread(target=target) for _ in range(args.presenters)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        print(f"\n{args.presenters} presenters x {args.utterances} turns (STT {args.stt_latency}s, "
+              f"LLM first token {args.llm_latency}s + {args.token_latency * 1000:.0f}ms/token):")
+        print(f"  {'':<24} {'first words p50':>16} {'p95':>9} {'whole reply p50':>16} {'p95':>9}")
+        for label, samples in results.items():
+            print(f"  {label:<24} {percentile(samples['first'], 50) * 1000:14.0f}ms "
+                  f"{percentile(samples['first'], 95) * 1000:7.0f}ms "
+                  f"{percentile(samples['full'], 50) * 1000:14.0f}ms "
+                  f"{percentile(samples['full'], 95) * 1000:7.0f}ms")
+
+        print(f"\n  per-turn timings reported by the server, p50 of {len(turn_timings)} streamed turns:")
+        print('  ' + '   '.join(f"{key} {percentile([timings[key] for timings in turn_timings], 50):.0f}"
+                                for key in ('transcribe_ms', 'first_token_ms', 'reply_ms', 'total_ms')))
+        server.shutdown()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def add_parsers(subparsers):
+    audio_parser = subparsers.add_parser('audio', help=bench_audio.__doc__)
+    audio_parser.add_argument('--presenters', type=int, default=200)
+    audio_parser.add_argument('--chunks', type=int, default=3, help='audio chunks per presenter')
+    audio_parser.add_argument('--server-threads', type=int, default=32)
+    audio_parser.add_argument('--stt-latency', type=float, default=0.5)
+    audio_parser.add_argument('--llm-latency', type=float, default=1.0)
+    audio_parser.add_argument('--poll-interval', type=float, default=0.2)
+    audio_parser.set_defaults(run=bench_audio)
+
+    stream_parser = subparsers.add_parser('stream', help=bench_stream.__doc__)
+    stream_parser.add_argument('--presenters', type=int, default=20)
+    stream_parser.add_argument('--utterances', type=int, default=3)
+    stream_parser.add_argument('--speech-seconds', type=float, default=3.0)
+    stream_parser.add_argument('--stt-latency', type=float, default=0.4)
+    stream_parser.add_argument('--llm-latency', type=float, default=0.8)
+    stream_parser.add_argument('--poll-interval', type=float, default=0.5, help='frontend result poll interval')
+    stream_parser.set_defaults(run=bench_stream)
+
+    stt_parser = subparsers.add_parser('stt', help=bench_stt.__doc__)
+    stt_parser.add_argument('--backend', choices=['fake', 'whisper'], default='fake')
+    stt_parser.add_argument('--model', default='openai/whisper-base.en')
+    stt_parser.add_argument('--wav-dir', help='directory of sample recordings (default: synthetic tones)')
+    stt_parser.add_argument('--clip-seconds', type=float, default=3.0)
+    stt_parser.add_argument('--sessions', type=int, default=32)
+    stt_parser.add_argument('--clips', type=int, default=5, help='clips per session')
+    stt_parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 4, 16])
+    stt_parser.add_argument('--workers', type=int, default=1)
+    stt_parser.add_argument('--max-wait', type=float, default=0.05)
+    stt_parser.add_argument('--batch-latency', type=float, default=0.3, help='fake backend seconds per call')
+    stt_parser.add_argument('--clip-latency', type=float, default=0.02, help='fake backend seconds per clip')
+    stt_parser.set_defaults(run=bench_stt)
+
+    replies_parser = subparsers.add_parser('replies', help=bench_replies.__doc__)
+    replies_parser.add_argument('--presenters', type=int, default=10)
+    replies_parser.add_argument('--utterances', type=int, default=3)
+    replies_parser.add_argument('--stt-latency', type=float, default=0.3)
+    replies_parser.add_argument('--llm-latency', type=float, default=0.4, help='seconds to the first token')
+    replies_parser.add_argument('--token-latency', type=float, default=0.04, help='seconds per generated token')
+    replies_parser.set_defaults(run=bench_replies)
+
+if __name__ == "__main__":
+    run(add_parsers)
@@ -0,0 +1,303 @@
+"""Helpers shared by the benchmarks: synthetic decks and audio, app servers, reporting"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime
+
+# The repository, where app.py and gunicorn.conf.py live
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def percentile(samples, pct):
+    """Return the pct-th percentile of a list of samples"""
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+def report(label, samples):
+    """Print mean/p50/p99 latency of samples given in seconds"""
+    print(f"  {label:<24} mean {statistics.mean(samples) * 1e6:9.1f}us  "
+          f"p50 {percentile(samples, 50) * 1e6:9.1f}us  "
+          f"p99 {percentile(samples, 99) * 1e6:9.1f}us")
+
+def make_session(session_id):
+    return {
+        'session_id': session_id,
+        'roll_no': 'R' + session_id[:6],
+        'name': 'Student',
+        'file_path': f'uploads/{session_id}_deck.pdf',
+        'filename': 'deck.pdf',
+        'status': 'uploaded',
+        'created_at': datetime.now().isoformat()
+    }
+
+SAMPLE_SENTENCES = [
+    'Gradient descent minimizes the loss function by following its negative gradient.',
+    'The random forest combines many decision trees trained on bootstrap samples.',
+    'We evaluate the model with five-fold cross validation and report the F1 score.',
+    'Feature scaling keeps features with large ranges from dominating the distance metric.',
+    'The convolutional layers learn spatial filters that detect edges and textures.',
+    'Our dataset contains twelve thousand labelled images collected over six months.',
+    'Regularization with dropout reduces overfitting on the small validation set.',
+    'The transformer encoder uses self-attention to model long range dependencies.',
+]
+
+def slide_lines(number, lines):
+    return [f'Slide {number}: Results and methodology'] + [
+        SAMPLE_SENTENCES[(number + i) % len(SAMPLE_SENTENCES)] for i in range(lines)
+    ]
+
+def make_synthetic_pdf(path, pages, lines=12):
+    """Write a text-only PDF deck with `pages` pages"""
+    objects = ['<< /Type /Catalog /Pages 2 0 R >>', None,
+               '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    kids = []
+    for number in range(1, pages + 1):
+        text = ' '.join(
+            f'({line.replace("(", "").replace(")", "")}) Tj 0 -18 Td'
+            for line in slide_lines(number, lines)
+        )
+        stream = f'BT /F1 12 Tf 40 550 Td {text} ET'
+        objects.append(f'<< /Length {len(stream)} >>\nstream\n{stream}\nendstream')
+        content_ref = len(objects)
+        objects.append(f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 842 595] '
+                       f'/Resources << /Font << /F1 3 0 R >> >> /Contents {content_ref} 0 R >>')
+        kids.append(f'{len(objects)} 0 R')
+    objects[1] = f'<< /Type /Pages /Kids [{" ".join(kids)}] /Count {pages} >>'
+
+    body = b'%PDF-1.4\n'
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(body))
+        body += f'{number} 0 obj\n{obj}\nendobj\n'.encode('latin-1')
+    xref = len(body)
+    body += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode('latin-1')
+    body += ''.join(f'{offset:010d} 00000 n \n' for offset in offsets).encode('latin-1')
+    body += f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode('latin-1')
+
+    with open(path, 'wb') as f:
+        f.write(body)
+    return path
+
+def _synthetic_png(width, height, seed):
+    """An RGB gradient PNG, built without an imaging library"""
+    import struct
+    import zlib
+
+    rows = b''.join(
+        b'\x00' + bytes(((x * 255 // width + seed * 40) % 256, y * 255 // height, (x + y + seed * 90) % 256)[c]
+                        for x in range(width) for c in range(3))
+        for y in range(height))
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(rows)) + chunk(b'IEND', b''))
+
+def make_synthetic_pptx(path, slides, lines=12, rich=False):
+    """Write a PowerPoint deck with `slides` slides
+
+    Text only unless `rich`, which adds speaker notes to every slide, a
+    picture to every third slide and a table to every fourth.
+    """
+    import io
+    from pptx import Presentation
+    from pptx.util import Inches
+
+    prs = Presentation()
+    pictures = [_synthetic_png(*size, seed) for seed, size in enumerate(((640, 480), (200, 150), (960, 540)))]
+    for number in range(1, slides + 1):
+        slide = prs.slides.add_slide(prs.slide_layouts[1])
+        title, *body = slide_lines(number, lines)
+        slide.shapes.title.text = title
+        slide.placeholders[1].text = '\n'.join(body)
+        if not rich:
+            continue
+        slide.notes_slide.notes_text_frame.text = f'Remember to explain slide {number} slowly.'
+        if number % 3 == 0:
+            slide.shapes.add_picture(io.BytesIO(pictures[number % len(pictures)]),
+                                     Inches(6), Inches(4), width=Inches(3.5))
+        if number % 4 == 0:
+            table = slide.shapes.add_table(3, 3, Inches(0.5), Inches(5.5), Inches(5), Inches(1.2)).table
+            for row, cells in enumerate((('Model', 'Accuracy', 'F1'), ('Forest', '0.91', '0.88'),
+                                         ('Network', '0.94', '0.90'))):
+                for column, text in enumerate(cells):
+                    table.cell(row, column).text = text
+    prs.save(path)
+    return path
+
+def make_pcm(seconds=1.0, rate=16000, amplitude=3000):
+    """Mono 16-bit PCM of a 440Hz tone (amplitude 0 gives silence)"""
+    import math
+    import struct
+
+    return b''.join(
+        struct.pack('<h', int(amplitude * math.sin(2 * math.pi * 440 * i / rate)))
+        for i in range(int(seconds * rate))
+    )
+
+def make_wav(seconds=1.0, rate=16000):
+    """A mono 16-bit WAV of a tone, as bytes"""
+    import io
+    import wave
+
+    frames = make_pcm(seconds, rate)
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(frames)
+    return buffer.getvalue()
+
+def start_app(work_dir, server_threads=32, llm_latency=0.0, stt_latency=0.0, **env):
+    """Import app.py against a scratch data dir and serve it with a fixed-size thread pool
+
+    The pool stands in for a production WSGI worker with a bounded number of
+    request threads. Speech-to-text is replaced by a stub sleeping
+    `stt_latency` seconds and OpenAI by FakeOpenAIClient.
+    """
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+    os.environ.update({
+        'DATA_DIR': os.path.join(work_dir, 'data'),
+        'UPLOAD_FOLDER': os.path.join(work_dir, 'uploads'),
+        'LLM_BACKEND': 'fake',
+    })
+    os.environ.update({key: str(value) for key, value in env.items()})
+    import app as app_module
+
+    app_module.client.latency = llm_latency
+
+    def fake_speech_to_text(audio):
+        time.sleep(stt_latency)
+        return 'We use gradient descent to train the random forest model.'
+    app_module.evaluator.speech_to_text = fake_speech_to_text
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    class PooledWSGIServer(BaseWSGIServer):
+        request_queue_size = 1024
+
+        def __init__(self, host, port, wsgi_app):
+            super().__init__(host, port, wsgi_app, handler=QuietHandler)
+            self.pool = ThreadPoolExecutor(max_workers=server_threads)
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self._handle, request, client_address)
+
+        def _handle(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    server = PooledWSGIServer('127.0.0.1', 0, app_module.app)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return app_module, server
+
+def http_request(port, method, path, fields=None, files=None, response_headers=None):
+    """Minimal HTTP client returning (status, parsed JSON body)
+
+    The response headers are copied into `response_headers` when a dict is given.
+    """
+    import http.client
+    import json
+
+    headers = {}
+    body = None
+    if fields is not None or files is not None:
+        boundary = uuid.uuid4().hex
+        parts = []
+        for name, value in (fields or {}).items():
+            parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+        for name, (filename, data) in (files or {}).items():
+            parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                         f'Content-Type: application/octet-stream\r\n\r\n'.encode() + data + b'\r\n')
+        body = b''.join(parts) + f'--{boundary}--\r\n'.encode()
+        headers['Content-Type'] = f'multipart/form-data; boundary={boundary}'
+
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=300)
+    try:
+        conn.request(method, path, body=body, headers=headers)
+        response = conn.getresponse()
+        payload = response.read()
+        if response_headers is not None:
+            response_headers.update(response.getheaders())
+        return response.status, json.loads(payload) if payload else None
+    finally:
+        conn.close()
+
+def start_live_session(app_module):
+    """Create a session that is ready and has an evaluation started"""
+    session_id = str(uuid.uuid4())
+    session = make_session(session_id)
+    session['status'] = 'ready'
+    app_module.db.create_session(session)
+    app_module.db.create_evaluation({'session_id': session_id, 'status': 'started', 'transcript': []})
+    return session_id
+
+def free_port():
+    import socket
+
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def start_gunicorn(work_dir, workers=1, threads=32, llm_latency=0.0, stt_latency=0.0, **env):
+    """Serve app.py with gunicorn.conf.py against a scratch data dir, returning (process, port, env)
+
+    OpenAI and speech-to-text are the fake backends taking `llm_latency`
+    seconds per call and `stt_latency` per batch, without rate limits.
+    """
+    import subprocess
+
+    port = free_port()
+    env = dict(os.environ, PORT=str(port), WEB_WORKERS=str(workers), WEB_THREADS=str(threads),
+               DATA_DIR=os.path.join(work_dir, 'data'), UPLOAD_FOLDER=os.path.join(work_dir, 'uploads'),
+               LLM_BACKEND='fake', FAKE_LLM_LATENCY=str(llm_latency),
+               STT_BACKEND='fake', FAKE_STT_LATENCY=str(stt_latency),
+               WS_PORT='0', JANITOR_INTERVAL='0', EXTRACTION_PROCESSES='1',
+               # The account's rate limits would cap every configuration alike
+               LLM_REQUESTS_PER_MINUTE='0', LLM_TOKENS_PER_MINUTE='0',
+               **{key: str(value) for key, value in env.items()})
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+                              cwd=ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while True:
+        try:
+            http_request(port, 'GET', '/api/status/none')
+            break
+        except OSError:
+            if server.poll() is not None or time.monotonic() > deadline:
+                server.kill()
+                raise Exception("gunicorn did not start; is it installed? (pip install gunicorn)")
+            time.sleep(0.2)
+    time.sleep(1)  # let every worker finish importing the app
+    return server, port, env
+
+def run(*add_parsers):
+    """Parse the command line and run the benchmark it names
+
+    Each argument registers its module's benchmarks on the subparsers.
+    """
+    parser = argparse.ArgumentParser(description='Benchmarks for the presentation evaluator hot paths')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+    for add in add_parsers:
+        add(subparsers)
+
+    args = parser.parse_args()
+    print(f"🔍 Running {args.benchmark} benchmark...")
+    print("=" * 50)
+    args.run(args)
@@ -0,0 +1,429 @@
+"""Conversation benchmarks: session memory, slide retrieval, question bank, answer grading and scoring
+
+Usage: python -m benchmarks.conversation <context|retrieval|questions|answers|scoring> [options]
+"""
+
+import random
+import re
+import shutil
+import statistics
+import tempfile
+import time
+import uuid
+
+from benchmarks.common import (percentile, report, make_session, slide_lines, start_app, http_request,
+                               start_live_session, run)
+
+def bench_context(args):
+    """Prompt tokens and reply latency over a long talk: full-history prompts vs rolling context"""
+    import json
+    from conversation_context import ConversationContext
+    from database import Database
+    from fake_llm import FakeOpenAIClient
+    from presentation_evaluator import PresentationEvaluator
+    from speech_engine import FakeSpeechBackend, SpeechEngine
+
+    work_dir = tempfile.mkdtemp(prefix='bench_context_')
+    try:
+        db = Database(work_dir)
+        client = FakeOpenAIClient(latency=args.llm_latency, latency_per_1k_tokens=args.latency_per_1k)
+        content = [{'slide_number': number, 'content': '\n'.join(slide_lines(number, 12))}
+                   for number in range(1, args.slides + 1)]
+        analysis = json.loads(client._answer('keys: topic, concepts ' + ' '.join(s['content'] for s in content)))
+
+        session_id = str(uuid.uuid4())
+        db.create_session(make_session(session_id))
+        db.update_session_analysis(session_id, content, analysis)
+        db.update_session_status(session_id, 'ready')
+        db.create_evaluation({'session_id': session_id, 'status': 'started', 'transcript': []})
+
+        # The student walks through the deck, a few turns per slide
+        turns = [' '.join(slide_lines(1 + i * args.slides // args.turns, 3)[1:])
+                 for i in range(args.turns)]
+        checkpoints = sorted({1, args.turns // 4, args.turns // 2, args.turns})
+
+        def naive_reply(history, transcript):
+            # Everything stuffed into every call: analysis, all slides, whole conversation
+            prompt = (f'Analysis: {json.dumps(analysis)}\nSlides: {json.dumps(content)}\n'
+                      f'Conversation so far:\n' + '\n'.join(history) + f'\nThe student just said: {transcript}')
+            response = client.chat.completions.create(model='gpt-4', messages=[{'role': 'user', 'content': prompt}])
+            return response.choices[0].message.content, response.usage.prompt_tokens
+
+        context = ConversationContext(client, db, token_budget=args.token_budget)
+        evaluator = PresentationEvaluator(client, speech=SpeechEngine(FakeSpeechBackend()), context=context)
+
+        for mode in ('full history', 'rolling context'):
+            history = []
+            print(f"\n{mode}, {args.turns} turns over {args.slides} slides:")
+            for turn, transcript in enumerate(turns, 1):
+                db.add_transcript_entry(session_id, transcript)
+                start = time.perf_counter()
+                if mode == 'full history':
+                    reply, prompt_tokens = naive_reply(history, transcript)
+                    history += [f'Student: {transcript}', f'Evaluator: {reply}']
+                else:
+                    evaluator.generate_response(transcript, session_id)
+                    prompt_tokens = context.usage(session_id)['prompt_tokens'][-1]
+                elapsed = time.perf_counter() - start
+                if turn in checkpoints:
+                    print(f"  turn {turn:4d}   prompt {prompt_tokens:6d} tokens   reply {elapsed * 1000:8.1f}ms")
+
+        usage = context.usage(session_id)
+        print(f"\n  rolling context: mean {statistics.mean(usage['prompt_tokens']):.0f} prompt tokens/turn, "
+              f"max {max(usage['prompt_tokens'])}, summary {usage['summary_tokens']} tokens (budget {args.token_budget})")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def bench_retrieval(args):
+    """Slide index build/search cost and scoring prompt size: whole deck vs retrieved slides"""
+    import json
+    from fake_llm import FakeOpenAIClient
+    from presentation_evaluator import SCORING_CRITERIA, PresentationEvaluator
+    from slide_index import SlideIndex
+    from speech_engine import FakeSpeechBackend, SpeechEngine
+
+    client = FakeOpenAIClient(latency=args.llm_latency, latency_per_1k_tokens=args.latency_per_1k)
+    evaluator = PresentationEvaluator(client, speech=SpeechEngine(FakeSpeechBackend()))
+    transcript = [{'text': ' '.join(slide_lines(i, 3)[1:])} for i in range(args.turns)]
+    full_transcript = ' '.join(entry['text'] for entry in transcript)
+
+    for slides in args.slides:
+        content = [{'slide_number': number,
+                    'content': '\n'.join(slide_lines(number, 12) + [f'Experiment {number} uses dataset{number}.'])}
+                   for number in range(1, slides + 1)]
+        analysis = json.loads(client._answer('keys: topic, concepts ' + ' '.join(s['content'] for s in content)))
+
+        start = time.perf_counter()
+        slide_index = SlideIndex.build(content)
+        build_time = time.perf_counter() - start
+        searches = []
+        for number in range(1, slides + 1):
+            start = time.perf_counter()
+            slide_index.search(f'How was dataset{number} collected for the transformer?', 3)
+            searches.append(time.perf_counter() - start)
+
+        print(f"\n{slides} slides: index build {build_time * 1000:.1f}ms, "
+              f"{len(json.dumps(slide_index.to_dict()))} bytes stored, search p50 {percentile(searches, 50) * 1e6:.0f}us")
+
+        # Before: the analysis carried every slide and went into the scoring prompt whole
+        criteria = '\n'.join(f'{i}. {name} ({points} points) - {description}'
+                             for i, (name, points, description) in enumerate(SCORING_CRITERIA, 1))
+        start = time.perf_counter()
+        response = client.chat.completions.create(model='gpt-4', messages=[{'role': 'user', 'content': (
+            f'Transcript:\n{full_transcript}\nPresentation Analysis: {json.dumps(dict(analysis, slides=content))}\n'
+            f'{criteria}\nFormat as JSON with keys: scores')}])
+        print(f"  scoring, whole deck        prompt {response.usage.prompt_tokens:6d} tokens   "
+              f"{(time.perf_counter() - start) * 1000:8.1f}ms")
+
+        tokens_before = client.prompt_tokens
+        start = time.perf_counter()
+        evaluator.calculate_final_scores({'transcript': transcript}, {
+            'content': content, 'analysis': analysis, 'slide_index': slide_index.to_dict()})
+        print(f"  scoring, retrieved slides  prompt {client.prompt_tokens - tokens_before:6d} tokens   "
+              f"{(time.perf_counter() - start) * 1000:8.1f}ms")
+
+QUESTION_TOPICS = [
+    'backpropagation', 'regularization', 'tokenization', 'augmentation', 'normalization', 'quantization',
+    'embeddings', 'clustering', 'hyperparameters', 'overfitting', 'convolution', 'attention',
+]
+
+def bench_questions(args):
+    """Live reply latency with questions served from the prepared bank vs an LLM call every turn"""
+    from database import Database
+    from fake_llm import FakeOpenAIClient
+    from presentation_evaluator import PresentationEvaluator
+    from question_bank import QuestionBank
+    from slide_index import SlideIndex
+    from speech_engine import FakeSpeechBackend, SpeechEngine
+
+    work_dir = tempfile.mkdtemp(prefix='bench_questions_')
+    try:
+        db = Database(work_dir)
+        client = FakeOpenAIClient(latency=args.llm_latency, token_latency=args.token_latency)
+        # Each slide is about its own topic, as in a real deck
+        content = [{'slide_number': number, 'content': '\n'.join(
+            [f'{QUESTION_TOPICS[number % len(QUESTION_TOPICS)].capitalize()} in our pipeline'] + slide_lines(number, 3)[1:])}
+            for number in range(1, args.slides + 1)]
+        evaluator = PresentationEvaluator(client, speech=SpeechEngine(FakeSpeechBackend()))
+        analysis = evaluator.analyze_presentation(content)
+
+        bank = QuestionBank(client, db, min_score=args.min_score)
+        calls = client.calls
+        start = time.perf_counter()
+        question_bank = bank.build(content, analysis)
+        print(f"Bank of {len(question_bank)} questions for {args.slides} slides built in "
+              f"{(time.perf_counter() - start) * 1000:.0f}ms with {client.calls - calls} LLM calls (at processing time)")
+
+        # The student walks through the deck; some turns are filler no slide matches
+        rng = random.Random(7)
+        turns = []
+        for i in range(args.turns):
+            number = 1 + i * args.slides // args.turns
+            if rng.random() < args.filler:
+                turns.append('Okay, let me take a moment before I move on.')
+            else:
+                turns.append(f'Here {QUESTION_TOPICS[number % len(QUESTION_TOPICS)]} matters because '
+                             + slide_lines(number, 2)[1])
+
+        for label, questions in (('LLM every turn', None), ('question bank', bank)):
+            session_id = str(uuid.uuid4())
+            db.create_session(make_session(session_id))
+            db.update_session_analysis(session_id, content, analysis, SlideIndex.build(content).to_dict(),
+                                       question_bank if questions is not None else None)
+            db.create_evaluation({'session_id': session_id, 'status': 'started', 'transcript': []})
+            evaluator.questions = questions
+
+            first_token = []
+            full = []
+            calls = client.calls
+            for transcript in turns:
+                start = time.perf_counter()
+                first = None
+                for _ in evaluator.stream_response(transcript, session_id):
+                    if first is None:
+                        first = time.perf_counter() - start
+                full.append(time.perf_counter() - start)
+                first_token.append(first)
+            served = bank.stats(session_id)['asked'] if questions is not None else 0
+            print(f"\n{label}, {args.turns} turns:")
+            report('first words', first_token)
+            report('whole reply', full)
+            print(f"  replies from the bank {served}/{args.turns}   LLM calls {client.calls - calls} "
+                  f"(summaries and scoring included)")
+        evaluator.questions = None
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+# Answers to evaluator questions with the grade (0-1) the LLM gave each; the
+# fixture set the local grader is measured against. An empty keypoint list
+# is a question the LLM asked on its own, with no prepared keypoints.
+ANSWER_FIXTURES = [
+    ('Why did you use dropout in the network?',
+     ['reduces overfitting', 'randomly drops units', 'regularization', 'disabled at inference'], [
+         ('Dropout is a regularization technique: during training it randomly drops units so the network cannot '
+          'rely on any single neuron, which reduces overfitting. At inference it is disabled.', 1.0),
+         ('It helps the model not overfit on the training data.', 0.5),
+         ("During training we switch off a random subset of neurons each step, so the network can't memorize the "
+          'training set and generalizes better; at test time all neurons are used.', 0.9),
+         ('Dropout makes training faster because there are fewer parameters to store.', 0.1),
+         ("I'm not sure, my teammate added it.", 0.0),
+     ]),
+    ('How did you choose the learning rate?',
+     ['learning rate search', 'validation loss', 'too high diverges', 'decay schedule'], [
+         ('We ran a learning rate search over a log scale and kept the value with the lowest validation loss; too '
+          'high a rate made the loss diverge, and we added a decay schedule.', 1.0),
+         ('We tried a few values and picked the one where the validation loss was lowest.', 0.6),
+         ('Our dataset has twelve thousand images collected over six months.', 0.0),
+         ('Trial and error.', 0.2),
+     ]),
+    ('Why is cross validation better than a single split here?',
+     ['small dataset', 'every sample used for validation', 'variance of the estimate', 'five folds'], [
+         ('With a small dataset a single split is noisy; five-fold cross validation uses every sample for validation '
+          'once and averages the folds, which lowers the variance of the estimate.', 1.0),
+         ('Because it uses five folds, so the result is averaged.', 0.5),
+         ('Cross validation trains the model five times faster.', 0.1),
+         ('Our data is limited, so one holdout set would give a lucky or unlucky number; rotating which part is held '
+          'out and averaging gives a more trustworthy score.', 0.9),
+     ]),
+    ('What does the attention mechanism add over a recurrent network?',
+     ['long range dependencies', 'parallel computation', 'weights between all tokens', 'no recurrence'], [
+         ('Self-attention computes weights between all tokens at once, so long range dependencies are one step away '
+          'and, with no recurrence, the computation runs in parallel.', 1.0),
+         ('It handles long range dependencies better than a recurrent network.', 0.5),
+         ('Attention reduces the number of layers to one.', 0.1),
+         ("I don't know exactly how it works.", 0.0),
+     ]),
+    ('Why did you scale the features before k-nearest neighbours?',
+     ['distance based', 'large ranges dominate', 'standardization', 'equal contribution'], [
+         ('KNN is distance based, so features with large ranges would dominate the distance; standardization gives '
+          'each feature an equal contribution.', 1.0),
+         ("So that the big features don't dominate.", 0.5),
+         ('Scaling makes the dataset smaller so it trains faster.', 0.1),
+         ('Neighbours are found by measuring how far apart points are, and income in dollars would swamp age in '
+          'years unless we put them on the same footing.', 0.9),
+     ]),
+    ('Could you explain why you chose a random forest over a single decision tree?', [], [
+         ('A single decision tree overfits and has high variance; the random forest averages many trees trained on '
+          'bootstrap samples with random feature subsets, so the variance drops and accuracy improves.', 1.0),
+         ('The forest is more accurate than one tree.', 0.4),
+         ('Because a random forest does not need any training data.', 0.0),
+     ]),
+    ('How did you handle the class imbalance?',
+     ['class weights', 'oversampling minority class', 'F1 instead of accuracy', 'stratified split'], [
+         ('We used class weights in the loss and oversampled the minority class, split the data stratified, and '
+          'reported F1 instead of accuracy since accuracy is misleading here.', 1.0),
+         ('We oversampled the minority class.', 0.4),
+         ('There was no imbalance problem since accuracy was 95%.', 0.1),
+         ("Not sure, I think we didn't.", 0.0),
+     ]),
+]
+
+def bench_answers(args):
+    """Answer grading on a fixture set: local only vs local with LLM escalation vs the LLM for every answer"""
+    import json
+    import types
+    from answer_grading import AnswerGrader, grade_locally
+    from fake_llm import FakeOpenAIClient
+
+    cases = [(question, keypoints, answer, reference)
+             for question, keypoints, answers in ANSWER_FIXTURES for answer, reference in answers]
+    verdicts = {answer: reference for _, _, answer, reference in cases}
+
+    # Replays the recorded LLM grades, with the API's latency
+    client = FakeOpenAIClient(latency=args.llm_latency)
+    def recorded(self, prompt):
+        answer = re.findall(r"Student's answer: ([^\n]*)", prompt)[0]
+        return json.dumps({'answer_score': verdicts[answer] * 10, 'reason': 'recorded'})
+    client._answer = types.MethodType(recorded, client)
+
+    def band(score):
+        return 'good' if score >= 0.7 else 'poor' if score < 0.3 else 'partial'
+
+    def report(label, grades, latencies, llm_calls):
+        agree = sum(1 for (*_, reference), grade in zip(cases, grades) if band(grade) == band(reference))
+        error = statistics.mean(abs(grade - reference) * 10 for (*_, reference), grade in zip(cases, grades))
+        print(f"  {label:<22} agreement {agree / len(cases):5.0%}   mean error {error:4.2f}/10 points   "
+              f"LLM calls {llm_calls:3d}   per answer p50 {percentile(latencies, 50) * 1000:8.2f}ms  "
+              f"p95 {percentile(latencies, 95) * 1000:8.2f}ms")
+
+    print(f"{len(cases)} answers to {len(ANSWER_FIXTURES)} questions, LLM latency {args.llm_latency * 1000:.0f}ms, "
+          f"escalating local scores in [{args.low}, {args.high}]:")
+
+    latencies = []
+    local = []
+    for question, keypoints, answer, _ in cases:
+        start = time.perf_counter()
+        local.append(grade_locally(question, answer, keypoints)['score'])
+        latencies.append(time.perf_counter() - start)
+    report('local only', local, latencies, 0)
+
+    grader = AnswerGrader(client, low=args.low, high=args.high, finalize_wait=60)
+    latencies = []
+    calls = client.calls
+    start = time.perf_counter()
+    for question, keypoints, answer, _ in cases:
+        # The student hears the next question at once; escalations finish in the background
+        asked = time.perf_counter()
+        grader.record('fixture', question, answer, keypoints)
+        latencies.append(time.perf_counter() - asked)
+    hybrid = [entry['grade']['score'] for entry in grader.entries('fixture')] if grader.grades('fixture', 60) else []
+    settled = time.perf_counter() - start
+    report('local + LLM escalation', hybrid, latencies, client.calls - calls)
+    escalated = sum(1 for entry in grader.entries('fixture') if entry['grade']['method'] == 'llm')
+    print(f"  {'':<22} {escalated}/{len(cases)} escalated, every grade final after {settled * 1000:.0f}ms")
+
+    latencies = []
+    llm = []
+    calls = client.calls
+    for question, keypoints, answer, _ in cases:
+        start = time.perf_counter()
+        llm.append(grader.grade_with_llm(question, answer, keypoints))
+        latencies.append(time.perf_counter() - start)
+    report('LLM every answer', llm, latencies, client.calls - calls)
+
+    if args.verbose:
+        print()
+        for (question, _, answer, reference), score, final in zip(cases, local, hybrid):
+            print(f"  ref {reference:4.2f}  local {score:4.2f}  final {final:4.2f}  {answer[:70]}")
+
+def bench_scoring(args):
+    """Time to final scores when the talk ends: one whole-transcript call vs incremental scoring"""
+    import json
+
+    work_dir = tempfile.mkdtemp(prefix='bench_scoring_')
+    try:
+        app_module, server = start_app(work_dir, llm_latency=args.llm_latency,
+                                       SCORING_SEGMENT_TURNS=args.segment_turns)
+        client = app_module.client
+        client.latency_per_1k_tokens = args.latency_per_1k
+        client.token_latency = args.token_latency
+        db = app_module.db
+
+        content = [{'slide_number': number, 'content': '\n'.join(slide_lines(number, 12))}
+                   for number in range(1, args.slides + 1)]
+        analysis = json.loads(client._answer('keys: topic, concepts ' + ' '.join(s['content'] for s in content)))
+        session_id = start_live_session(app_module)
+        db.update_session_analysis(session_id, content, analysis)
+
+        # The talk, turn by turn, with the scorer working in the background
+        talk_start = time.perf_counter()
+        for i in range(args.turns):
+            transcript = ' '.join(slide_lines(1 + i * args.slides // args.turns, 3)[1:])
+            db.add_transcript_entry(session_id, transcript)
+            app_module.evaluator.generate_response(transcript, session_id)
+            time.sleep(args.turn_interval)
+        talk_time = time.perf_counter() - talk_start
+        during = app_module.llm.stats().get('scoring', {})
+
+        # Before: one call over the whole transcript once the student has finished
+        start = time.perf_counter()
+        before = app_module.evaluator.calculate_final_scores(db.get_evaluation(session_id), db.get_session(session_id))
+        before_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        status, result = http_request(server.server_port, 'POST', f'/api/complete-evaluation/{session_id}')
+        after_time = time.perf_counter() - start
+        while True:
+            _, final = http_request(server.server_port, 'GET', f'/api/results/{session_id}?fields=total_score,pending_turns')
+            if not final['pending_turns']:
+                break
+            time.sleep(0.05)
+        settled_time = time.perf_counter() - start
+
+        print(f"\n{args.turns} turns over {args.slides} slides, LLM {args.llm_latency}s + "
+              f"{args.latency_per_1k}s/1k prompt tokens + {args.token_latency * 1000:.0f}ms/output token:")
+        print(f"  whole-transcript scoring at the end   {before_time * 1000:8.0f}ms   total {before['total_score']}")
+        print(f"  incremental, complete-evaluation      {after_time * 1000:8.0f}ms   total {result['total_score']}   "
+              f"(HTTP {status}, {result['pending_turns']} turns still being scored)")
+        print(f"  incremental, results final after      {settled_time * 1000:8.0f}ms   total {final['total_score']}")
+        print(f"\n  during the {talk_time:.1f}s talk: {during.get('calls', 0)} scoring calls, "
+              f"{during.get('prompt_tokens', 0) // max(1, during.get('calls', 0))} prompt tokens each on average, "
+              f"p50 {during.get('latency_p50', 0) * 1000:.0f}ms")
+        server.shutdown()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def add_parsers(subparsers):
+    context_parser = subparsers.add_parser('context', help=bench_context.__doc__)
+    context_parser.add_argument('--turns', type=int, default=120, help='student turns (120 = one per 10s for 20 minutes)')
+    context_parser.add_argument('--slides', type=int, default=30)
+    context_parser.add_argument('--token-budget', type=int, default=1500)
+    context_parser.add_argument('--llm-latency', type=float, default=0.05)
+    context_parser.add_argument('--latency-per-1k', type=float, default=0.05, help='simulated seconds per 1k prompt tokens')
+    context_parser.set_defaults(run=bench_context)
+
+    retrieval_parser = subparsers.add_parser('retrieval', help=bench_retrieval.__doc__)
+    retrieval_parser.add_argument('--slides', type=int, nargs='+', default=[20, 60, 200])
+    retrieval_parser.add_argument('--turns', type=int, default=60, help='transcript entries scored')
+    retrieval_parser.add_argument('--llm-latency', type=float, default=0.2)
+    retrieval_parser.add_argument('--latency-per-1k', type=float, default=0.05, help='simulated seconds per 1k prompt tokens')
+    retrieval_parser.set_defaults(run=bench_retrieval)
+
+    questions_parser = subparsers.add_parser('questions', help=bench_questions.__doc__)
+    questions_parser.add_argument('--slides', type=int, default=24)
+    questions_parser.add_argument('--turns', type=int, default=40)
+    questions_parser.add_argument('--filler', type=float, default=0.25, help='share of turns no slide matches')
+    questions_parser.add_argument('--min-score', type=float, default=2.0)
+    questions_parser.add_argument('--llm-latency', type=float, default=0.8)
+    questions_parser.add_argument('--token-latency', type=float, default=0.02)
+    questions_parser.set_defaults(run=bench_questions)
+
+    answers_parser = subparsers.add_parser('answers', help=bench_answers.__doc__)
+    answers_parser.add_argument('--low', type=float, default=0.3, help='lowest local score sent to the LLM')
+    answers_parser.add_argument('--high', type=float, default=0.7, help='highest local score sent to the LLM')
+    answers_parser.add_argument('--llm-latency', type=float, default=0.5)
+    answers_parser.add_argument('--verbose', action='store_true', help='print every answer with its grades')
+    answers_parser.set_defaults(run=bench_answers)
+
+    scoring_parser = subparsers.add_parser('scoring', help=bench_scoring.__doc__)
+    scoring_parser.add_argument('--turns', type=int, default=30)
+    scoring_parser.add_argument('--slides', type=int, default=30)
+    scoring_parser.add_argument('--segment-turns', type=int, default=3)
+    scoring_parser.add_argument('--turn-interval', type=float, default=0.5, help='seconds between turns')
+    scoring_parser.add_argument('--llm-latency', type=float, default=0.5)
+    scoring_parser.add_argument('--latency-per-1k', type=float, default=0.3, help='extra seconds per 1k prompt tokens')
+    scoring_parser.add_argument('--token-latency', type=float, default=0.03, help='seconds per output token')
+    scoring_parser.set_defaults(run=bench_scoring)
+
+if __name__ == "__main__":
+    run(add_parsers)
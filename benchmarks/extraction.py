@@ -0,0 +1,121 @@
+"""Slide extraction benchmarks: worker processes and per-slide layout and images
+
+Usage: python -m benchmarks.extraction <extraction|slides> [options]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.common import make_synthetic_pdf, make_synthetic_pptx, run
+
+def bench_extraction(args):
+    """Sequential extraction vs the process-pool ExtractionEngine on synthetic decks"""
+    from presentation_evaluator import PresentationEvaluator
+    from slide_extractor import ExtractionEngine
+
+    corpus_dir = tempfile.mkdtemp(prefix='bench_decks_')
+    engine = ExtractionEngine(max_workers=args.workers, chunk_size=args.chunk_size)
+    try:
+        # Warm the pool so worker start-up is not billed to the first deck
+        engine.extract(make_synthetic_pdf(os.path.join(corpus_dir, 'warmup.pdf'), 1))
+
+        for pages in args.pages:
+            decks = [
+                make_synthetic_pdf(os.path.join(corpus_dir, f'deck_{pages}.pdf'), pages),
+                make_synthetic_pptx(os.path.join(corpus_dir, f'deck_{pages}.pptx'), pages),
+            ]
+            print(f"\n{pages} slides:")
+            for deck in decks:
+                start = time.perf_counter()
+                expected = PresentationEvaluator.extract_presentation_content(deck)
+                sequential = time.perf_counter() - start
+
+                start = time.perf_counter()
+                first_slide = None
+                slides = []
+                for slide in engine.iter_slides(deck):
+                    if first_slide is None:
+                        first_slide = time.perf_counter() - start
+                    slides.append(slide)
+                parallel = time.perf_counter() - start
+
+                if slides != expected:
+                    print(f"❌ {os.path.basename(deck)}: engine output differs from sequential path")
+                    sys.exit(1)
+
+                kind = deck.rsplit('.', 1)[1]
+                print(f"  {kind:<5} sequential {pages / sequential:8.1f} slides/s   "
+                      f"engine {pages / parallel:8.1f} slides/s   "
+                      f"speed-up {sequential / parallel:4.1f}x   first slide after {first_slide * 1000:.0f}ms")
+    finally:
+        engine.shutdown()
+        shutil.rmtree(corpus_dir, ignore_errors=True)
+
+def bench_slides(args):
+    """Structured slide extraction, and decoding images only for the slides scoring shows"""
+    import json
+    from presentation_evaluator import PresentationEvaluator
+    from result_cache import ResultCache
+    from slide_content import Image, inspect_images
+    from slide_extractor import ExtractionEngine, SlideVisuals
+
+    work_dir = tempfile.mkdtemp(prefix='bench_slides_')
+    engine = ExtractionEngine(max_workers=args.workers)
+    try:
+        engine.extract(make_synthetic_pdf(os.path.join(work_dir, 'warmup.pdf'), 1))
+        print(f"Pillow {'installed: contrast and saturation measured' if Image else 'missing: image sizes only'}")
+        for count in args.slides:
+            plain = make_synthetic_pptx(os.path.join(work_dir, f'plain_{count}.pptx'), count)
+            rich = make_synthetic_pptx(os.path.join(work_dir, f'rich_{count}.pptx'), count, rich=True)
+            print(f"\n{count} slides ({os.path.getsize(rich) // 1024} KB with pictures, tables and notes):")
+
+            for label, deck in (('text only', plain), ('rich', rich)):
+                start = time.perf_counter()
+                content = PresentationEvaluator.extract_presentation_content(deck)
+                elapsed = time.perf_counter() - start
+                stored = len(json.dumps(content))
+                found = {key: sum(slide.get('layout', {}).get(key, 0) for slide in content)
+                         for key in ('pictures', 'tables')}
+                notes = sum(1 for slide in content if slide.get('notes'))
+                print(f"  extract {label:<10} {elapsed * 1000:8.1f}ms   stored {stored / count:6.0f} bytes/slide   "
+                      f"pictures {found['pictures']}  tables {found['tables']}  notes {notes}")
+
+            # What decoding every picture up front would have cost
+            start = time.perf_counter()
+            inspect_images(rich, range(1, count + 1))
+            eager = time.perf_counter() - start
+
+            # What scoring pays: the design criterion's few slides, then again from the cache
+            visuals = SlideVisuals(engine, ResultCache(os.path.join(work_dir, f'cache_{count}')))
+            design = list(range(3, 3 * args.design_slides + 1, 3))
+            start = time.perf_counter()
+            stats = visuals(rich, design)
+            cold = time.perf_counter() - start
+            start = time.perf_counter()
+            visuals(rich, design)
+            warm = time.perf_counter() - start
+            print(f"  images of every slide {eager * 1000:8.1f}ms   of {len(design)} design slides "
+                  f"{cold * 1000:6.1f}ms   cached {warm * 1000:5.1f}ms")
+            print(f"  e.g. slide {design[0]}: {stats[design[0]]}")
+    finally:
+        engine.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def add_parsers(subparsers):
+    extraction_parser = subparsers.add_parser('extraction', help=bench_extraction.__doc__)
+    extraction_parser.add_argument('--pages', type=int, nargs='+', default=[20, 120, 400])
+    extraction_parser.add_argument('--workers', type=int, default=os.cpu_count())
+    extraction_parser.add_argument('--chunk-size', type=int, default=8)
+    extraction_parser.set_defaults(run=bench_extraction)
+
+    slides_parser = subparsers.add_parser('slides', help=bench_slides.__doc__)
+    slides_parser.add_argument('--slides', type=int, nargs='+', default=[30, 120])
+    slides_parser.add_argument('--design-slides', type=int, default=3, help='slides scoring shows for design')
+    slides_parser.add_argument('--workers', type=int, default=os.cpu_count())
+    slides_parser.set_defaults(run=bench_slides)
+
+if __name__ == "__main__":
+    run(add_parsers)
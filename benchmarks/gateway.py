@@ -0,0 +1,94 @@
+"""LLM gateway benchmark: live turns under a burst of background calls
+
+Usage: python -m benchmarks.gateway gateway [options]
+"""
+
+import time
+
+from benchmarks.common import percentile, SAMPLE_SENTENCES, run
+
+def bench_gateway(args):
+    """Live replies during a burst of background analysis, direct client vs LLM gateway, on a rate-limited mock API"""
+    import threading
+    import openai
+    from fake_llm import FakeOpenAIClient, FakeOpenAIServer
+    from llm_gateway import (PRIORITY_BACKGROUND, PRIORITY_LIVE, LLMGateway, create_openai_client)
+
+    analysis_prompt = ' '.join(SAMPLE_SENTENCES * 40) + ' Format as JSON with keys: topic, concepts'
+    reply_prompt = 'The student just said: we tuned the learning rate with a grid search.'
+
+    for mode in ('direct', 'gateway'):
+        server = FakeOpenAIServer(client=FakeOpenAIClient(args.llm_latency),
+                                  requests_per_second=args.rate_limit).start()
+        if mode == 'direct':
+            # As before: the SDK's own two retries, no scheduling
+            client = openai.OpenAI(api_key='fake', base_url=server.url)
+
+            def call(prompt, priority, purpose):
+                return client.chat.completions.create(model='gpt-4', messages=[{'role': 'user', 'content': prompt}])
+        else:
+            gateway = LLMGateway(create_openai_client('fake', server.url), max_concurrency=args.concurrency,
+                                 requests_per_minute=args.rate_limit * 60 * 0.9, tokens_per_minute=0,
+                                 burst_seconds=1)
+
+            def call(prompt, priority, purpose):
+                return gateway.complete([{'role': 'user', 'content': prompt}], purpose=purpose, priority=priority)
+
+        live_latencies = []
+        failures = {'live': 0, 'background': 0}
+        lock = threading.Lock()
+
+        def background():
+            try:
+                call(analysis_prompt, PRIORITY_BACKGROUND, 'analysis')
+            except Exception:
+                with lock:
+                    failures['background'] += 1
+
+        def presenter():
+            for _ in range(args.turns):
+                start = time.perf_counter()
+                try:
+                    call(reply_prompt, PRIORITY_LIVE, 'reply')
+                    with lock:
+                        live_latencies.append(time.perf_counter() - start)
+                except Exception:
+                    with lock:
+                        failures['live'] += 1
+                time.sleep(args.think_time)
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=background) for _ in range(args.background)]
+        for thread in threads:
+            thread.start()
+        # Students start talking while the analysis burst is in flight
+        time.sleep(0.5)
+        threads += [threading.Thread(target=presenter) for _ in range(args.presenters)]
+        for thread in threads[args.background:]:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        server.shutdown()
+
+        print(f"\n{mode}: {args.background} analysis calls + {args.presenters} presenters x {args.turns} replies, "
+              f"API limit {args.rate_limit} req/s")
+        print(f"  finished in {elapsed:6.1f}s   API 429s {server.rate_limited:4d}   "
+              f"failed live {failures['live']}   failed background {failures['background']}")
+        if live_latencies:
+            print(f"  live reply  p50 {percentile(live_latencies, 50) * 1000:8.1f}ms   "
+                  f"p99 {percentile(live_latencies, 99) * 1000:8.1f}ms")
+
+def add_parsers(subparsers):
+    gateway_parser = subparsers.add_parser('gateway', help=bench_gateway.__doc__)
+    gateway_parser.add_argument('--background', type=int, default=60, help='analysis calls fired at once')
+    gateway_parser.add_argument('--presenters', type=int, default=5)
+    gateway_parser.add_argument('--turns', type=int, default=5)
+    gateway_parser.add_argument('--think-time', type=float, default=0.5, help='seconds between a reply and the next turn')
+    gateway_parser.add_argument('--rate-limit', type=int, default=10, help='mock API requests per second')
+    gateway_parser.add_argument('--concurrency', type=int, default=16)
+    gateway_parser.add_argument('--llm-latency', type=float, default=0.3)
+    gateway_parser.set_defaults(run=bench_gateway)
+
+if __name__ == "__main__":
+    run(add_parsers)
@@ -0,0 +1,107 @@
+"""Retention benchmark: the janitor over a long history of sessions
+
+Usage: python -m benchmarks.housekeeping retention [options]
+"""
+
+import os
+import random
+import shutil
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from benchmarks.common import make_session, slide_lines, run
+
+def bench_retention(args):
+    """Disk use and session read latency before and after a retention sweep over a long-running install"""
+    from database import Database
+    from retention import Janitor, SessionArchive
+    from upload_store import UploadStore
+
+    work_dir = tempfile.mkdtemp(prefix='bench_retention_')
+    try:
+        db = Database(os.path.join(work_dir, 'data'))
+        uploads = UploadStore(os.path.join(work_dir, 'uploads'))
+        archive = SessionArchive(db.data_dir)
+        day = 86400
+        janitor = Janitor(db, uploads, archive, interval=0, ttls={
+            'uploaded': 14 * day, 'processing': 14 * day, 'ready': 14 * day, 'error': 7 * day, 'completed': 30 * day})
+
+        content = [{'slide_number': number, 'content': '\n'.join(slide_lines(number, 12))}
+                   for number in range(1, args.slides + 1)]
+        deck = os.urandom(args.deck_kb * 1024)
+        statuses = ['completed'] * 6 + ['ready', 'error: extraction failed', 'uploaded']
+        now = datetime.now()
+        for i in range(args.sessions):
+            session_id = str(uuid.uuid4())
+            # Most of the history is older than any retention period
+            age = timedelta(days=random.uniform(0, args.history_days))
+            stamp = (now - age).isoformat()
+            session = make_session(session_id)
+            session.update(status=statuses[i % len(statuses)], created_at=stamp, updated_at=stamp,
+                           file_path=os.path.join(uploads.upload_dir, f'{session_id}_deck.pdf'))
+            with open(session['file_path'], 'wb') as f:
+                f.write(deck)
+            session.update(content=content, analysis={'topic': 'Machine learning'})
+            db.create_session(session)
+            if session['status'] == 'completed':
+                db.create_evaluation({'session_id': session_id, 'status': 'completed', 'start_time': stamp,
+                                      'completed_at': stamp, 'updated_at': stamp,
+                                      'roll_no': session['roll_no'], 'name': session['name'],
+                                      'final_scores': {}, 'total_score': 70, 'feedback': {},
+                                      'transcript': [{'text': ' '.join(slide_lines(turn, 3)), 'timestamp': stamp}
+                                                     for turn in range(args.turns)],
+                                      'questions_asked': [], 'answers_given': []})
+            for _ in range(args.turns // 4):
+                db.create_audio_chunk({'chunk_id': str(uuid.uuid4()), 'session_id': session_id,
+                                       'status': 'done', 'created_at': stamp})
+        # Decks whose session was deleted without them
+        for i in range(args.sessions // 20):
+            path = os.path.join(uploads.upload_dir, f'orphan{i}_deck.pdf')
+            with open(path, 'wb') as f:
+                f.write(deck)
+            os.utime(path, (time.time() - 2 * day, time.time() - 2 * day))
+
+        def disk(path):
+            return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+        def read_latency():
+            ids = [session['session_id'] for session in db.list_sessions()]
+            latencies = janitor._read_latencies(ids)
+            start = time.perf_counter()
+            db.list_sessions('status')
+            return latencies[len(latencies) // 2], (time.perf_counter() - start) * 1000, len(ids)
+
+        db.compact()
+        before = (disk(uploads.upload_dir), db.size(), *read_latency())
+        start = time.perf_counter()
+        removed = janitor.sweep()
+        sweep_time = time.perf_counter() - start
+        after = (disk(uploads.upload_dir), db.size(), *read_latency())
+
+        print(f"\n{args.sessions} sessions over {args.history_days} days, {args.deck_kb} KB decks:")
+        print(f"  {'':<10}{'sessions':>10}{'uploads':>12}{'database':>12}{'session read p50':>20}{'status scan':>14}")
+        for label, (upload_bytes, db_bytes, p50, scan, count) in (('before', before), ('after', after)):
+            print(f"  {label:<10}{count:>10}{upload_bytes / 2 ** 20:>10.1f}MB{db_bytes / 2 ** 20:>10.1f}MB"
+                  f"{p50:>18.3f}ms{scan:>12.1f}ms")
+        print(f"\n  sweep took {sweep_time:.2f}s: {removed.get('sessions_deleted', 0)} deleted, "
+              f"{removed.get('sessions_archived', 0)} archived, {removed.get('uploads_deleted', 0)} files and "
+              f"{removed.get('audio_chunks_deleted', 0)} audio chunks removed, "
+              f"{removed.get('bytes_reclaimed', 0) / 2 ** 20:.1f}MB reclaimed")
+        archived = archive.stats()
+        print(f"  archive: {archived['records']} evaluations in {archived['bytes'] / 2 ** 20:.1f}MB")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def add_parsers(subparsers):
+    retention_parser = subparsers.add_parser('retention', help=bench_retention.__doc__)
+    retention_parser.add_argument('--sessions', type=int, default=2000)
+    retention_parser.add_argument('--history-days', type=int, default=180, help='age spread of the sessions')
+    retention_parser.add_argument('--slides', type=int, default=30)
+    retention_parser.add_argument('--turns', type=int, default=40, help='transcript entries per completed session')
+    retention_parser.add_argument('--deck-kb', type=int, default=256)
+    retention_parser.set_defaults(run=bench_retention)
+
+if __name__ == "__main__":
+    run(add_parsers)
@@ -0,0 +1,314 @@
+"""End-to-end load benchmarks: whole student flows on gunicorn
+
+Usage: python -m benchmarks.load <flow|scaleout> [options]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.common import (percentile, make_synthetic_pdf, make_synthetic_pptx, make_wav, http_request,
+                               start_gunicorn, run)
+
+def process_tree_memory(pid):
+    """(current, peak) resident bytes of a process and its descendants, None where /proc is missing"""
+    def children(pid):
+        try:
+            with open(f'/proc/{pid}/task/{pid}/children') as f:
+                return [int(child) for child in f.read().split()]
+        except OSError:
+            return []
+
+    current = peak = 0
+    pending = [pid]
+    while pending:
+        pid = pending.pop()
+        pending.extend(children(pid))
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                fields = dict(line.split(':', 1) for line in f if ':' in line)
+        except OSError:
+            continue
+        current += int(fields.get('VmRSS', '0 kB').split()[0]) * 1024
+        peak += int(fields.get('VmHWM', '0 kB').split()[0]) * 1024
+    return (current, peak) if peak else None
+
+def student_flow(port, filename, deck, audio, turns, poll_interval, record):
+    """One student from submission to results, returning the session ID (None if a request failed)
+
+    record(endpoint, seconds, status, headers) is called for every request.
+    """
+    def call(endpoint, method, path, **kwargs):
+        headers = {}
+        start = time.perf_counter()
+        status, body = http_request(port, method, path, response_headers=headers, **kwargs)
+        record(endpoint, time.perf_counter() - start, status, headers)
+        return status, body
+
+    status, body = call('submit', 'POST', '/api/submit', fields={'roll_no': 'R1', 'name': 'Student'},
+                        files={'file': (filename, deck)})
+    if status != 200:
+        return None
+    session_id = body['session_id']
+    while True:
+        status, body = call('status', 'GET', f'/api/status/{session_id}?fields=status')
+        if status != 200 or body['status'] == 'ready' or body['status'].startswith('error'):
+            break
+        time.sleep(poll_interval)
+    if status != 200 or body['status'] != 'ready':
+        return None
+
+    requests = [('start', 'POST', f'/api/start-presentation/{session_id}', None)]
+    requests += [('audio-upload', 'POST', f'/api/audio-upload/{session_id}?sync=1', {'audio': ('chunk.wav', audio)})
+                 for _ in range(turns)]
+    requests += [('complete', 'POST', f'/api/complete-evaluation/{session_id}', None),
+                 ('results', 'GET', f'/api/results/{session_id}', None)]
+    for endpoint, method, path, files in requests:
+        status, _ = call(endpoint, method, path, files=files)
+        if status != 200:
+            return None
+    return session_id
+
+def _run_students(students, rounds, flow):
+    """Run `students` threads doing `rounds` flows each, returning (completed, failed, seconds)"""
+    import threading
+
+    completed = []
+    failed = []
+    lock = threading.Lock()
+
+    def student(number):
+        for round_number in range(rounds):
+            session_id = flow(number, round_number)
+            with lock:
+                (completed if session_id else failed).append(session_id)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=student, args=(number,)) for number in range(students)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return completed, failed, time.perf_counter() - start
+
+def _lost_turns(data_dir, session_ids, turns):
+    """Completed sessions whose evaluation is missing or lacks some of its turns"""
+    from database import Database
+
+    db = Database(data_dir)
+    lost = 0
+    for session_id in session_ids:
+        evaluation = db.get_evaluation(session_id)
+        if evaluation is None or evaluation.get('status') != 'completed' or len(evaluation['transcript']) != turns:
+            lost += 1
+    db.close()
+    return lost
+
+def bench_flow(args):
+    """Many simulated students through submit, status, audio upload, completion and results
+
+    Decks are synthetic PDF and PowerPoint files of each size in --slides,
+    dealt out in turn; the LLM and speech-to-text are the fake backends with
+    the given latencies. Reports p50/p95/p99 latency per endpoint,
+    throughput and server memory. --save writes the figures as JSON and
+    --baseline compares against such a file, exiting non-zero when a p95
+    or the throughput is worse by more than --tolerance.
+    """
+    import json
+    import threading
+    from collections import defaultdict
+
+    deck_dir = tempfile.mkdtemp(prefix='bench_decks_')
+    work_dir = tempfile.mkdtemp(prefix='bench_flow_')
+    try:
+        decks = []
+        for slides in args.slides:
+            for kind, make in (('pdf', make_synthetic_pdf), ('pptx', make_synthetic_pptx)):
+                path = make(os.path.join(deck_dir, f'deck_{slides}.{kind}'), slides)
+                with open(path, 'rb') as f:
+                    decks.append((os.path.basename(path), f.read()))
+        audio = make_wav(args.audio_seconds)
+
+        server, port, env = start_gunicorn(work_dir, workers=args.workers, threads=args.threads,
+                                           llm_latency=args.llm_latency, stt_latency=args.stt_latency)
+        samples = defaultdict(list)
+        errors = defaultdict(int)
+        lock = threading.Lock()
+        peak = [0]
+
+        def record(endpoint, seconds, status, headers):
+            with lock:
+                samples[endpoint].append(seconds)
+                if status not in (200, 202):
+                    errors[endpoint] += 1
+
+        def flow(number, round_number):
+            filename, deck = decks[(number + round_number) % len(decks)]
+            return student_flow(port, filename, deck, audio, args.turns, args.poll_interval, record)
+
+        stop = threading.Event()
+
+        def sample_memory():
+            # VmHWM is per process; the sum is sampled so exited extraction processes still count
+            while not stop.wait(0.5):
+                memory = process_tree_memory(server.pid)
+                if memory:
+                    peak[0] = max(peak[0], memory[1])
+        sampler = threading.Thread(target=sample_memory, daemon=True)
+        sampler.start()
+        try:
+            completed, failed, elapsed = _run_students(args.students, args.rounds, flow)
+            memory = process_tree_memory(server.pid)
+        finally:
+            stop.set()
+            server.terminate()
+            server.wait()
+        lost = _lost_turns(env['DATA_DIR'], completed, args.turns)
+
+        requests = sum(len(values) for values in samples.values())
+        results = {
+            'flows_per_second': len(completed) / elapsed,
+            'requests_per_second': requests / elapsed,
+            'failed_flows': len(failed),
+            'lost_turns': lost,
+            'rss_bytes': memory[0] if memory else None,
+            'peak_rss_bytes': max(peak[0], memory[1]) if memory else None,
+            'endpoints': {
+                endpoint: {
+                    'requests': len(values),
+                    'errors': errors[endpoint],
+                    'p50_ms': percentile(values, 50) * 1000,
+                    'p95_ms': percentile(values, 95) * 1000,
+                    'p99_ms': percentile(values, 99) * 1000
+                }
+                for endpoint, values in samples.items()
+            }
+        }
+
+        print(f"\n{args.students} students x {args.rounds} flows of {args.turns} turns on {args.workers} "
+              f"worker(s) x {args.threads} threads; decks of {', '.join(map(str, args.slides))} slides; "
+              f"LLM {args.llm_latency * 1000:.0f}ms, STT {args.stt_latency * 1000:.0f}ms")
+        print(f"  {'endpoint':<14}{'requests':>9}{'errors':>8}{'p50':>10}{'p95':>10}{'p99':>10}")
+        for endpoint, figures in results['endpoints'].items():
+            print(f"  {endpoint:<14}{figures['requests']:>9}{figures['errors']:>8}{figures['p50_ms']:>8.1f}ms"
+                  f"{figures['p95_ms']:>8.1f}ms{figures['p99_ms']:>8.1f}ms")
+        print(f"  throughput {results['flows_per_second']:.2f} flows/s, {results['requests_per_second']:.1f} requests/s   "
+              f"failed flows {len(failed)}   lost turns {lost}")
+        if memory:
+            print(f"  server memory {results['rss_bytes'] / 2 ** 20:.0f} MiB at the end, "
+                  f"{results['peak_rss_bytes'] / 2 ** 20:.0f} MiB peak (all processes)")
+
+        if args.save:
+            with open(args.save, 'w') as f:
+                json.dump(results, f, indent=2)
+            print(f"  saved to {args.save}")
+
+        regressions = []
+        if args.baseline:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+            limit = 1 + args.tolerance
+            if results['flows_per_second'] * limit < baseline['flows_per_second']:
+                regressions.append(f"throughput {results['flows_per_second']:.2f} flows/s, "
+                                   f"baseline {baseline['flows_per_second']:.2f}")
+            for endpoint, figures in baseline['endpoints'].items():
+                current = results['endpoints'].get(endpoint)
+                # Fast endpoints jitter by a few milliseconds between runs
+                if current and current['p95_ms'] > max(figures['p95_ms'] * limit, figures['p95_ms'] + 10):
+                    regressions.append(f"{endpoint} p95 {current['p95_ms']:.1f}ms, baseline {figures['p95_ms']:.1f}ms")
+
+        if failed or lost or regressions:
+            for regression in regressions:
+                print(f"❌ {regression}")
+            if failed or lost:
+                print(f"❌ {len(failed)} failed flows, {lost} sessions with lost turns")
+            sys.exit(1)
+        print("✅ Every flow completed" + (" within the baseline" if args.baseline else ''))
+    finally:
+        shutil.rmtree(deck_dir, ignore_errors=True)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def bench_scaleout(args):
+    """Full student flows against gunicorn with 1, 2, 4... worker processes sharing one data dir
+
+    Requests of a flow land on whichever worker the kernel picks. Workers
+    are bounded by their request threads while waiting on the (fake) LLM,
+    so throughput grows with their number until the CPUs run out.
+    """
+    import threading
+
+    deck_dir = tempfile.mkdtemp(prefix='bench_deck_')
+    with open(make_synthetic_pdf(os.path.join(deck_dir, 'deck.pdf'), args.slides), 'rb') as f:
+        deck = f.read()
+    shutil.rmtree(deck_dir, ignore_errors=True)
+    audio = make_wav(1.0)
+
+    def run(workers):
+        work_dir = tempfile.mkdtemp(prefix='bench_scaleout_')
+        served_by = set()
+        lock = threading.Lock()
+
+        def record(endpoint, seconds, status, headers):
+            with lock:
+                served_by.add(headers.get('X-Served-By'))
+
+        try:
+            server, port, env = start_gunicorn(work_dir, workers=workers, threads=args.threads,
+                                               llm_latency=args.llm_latency)
+            try:
+                completed, failed, elapsed = _run_students(
+                    args.students, args.rounds,
+                    lambda number, round_number: student_flow(port, 'deck.pdf', deck, audio, args.turns,
+                                                              args.poll_interval, record))
+            finally:
+                server.terminate()
+                server.wait()
+            # Every completed session must hold every turn, whichever workers served it
+            lost = _lost_turns(env['DATA_DIR'], completed, args.turns)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        # X-Served-By is only set when there are several workers
+        return len(completed) / elapsed, len(failed), lost, max(1, len(served_by - {None}))
+
+    print(f"\n{args.students} students x {args.rounds} flows of {args.turns} turns, "
+          f"{args.threads} threads per worker, LLM latency {args.llm_latency * 1000:.0f}ms, "
+          f"{os.cpu_count()} CPUs:")
+    base = None
+    for workers in args.workers:
+        throughput, failed, lost, serving = run(workers)
+        base = base or throughput
+        print(f"  {workers} workers  {throughput:7.2f} flows/s  x{throughput / base:5.2f}   "
+              f"failed {failed}  lost {lost}  workers serving {serving}")
+
+def add_parsers(subparsers):
+    flow_parser = subparsers.add_parser('flow', help=bench_flow.__doc__)
+    flow_parser.add_argument('--students', type=int, default=20, help='concurrent clients')
+    flow_parser.add_argument('--rounds', type=int, default=2, help='flows per client')
+    flow_parser.add_argument('--turns', type=int, default=5, help='audio turns per flow')
+    flow_parser.add_argument('--slides', type=int, nargs='+', default=[5, 30, 120], help='deck sizes')
+    flow_parser.add_argument('--audio-seconds', type=float, default=2.0)
+    flow_parser.add_argument('--llm-latency', type=float, default=0.5)
+    flow_parser.add_argument('--stt-latency', type=float, default=0.2)
+    flow_parser.add_argument('--workers', type=int, default=1, help='gunicorn worker processes')
+    flow_parser.add_argument('--threads', type=int, default=32, help='request threads per worker')
+    flow_parser.add_argument('--poll-interval', type=float, default=0.5)
+    flow_parser.add_argument('--save', help='write the results to this JSON file')
+    flow_parser.add_argument('--baseline', help='JSON results to compare against')
+    flow_parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown vs the baseline')
+    flow_parser.set_defaults(run=bench_flow)
+
+    scaleout_parser = subparsers.add_parser('scaleout', help=bench_scaleout.__doc__)
+    scaleout_parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    scaleout_parser.add_argument('--threads', type=int, default=4, help='request threads per worker')
+    scaleout_parser.add_argument('--students', type=int, default=32, help='concurrent clients')
+    scaleout_parser.add_argument('--rounds', type=int, default=2, help='flows per client')
+    scaleout_parser.add_argument('--turns', type=int, default=4, help='audio turns per flow')
+    scaleout_parser.add_argument('--slides', type=int, default=10)
+    scaleout_parser.add_argument('--llm-latency', type=float, default=1.0)
+    scaleout_parser.add_argument('--poll-interval', type=float, default=0.5)
+    scaleout_parser.set_defaults(run=bench_scaleout)
+
+if __name__ == "__main__":
+    run(add_parsers)
@@ -0,0 +1,153 @@
+"""Database benchmarks: per-operation latency and concurrent writers
+
+Usage: python -m benchmarks.storage <database|stress> [options]
+"""
+
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+
+from benchmarks.common import report, make_session, run
+
+def bench_database(args):
+    """Per-operation Database latency as the number of stored sessions grows"""
+    from database import Database
+
+    for size in args.sizes:
+        data_dir = tempfile.mkdtemp(prefix='bench_db_')
+        try:
+            db = Database(data_dir)
+
+            # Populate the store with `size` sessions, each with an evaluation
+            session_ids = []
+            for _ in range(size):
+                session_id = str(uuid.uuid4())
+                db.create_session(make_session(session_id))
+                db.create_evaluation({'session_id': session_id, 'status': 'started', 'transcript': []})
+                session_ids.append(session_id)
+
+            samples = {name: [] for name in (
+                'create_session', 'get_session', 'update_session_status',
+                'add_transcript_entry', 'get_evaluation')}
+
+            for i in range(args.ops):
+                target = session_ids[i % len(session_ids)]
+
+                start = time.perf_counter()
+                db.create_session(make_session(str(uuid.uuid4())))
+                samples['create_session'].append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                db.get_session(target)
+                samples['get_session'].append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                db.update_session_status(target, 'processing')
+                samples['update_session_status'].append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                db.add_transcript_entry(target, 'The model is trained with gradient descent.')
+                samples['add_transcript_entry'].append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                db.get_evaluation(target)
+                samples['get_evaluation'].append(time.perf_counter() - start)
+
+            db.close()
+
+            print(f"\n{size} sessions:")
+            for name, values in samples.items():
+                report(name, values)
+        finally:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+def _hammer_database(db, session_ids, worker, entries):
+    """Append transcript entries and status changes from one worker"""
+    for i in range(entries):
+        for session_id in session_ids:
+            if not db.add_transcript_entry(session_id, f'{worker}:{i}'):
+                raise Exception(f"Transcript entry {worker}:{i} rejected for {session_id}")
+            db.update_session_status(session_id, f'{worker}:{i}')
+
+def _hammer_database_process(data_dir, session_ids, worker, entries):
+    """Run _hammer_database against a Database opened in a child process"""
+    from database import Database
+
+    db = Database(data_dir)
+    _hammer_database(db, session_ids, worker, entries)
+    db.close()
+
+def stress_database(args):
+    """Hammer the Database from many threads and processes and verify nothing is lost"""
+    import multiprocessing
+    import threading
+    from database import Database
+
+    data_dir = tempfile.mkdtemp(prefix='stress_db_')
+    try:
+        db = Database(data_dir)
+        session_ids = [str(uuid.uuid4()) for _ in range(args.sessions)]
+        for session_id in session_ids:
+            db.create_session(make_session(session_id))
+            db.create_evaluation({'session_id': session_id, 'status': 'started', 'transcript': []})
+
+        start = time.perf_counter()
+
+        processes = [
+            multiprocessing.Process(target=_hammer_database_process,
+                                    args=(data_dir, session_ids, f'p{p}', args.entries))
+            for p in range(args.processes)
+        ]
+        threads = [
+            threading.Thread(target=_hammer_database,
+                             args=(db, session_ids, f't{t}', args.entries))
+            for t in range(args.threads)
+        ]
+        for worker in processes + threads:
+            worker.start()
+        for worker in processes + threads:
+            worker.join()
+
+        elapsed = time.perf_counter() - start
+
+        failed_processes = [p for p in processes if p.exitcode != 0]
+        workers = [f'p{p}' for p in range(args.processes)] + [f't{t}' for t in range(args.threads)]
+        expected = {f'{worker}:{i}' for worker in workers for i in range(args.entries)}
+
+        lost = 0
+        for session_id in session_ids:
+            texts = [entry['text'] for entry in db.get_evaluation(session_id)['transcript']]
+            lost += len(expected - set(texts)) + (len(texts) - len(set(texts)))
+            status = db.get_session(session_id)['status']
+            if status.split(':')[0] not in workers:
+                lost += 1
+        db.close()
+
+        writes = len(expected) * len(session_ids) * 2
+        print(f"  {len(workers)} workers, {args.sessions} sessions, {writes} writes in {elapsed:.2f}s "
+              f"({writes / elapsed:.0f} writes/s)")
+
+        if failed_processes or lost:
+            print(f"❌ {lost} lost or duplicated entries, {len(failed_processes)} failed processes")
+            sys.exit(1)
+        print("✅ No entries lost")
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+def add_parsers(subparsers):
+    db_parser = subparsers.add_parser('database', help=bench_database.__doc__)
+    db_parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000, 100000])
+    db_parser.add_argument('--ops', type=int, default=500, help='operations timed per size')
+    db_parser.set_defaults(run=bench_database)
+
+    stress_parser = subparsers.add_parser('stress', help=stress_database.__doc__)
+    stress_parser.add_argument('--threads', type=int, default=8)
+    stress_parser.add_argument('--processes', type=int, default=4)
+    stress_parser.add_argument('--sessions', type=int, default=4)
+    stress_parser.add_argument('--entries', type=int, default=50, help='entries per worker per session')
+    stress_parser.set_defaults(run=stress_database)
+
+if __name__ == "__main__":
+    run(add_parsers)
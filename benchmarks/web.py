@@ -0,0 +1,329 @@
+"""HTTP benchmarks: status updates, response size, uploads and /metrics
+
+Usage: python -m benchmarks.web <status|responses|upload|metrics> [options]
+"""
+
+import os
+import shutil
+import statistics
+import tempfile
+import time
+import uuid
+
+from benchmarks.common import (percentile, make_session, slide_lines, make_synthetic_pdf, start_app,
+                               http_request, run)
+
+def _read_status_stream(port, session_id):
+    """Follow /api/status-stream until the ready event, returning (arrival time, bytes read)"""
+    import http.client
+
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=300)
+    try:
+        conn.request('GET', f'/api/status-stream/{session_id}')
+        response = conn.getresponse()
+        received = 0
+        event = None
+        for line in response:
+            received += len(line)
+            if line.startswith(b'event: '):
+                event = line[7:].strip()
+            elif line.startswith(b'data: ') and event in (b'ready', b'error'):
+                return time.perf_counter(), received + len(response.read())
+        return time.perf_counter(), received
+    finally:
+        conn.close()
+
+def bench_status(args):
+    """Status change to client notification: 3-second polling vs the server-sent event stream"""
+    import threading
+
+    work_dir = tempfile.mkdtemp(prefix='bench_status_')
+    try:
+        app_module, server = start_app(work_dir, server_threads=args.uploads + 8,
+                                       llm_latency=args.llm_latency, WS_PORT=0)
+        port = server.server_port
+        deck = os.path.join(work_dir, 'deck.pdf')
+
+        # Record when each session really became ready
+        ready_at = {}
+        set_session_status = app_module.set_session_status
+
+        def recording_set_session_status(session_id, status):
+            set_session_status(session_id, status)
+            if status == 'ready':
+                ready_at[session_id] = time.perf_counter()
+        app_module.set_session_status = recording_set_session_status
+
+        for mode in ('poll', 'stream'):
+            delays = []
+            requests = []
+            transferred = []
+            lock = threading.Lock()
+
+            def student(index):
+                # Distinct decks so the result cache does not short-circuit processing
+                path = f'{deck}.{mode}{index}'
+                make_synthetic_pdf(path, args.slides)
+                with open(path, 'rb') as f:
+                    status, body = http_request(port, 'POST', '/api/submit',
+                                                fields={'roll_no': f'R{index}', 'name': 'Student'},
+                                                files={'file': ('deck.pdf', f.read() + f'%{mode}{index}'.encode())})
+                session_id = body['session_id']
+
+                if mode == 'stream':
+                    arrived, received = _read_status_stream(port, session_id)
+                    count = 1
+                else:
+                    import http.client
+                    count = received = 0
+                    while True:
+                        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=300)
+                        conn.request('GET', f'/api/status/{session_id}')
+                        payload = conn.getresponse().read()
+                        conn.close()
+                        count += 1
+                        received += len(payload)
+                        if b'"status":"ready"' in payload.replace(b' ', b''):
+                            arrived = time.perf_counter()
+                            break
+                        time.sleep(args.poll_interval)
+
+                with lock:
+                    delays.append(arrived - ready_at[session_id])
+                    requests.append(count)
+                    transferred.append(received)
+
+            threads = [threading.Thread(target=student, args=(i,)) for i in range(args.uploads)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            print(f"\n{mode}, {args.uploads} uploads of {args.slides} slides:")
+            print(f"  ready to client  p50 {percentile(delays, 50) * 1000:8.1f}ms   "
+                  f"p99 {percentile(delays, 99) * 1000:8.1f}ms")
+            print(f"  requests/client  mean {statistics.mean(requests):6.1f}   "
+                  f"bytes/client mean {statistics.mean(transferred):9.0f}")
+
+        server.shutdown()
+        app_module.job_queue.shutdown()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def bench_responses(args):
+    """Bytes on the wire and handler latency of /api/status and /api/results variants"""
+    work_dir = tempfile.mkdtemp(prefix='bench_responses_')
+    try:
+        app_module, server = start_app(work_dir, WS_PORT=0)
+        server.shutdown()
+        client = app_module.app.test_client()
+
+        content = [{'slide_number': number, 'content': '\n'.join(slide_lines(number, args.lines))}
+                   for number in range(1, args.slides + 1)]
+        analysis = app_module.client._answer('keys: topic, concepts ' + ' '.join(
+            slide['content'] for slide in content))
+        analysis = __import__('json').loads(analysis)
+        analysis['slide_count'] = len(content)
+
+        # A session stored the old way, with the slides embedded in the analysis too
+        legacy_id = str(uuid.uuid4())
+        app_module.db.create_session(make_session(legacy_id))
+        app_module.db.update_session_analysis(legacy_id, content, dict(analysis, slides=content))
+        app_module.db.update_session_status(legacy_id, 'ready')
+
+        def legacy_get_status(session_id):
+            # The handler as it was: full session decode, every field, no compression
+            session = app_module.db.get_session(session_id)
+            return app_module.jsonify({
+                'session_id': session_id,
+                'status': session['status'],
+                'queue_position': app_module.job_queue.position(session_id),
+                'analysis': session.get('analysis'),
+                'content': session.get('content')
+            })
+        app_module.app.add_url_rule('/bench/legacy-status/<session_id>', 'legacy_status', legacy_get_status)
+
+        session_id = str(uuid.uuid4())
+        app_module.db.create_session(make_session(session_id))
+        app_module.db.update_session_analysis(session_id, content, analysis)
+        app_module.db.update_session_status(session_id, 'ready')
+        app_module.db.create_evaluation({'session_id': session_id, 'status': 'started', 'transcript': []})
+        app_module.db.complete_evaluation(session_id, {
+            'scores': {'Content Knowledge': 20}, 'total_score': 20,
+            'feedback': {'Content Knowledge': 'Clear explanations of the method.'}
+        })
+
+        etag = client.get(f'/api/status/{session_id}').headers['ETag']
+        results_etag = client.get(f'/api/results/{session_id}').headers['ETag']
+        gzip_header = {'Accept-Encoding': 'gzip'}
+        variants = [
+            ('status, before', f'/bench/legacy-status/{legacy_id}', {}),
+            ('status, full', f'/api/status/{session_id}', {}),
+            ('status, full + gzip', f'/api/status/{session_id}', gzip_header),
+            ('status, ?fields=status', f'/api/status/{session_id}?fields=status', gzip_header),
+            ('status, If-None-Match', f'/api/status/{session_id}', dict(gzip_header, **{'If-None-Match': etag})),
+            ('results, full', f'/api/results/{session_id}', gzip_header),
+            ('results, If-None-Match', f'/api/results/{session_id}',
+             dict(gzip_header, **{'If-None-Match': results_etag})),
+        ]
+
+        def report(label, response, samples):
+            print(f"  {label:<24} {response.status_code}  {len(response.get_data()):9d} bytes   "
+                  f"p50 {percentile(samples, 50) * 1e6:8.1f}us   p99 {percentile(samples, 99) * 1e6:8.1f}us")
+
+        print(f"\n{args.slides} slides x {args.lines} lines:")
+        for label, path, headers in variants:
+            samples = []
+            for _ in range(args.requests):
+                start = time.perf_counter()
+                response = client.get(path, headers=headers)
+                samples.append(time.perf_counter() - start)
+            report(label, response, samples)
+
+        app_module.job_queue.shutdown()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def _io_counters():
+    """(bytes read, bytes written) by this process so far, from /proc/self/io"""
+    try:
+        with open('/proc/self/io') as f:
+            counters = dict(line.split(': ') for line in f.read().splitlines())
+        return int(counters['rchar']), int(counters['wchar'])
+    except (OSError, KeyError):
+        return 0, 0
+
+def bench_upload(args):
+    """Receiving a deck: Werkzeug's spooled parse, file.save and a hashing pass vs the single-pass UploadStore"""
+    import tracemalloc
+    from werkzeug.wrappers import Request
+    from result_cache import hash_file
+    from upload_store import UploadStore
+
+    work_dir = tempfile.mkdtemp(prefix='bench_upload_')
+    try:
+        store = UploadStore(os.path.join(work_dir, 'uploads'), max_bytes=(max(args.sizes) + 1) * 1024 * 1024)
+
+        class IngestRequest(Request):
+            def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+                return store.ingest(filename)
+
+        def before(request, target):
+            request.files['file'].save(target)
+            return hash_file(target)
+
+        def after(request, target):
+            return store.commit(request.files['file'].stream, target)
+
+        boundary = 'benchmarkboundary'
+        body_path = os.path.join(work_dir, 'body')
+        print(f"\n{'deck':>8}  {'path':<28}{'time':>9}{'read':>10}{'written':>10}{'peak memory':>13}")
+        for size_mb in args.sizes:
+            with open(body_path, 'wb') as body:
+                body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="deck.pdf"\r\n'
+                           f'Content-Type: application/pdf\r\n\r\n%PDF-1.4\n'.encode())
+                for _ in range(size_mb):
+                    body.write(os.urandom(1024 * 1024))
+                body.write(f'\r\n--{boundary}--\r\n'.encode())
+            length = os.path.getsize(body_path)
+
+            for label, request_class, receive in (('save + hash (before)', Request, before),
+                                                  ('streamed ingest (after)', IngestRequest, after)):
+                target = os.path.join(work_dir, 'uploads', 'deck.pdf')
+                with open(body_path, 'rb') as stream:
+                    request = request_class.from_values(
+                        input_stream=stream, content_length=length, method='POST',
+                        content_type=f'multipart/form-data; boundary={boundary}')
+                    read_before, written_before = _io_counters()
+                    tracemalloc.start()
+                    start = time.perf_counter()
+                    receive(request, target)
+                    elapsed = time.perf_counter() - start
+                    _, peak = tracemalloc.get_traced_memory()
+                    tracemalloc.stop()
+                    read, written = _io_counters()
+                    request.close()
+                os.remove(target)
+                print(f"{size_mb:>6}MB  {label:<28}{elapsed * 1000:>7.0f}ms"
+                      f"{(read - read_before) / 2 ** 20:>8.0f}MB{(written - written_before) / 2 ** 20:>8.0f}MB"
+                      f"{peak / 1024:>11.0f}KB")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def bench_metrics(args):
+    """Cost of the instrumentation on hot paths: metrics off, on, and tracing every call"""
+    from metrics import metrics
+
+    work_dir = tempfile.mkdtemp(prefix='bench_metrics_')
+    try:
+        app_module, server = start_app(work_dir, WS_PORT=0, JANITOR_INTERVAL=0)
+        client = app_module.app.test_client()
+        db = app_module.db
+        session_ids = [str(uuid.uuid4()) for _ in range(100)]
+        for session_id in session_ids:
+            db.create_session(make_session(session_id))
+        histogram = metrics.histogram('bench_seconds')
+
+        def timed_block(session_id):
+            with histogram.time():
+                pass
+
+        operations = (
+            ('timer', timed_block),
+            ('status read', db.get_session_status),
+            ('status write', lambda session_id: db.update_session_status(session_id, 'ready')),
+            ('GET status', lambda session_id: client.get(f'/api/status/{session_id}?fields=status'))
+        )
+
+        def run(operation, count):
+            start = time.perf_counter()
+            for i in range(count):
+                operation(session_ids[i % len(session_ids)])
+            return (time.perf_counter() - start) / count * 1e6
+
+        print("\nMicroseconds per operation (best of 3):")
+        print(f"  {'':<14}{'off':>10}{'on':>10}{'traced':>10}{'overhead':>10}")
+        for label, operation in operations:
+            count = args.operations // 10 if label == 'GET status' else args.operations
+            metrics.enabled = False
+            run(operation, count)  # warm up
+            off = min(run(operation, count) for _ in range(3))
+            metrics.enabled = True
+            on = min(run(operation, count) for _ in range(3))
+            token = metrics.start_trace()
+            traced = min(run(operation, count) for _ in range(3))
+            metrics.end_trace(token)
+            print(f"  {label:<14}{off:>10.2f}{on:>10.2f}{traced:>10.2f}{on - off:>8.2f}us")
+
+        start = time.perf_counter()
+        response = client.get('/metrics')
+        print(f"\n  /metrics scrape: {(time.perf_counter() - start) * 1000:.2f}ms for "
+              f"{len(response.get_data().splitlines())} lines")
+        server.shutdown()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def add_parsers(subparsers):
+    status_parser = subparsers.add_parser('status', help=bench_status.__doc__)
+    status_parser.add_argument('--uploads', type=int, default=20)
+    status_parser.add_argument('--slides', type=int, default=20)
+    status_parser.add_argument('--llm-latency', type=float, default=2.0)
+    status_parser.add_argument('--poll-interval', type=float, default=3.0, help='frontend status poll interval')
+    status_parser.set_defaults(run=bench_status)
+
+    responses_parser = subparsers.add_parser('responses', help=bench_responses.__doc__)
+    responses_parser.add_argument('--slides', type=int, default=40)
+    responses_parser.add_argument('--lines', type=int, default=12, help='text lines per slide')
+    responses_parser.add_argument('--requests', type=int, default=200, help='requests timed per variant')
+    responses_parser.set_defaults(run=bench_responses)
+
+    upload_parser = subparsers.add_parser('upload', help=bench_upload.__doc__)
+    upload_parser.add_argument('--sizes', type=int, nargs='+', default=[16, 100, 200], help='deck sizes in MB')
+    upload_parser.set_defaults(run=bench_upload)
+
+    metrics_parser = subparsers.add_parser('metrics', help=bench_metrics.__doc__)
+    metrics_parser.add_argument('--operations', type=int, default=20000)
+    metrics_parser.set_defaults(run=bench_metrics)
+
+if __name__ == "__main__":
+    run(add_parsers)
@@ -0,0 +1,214 @@
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_gateway import PRIORITY_BACKGROUND, as_gateway, count_tokens, truncate_tokens
+from slide_index import SlideIndex
+
+SYSTEM_PROMPT = "You are an expert technical presentation evaluator having a conversation with a student."
+
+class SessionContext:
+    """What the evaluator remembers about one presentation"""
+
+    def __init__(self, brief, slides, slide_index, recent_turns):
+        self.brief = brief
+        self.slides = slides  # slide number -> text
+        self.slide_index = slide_index
+        self.summary = ''
+        self.recent = deque()  # (role, text), oldest first
+        self.recent_turns = recent_turns
+        self.unsummarized = []  # turns pushed out of the window, not yet in the summary
+        self.summarizing = False
+        self.prompt_tokens = []  # per turn
+        self.lock = threading.Lock()
+
+class ConversationContext:
+    """Rolling per-session context for live evaluator replies
+
+    Each reply prompt is built from a short brief of the deck, a running
+    summary of the talk so far, the slides most related to what the
+    student is saying and the last few turns, trimmed to `token_budget`
+    tokens. Turns leaving the recent window are folded into the summary by
+    a background LLM call, so prompt size (and reply latency) stays flat
+    however long the presentation runs. The summary is saved with the
+    evaluation, for a worker process or restart that picks the session up.
+    """
+
+    def __init__(self, llm, db=None, token_budget=1500, recent_turns=4, summary_tokens=250,
+                 slide_tokens=400, slides_per_turn=3, max_sessions=1000):
+        self.llm = as_gateway(llm)
+        self.db = db
+        self.token_budget = token_budget
+        self.recent_turns = recent_turns
+        self.summary_tokens = summary_tokens
+        self.slide_tokens = slide_tokens
+        self.slides_per_turn = slides_per_turn
+        self.max_sessions = max_sessions
+
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._summarizer = ThreadPoolExecutor(max_workers=2, thread_name_prefix='context-summary')
+
+    def _context(self, session_id):
+        """The session's context, loaded from the database on first use"""
+        with self._lock:
+            context = self._sessions.get(session_id)
+            if context is not None:
+                self._sessions.move_to_end(session_id)
+                return context
+
+        context = self._load(session_id)
+        with self._lock:
+            context = self._sessions.setdefault(session_id, context)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return context
+
+    def _load(self, session_id):
+        session = self.db.get_session(session_id) if self.db is not None else None
+        session = session or {}
+        analysis = session.get('analysis') or {}
+
+        brief = []
+        if analysis.get('topic'):
+            brief.append(f"Topic: {analysis['topic']}")
+        if analysis.get('concepts'):
+            brief.append(f"Key concepts: {', '.join(map(str, analysis['concepts']))}")
+        if analysis.get('focus_areas'):
+            brief.append(f"Probe deeper on: {', '.join(map(str, analysis['focus_areas']))}")
+
+        content = session.get('content') or []
+        slides = {slide.get('slide_number'): slide.get('content', '') for slide in content}
+        # Sessions processed before the index existed get one built now
+        if session.get('slide_index'):
+            slide_index = SlideIndex.from_dict(session['slide_index'])
+        else:
+            slide_index = SlideIndex.build(content)
+        context = SessionContext('\n'.join(brief), slides, slide_index, self.recent_turns)
+
+        # Pick up where a restarted process, or another worker, left off
+        if self.db is not None:
+            evaluation = self.db.get_evaluation_fields(session_id, 'context_summary') or {}
+            context.summary = evaluation.get('context_summary') or ''
+            for entry in self.db.get_recent_transcript(session_id, self.recent_turns):
+                context.recent.append(('user', entry.get('text', '')))
+        return context
+
+    def _relevant_slides(self, context, text):
+        """Slides best matching what the student just said, most relevant first"""
+        return [(number, context.slides.get(number, ''))
+                for number, _ in context.slide_index.search(text, self.slides_per_turn)]
+
+    def build_messages(self, session_id, transcript, instructions):
+        """Chat messages for a reply to `transcript`, within the token budget"""
+        context = self._context(session_id)
+        with context.lock:
+            summary = context.summary
+            recent = list(context.recent)
+
+        transcript = truncate_tokens(transcript, self.token_budget // 4, keep='end')
+        prompt = instructions.format(transcript=transcript)
+        remaining = self.token_budget - count_tokens(SYSTEM_PROMPT) - count_tokens(prompt)
+
+        system = [SYSTEM_PROMPT]
+        if context.brief:
+            brief = truncate_tokens(context.brief, remaining // 4)
+            system.append(f"Presentation brief:\n{brief}")
+            remaining -= count_tokens(brief)
+        if summary:
+            summary = truncate_tokens(summary, min(self.summary_tokens, remaining // 3), keep='end')
+            system.append(f"Summary of the presentation so far:\n{summary}")
+            remaining -= count_tokens(summary)
+
+        recent_text = ' '.join(text for role, text in recent[-2:] if role == 'user')
+        slide_budget = min(self.slide_tokens, remaining // 2)
+        for number, content in self._relevant_slides(context, f'{recent_text} {transcript}'):
+            excerpt = truncate_tokens(content, slide_budget)
+            if not excerpt:
+                break
+            system.append(f"Slide {number}:\n{excerpt}")
+            slide_budget -= count_tokens(excerpt)
+            remaining -= count_tokens(excerpt)
+
+        # Newest turns first, as many as still fit
+        history = []
+        for role, text in reversed(recent):
+            tokens = count_tokens(text)
+            if tokens > remaining:
+                break
+            history.insert(0, {'role': role, 'content': text})
+            remaining -= tokens
+
+        return [{'role': 'system', 'content': '\n\n'.join(system)}] + history + [
+            {'role': 'user', 'content': prompt}]
+
+    def record_turn(self, session_id, transcript, reply, prompt_tokens):
+        """Add a student turn and the evaluator's reply, summarizing older turns"""
+        context = self._context(session_id)
+        with context.lock:
+            context.prompt_tokens.append(prompt_tokens)
+            context.recent.append(('user', transcript))
+            if reply:
+                context.recent.append(('assistant', reply))
+            while len(context.recent) > 2 * context.recent_turns:
+                context.unsummarized.append(context.recent.popleft())
+
+            if context.unsummarized and not context.summarizing:
+                context.summarizing = True
+                self._summarizer.submit(self._summarize, session_id, context)
+
+    def _summarize(self, session_id, context):
+        """Fold turns that left the recent window into the running summary"""
+        while True:
+            with context.lock:
+                turns = context.unsummarized
+                context.unsummarized = []
+                summary = context.summary
+                if not turns:
+                    context.summarizing = False
+                    return
+
+            conversation = '\n'.join(f"{'Student' if role == 'user' else 'Evaluator'}: {text}"
+                                     for role, text in turns)
+            try:
+                response = self.llm.complete(
+                    purpose='summary',
+                    priority=PRIORITY_BACKGROUND,
+                    messages=[{'role': 'user', 'content': f"""
+                    Update the running summary of a student's presentation with the new exchange.
+                    Keep what the student claimed, explained or failed to explain, and the questions asked.
+                    Reply with the summary only, under {self.summary_tokens * 3 // 4} words.
+
+                    Running summary:
+                    {summary or '(none yet)'}
+
+                    New exchange:
+                    {conversation}
+                    """}],
+                    temperature=0.2,
+                    max_tokens=self.summary_tokens
+                )
+                summary = response.choices[0].message.content.strip()
+            except Exception:
+                # Keep the most recent material rather than lose it
+                summary = truncate_tokens(f'{summary}\n{conversation}', self.summary_tokens, keep='end')
+
+            with context.lock:
+                context.summary = summary
+            if self.db is not None:
+                self.db.update_evaluation_fields(session_id, context_summary=summary)
+
+    def usage(self, session_id):
+        """Prompt tokens sent per turn so far and the current summary size"""
+        context = self._context(session_id)
+        with context.lock:
+            return {
+                'turns': len(context.prompt_tokens),
+                'prompt_tokens': list(context.prompt_tokens),
+                'summary_tokens': count_tokens(context.summary)
+            }
+
+    def forget(self, session_id):
+        """Drop a session's context once its evaluation is over"""
+        with self._lock:
+            self._sessions.pop(session_id, None)
@@ -1,182 +1,669 @@
 import json
 import os
+import sqlite3
+import threading
+import time
 from datetime import datetime
 import uuid
 
+from metrics import metrics
+
+# Seconds a writer waits for another process holding the write lock
+BUSY_TIMEOUT = 30
+
+# Looked up once: these are timed on every query
+DB_READ_SECONDS = metrics.histogram('db_seconds', op='read')
+DB_WRITE_SECONDS = metrics.histogram('db_seconds', op='write')
+
+# Keys that grow during a live presentation are stored as rows in their own
+# tables so that appending is an indexed insert instead of a record rewrite.
+APPENDED_EVALUATION_KEYS = ('transcript', 'questions_asked', 'answers_given')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS evaluations (
+    session_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS transcript_entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    entry TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_transcript_session ON transcript_entries (session_id, id);
+CREATE TABLE IF NOT EXISTS qa_entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_qa_session ON qa_entries (session_id, id);
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL,
+    run_at REAL NOT NULL DEFAULT 0,
+    owner TEXT,
+    lease_until REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS audio_chunks (
+    chunk_id TEXT PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_audio_chunks_session ON audio_chunks (session_id);
+"""
+
+# Columns added to existing tables since they were first created
+ADDED_COLUMNS = {
+    'jobs': (('run_at', 'REAL NOT NULL DEFAULT 0'), ('owner', 'TEXT'), ('lease_until', 'REAL')),
+}
+
 class Database:
-    def __init__(self):
-        self.data_dir = 'data'
+    def __init__(self, data_dir='data'):
+        self.data_dir = data_dir
+        self.db_file = os.path.join(self.data_dir, 'evaluator.db')
         self.sessions_file = os.path.join(self.data_dir, 'sessions.json')
         self.evaluations_file = os.path.join(self.data_dir, 'evaluations.json')
-        
+
         # Ensure data directory exists
         os.makedirs(self.data_dir, exist_ok=True)
-        
-        # Initialize data files
-        self._initialize_data_files()
-    
-    def _initialize_data_files(self):
-        """Initialize JSON data files if they don't exist"""
-        if not os.path.exists(self.sessions_file):
-            with open(self.sessions_file, 'w') as f:
-                json.dump({}, f)
-        
-        if not os.path.exists(self.evaluations_file):
-            with open(self.evaluations_file, 'w') as f:
-                json.dump({}, f)
-    
-    def _read_json(self, filepath):
-        """Read JSON data from file"""
+
+        # Each thread gets its own connection. SQLite has one write lock per
+        # database, so writes of every session take turns; they are kept to
+        # short transactions, and reads (WAL) never wait for them.
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        self._add_columns(conn)
+        conn.close()
+
+        # Import data left behind by the JSON file storage
+        self.migrate_from_json()
+
+    def _add_columns(self, conn):
+        """Bring tables created by an older version up to the current schema"""
+        conn.execute('BEGIN IMMEDIATE')
         try:
-            with open(filepath, 'r') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return {}
-    
-    def _write_json(self, filepath, data):
-        """Write JSON data to file"""
-        with open(filepath, 'w') as f:
-            json.dump(data, f, indent=2)
-    
+            for table, columns in ADDED_COLUMNS.items():
+                existing = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+                for name, definition in columns:
+                    if name not in existing:
+                        conn.execute(f'ALTER TABLE {table} ADD COLUMN {name} {definition}')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    @property
+    def _conn(self):
+        """Connection owned by the calling thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def _connect(self):
+        """Open a connection to the SQLite database in WAL mode"""
+        conn = sqlite3.connect(self.db_file, timeout=BUSY_TIMEOUT, check_same_thread=False,
+                               isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def close(self):
+        """Close every connection opened by this instance"""
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
+
+    def _transaction(self):
+        """Write transaction
+
+        BEGIN IMMEDIATE takes SQLite's database-wide write lock up front, so
+        a read-modify-write inside the block is atomic across threads and
+        processes and is rolled back as a whole if anything fails. Every
+        write in every process waits for it: keep the block short.
+        """
+        return _Transaction(self._conn, 'BEGIN IMMEDIATE', DB_WRITE_SECONDS)
+
+    def _snapshot(self):
+        """Read transaction giving a consistent view across several queries"""
+        return _Transaction(self._conn, 'BEGIN', DB_READ_SECONDS)
+
+    def _set_fields(self, table, session_id, fields):
+        """Set top-level fields of a JSON record in one statement, False if it is missing
+
+        json_set edits the stored record in place: nothing is read and
+        decoded first, so the write lock is held for this statement alone.
+        """
+        paths = ', '.join(f"'$.\"{field}\"', json(?)" for field in fields)
+        with DB_WRITE_SECONDS.time():
+            cursor = self._conn.execute(
+                f'UPDATE {table} SET data = json_set(data, {paths}) WHERE session_id = ?',
+                [json.dumps(value) for value in fields.values()] + [session_id]
+            )
+        return cursor.rowcount > 0
+
+    def _load(self, table, session_id):
+        """Load a JSON record by session ID"""
+        row = self._conn.execute(
+            f'SELECT data FROM {table} WHERE session_id = ?', (session_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _store(self, table, session_id, record):
+        """Insert or replace a JSON record"""
+        self._conn.execute(
+            f'INSERT OR REPLACE INTO {table} (session_id, data) VALUES (?, ?)',
+            (session_id, json.dumps(record))
+        )
+
+    def _attach_entries(self, session_id, evaluation):
+        """Attach appended transcript and Q&A rows to an evaluation record"""
+        evaluation['transcript'] = [
+            json.loads(entry) for (entry,) in self._conn.execute(
+                'SELECT entry FROM transcript_entries WHERE session_id = ? ORDER BY id',
+                (session_id,)
+            )
+        ]
+        evaluation['questions_asked'] = []
+        evaluation['answers_given'] = []
+        for question, answer in self._conn.execute(
+            'SELECT question, answer FROM qa_entries WHERE session_id = ? ORDER BY id',
+            (session_id,)
+        ):
+            evaluation['questions_asked'].append(json.loads(question))
+            evaluation['answers_given'].append(json.loads(answer))
+        return evaluation
+
+    def _insert_evaluation(self, evaluation_data):
+        """Store an evaluation record, moving appended lists into their tables"""
+        session_id = evaluation_data['session_id']
+        record = {k: v for k, v in evaluation_data.items() if k not in APPENDED_EVALUATION_KEYS}
+        self._store('evaluations', session_id, record)
+
+        self._conn.execute('DELETE FROM transcript_entries WHERE session_id = ?', (session_id,))
+        self._conn.execute('DELETE FROM qa_entries WHERE session_id = ?', (session_id,))
+
+        transcript = evaluation_data.get('transcript') or []
+        self._conn.executemany(
+            'INSERT INTO transcript_entries (session_id, entry) VALUES (?, ?)',
+            [(session_id, json.dumps(entry)) for entry in transcript]
+        )
+
+        questions = evaluation_data.get('questions_asked') or []
+        answers = evaluation_data.get('answers_given') or []
+        self._conn.executemany(
+            'INSERT INTO qa_entries (session_id, question, answer) VALUES (?, ?, ?)',
+            [(session_id, json.dumps(q), json.dumps(a)) for q, a in zip(questions, answers)]
+        )
+
+    def migrate_from_json(self):
+        """One-shot import of sessions.json/evaluations.json into SQLite"""
+        migrated = 0
+        with self._transaction():
+            for filepath, table in ((self.sessions_file, 'sessions'),
+                                    (self.evaluations_file, 'evaluations')):
+                if not os.path.exists(filepath):
+                    continue
+
+                try:
+                    with open(filepath, 'r') as f:
+                        records = json.load(f)
+                except json.JSONDecodeError:
+                    records = {}
+
+                for session_id, record in records.items():
+                    if table == 'evaluations':
+                        self._insert_evaluation(dict(record, session_id=session_id))
+                    else:
+                        self._store(table, session_id, record)
+                    migrated += 1
+
+        # Keep the originals around, but never import them twice
+        for filepath in (self.sessions_file, self.evaluations_file):
+            if os.path.exists(filepath):
+                os.replace(filepath, filepath + '.migrated')
+
+        return migrated
+
     def create_session(self, session_data):
         """Create a new session record"""
-        sessions = self._read_json(self.sessions_file)
         session_id = session_data['session_id']
-        sessions[session_id] = session_data
-        self._write_json(self.sessions_file, sessions)
+        with self._transaction():
+            self._store('sessions', session_id, session_data)
         return session_id
-    
+
     def get_session(self, session_id):
         """Get session by ID"""
-        sessions = self._read_json(self.sessions_file)
-        return sessions.get(session_id)
-    
+        with self._snapshot():
+            return self._load('sessions', session_id)
+
+    def _load_fields(self, table, session_id, fields):
+        """Read a few top-level fields of a record without decoding the rest, None if missing"""
+        columns = ', '.join(f"json_extract(data, '$.\"{field}\"')" for field in fields)
+        with DB_READ_SECONDS.time():
+            row = self._conn.execute(
+                f'SELECT {columns} FROM {table} WHERE session_id = ?', (session_id,)
+            ).fetchone()
+        return dict(zip(fields, row)) if row else None
+
+    def get_session_fields(self, session_id, *fields):
+        """Get selected session fields, skipping the content and analysis blobs"""
+        return self._load_fields('sessions', session_id, fields)
+
+    def get_session_status(self, session_id):
+        """Get just a session's status"""
+        fields = self.get_session_fields(session_id, 'status')
+        return fields['status'] if fields else None
+
     def update_session_status(self, session_id, status):
         """Update session status"""
-        sessions = self._read_json(self.sessions_file)
-        if session_id in sessions:
-            sessions[session_id]['status'] = status
-            sessions[session_id]['updated_at'] = datetime.now().isoformat()
-            self._write_json(self.sessions_file, sessions)
-            return True
-        return False
-    
-    def update_session_analysis(self, session_id, content, analysis):
-        """Update session with presentation analysis"""
-        sessions = self._read_json(self.sessions_file)
-        if session_id in sessions:
-            sessions[session_id]['content'] = content
-            sessions[session_id]['analysis'] = analysis
-            sessions[session_id]['updated_at'] = datetime.now().isoformat()
-            self._write_json(self.sessions_file, sessions)
+        return self._set_fields('sessions', session_id, {'status': status, 'updated_at': datetime.now().isoformat()})
+
+    def update_session_analysis(self, session_id, content, analysis, slide_index=None, question_bank=None):
+        """Update session with presentation analysis, its slide retrieval index and question bank"""
+        with self._transaction():
+            session = self._load('sessions', session_id)
+            if session is None:
+                return False
+            session['content'] = content
+            session['analysis'] = analysis
+            if slide_index is not None:
+                session['slide_index'] = slide_index
+            if question_bank is not None:
+                session['question_bank'] = question_bank
+            session['updated_at'] = datetime.now().isoformat()
+            self._store('sessions', session_id, session)
             return True
-        return False
-    
+
     def create_evaluation(self, evaluation_data):
         """Create a new evaluation record"""
-        evaluations = self._read_json(self.evaluations_file)
         session_id = evaluation_data['session_id']
-        evaluations[session_id] = evaluation_data
-        self._write_json(self.evaluations_file, evaluations)
+        with self._transaction():
+            self._insert_evaluation(evaluation_data)
         return session_id
-    
+
     def get_evaluation(self, session_id):
         """Get evaluation by session ID"""
-        evaluations = self._read_json(self.evaluations_file)
-        return evaluations.get(session_id)
-    
+        with self._snapshot():
+            evaluation = self._load('evaluations', session_id)
+            if evaluation is None:
+                return None
+            return self._attach_entries(session_id, evaluation)
+
+    def get_evaluation_fields(self, session_id, *fields):
+        """Get selected evaluation fields without loading its transcript and Q&A entries"""
+        return self._load_fields('evaluations', session_id, fields)
+
+    def update_evaluation_fields(self, session_id, **fields):
+        """Set top-level fields of an evaluation record"""
+        return self._set_fields('evaluations', session_id, dict(fields, updated_at=datetime.now().isoformat()))
+
+    def _touch_evaluation(self, session_id):
+        """Bump updated_at on an evaluation, returning False if it is missing"""
+        return self._conn.execute(
+            "UPDATE evaluations SET data = json_set(data, '$.updated_at', ?) WHERE session_id = ?",
+            (datetime.now().isoformat(), session_id)
+        ).rowcount > 0
+
     def add_transcript_entry(self, session_id, transcript):
         """Add transcript entry to evaluation"""
-        evaluations = self._read_json(self.evaluations_file)
-        if session_id in evaluations:
-            if 'transcript' not in evaluations[session_id]:
-                evaluations[session_id]['transcript'] = []
-            
-            evaluations[session_id]['transcript'].append({
-                'text': transcript,
-                'timestamp': datetime.now().isoformat()
-            })
-            
-            evaluations[session_id]['updated_at'] = datetime.now().isoformat()
-            self._write_json(self.evaluations_file, evaluations)
+        with self._transaction():
+            if not self._touch_evaluation(session_id):
+                return False
+
+            self._conn.execute(
+                'INSERT INTO transcript_entries (session_id, entry) VALUES (?, ?)',
+                (session_id, json.dumps({
+                    'text': transcript,
+                    'timestamp': datetime.now().isoformat()
+                }))
+            )
             return True
-        return False
-    
-    def add_question_answer(self, session_id, question, answer):
-        """Add question and answer to evaluation"""
-        evaluations = self._read_json(self.evaluations_file)
-        if session_id in evaluations:
-            if 'questions_asked' not in evaluations[session_id]:
-                evaluations[session_id]['questions_asked'] = []
-            if 'answers_given' not in evaluations[session_id]:
-                evaluations[session_id]['answers_given'] = []
-            
-            evaluations[session_id]['questions_asked'].append({
-                'question': question,
-                'timestamp': datetime.now().isoformat()
-            })
-            
-            evaluations[session_id]['answers_given'].append({
-                'answer': answer,
-                'timestamp': datetime.now().isoformat()
-            })
-            
-            evaluations[session_id]['updated_at'] = datetime.now().isoformat()
-            self._write_json(self.evaluations_file, evaluations)
+
+    def get_recent_transcript(self, session_id, limit):
+        """Last `limit` transcript entries of an evaluation, oldest first"""
+        rows = self._conn.execute(
+            'SELECT entry FROM transcript_entries WHERE session_id = ? ORDER BY id DESC LIMIT ?',
+            (session_id, limit)
+        ).fetchall()
+        return [json.loads(entry) for (entry,) in reversed(rows)]
+
+    def get_transcript_entries(self, session_id, start=0):
+        """Transcript entries of an evaluation from the `start`-th on, oldest first"""
+        rows = self._conn.execute(
+            'SELECT entry FROM transcript_entries WHERE session_id = ? ORDER BY id LIMIT -1 OFFSET ?',
+            (session_id, start)
+        ).fetchall()
+        return [json.loads(entry) for (entry,) in rows]
+
+    def add_question_answer(self, session_id, question, answer, grade=None):
+        """Add question and answer to evaluation, returning the entry's ID (False if missing)"""
+        with self._transaction():
+            if not self._touch_evaluation(session_id):
+                return False
+
+            timestamp = datetime.now().isoformat()
+            answer_entry = {'answer': answer, 'timestamp': timestamp}
+            if grade is not None:
+                answer_entry['grade'] = grade
+            cursor = self._conn.execute(
+                'INSERT INTO qa_entries (session_id, question, answer) VALUES (?, ?, ?)',
+                (session_id,
+                 json.dumps({'question': question, 'timestamp': timestamp}),
+                 json.dumps(answer_entry))
+            )
+            return cursor.lastrowid
+
+    def update_answer_grade(self, session_id, entry_id, grade):
+        """Replace the grade stored with an answer"""
+        with self._transaction():
+            row = self._conn.execute('SELECT answer FROM qa_entries WHERE id = ? AND session_id = ?',
+                                     (entry_id, session_id)).fetchone()
+            if row is None:
+                return False
+            answer_entry = json.loads(row[0])
+            answer_entry['grade'] = grade
+            self._conn.execute('UPDATE qa_entries SET answer = ? WHERE id = ?', (json.dumps(answer_entry), entry_id))
             return True
-        return False
-    
+
+    def get_question_answers(self, session_id):
+        """Question and answer entries of an evaluation, oldest first, merged into one dict each"""
+        rows = self._conn.execute(
+            'SELECT id, question, answer FROM qa_entries WHERE session_id = ? ORDER BY id', (session_id,)
+        ).fetchall()
+        entries = []
+        for entry_id, question, answer in rows:
+            question, answer = json.loads(question), json.loads(answer)
+            entries.append(dict(answer, id=entry_id, question=question.get('question'),
+                                asked_at=question.get('timestamp')))
+        return entries
+
     def complete_evaluation(self, session_id, final_scores):
         """Complete evaluation with final scores"""
-        evaluations = self._read_json(self.evaluations_file)
-        sessions = self._read_json(self.sessions_file)
-        
-        if session_id in evaluations and session_id in sessions:
+        with self._transaction():
+            evaluation = self._load('evaluations', session_id)
+            session = self._load('sessions', session_id)
+
+            if evaluation is None or session is None:
+                return False
+
             # Update evaluation
-            evaluations[session_id]['status'] = 'completed'
-            evaluations[session_id]['final_scores'] = final_scores['scores']
-            evaluations[session_id]['total_score'] = final_scores['total_score']
-            evaluations[session_id]['feedback'] = final_scores.get('feedback', {})
-            evaluations[session_id]['completed_at'] = datetime.now().isoformat()
-            
+            evaluation['status'] = 'completed'
+            evaluation['final_scores'] = final_scores['scores']
+            evaluation['total_score'] = final_scores['total_score']
+            evaluation['feedback'] = final_scores.get('feedback', {})
+            evaluation['pending_turns'] = final_scores.get('pending_turns', 0)
+            evaluation['completed_at'] = datetime.now().isoformat()
+
             # Add student info from session
-            evaluations[session_id]['roll_no'] = sessions[session_id]['roll_no']
-            evaluations[session_id]['name'] = sessions[session_id]['name']
-            
+            evaluation['roll_no'] = session['roll_no']
+            evaluation['name'] = session['name']
+
             # Update session status
-            sessions[session_id]['status'] = 'completed'
-            sessions[session_id]['updated_at'] = datetime.now().isoformat()
-            
-            self._write_json(self.evaluations_file, evaluations)
-            self._write_json(self.sessions_file, sessions)
+            session['status'] = 'completed'
+            session['updated_at'] = datetime.now().isoformat()
+
+            self._store('evaluations', session_id, evaluation)
+            self._store('sessions', session_id, session)
             return True
-        return False
-    
+
     def get_all_sessions(self):
         """Get all sessions"""
-        return self._read_json(self.sessions_file)
-    
+        with self._snapshot():
+            return {
+                session_id: json.loads(data)
+                for session_id, data in self._conn.execute('SELECT session_id, data FROM sessions')
+            }
+
     def get_all_evaluations(self):
         """Get all evaluations"""
-        return self._read_json(self.evaluations_file)
-    
+        with self._snapshot():
+            evaluations = {
+                session_id: json.loads(data)
+                for session_id, data in self._conn.execute('SELECT session_id, data FROM evaluations')
+            }
+            for session_id, evaluation in evaluations.items():
+                self._attach_entries(session_id, evaluation)
+            return evaluations
+
+    def list_sessions(self, *fields):
+        """Selected fields of every session with its evaluation's status and last update, skipping the blobs"""
+        columns = ''.join(f", json_extract(s.data, '$.\"{field}\"')" for field in fields)
+        with self._snapshot():
+            rows = self._conn.execute(
+                f"SELECT s.session_id{columns}, json_extract(e.data, '$.status'), "
+                f"COALESCE(json_extract(e.data, '$.updated_at'), json_extract(e.data, '$.start_time')) "
+                f"FROM sessions s LEFT JOIN evaluations e ON e.session_id = s.session_id"
+            ).fetchall()
+        keys = ('session_id',) + fields + ('evaluation_status', 'evaluation_updated_at')
+        return [dict(zip(keys, row)) for row in rows]
+
     def delete_session(self, session_id):
         """Delete session and its evaluation"""
-        sessions = self._read_json(self.sessions_file)
-        evaluations = self._read_json(self.evaluations_file)
-        
-        deleted = False
-        
-        if session_id in sessions:
-            del sessions[session_id]
-            deleted = True
-        
-        if session_id in evaluations:
-            del evaluations[session_id]
-            deleted = True
-        
-        if deleted:
-            self._write_json(self.sessions_file, sessions)
-            self._write_json(self.evaluations_file, evaluations)
-        
-        return deleted
\ No newline at end of file
+        with self._transaction():
+            deleted = 0
+            for table in ('sessions', 'evaluations', 'transcript_entries', 'qa_entries', 'audio_chunks', 'jobs'):
+                deleted += self._conn.execute(
+                    f'DELETE FROM {table} WHERE session_id = ?', (session_id,)
+                ).rowcount
+            return deleted > 0
+
+    def create_job(self, job):
+        """Persist a background job, runnable at once"""
+        with self._transaction():
+            self._conn.execute(
+                'INSERT INTO jobs (job_id, session_id, payload, status, attempts, created_at, run_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (job['job_id'], job['session_id'], json.dumps(job['payload']),
+                 job['status'], job['attempts'], job['created_at'], time.time())
+            )
+        return job['job_id']
+
+    def claim_job(self, owner, lease):
+        """Take the next due job for `owner` for `lease` seconds, None if there is none
+
+        A running job whose lease ran out, its worker having stopped, is
+        taken again. Claiming counts as an attempt.
+        """
+        now = time.time()
+        due = ("(status = 'queued' AND run_at <= ?) "
+               "OR (status = 'running' AND COALESCE(lease_until, 0) < ?)")
+        # Idle workers poll: only take the write lock when there is something to claim
+        if self._conn.execute(f'SELECT 1 FROM jobs WHERE {due} LIMIT 1', (now, now)).fetchone() is None:
+            return None
+        with self._transaction():
+            row = self._conn.execute(
+                f'SELECT job_id, session_id, payload, attempts, created_at FROM jobs WHERE {due} '
+                f'ORDER BY run_at, created_at LIMIT 1', (now, now)
+            ).fetchone()
+            if row is None:
+                return None
+            job_id, session_id, payload, attempts, created_at = row
+            self._conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = ?, owner = ?, lease_until = ? WHERE job_id = ?",
+                (attempts + 1, owner, now + lease, job_id)
+            )
+        return {
+            'job_id': job_id,
+            'session_id': session_id,
+            'payload': json.loads(payload),
+            'status': 'running',
+            'attempts': attempts + 1,
+            'created_at': created_at,
+            'owner': owner
+        }
+
+    def renew_jobs(self, job_ids, owner, lease):
+        """Extend the lease of running jobs `owner` still holds, returning how many"""
+        if not job_ids:
+            return 0
+        placeholders = ', '.join('?' for _ in job_ids)
+        with self._transaction():
+            return self._conn.execute(
+                f'UPDATE jobs SET lease_until = ? WHERE owner = ? AND job_id IN ({placeholders})',
+                (time.time() + lease, owner, *job_ids)
+            ).rowcount
+
+    def retry_job(self, job_id, run_at):
+        """Put a job back in the queue, runnable from epoch time `run_at`"""
+        with self._transaction():
+            return self._conn.execute(
+                "UPDATE jobs SET status = 'queued', run_at = ?, owner = NULL, lease_until = NULL "
+                "WHERE job_id = ?", (run_at, job_id)
+            ).rowcount > 0
+
+    def update_job(self, job_id, status, attempts):
+        """Update the status and attempt count of a background job"""
+        with self._transaction():
+            return self._conn.execute(
+                'UPDATE jobs SET status = ?, attempts = ? WHERE job_id = ?',
+                (status, attempts, job_id)
+            ).rowcount > 0
+
+    def delete_job(self, job_id):
+        """Remove a finished background job"""
+        with self._transaction():
+            return self._conn.execute('DELETE FROM jobs WHERE job_id = ?', (job_id,)).rowcount > 0
+
+    def count_jobs(self, status):
+        """Number of jobs with a status"""
+        return self._conn.execute('SELECT COUNT(*) FROM jobs WHERE status = ?', (status,)).fetchone()[0]
+
+    def job_position(self, session_id):
+        """1-based place of a session's queued job in run order, 0 if running, None if absent"""
+        with self._snapshot():
+            row = self._conn.execute(
+                "SELECT status, run_at, created_at FROM jobs WHERE session_id = ? "
+                "AND status IN ('queued', 'running') ORDER BY status DESC LIMIT 1", (session_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            status, run_at, created_at = row
+            if status == 'running':
+                return 0
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued' "
+                "AND (run_at < ? OR (run_at = ? AND created_at <= ?))", (run_at, run_at, created_at)
+            ).fetchone()[0]
+
+    def get_unfinished_jobs(self):
+        """Get jobs that are still queued or were interrupted while running"""
+        with self._snapshot():
+            return [
+                {
+                    'job_id': job_id,
+                    'session_id': session_id,
+                    'payload': json.loads(payload),
+                    'status': status,
+                    'attempts': attempts,
+                    'created_at': created_at,
+                    'owner': owner
+                }
+                for job_id, session_id, payload, status, attempts, created_at, owner in self._conn.execute(
+                    "SELECT job_id, session_id, payload, status, attempts, created_at, owner FROM jobs "
+                    "WHERE status IN ('queued', 'running') ORDER BY created_at"
+                )
+            ]
+
+    def create_audio_chunk(self, chunk_data):
+        """Record a live audio chunk awaiting transcription"""
+        with self._transaction():
+            self._conn.execute(
+                'INSERT INTO audio_chunks (chunk_id, session_id, data) VALUES (?, ?, ?)',
+                (chunk_data['chunk_id'], chunk_data['session_id'], json.dumps(chunk_data))
+            )
+        return chunk_data['chunk_id']
+
+    def get_audio_chunk(self, chunk_id):
+        """Get a live audio chunk by ID"""
+        with self._snapshot():
+            row = self._conn.execute(
+                'SELECT data FROM audio_chunks WHERE chunk_id = ?', (chunk_id,)
+            ).fetchone()
+            return json.loads(row[0]) if row else None
+
+    def complete_audio_chunk(self, chunk_id, status, **results):
+        """Store the outcome (transcript/response or error) of a live audio chunk"""
+        with self._transaction():
+            row = self._conn.execute(
+                'SELECT data FROM audio_chunks WHERE chunk_id = ?', (chunk_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            chunk = json.loads(row[0])
+            chunk.update(results)
+            chunk['status'] = status
+            chunk['completed_at'] = datetime.now().isoformat()
+            self._conn.execute(
+                'UPDATE audio_chunks SET data = ? WHERE chunk_id = ?', (json.dumps(chunk), chunk_id)
+            )
+            return chunk
+
+    def delete_audio_chunks(self, before):
+        """Delete live audio chunk records created before an ISO timestamp, returning how many"""
+        with self._transaction():
+            return self._conn.execute(
+                "DELETE FROM audio_chunks WHERE json_extract(data, '$.created_at') < ?", (before,)
+            ).rowcount
+
+    def size(self):
+        """Bytes the database takes on disk, write-ahead log included"""
+        return sum(os.path.getsize(path) for path in (self.db_file, self.db_file + '-wal')
+                   if os.path.exists(path))
+
+    def compact(self, min_free_fraction=0.2):
+        """Give space freed by deletes back to the filesystem, returning the bytes reclaimed
+
+        The write-ahead log is checkpointed and truncated every time. The file
+        itself is only rebuilt (VACUUM, which holds up writers while it runs)
+        once `min_free_fraction` of its pages are free.
+        """
+        before = self.size()
+        page_count = self._conn.execute('PRAGMA page_count').fetchone()[0]
+        free_pages = self._conn.execute('PRAGMA freelist_count').fetchone()[0]
+        if page_count and free_pages / page_count >= min_free_fraction:
+            self._conn.execute('VACUUM')
+        self._conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        return max(0, before - self.size())
+
+class _Transaction:
+    """Run statements in one transaction, committing or rolling back on exit
+
+    The time from waiting for the lock to the commit is recorded in
+    `histogram`.
+    """
+
+    def __init__(self, conn, begin, histogram):
+        self.conn = conn
+        self.begin = begin
+        self.timer = histogram.time()
+
+    def __enter__(self):
+        self.timer.__enter__()
+        self.conn.execute(self.begin)
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        finally:
+            self.timer.__exit__(exc_type, exc, tb)
+        return False
@@ -0,0 +1,246 @@
+import argparse
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+class FakeOpenAIClient:
+    """Offline stand-in for openai.OpenAI used by benchmarks and local runs
+
+    Mirrors the `client.chat.completions.create(...)` surface the evaluator
+    uses and answers deterministically based on the prompt, sleeping for
+    `latency` seconds per call (plus `latency_per_1k_tokens` for long prompts)
+    to simulate the network round-trip, then `token_latency` per generated
+    token. stream=True yields the reply word by word as the tokens are
+    generated. Prompts over `context_window` tokens are rejected the way
+    the real API rejects them.
+    """
+
+    def __init__(self, latency=0.0, latency_per_1k_tokens=0.0, context_window=None, token_latency=0.0):
+        self.latency = latency
+        self.latency_per_1k_tokens = latency_per_1k_tokens
+        self.token_latency = token_latency
+        self.context_window = context_window
+        self.calls = 0
+        self.prompt_tokens = 0
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model=None, messages=None, stream=False, **kwargs):
+        prompt = '\n'.join(message['content'] for message in messages or [])
+        prompt_tokens = len(prompt) // 4
+        if self.context_window and prompt_tokens > self.context_window:
+            raise Exception(f"This model's maximum context length is {self.context_window} tokens, "
+                            f"however you requested {prompt_tokens} tokens")
+
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+
+        time.sleep(self.latency + self.latency_per_1k_tokens * prompt_tokens / 1000.0)
+
+        content = self._answer(prompt)
+        if stream:
+            return self._stream(content)
+        time.sleep(self.token_latency * (len(content) // 4))
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(role='assistant', content=content))],
+            usage=SimpleNamespace(prompt_tokens=prompt_tokens,
+                                  completion_tokens=len(content) // 4,
+                                  total_tokens=prompt_tokens + len(content) // 4)
+        )
+
+    def _stream(self, content):
+        """Chunks shaped like the API's chat.completion.chunk objects, one word each"""
+        for word in re.findall(r'\S+\s*', content):
+            time.sleep(self.token_latency * max(1, len(word) // 4))
+            yield SimpleNamespace(choices=[SimpleNamespace(
+                index=0, delta=SimpleNamespace(content=word), finish_reason=None)])
+        yield SimpleNamespace(choices=[SimpleNamespace(
+            index=0, delta=SimpleNamespace(content=None), finish_reason='stop')])
+
+    def _answer(self, prompt):
+        """Build a plausible reply for the kind of prompt received"""
+        if 'keys: topic, concepts' in prompt:
+            words = sorted(set(re.findall(r'[a-z]{7,}', prompt.lower())))[:8]
+            return json.dumps({
+                'topic': words[0] if words else 'presentation',
+                'concepts': words,
+                'algorithms': [word for word in words if word.endswith(('ion', 'ing'))],
+                'complexity': 'intermediate',
+                'suggested_questions': [f'Can you explain how {word} is used?' for word in words[:3]],
+                'focus_areas': words[3:5]
+            })
+
+        if 'keys: questions' in prompt:
+            per_slide = int((re.findall(r'up to (\d+) short questions', prompt) or ['2'])[0])
+            templates = ['On slide {number}, why did you use {word}, and what would change without it?',
+                         'On slide {number}, how would you check that your {word} works as intended?']
+            questions = []
+            for number, text in re.findall(r'Slide (\d+): ([^\n]+)', prompt):
+                words = list(dict.fromkeys(re.findall(r'[a-z]{7,}', text.lower())))
+                for template, word in list(zip(templates, words))[:per_slide]:
+                    questions.append({'slide': int(number), 'question': template.format(number=number, word=word),
+                                      'keypoints': words[:4]})
+            return json.dumps({'questions': questions})
+
+        if 'keys: answer_score' in prompt:
+            # Keypoints mentioned in the answer, or its length when there are none
+            answer = (re.findall(r"Student's answer: ([^\n]*)", prompt) or [''])[0].lower()
+            keypoints = [point.strip().lower() for point in
+                         (re.findall(r'A good answer covers: ([^\n]*)', prompt) or [''])[0].split(',') if point.strip()]
+            if keypoints:
+                score = 10 * sum(1 for point in keypoints if point.split()[0] in answer) // len(keypoints)
+            else:
+                score = min(10, len(answer.split()) // 3)
+            return json.dumps({'answer_score': score, 'reason': 'Graded against the expected keypoints.'})
+
+        if 'keys: scores' in prompt:
+            categories = re.findall(r'\d\. ([A-Z][A-Za-z &]+?) \((\d+) points\)', prompt)
+            return json.dumps({
+                'scores': {name: int(points) * 7 // 10 for name, points in categories},
+                'feedback': {name: 'Solid work; add more detail.' for name, _ in categories},
+                'total_score': sum(int(points) * 7 // 10 for _, points in categories)
+            })
+
+        if 'running summary' in prompt:
+            # Keep the latest sentences, like a summary that stays roughly the same size
+            sentences = re.findall(r'(?:Student|Evaluator): ([^\n]+)', prompt)
+            return ' '.join(sentences[-4:])
+
+        return ('That is a good point. Could you explain why you chose that approach over the '
+                'alternatives, and what trade-offs you weighed when you evaluated it on your data?')
+
+class _FakeOpenAIHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so clients can reuse pooled connections
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        if not self.path.endswith('/chat/completions'):
+            return self._reply(404, {'error': {'message': 'Not found', 'type': 'invalid_request_error'}})
+
+        if not self.server.admit():
+            return self._reply(429, {'error': {'message': 'Rate limit reached for requests',
+                                               'type': 'requests', 'code': 'rate_limit_exceeded'}},
+                               {'Retry-After': '1'})
+
+        try:
+            response = self.server.client._create(**body)
+        except Exception as e:
+            return self._reply(400, {'error': {'message': str(e), 'type': 'invalid_request_error'}})
+
+        if body.get('stream'):
+            return self._reply_stream(body, response)
+
+        self._reply(200, {
+            'id': f'chatcmpl-{uuid.uuid4().hex}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'gpt-4'),
+            'choices': [{'index': 0, 'finish_reason': 'stop',
+                         'message': {'role': 'assistant', 'content': response.choices[0].message.content}}],
+            'usage': vars(response.usage)
+        })
+
+    def _reply(self, status, payload, headers=None):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _reply_stream(self, body, chunks):
+        """Send the chunks as server-sent events over a chunked response, ending with [DONE]"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        completion_id = f'chatcmpl-{uuid.uuid4().hex}'
+        for chunk in chunks:
+            choice = chunk.choices[0]
+            self._write_chunk('data: ' + json.dumps({
+                'id': completion_id,
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': body.get('model', 'gpt-4'),
+                'choices': [{'index': 0, 'delta': {'content': choice.delta.content},
+                             'finish_reason': choice.finish_reason}]
+            }) + '\n\n')
+        self._write_chunk('data: [DONE]\n\n')
+        self.wfile.write(b'0\r\n\r\n')
+
+    def _write_chunk(self, text):
+        data = text.encode('utf-8')
+        self.wfile.write(f'{len(data):x}\r\n'.encode() + data + b'\r\n')
+        self.wfile.flush()
+
+    def log_message(self, *args):
+        pass
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    """Local OpenAI-compatible /v1/chat/completions endpoint backed by FakeOpenAIClient
+
+    Requests are metered by a bucket refilling `requests_per_second` and
+    holding a second's worth; once it is empty they get a 429 with
+    Retry-After, like the real API's rate limiter.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, client=None, requests_per_second=None):
+        super().__init__((host, port), _FakeOpenAIHandler)
+        self.client = client or FakeOpenAIClient()
+        self.requests_per_second = requests_per_second
+        self.requests = 0
+        self.rate_limited = 0
+        self._allowance = requests_per_second or 0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f'http://{self.server_address[0]}:{self.server_address[1]}/v1'
+
+    def admit(self):
+        """Count a request, returning False if it is over the rate limit"""
+        with self._lock:
+            self.requests += 1
+            if not self.requests_per_second:
+                return True
+            now = time.monotonic()
+            self._allowance = min(self.requests_per_second,
+                                  self._allowance + (now - self._updated) * self.requests_per_second)
+            self._updated = now
+            if self._allowance < 1:
+                self.rate_limited += 1
+                return False
+            self._allowance -= 1
+            return True
+
+    def start(self):
+        """Serve on a background thread"""
+        threading.Thread(target=self.serve_forever, name='fake-openai', daemon=True).start()
+        return self
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run a local mock of the OpenAI chat completions API')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--latency', type=float, default=0.5, help='seconds per call')
+    parser.add_argument('--latency-per-1k-tokens', type=float, default=0.0)
+    parser.add_argument('--token-latency', type=float, default=0.03, help='seconds per generated token')
+    parser.add_argument('--requests-per-second', type=int, default=None)
+    args = parser.parse_args()
+
+    client = FakeOpenAIClient(args.latency, args.latency_per_1k_tokens, token_latency=args.token_latency)
+    server = FakeOpenAIServer(args.host, args.port, client, args.requests_per_second)
+    print(f"Mock OpenAI API on {server.url} (set OPENAI_BASE_URL to this)")
+    server.serve_forever()
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+
+"""
+Grade a whole class offline
+
+Usage: python grade_batch.py <submissions_dir> [options]
+
+Every deck (.pdf, .pptx, .ppt) in the directory is one student. A
+transcript of the talk can sit next to it under the same name (alice.txt),
+or a recording (alice.wav); with neither, the deck alone is scored. An
+optional roster.csv with filename, roll_no and name columns names the
+students, otherwise the file name stands in for both.
+
+Results go into the same database as the web app. Every stage is
+checkpointed there, so running the command again after an interruption
+resumes where it stopped and skips students already graded.
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import re
+import sys
+import time
+import uuid
+import wave
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+from database import Database
+from incremental_scoring import SCORING_CRITERIA
+from llm_gateway import LLMGateway, create_openai_client
+from presentation_evaluator import PresentationEvaluator
+from result_cache import ResultCache, hash_file
+from slide_extractor import ExtractionEngine
+from slide_index import SlideIndex
+from speech_engine import UNRECOGNIZED, create_speech_engine
+
+DECK_EXTENSIONS = ('.pdf', '.pptx', '.ppt')
+AUDIO_CHUNK_SECONDS = 30  # recordings are transcribed in pieces this long
+
+def find_submissions(directory):
+    """One dict per deck in the directory, sorted by file name"""
+    roster = {}
+    roster_path = os.path.join(directory, 'roster.csv')
+    if os.path.exists(roster_path):
+        with open(roster_path, newline='') as f:
+            for row in csv.DictReader(f):
+                roster[row['filename']] = (row.get('roll_no'), row.get('name'))
+
+    submissions = []
+    for filename in sorted(os.listdir(directory)):
+        stem, extension = os.path.splitext(filename)
+        if extension.lower() not in DECK_EXTENSIONS:
+            continue
+        roll_no, name = roster.get(filename, (None, None))
+        base = os.path.join(directory, stem)
+        submissions.append({
+            'file_path': os.path.join(directory, filename),
+            'filename': filename,
+            'roll_no': roll_no or stem,
+            'name': name or stem,
+            'transcript_path': base + '.txt' if os.path.exists(base + '.txt') else None,
+            'audio_path': base + '.wav' if os.path.exists(base + '.wav') else None
+        })
+    return submissions
+
+def split_wav(path, seconds=AUDIO_CHUNK_SECONDS):
+    """Yield consecutive `seconds`-long pieces of a WAV recording as in-memory WAV files"""
+    with wave.open(path, 'rb') as source:
+        params = source.getparams()
+        frames_per_piece = int(source.getframerate() * seconds)
+        while True:
+            frames = source.readframes(frames_per_piece)
+            if not frames:
+                return
+            piece = io.BytesIO()
+            with wave.open(piece, 'wb') as out:
+                out.setparams(params)
+                out.writeframes(frames)
+            piece.seek(0)
+            yield piece
+
+class BatchGrader:
+    """Takes submissions through extraction, analysis, transcription and scoring
+
+    Each stage is stored before the next one starts: the session is
+    'ready' once analyzed, the evaluation then holds the transcript, and
+    'completed' means scored. grade() picks up after the last stage a
+    previous run finished.
+    """
+
+    def __init__(self, db, evaluator, extractor=None, force=False):
+        self.db = db
+        self.evaluator = evaluator
+        self.extractor = extractor
+        self.force = force
+
+    @staticmethod
+    def session_id(submission):
+        """Stable ID for a student's deck, so reruns find their earlier progress"""
+        file_hash = hash_file(submission['file_path'])
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, f"batch/{submission['roll_no']}/{file_hash}"))
+
+    def grade(self, submission):
+        """Grade one submission, returning (session_id, 'graded' or 'skipped')"""
+        session_id = self.session_id(submission)
+        session = self.db.get_session(session_id)
+        if session is not None and session['status'] == 'completed' and not self.force:
+            return session_id, 'skipped'
+
+        if session is None:
+            self.db.create_session({
+                'session_id': session_id,
+                'roll_no': submission['roll_no'],
+                'name': submission['name'],
+                'file_path': submission['file_path'],
+                'filename': submission['filename'],
+                'status': 'uploaded',
+                'created_at': datetime.now().isoformat()
+            })
+
+        if self.force or session is None or session['status'] not in ('ready', 'completed'):
+            self.db.update_session_status(session_id, 'processing')
+            try:
+                content, analysis = self.evaluator.process_file(submission['file_path'], self.extractor)
+            except Exception as e:
+                self.db.update_session_status(session_id, f'error: {str(e)}')
+                raise
+            self.db.update_session_analysis(session_id, content, analysis, SlideIndex.build(content).to_dict())
+            self.db.update_session_status(session_id, 'ready')
+
+        evaluation = self.db.get_evaluation(session_id)
+        if evaluation is None or self.force:
+            self.db.create_evaluation({
+                'session_id': session_id,
+                'status': 'started',
+                'start_time': datetime.now().isoformat(),
+                'transcript': self.transcribe(submission),
+                'scores': {},
+                'questions_asked': [],
+                'answers_given': []
+            })
+            evaluation = self.db.get_evaluation(session_id)
+
+        final_scores = self.evaluator.score_presentation(evaluation, self.db.get_session(session_id))
+        self.db.complete_evaluation(session_id, final_scores)
+        return session_id, 'graded'
+
+    def transcribe(self, submission):
+        """Transcript entries from the submission's transcript file or recording, [] if it has neither"""
+        if submission['transcript_path']:
+            with open(submission['transcript_path'], encoding='utf-8', errors='replace') as f:
+                parts = [part.strip() for part in re.split(r'\n\s*\n', f.read())]
+        elif submission['audio_path']:
+            parts = [self.evaluator.speech_to_text(piece) for piece in split_wav(submission['audio_path'])]
+            parts = [part for part in parts if part != UNRECOGNIZED]
+        else:
+            parts = []
+
+        timestamp = datetime.now().isoformat()
+        return [{'text': part, 'timestamp': timestamp} for part in parts if part]
+
+def grade_all(grader, submissions, workers, log=print):
+    """Grade submissions `workers` at a time, returning {outcome: count} and the graded session IDs"""
+    counts = Counter()
+    session_ids = []
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='grade')
+    futures = {pool.submit(grader.grade, submission): submission for submission in submissions}
+    try:
+        for done, future in enumerate(as_completed(futures), 1):
+            filename = futures[future]['filename']
+            try:
+                session_id, outcome = future.result()
+            except Exception as e:
+                counts['failed'] += 1
+                log(f"[{done}/{len(futures)}] {filename}: failed: {str(e)}")
+                continue
+            counts[outcome] += 1
+            session_ids.append(session_id)
+            log(f"[{done}/{len(futures)}] {filename}: {outcome}")
+    except KeyboardInterrupt:
+        log("Interrupted: finishing the submissions in progress; run again to resume")
+        pool.shutdown(wait=True, cancel_futures=True)
+        raise
+    pool.shutdown()
+    return counts, session_ids
+
+def write_csv(db, session_ids, path):
+    """One row per graded student: roll number, name, file, total and each criterion"""
+    criteria = [name for name, _, _ in SCORING_CRITERIA]
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['roll_no', 'name', 'filename', 'total_score'] + criteria)
+        for session_id in session_ids:
+            session = db.get_session_fields(session_id, 'filename')
+            evaluation = db.get_evaluation_fields(session_id, 'roll_no', 'name', 'total_score', 'final_scores')
+            scores = json.loads(evaluation['final_scores'] or '{}')
+            writer.writerow([evaluation['roll_no'], evaluation['name'], session['filename'],
+                             evaluation['total_score']] + [scores.get(name) for name in criteria])
+
+def create_grader(force=False):
+    """BatchGrader wired like the web app, from the same environment variables"""
+    if os.getenv('LLM_BACKEND') == 'fake':
+        from fake_llm import FakeOpenAIClient
+        client = FakeOpenAIClient()
+    else:
+        client = create_openai_client(
+            api_key=os.getenv('OPENAI_API_KEY'),
+            base_url=os.getenv('OPENAI_BASE_URL'),
+            timeout=float(os.getenv('LLM_TIMEOUT', 60))
+        )
+    llm = LLMGateway(
+        client,
+        max_concurrency=int(os.getenv('LLM_MAX_CONCURRENCY', 16)),
+        requests_per_minute=int(os.getenv('LLM_REQUESTS_PER_MINUTE', 500)),
+        tokens_per_minute=int(os.getenv('LLM_TOKENS_PER_MINUTE', 150000)),
+        max_retries=int(os.getenv('LLM_MAX_RETRIES', 3)),
+        timeout=float(os.getenv('LLM_TIMEOUT', 60))
+    )
+
+    db = Database(os.getenv('DATA_DIR', 'data'))
+    cache = ResultCache(
+        db.data_dir,
+        max_bytes=int(os.getenv('CACHE_MAX_BYTES', 256 * 1024 * 1024)),
+        ttl=int(os.getenv('CACHE_TTL', 30 * 24 * 3600))
+    )
+    speech = create_speech_engine(
+        os.getenv('STT_BACKEND', 'google'),
+        model=os.getenv('STT_MODEL', 'openai/whisper-base.en'),
+        batch_size=int(os.getenv('STT_BATCH_SIZE', 16)),
+        max_wait=float(os.getenv('STT_BATCH_WAIT', 0.05)),
+        workers=int(os.getenv('STT_WORKERS', 0)) or None
+    )
+    evaluator = PresentationEvaluator(
+        llm,
+        cache=cache,
+        speech=speech,
+        max_prompt_tokens=int(os.getenv('ANALYSIS_MAX_PROMPT_TOKENS', 6000)),
+        group_tokens=int(os.getenv('ANALYSIS_GROUP_TOKENS', 3000)),
+        analysis_concurrency=int(os.getenv('ANALYSIS_CONCURRENCY', 4))
+    )
+    extractor = ExtractionEngine(
+        max_workers=int(os.getenv('EXTRACTION_PROCESSES', os.cpu_count() or 1)),
+        time_budget=int(os.getenv('EXTRACTION_TIME_BUDGET', 120)),
+        memory_budget=int(os.getenv('EXTRACTION_MEMORY_BUDGET', 1024 ** 3))
+    )
+    return BatchGrader(db, evaluator, extractor, force=force)
+
+def main():
+    parser = argparse.ArgumentParser(description='Grade a directory of presentations offline')
+    parser.add_argument('directory', help='decks, with optional <name>.txt/<name>.wav and roster.csv')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('LLM_MAX_CONCURRENCY', 16)),
+                        help='submissions in progress at once (default: LLM_MAX_CONCURRENCY)')
+    parser.add_argument('--csv', help='also write the scores to this CSV file')
+    parser.add_argument('--force', action='store_true', help='grade again submissions already graded')
+    args = parser.parse_args()
+
+    submissions = find_submissions(args.directory)
+    if not submissions:
+        print(f"No presentations found in {args.directory}")
+        return 1
+
+    grader = create_grader(force=args.force)
+    print(f"Grading {len(submissions)} submissions, {args.workers} at a time, "
+          f"{grader.extractor.max_workers} extraction processes")
+
+    start = time.perf_counter()
+    try:
+        counts, session_ids = grade_all(grader, submissions, args.workers)
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        grader.extractor.shutdown()
+
+    print(f"\nDone in {time.perf_counter() - start:.1f}s: {counts['graded']} graded, "
+          f"{counts['skipped']} already graded, {counts['failed']} failed")
+    if args.csv:
+        write_csv(grader.db, session_ids, args.csv)
+        print(f"Scores written to {args.csv}")
+    return 1 if counts['failed'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,21 @@
+# Production server: gunicorn -c gunicorn.conf.py app:app
+#
+# Every worker process runs the whole app (job workers, live turns, audio
+# streaming) against the shared DATA_DIR; jobs, sessions and turn leases
+# live in SQLite, so any worker can serve any request of any session.
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+workers = int(os.getenv('WEB_WORKERS', os.cpu_count() or 1))
+# Requests mostly wait on the LLM and speech-to-text, and each open
+# /api/status-stream holds a thread, so workers are threaded
+worker_class = 'gthread'
+threads = int(os.getenv('WEB_THREADS', 32))
+# Each worker imports the app after the fork, starting its own background threads
+preload_app = False
+timeout = int(os.getenv('WEB_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+# The app divides the LLM rate limits by it and turns on the SQLite shared state
+os.environ['WEB_WORKERS'] = str(workers)
@@ -0,0 +1,379 @@
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_gateway import PRIORITY_SCORING, as_gateway, truncate_tokens
+from slide_content import describe_design
+from slide_index import SlideIndex
+
+# (category, maximum points, what it covers)
+SCORING_CRITERIA = [
+    ('Project Content', 20, 'Depth, relevance, correctness of the topic'),
+    ('Algorithm Used', 15, 'Choice and justification of ML algorithms'),
+    ('Student Skill Level', 15, 'Mastery of concepts, confidence, and critical thinking'),
+    ('Slide Design & Visuals', 10, 'Clarity, aesthetics, and information delivery'),
+    ('Communication & Delivery', 20, 'Oral presentation skill, engagement, flow'),
+    ('Handling of Questions', 10, 'Ability to answer, clarity, and adaptability'),
+    ('Research Process & Methodology', 10, 'Approach, application, reproducibility'),
+]
+
+# The criterion whose slides are shown with their layout and pictures described
+DESIGN_CRITERION = 'Slide Design & Visuals'
+
+# Deck analysis fields whose terms find each criterion's slides; the design
+# criterion goes by the slides' layout instead
+CRITERION_QUERIES = {
+    'Project Content': ('topic', 'concepts'),
+    'Algorithm Used': ('algorithms',),
+    'Student Skill Level': ('concepts', 'focus_areas'),
+    'Communication & Delivery': ('topic',),
+    'Handling of Questions': ('focus_areas', 'suggested_questions'),
+    'Research Process & Methodology': ('algorithms', 'concepts'),
+}
+
+def _analysis_terms(analysis, keys):
+    """The text of some deck analysis fields, which may be strings or lists"""
+    values = []
+    for key in keys:
+        value = analysis.get(key)
+        if isinstance(value, list):
+            values += [str(item) for item in value]
+        elif value:
+            values.append(str(value))
+    return ' '.join(values)
+
+def criteria_slides(session_data, per_criterion=3, visuals=None):
+    """Top slides per scoring criterion, and the text of every slide picked once
+
+    Slides are found with the deck analysis's topic, concepts and
+    algorithms (CRITERION_QUERIES): the rubric's own wording is not what
+    slides say. A criterion nothing matches gets the slides that match the
+    whole analysis best, or the first slides of the deck. The design
+    criterion gets the slides with the most pictures, tables and charts,
+    each with a line on its layout, and on its images when `visuals` (a
+    SlideVisuals) can inspect the upload.
+    """
+    content = session_data.get('content') or []
+    analysis = session_data.get('analysis') or {}
+    if session_data.get('slide_index'):
+        slide_index = SlideIndex.from_dict(session_data['slide_index'])
+    else:
+        slide_index = SlideIndex.build(content)
+
+    top = [number for number, _ in slide_index.search(
+        _analysis_terms(analysis, ('topic', 'concepts', 'algorithms')), per_criterion)]
+    top = top or [slide['slide_number'] for slide in content[:per_criterion] if 'slide_number' in slide]
+    numbers = {}
+    for name, _, _ in SCORING_CRITERIA:
+        if name == DESIGN_CRITERION:
+            continue
+        query = _analysis_terms(analysis, CRITERION_QUERIES.get(name, ()))
+        numbers[name] = sorted(number for number, _ in slide_index.search(query, per_criterion)) or sorted(top)
+
+    picked = set(number for slides in numbers.values() for number in slides)
+    slide_text = '\n'.join(f"Slide {slide['slide_number']}: {slide['content']}"
+                           for slide in content if slide.get('slide_number') in picked)
+
+    # Design is judged on the slides with the most pictures, tables and charts
+    def visual(slide):
+        layout = slide.get('layout') or {}
+        return layout.get('pictures', 0) + layout.get('charts', 0) + layout.get('tables', 0)
+    design = sorted((slide for slide in content if visual(slide)), key=visual, reverse=True)[:per_criterion]
+    design = sorted(design or [slide for slide in content if slide.get('slide_number') in top],
+                    key=lambda slide: slide.get('slide_number', 0))
+    numbers[DESIGN_CRITERION] = [slide['slide_number'] for slide in design]
+    if design:
+        images = {}
+        if visuals is not None and session_data.get('file_path'):
+            try:
+                images = visuals(session_data['file_path'], [slide['slide_number'] for slide in design])
+            except Exception:
+                # Upload already removed or unreadable: the layout alone still helps
+                images = {}
+        lines = [describe_design(slide, images.get(slide['slide_number'])) for slide in design]
+        lines = [line for line in lines if line]
+        if lines:
+            slide_text += '\nSlide design:\n' + '\n'.join(lines)
+    return numbers, slide_text
+
+def criteria_listing(slides=None):
+    """Numbered criteria with their maximum points, and their slides when given"""
+    return '\n'.join(
+        f"{number}. {name} ({points} points) - {description}"
+        + (f" [see slides {', '.join(map(str, slides[name]))}]" if slides and slides.get(name) else '')
+        for number, (name, points, description) in enumerate(SCORING_CRITERIA, 1)
+    )
+
+def clamp_scores(scores):
+    """A score for every criterion, within 0 and its maximum (0 when missing)"""
+    clamped = {}
+    for name, points, _ in SCORING_CRITERIA:
+        try:
+            clamped[name] = min(points, max(0, int(scores.get(name, 0))))
+        except (TypeError, ValueError):
+            clamped[name] = 0
+    return clamped
+
+class SessionScores:
+    """Running assessment of one presentation"""
+
+    def __init__(self, scores=None, feedback=None, turns_scored=0, segments=0):
+        self.scores = scores or {}  # criterion -> points, empty until a segment is scored
+        self.feedback = feedback or {}
+        self.turns_scored = turns_scored
+        self.segments = segments
+        self.turns_seen = turns_scored  # turns handed over, scored or not
+        self.pending = []  # (student said, evaluator replied), oldest first
+        self.in_flight = 0  # turns in the segment being scored
+        self.scoring = False
+        self.closed = False  # evaluation completed: later segments rewrite the stored results
+        self.finalized_segments = None  # segments in the result finalize() returned
+        self.one_shot = False  # finalize() had nothing scored: the caller stored its own result
+        self.lock = threading.Lock()
+        self.idle = threading.Condition(self.lock)
+
+    def running(self):
+        return {'scores': self.scores, 'feedback': self.feedback,
+                'turns_scored': self.turns_scored, 'segments': self.segments}
+
+class IncrementalScorer:
+    """Scores a presentation segment by segment while it is being given
+
+    Every `segment_turns` turns, a background LLM call updates the running
+    per-criterion scores and feedback from the new exchanges, so each call
+    reads a few turns and the assessment so far instead of the whole talk.
+    The running assessment is saved with the evaluation. finalize() is then
+    a merge: it waits at most `finalize_wait` seconds for a segment in
+    flight, and turns not scored by then are folded in after close(),
+    rewriting the stored results. When another worker process has served
+    the session since, reload() picks its running assessment back up.
+    """
+
+    def __init__(self, llm, db=None, segment_turns=3, finalize_wait=0.5, segment_tokens=3000,
+                 slide_tokens=1500, per_criterion=3, workers=4, max_sessions=1000, visuals=None, answers=None):
+        self.llm = as_gateway(llm)
+        self.db = db
+        self.visuals = visuals
+        # An AnswerGrader: "Handling of Questions" comes from the graded answers, not the segments
+        self.answers = answers
+        self.segment_turns = segment_turns
+        self.finalize_wait = finalize_wait
+        self.segment_tokens = segment_tokens
+        self.slide_tokens = slide_tokens
+        self.per_criterion = per_criterion
+        self.max_sessions = max_sessions
+
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='scoring')
+
+    def _state(self, session_id):
+        """The session's running assessment, loaded from the evaluation on first use"""
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if state is not None:
+                self._sessions.move_to_end(session_id)
+                return state
+
+        state = self._load(session_id)
+        with self._lock:
+            state = self._sessions.setdefault(session_id, state)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return state
+
+    def _load(self, session_id):
+        if self.db is None:
+            return SessionScores()
+        running = (self.db.get_evaluation_fields(session_id, 'running_scores') or {}).get('running_scores')
+        if not running:
+            return SessionScores()
+        return SessionScores(**(json.loads(running) if isinstance(running, str) else running))
+
+    def reload(self, session_id):
+        """Replace the cached assessment with the stored one, queueing the turns it has not scored
+
+        For a session whose turns were served by another worker process.
+        A segment that process still has in flight may be scored again here.
+        """
+        state = self._load(session_id)
+        if self.db is not None:
+            for entry in self.db.get_transcript_entries(session_id, state.turns_scored):
+                state.pending.append((entry['text'] if isinstance(entry, dict) else entry, None))
+            state.turns_seen += len(state.pending)
+        with self._lock:
+            self._sessions[session_id] = state
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def add_turn(self, session_id, transcript, reply):
+        """Queue a turn, starting a background segment once enough have gathered"""
+        state = self._state(session_id)
+        with state.lock:
+            if state.closed:
+                return
+            state.pending.append((transcript, reply))
+            state.turns_seen += 1
+            self._schedule(session_id, state)
+
+    def _schedule(self, session_id, state):
+        """Start the scoring worker if a segment is ready; call with state.lock held"""
+        ready = len(state.pending) >= (1 if state.closed else self.segment_turns)
+        if ready and not state.scoring:
+            state.scoring = True
+            self._pool.submit(self._score, session_id, state)
+
+    def finalize(self, session_id, evaluation):
+        """Merged scores, feedback and total for a finished presentation, or None if nothing was scored
+
+        Transcript entries the scorer never saw (say, from before a restart)
+        are queued as well; `pending_turns` counts the turns not in the result.
+        """
+        state = self._state(session_id)
+        transcript = evaluation.get('transcript') or []
+        with state.lock:
+            for entry in transcript[state.turns_seen:]:
+                state.pending.append((entry['text'] if isinstance(entry, dict) else entry, None))
+            state.turns_seen = max(state.turns_seen, len(transcript))
+
+            if state.scoring:
+                state.idle.wait_for(lambda: not state.scoring, self.finalize_wait)
+            if not state.scores:
+                state.one_shot = True
+                return None
+            state.finalized_segments = state.segments
+            return self._result(session_id, state)
+
+    def close(self, session_id):
+        """The evaluation is stored: score what is left and update it, then forget the session"""
+        state = self._state(session_id)
+        with state.lock:
+            state.closed = True
+            if state.one_shot:
+                # The one-shot result covers the whole talk; late segments must not overwrite it
+                state.pending = []
+                fields = None
+            elif state.pending or state.scoring:
+                self._schedule(session_id, state)
+                return
+            else:
+                # A segment may have landed between finalize() and now
+                fields = self._final_fields(session_id, state) if state.segments != state.finalized_segments else None
+        if fields and self.db is not None:
+            self.db.update_evaluation_fields(session_id, **fields)
+        self._forget(session_id, state)
+
+    def _result(self, session_id, state):
+        scores = clamp_scores(state.scores)
+        result = {
+            'scores': scores,
+            'feedback': dict(state.feedback),
+            'total_score': sum(scores.values()),
+            'pending_turns': len(state.pending) + state.in_flight
+        }
+        return self.answers.apply(session_id, result) if self.answers is not None else result
+
+    def _final_fields(self, session_id, state):
+        """Evaluation fields holding the results, as db.complete_evaluation stores them"""
+        result = self._result(session_id, state)
+        return {'running_scores': state.running(), 'final_scores': result['scores'],
+                'total_score': result['total_score'], 'feedback': result['feedback'],
+                'pending_turns': result['pending_turns']}
+
+    def _forget(self, session_id, state):
+        with self._lock:
+            if self._sessions.get(session_id) is state:
+                del self._sessions[session_id]
+
+    def _score(self, session_id, state):
+        """Fold pending turns into the running assessment, a segment at a time"""
+        while True:
+            with state.lock:
+                if len(state.pending) < (1 if state.closed else self.segment_turns):
+                    state.scoring = False
+                    state.idle.notify_all()
+                    closed = state.closed
+                    break
+                turns = state.pending
+                state.pending = []
+                state.in_flight = len(turns)
+                scores, feedback, first = dict(state.scores), dict(state.feedback), state.segments == 0
+
+            try:
+                result = self._score_segment(session_id, turns, scores, feedback, first)
+            except Exception:
+                # Keep the turns for the next attempt (the next turn or close())
+                with state.lock:
+                    state.pending = turns + state.pending
+                    state.in_flight = 0
+                    state.scoring = False
+                    state.idle.notify_all()
+                return
+
+            with state.lock:
+                state.scores = clamp_scores(result.get('scores') or {})
+                state.feedback.update({name: text for name, text in (result.get('feedback') or {}).items()
+                                       if name in state.scores})
+                state.turns_scored += len(turns)
+                state.segments += 1
+                state.in_flight = 0
+                if state.one_shot:
+                    fields = None
+                elif state.closed:
+                    fields = self._final_fields(session_id, state)
+                else:
+                    fields = {'running_scores': state.running()}
+            if fields and self.db is not None:
+                self.db.update_evaluation_fields(session_id, **fields)
+
+        if closed:
+            self._forget(session_id, state)
+
+    def _score_segment(self, session_id, turns, scores, feedback, first):
+        """One LLM call updating the assessment with a segment of turns"""
+        slides = {}
+        slide_text = ''
+        if first and self.db is not None:
+            # The deck itself is only read once; its marks carry over in the running scores
+            session = self.db.get_session(session_id) or {}
+            slides, slide_text = criteria_slides(session, self.per_criterion, self.visuals)
+            slide_text = truncate_tokens(slide_text, self.slide_tokens)
+
+        conversation = '\n'.join(f"Student: {said}" + (f"\nEvaluator: {reply}" if reply else '')
+                                 for said, reply in turns)
+        conversation = truncate_tokens(conversation, self.segment_tokens, keep='end')
+        so_far = json.dumps({'scores': scores, 'feedback': feedback}) if scores else \
+            '(none yet, this is the start of the presentation)'
+
+        response = self.llm.complete(
+            purpose='scoring',
+            priority=PRIORITY_SCORING,
+            messages=[
+                {"role": "system", "content": "You are an expert evaluator providing detailed, fair, and constructive feedback."},
+                {"role": "user", "content": f"""
+                You are scoring a student's presentation while it is being given.
+
+                Criteria (out of the maximum points indicated):
+                {criteria_listing(slides)}
+                {f'''
+                Relevant Slides:
+                {slide_text}
+                ''' if slide_text else ''}
+                Assessment so far:
+                {so_far}
+
+                New part of the presentation:
+                {conversation}
+
+                Update the assessment with the new part. Scores cover the whole presentation so far;
+                leave a score unchanged when the new part says nothing about its category.
+                Give one or two sentences of feedback per category.
+
+                Format as JSON with keys: scores (object with category names as keys), feedback (object with category names as keys)
+                """}
+            ],
+            temperature=0.3
+        )
+        return json.loads(response.choices[0].message.content)
@@ -0,0 +1,185 @@
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from metrics import metrics
+from shared_state import worker_id
+
+class QueueFullError(Exception):
+    """Raised when the job queue has no room for another job"""
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class JobQueue:
+    """Bounded, persistent queue of background jobs run by fixed worker pools
+
+    Handlers run on the worker threads and are expected to hand CPU-bound
+    work (slide extraction) to a process pool. Jobs live in the database
+    and workers claim them from there, so every app worker process sharing
+    the database drains one queue: a submit wakes a local worker at once
+    and the others pick up jobs submitted elsewhere within
+    `poll_interval`. A running job holds a lease renewed every `lease` / 3
+    seconds; if its process stops, the job runs again once the lease runs
+    out, or straight away from recover() on the same host.
+    """
+
+    def __init__(self, db, handler, on_failure=None, workers=4, max_queued=200,
+                 max_attempts=3, retry_delay=2.0, lease=30, poll_interval=1.0):
+        self.db = db
+        self.handler = handler
+        self.on_failure = on_failure
+        self.workers = workers
+        self.max_queued = max_queued
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.lease = lease
+        self.poll_interval = poll_interval
+
+        self.owner = worker_id()
+        self._running = set()  # job IDs claimed by this process
+        self._condition = threading.Condition()
+        self._threads = []
+        self._stopping = False
+        self._stopped = threading.Event()  # wakes the heartbeat, which must not take submit notifications
+
+    def start(self):
+        """Start the worker threads and the lease heartbeat"""
+        # Started after any fork, so the owner is this process
+        self.owner = worker_id()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f'job-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._heartbeat, name='job-heartbeat', daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def shutdown(self, wait=True):
+        """Stop the workers; queued jobs stay persisted for the next start"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        self._stopped.set()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def is_full(self):
+        """Whether a new job would be rejected"""
+        return self.depth() >= self.max_queued
+
+    def submit(self, session_id, **payload):
+        """Queue a job for a session, raising QueueFullError when at capacity"""
+        job = {
+            'job_id': str(uuid.uuid4()),
+            'session_id': session_id,
+            'payload': payload,
+            'status': 'queued',
+            'attempts': 0,
+            'created_at': datetime.now().isoformat()
+        }
+
+        if self.is_full():
+            raise QueueFullError(f"Job queue is full ({self.max_queued} jobs waiting)")
+        self.db.create_job(job)
+        with self._condition:
+            self._condition.notify()
+
+        return job['job_id']
+
+    def recover(self):
+        """Re-queue jobs left running by a stopped process on this host
+
+        Queued jobs need nothing: they are in the database. Jobs of a
+        process on another host are taken over when their lease runs out.
+        """
+        host = socket.gethostname()
+        recovered = 0
+        for job in self.db.get_unfinished_jobs():
+            if job['status'] != 'running' or not job['owner']:
+                continue
+            owner_host, _, pid = job['owner'].rpartition(':')
+            if owner_host == host and job['owner'] != self.owner and not _pid_alive(int(pid)):
+                recovered += self.db.retry_job(job['job_id'], time.time())
+        with self._condition:
+            self._condition.notify_all()
+        return recovered
+
+    def position(self, session_id):
+        """1-based position of a session's job in the queue, 0 if running, None if absent"""
+        return self.db.job_position(session_id)
+
+    def depth(self):
+        """Number of jobs waiting to run"""
+        return self.db.count_jobs('queued')
+
+    def _wait(self):
+        """Sleep until a local submit or the next poll, returning False once shutting down"""
+        with self._condition:
+            if not self._stopping:
+                self._condition.wait(self.poll_interval)
+            return not self._stopping
+
+    def _worker(self):
+        while True:
+            with self._condition:
+                if self._stopping:
+                    return
+            try:
+                job = self.db.claim_job(self.owner, self.lease)
+            except Exception:
+                # Database busy past its timeout: try again on the next poll
+                job = None
+            if job is None:
+                if not self._wait():
+                    return
+                continue
+
+            with self._condition:
+                self._running.add(job['job_id'])
+            try:
+                try:
+                    self.handler(job['session_id'], **job['payload'])
+                except Exception as e:
+                    self._failed(job, e)
+                else:
+                    self.db.delete_job(job['job_id'])
+            except Exception as e:
+                # Recording the outcome failed (database busy past its timeout). The
+                # lease is no longer renewed, so the job runs again once it lapses.
+                metrics.inc('errors_total', stage='jobs', type=type(e).__name__)
+            finally:
+                with self._condition:
+                    self._running.discard(job['job_id'])
+
+    def _heartbeat(self):
+        """Renew the leases of the jobs this process is running"""
+        while not self._stopped.wait(self.lease / 3):
+            with self._condition:
+                job_ids = list(self._running)
+            try:
+                self.db.renew_jobs(job_ids, self.owner, self.lease)
+            except Exception:
+                continue
+
+    def _failed(self, job, error):
+        """Retry a failed job with jittered exponential backoff, or give up"""
+        if job['attempts'] < self.max_attempts:
+            delay = self.retry_delay * (2 ** (job['attempts'] - 1)) * random.uniform(0.5, 1.5)
+            self.db.retry_job(job['job_id'], time.time() + delay)
+            return
+
+        self.db.update_job(job['job_id'], 'failed', job['attempts'])
+        if self.on_failure is not None:
+            self.on_failure(job['session_id'], error)
@@ -0,0 +1,182 @@
+import io
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+def answer_turn(db, evaluator, session_id, audio):
+    """Transcribe one utterance and stream the evaluator's reply to it
+
+    Yields ('transcript', text), then ('delta', text) for each piece of the
+    reply as the LLM generates it, then ('done', {'reply', 'timings'}).
+    Timings are in milliseconds: transcription, reply requested to first
+    token, reply requested to last token, and the whole turn. The turn
+    holds the session's lease (see PresentationEvaluator.turn), so turns of
+    one session served by different worker processes run one at a time.
+    """
+    start = time.perf_counter()
+    with evaluator.turn(session_id):
+        transcript = evaluator.speech_to_text(audio)
+        yield 'transcript', transcript
+        db.add_transcript_entry(session_id, transcript)
+
+        requested = time.perf_counter()
+        first_token = None
+        pieces = []
+        for piece in evaluator.stream_response(transcript, session_id):
+            if first_token is None:
+                first_token = time.perf_counter()
+            pieces.append(piece)
+            yield 'delta', piece
+    end = time.perf_counter()
+
+    yield 'done', {'reply': ''.join(pieces), 'timings': {
+        'transcribe_ms': round((requested - start) * 1000, 1),
+        'first_token_ms': round(((first_token or end) - requested) * 1000, 1),
+        'reply_ms': round((end - requested) * 1000, 1),
+        'total_ms': round((end - start) * 1000, 1)
+    }}
+
+class TurnEvents:
+    """Events of one turn in progress, replayed in full to each follower"""
+
+    def __init__(self):
+        self.events = []
+        self.finished = False
+        self.condition = threading.Condition()
+
+    def push(self, event, data):
+        with self.condition:
+            self.events.append((event, data))
+            self.condition.notify_all()
+
+    def finish(self):
+        with self.condition:
+            self.finished = True
+            self.condition.notify_all()
+
+    def follow(self, timeout):
+        """Yield (event, data) pairs from the first, or None after `timeout` seconds without one"""
+        index = 0
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: index < len(self.events) or self.finished, timeout)
+                new = self.events[index:]
+                finished = self.finished
+            index += len(new)
+            for item in new:
+                yield item
+            if finished and index >= len(self.events):
+                return
+            if not new:
+                yield None
+
+class LiveTurnProcessor:
+    """Runs speech-to-text and response generation for live audio chunks off the request thread
+
+    Uploads hand their audio over with submit() and return straight away;
+    the chunk's transcript and evaluator reply are written to the database
+    when ready and can be awaited with wait(), or followed as they are
+    produced, reply text included, with events(). Chunks of one session are
+    processed strictly in order, while different sessions share the
+    worker pool. wait() also sees chunks finished by another worker
+    process, by reading the database every `poll_interval` seconds.
+    """
+
+    def __init__(self, db, evaluator, workers=16, poll_interval=0.5):
+        self.db = db
+        self.evaluator = evaluator
+        self.poll_interval = poll_interval
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='live-turn')
+        self._condition = threading.Condition()
+        self._pending = {}  # session_id -> deque of (chunk_id, audio_bytes) waiting their turn
+        self._active = set()
+        self._events = {}  # chunk_id -> TurnEvents, until the chunk is finished
+
+    def submit(self, session_id, audio_bytes):
+        """Queue an audio chunk, returning its chunk ID"""
+        chunk_id = str(uuid.uuid4())
+        with self._condition:
+            self._events[chunk_id] = TurnEvents()
+        self.db.create_audio_chunk({
+            'chunk_id': chunk_id,
+            'session_id': session_id,
+            'status': 'pending',
+            'created_at': datetime.now().isoformat()
+        })
+
+        with self._condition:
+            if session_id in self._active:
+                self._pending.setdefault(session_id, deque()).append((chunk_id, audio_bytes))
+                return chunk_id
+            self._active.add(session_id)
+
+        self._executor.submit(self._run, session_id, chunk_id, audio_bytes)
+        return chunk_id
+
+    def wait(self, chunk_id, timeout=0):
+        """Return the chunk record, waiting up to timeout seconds for it to finish"""
+        chunk = self.db.get_audio_chunk(chunk_id)
+        if chunk is None or chunk['status'] != 'pending' or not timeout:
+            return chunk
+
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while chunk['status'] == 'pending':
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                # Woken when a local chunk finishes; chunks run elsewhere are polled
+                self._condition.wait(min(remaining, self.poll_interval))
+                chunk = self.db.get_audio_chunk(chunk_id)
+        return chunk
+
+    def events(self, chunk_id):
+        """TurnEvents of a chunk still queued or in progress, None once it is finished"""
+        with self._condition:
+            return self._events.get(chunk_id)
+
+    def backlog(self):
+        """Chunks queued or in progress"""
+        with self._condition:
+            return len(self._events)
+
+    def shutdown(self, wait=True):
+        """Stop the worker pool"""
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, session_id, chunk_id, audio_bytes):
+        """Process a chunk, then hand the session's next chunk to the pool"""
+        while True:
+            self._process(session_id, chunk_id, audio_bytes)
+
+            with self._condition:
+                self._condition.notify_all()
+                queue = self._pending.get(session_id)
+                if not queue:
+                    self._pending.pop(session_id, None)
+                    self._active.discard(session_id)
+                    return
+                chunk_id, audio_bytes = queue.popleft()
+
+    def _process(self, session_id, chunk_id, audio_bytes):
+        with self._condition:
+            events = self._events[chunk_id]
+        try:
+            # Process audio straight from memory - convert speech to text, then stream the reply
+            for event, data in answer_turn(self.db, self.evaluator, session_id, io.BytesIO(audio_bytes)):
+                if event == 'transcript':
+                    transcript = data
+                elif event == 'done':
+                    self.db.complete_audio_chunk(chunk_id, 'done', transcript=transcript,
+                                                 response=data['reply'], timings=data['timings'])
+                events.push(event, data)
+        except Exception as e:
+            self.db.complete_audio_chunk(chunk_id, 'error', error=str(e))
+            events.push('error', str(e))
+        finally:
+            with self._condition:
+                self._events.pop(chunk_id, None)
+            events.finish()
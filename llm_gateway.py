@@ -0,0 +1,338 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+from collections import defaultdict, deque
+
+import openai
+
+from metrics import metrics
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding('cl100k_base')
+except ImportError:  # fall back to ~4 characters per token
+    _encoding = None
+
+# Lower runs first
+PRIORITY_LIVE = 0
+PRIORITY_SCORING = 1
+PRIORITY_BACKGROUND = 2
+
+def count_tokens(text):
+    """Number of tokens in text (exact with tiktoken installed, estimated otherwise)"""
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+def truncate_tokens(text, tokens, keep='start'):
+    """Cut text down to at most `tokens` tokens, keeping its start or its end"""
+    if tokens <= 0:
+        return ''
+    if count_tokens(text) <= tokens:
+        return text
+    if _encoding is not None:
+        encoded = _encoding.encode(text)
+        return _encoding.decode(encoded[:tokens] if keep == 'start' else encoded[-tokens:])
+    return text[:tokens * 4] if keep == 'start' else text[-tokens * 4:]
+
+def create_openai_client(api_key=None, base_url=None, timeout=60):
+    """openai.OpenAI for the gateway: retries are left to it and one instance is shared
+
+    The client keeps a keep-alive connection pool (100 connections) that
+    every thread reuses, so calls skip the TCP/TLS handshake.
+    """
+    return openai.OpenAI(api_key=api_key, base_url=base_url, max_retries=0, timeout=timeout)
+
+def _delta_text(chunk):
+    """Text carried by one streamed chat.completion.chunk, if any"""
+    choices = getattr(chunk, 'choices', None)
+    return choices[0].delta.content if choices else None
+
+class LLMError(Exception):
+    """Raised when an LLM call fails for good"""
+
+class LLMTimeoutError(LLMError):
+    """Raised when an LLM call cannot finish before its deadline"""
+
+class TokenBucket:
+    """Refills `per_minute` units a minute, holding at most `burst_seconds` worth"""
+
+    def __init__(self, per_minute, burst_seconds=10):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now, reserve=0):
+        """Seconds until `amount` can be taken leaving `reserve` (a fraction of capacity) behind
+
+        Requests bigger than the bucket wait for a full one.
+        """
+        self._refill(now)
+        needed = min(self.capacity, min(amount, self.capacity) + reserve * self.capacity)
+        return 0 if self.level >= needed else (needed - self.level) / self.rate
+
+    def take(self, amount, now):
+        self._refill(now)
+        self.level -= min(amount, self.capacity)
+
+class LLMGateway:
+    """Single way out to the chat completions API for the whole app
+
+    Calls queue by priority (live replies ahead of scoring ahead of
+    background analysis) for one of `max_concurrency` slots and for room
+    in the request and token rate buckets, a `live_reserve` share of which
+    only live replies may use so they never wait behind a backlog for the
+    next refill. Connection errors, 5xx and 429
+    answers are retried with jittered backoff, a 429 pausing every caller
+    for its Retry-After. Each call has a deadline covering queueing and
+    retries. Latency, queue time and token counts are kept per purpose
+    (see stats).
+    """
+
+    def __init__(self, client, max_concurrency=16, requests_per_minute=500, tokens_per_minute=150000,
+                 max_retries=3, backoff=0.5, timeout=60, burst_seconds=10, live_reserve=0.2):
+        self.client = client
+        self.live_reserve = live_reserve
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self._requests = TokenBucket(requests_per_minute, burst_seconds) if requests_per_minute else None
+        self._tokens = TokenBucket(tokens_per_minute, burst_seconds) if tokens_per_minute else None
+
+        self._condition = threading.Condition()
+        self._waiting = []  # heap of (priority, sequence)
+        self._sequence = itertools.count()
+        self._active = 0
+        self._paused_until = 0
+
+        self._metrics_lock = threading.Lock()
+        self._metrics = defaultdict(lambda: {
+            'calls': 0, 'errors': 0, 'retries': 0, 'rate_limited': 0,
+            'prompt_tokens': 0, 'completion_tokens': 0,
+            'latency': deque(maxlen=1000), 'queued': deque(maxlen=1000), 'first_token': deque(maxlen=1000)
+        })
+
+    def complete(self, messages, purpose='other', priority=PRIORITY_BACKGROUND, timeout=None,
+                 model='gpt-4', **params):
+        """Chat completion through the scheduler; raises LLMError once retries are used up"""
+        start = time.monotonic()
+        deadline = start + (timeout or self.timeout)
+
+        def request():
+            return self.client.chat.completions.create(
+                model=model, messages=messages, timeout=max(0.1, deadline - time.monotonic()), **params)
+
+        response, queued = self._send(request, purpose, priority, self._estimate(messages, params), deadline)
+        self._release()
+
+        usage = getattr(response, 'usage', None)
+        self._record(purpose, start, queued, getattr(usage, 'prompt_tokens', 0), getattr(usage, 'completion_tokens', 0))
+        return response
+
+    def stream(self, messages, purpose='other', priority=PRIORITY_BACKGROUND, timeout=None,
+               model='gpt-4', **params):
+        """Streamed chat completion, yielding the reply's text as the model generates it
+
+        Failures before the first token are retried like complete(); once
+        text has been yielded a failure ends the stream with LLMError. The
+        slot is held until the stream is exhausted or closed.
+        """
+        start = time.monotonic()
+        deadline = start + (timeout or self.timeout)
+
+        def request():
+            chunks = iter(self.client.chat.completions.create(
+                model=model, messages=messages, stream=True,
+                timeout=max(0.1, deadline - time.monotonic()), **params))
+            # Wait for the first text here, so errors up to that point are retried
+            for chunk in chunks:
+                text = _delta_text(chunk)
+                if text:
+                    return chunks, text
+            return chunks, ''
+
+        (chunks, text), queued = self._send(request, purpose, priority, self._estimate(messages, params), deadline)
+        first_token = time.monotonic() - start
+        pieces = [text]
+        try:
+            if text:
+                yield text
+            for chunk in chunks:
+                text = _delta_text(chunk)
+                if text:
+                    pieces.append(text)
+                    yield text
+        except Exception as e:
+            self._count(purpose, 'errors')
+            raise LLMError(f"LLM stream broke off: {str(e)}") from e
+        finally:
+            self._release()
+            if hasattr(chunks, 'close'):
+                chunks.close()
+
+        self._record(purpose, start, queued, sum(count_tokens(message['content']) for message in messages),
+                     count_tokens(''.join(pieces)), first_token)
+
+    @staticmethod
+    def _estimate(messages, params):
+        """Tokens a call may use, counted against the token bucket"""
+        return sum(count_tokens(message['content']) for message in messages) + params.get('max_tokens', 500)
+
+    def _send(self, request, purpose, priority, tokens, deadline):
+        """Run request() in a slot, retrying transient failures; returns (result, seconds queued)
+
+        The slot is still held on success and must be given back with _release().
+        """
+        attempts = 0
+        queued = 0
+        while True:
+            waited_from = time.monotonic()
+            self._acquire(priority, tokens, deadline)
+            queued += time.monotonic() - waited_from
+            try:
+                return request(), queued
+            except Exception as e:
+                self._release()
+                error = e
+
+            attempts += 1
+            retry_after = self._retry_after(error)
+            if retry_after is None or attempts > self.max_retries:
+                self._count(purpose, 'errors')
+                raise LLMError(f"LLM call failed after {attempts} attempt(s): {str(error)}") from error
+
+            self._count(purpose, 'retries')
+            if self._is_rate_limit(error):
+                self._count(purpose, 'rate_limited')
+                with self._condition:
+                    self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+                    self._condition.notify_all()
+
+            delay = max(retry_after, self.backoff * (2 ** (attempts - 1)) * random.uniform(0.5, 1.5))
+            if time.monotonic() + delay >= deadline:
+                self._count(purpose, 'errors')
+                raise LLMTimeoutError(f"LLM call would miss its deadline retrying: {str(error)}") from error
+            time.sleep(delay)
+
+    def _acquire(self, priority, tokens, deadline):
+        """Wait until this call is first in line and a slot and rate budget are free"""
+        ticket = (priority, next(self._sequence))
+        with self._condition:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = self._ready_in(priority, tokens, now) if self._waiting[0] == ticket else None
+                    if wait == 0:
+                        heapq.heappop(self._waiting)
+                        self._active += 1
+                        if self._requests is not None:
+                            self._requests.take(1, now)
+                        if self._tokens is not None:
+                            self._tokens.take(tokens, now)
+                        # The next in line may be able to go too
+                        self._condition.notify_all()
+                        return
+                    if now >= deadline:
+                        raise LLMTimeoutError("LLM call timed out waiting for capacity")
+                    self._condition.wait(min(wait if wait is not None else deadline - now, deadline - now))
+            except BaseException:
+                if ticket in self._waiting:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                    self._condition.notify_all()
+                raise
+
+    def _ready_in(self, priority, tokens, now):
+        """Seconds until the head of the line may start, None if it waits for a slot"""
+        if self._active >= self.max_concurrency:
+            return None
+        reserve = 0 if priority <= PRIORITY_LIVE else self.live_reserve
+        wait = max(0, self._paused_until - now)
+        if self._requests is not None:
+            wait = max(wait, self._requests.wait_time(1, now, reserve))
+        if self._tokens is not None:
+            wait = max(wait, self._tokens.wait_time(tokens, now, reserve))
+        return wait
+
+    def _release(self):
+        with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+    @staticmethod
+    def _is_rate_limit(error):
+        return isinstance(error, openai.RateLimitError) or getattr(error, 'status_code', None) == 429
+
+    def _retry_after(self, error):
+        """Seconds to wait before retrying, or None if the error is not worth retrying"""
+        if self._is_rate_limit(error):
+            response = getattr(error, 'response', None)
+            header = response.headers.get('retry-after') if response is not None else None
+            try:
+                return float(header)
+            except (TypeError, ValueError):
+                return self.backoff
+        status = getattr(error, 'status_code', None)
+        if isinstance(error, openai.APIConnectionError) or (status is not None and status >= 500):
+            return 0
+        return None
+
+    def _count(self, purpose, key):
+        with self._metrics_lock:
+            self._metrics[purpose][key] += 1
+
+    def _record(self, purpose, start, queued, prompt_tokens, completion_tokens, first_token=None):
+        latency = time.monotonic() - start
+        metrics.observe('llm_call_seconds', latency, purpose=purpose)
+        metrics.observe('llm_queue_seconds', queued, purpose=purpose)
+        with self._metrics_lock:
+            record = self._metrics[purpose]
+            record['calls'] += 1
+            record['prompt_tokens'] += prompt_tokens or 0
+            record['completion_tokens'] += completion_tokens or 0
+            record['latency'].append(latency)
+            record['queued'].append(queued)
+            if first_token is not None:
+                record['first_token'].append(first_token)
+
+    def load(self):
+        """Calls in flight and calls waiting for a slot or the rate limits"""
+        with self._condition:
+            return {'active': self._active, 'waiting': len(self._waiting)}
+
+    def stats(self):
+        """Per-purpose call counts, token totals and latency/queue-time percentiles in seconds
+
+        Streamed calls also report time to the first token.
+        """
+        def percentile(samples, pct):
+            ordered = sorted(samples)
+            return ordered[min(len(ordered) - 1, int(pct / 100.0 * len(ordered)))] if ordered else 0
+
+        samples = ('latency', 'queued', 'first_token')
+        with self._metrics_lock:
+            stats = {}
+            for purpose, record in self._metrics.items():
+                stats[purpose] = dict(
+                    {key: value for key, value in record.items() if key not in samples},
+                    latency_p50=percentile(record['latency'], 50),
+                    latency_p95=percentile(record['latency'], 95),
+                    queued_p95=percentile(record['queued'], 95)
+                )
+                if record['first_token']:
+                    stats[purpose]['first_token_p50'] = percentile(record['first_token'], 50)
+                    stats[purpose]['first_token_p95'] = percentile(record['first_token'], 95)
+            return stats
+
+def as_gateway(client, **options):
+    """Wrap a raw OpenAI-style client in an LLMGateway unless it already is one"""
+    return client if isinstance(client, LLMGateway) else LLMGateway(client, **options)
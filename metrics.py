@@ -0,0 +1,213 @@
+import bisect
+import contextvars
+import threading
+import time
+from collections import defaultdict
+
+# Upper bounds in seconds, from a fast database read to a slow deck analysis
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1, 2.5, 5, 10, 30, 60, 120)
+
+# Spans of the request being traced on this thread, None when not tracing
+_spans = contextvars.ContextVar('metric_spans', default=None)
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+def _format_labels(pairs):
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Histogram:
+    """One labelled series of a latency histogram, from Metrics.histogram()
+
+    Hot paths look it up once and keep it, which saves matching the
+    labels on every observation.
+    """
+
+    __slots__ = ('metrics', 'span', 'counts', 'sum', 'count')
+
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        base = name[:-len('_seconds')] if name.endswith('_seconds') else name
+        self.span = '_'.join([base] + [str(value) for value in labels.values()])
+        self.counts = [0] * (len(metrics.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        metrics = self.metrics
+        if not metrics.enabled:
+            return
+        index = bisect.bisect_left(metrics.buckets, seconds)
+        with metrics._lock:
+            self.counts[index] += 1
+            self.sum += seconds
+            self.count += 1
+        spans = _spans.get()
+        if spans is not None:
+            spans.append((self.span, seconds))
+
+    def time(self):
+        """Context manager recording the duration of its block"""
+        if not self.metrics.enabled:
+            return _NULL_TIMER
+        return _Timer(self)
+
+class _Timer:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+class Metrics:
+    """Latency histograms, counters and gauges, exposed in the Prometheus text format
+
+    Components record with observe()/inc() or time a block with timer();
+    figures other components already keep (cache hits, LLM tokens, queue
+    depths) are read at scrape time through collect() callbacks, so they
+    cost nothing between scrapes. While `enabled` is False recording is a
+    single attribute check and timer() returns a shared no-op.
+
+    Timings recorded on a thread that is tracing a request (see
+    start_trace) are also kept as spans of that request. `labels` are
+    added to every series rendered, e.g. the worker process serving them.
+    """
+
+    def __init__(self, enabled=True, buckets=DEFAULT_BUCKETS, labels=None):
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self.labels = dict(labels or {})
+        self._lock = threading.Lock()
+        self._histograms = {}  # (name, labels) -> Histogram
+        self._counters = defaultdict(float)  # (name, labels) -> value
+        self._collectors = []  # (name, kind, help, callback)
+        self._help = {}
+
+    def describe(self, name, help_text):
+        """Set the HELP line of a recorded metric"""
+        self._help[name] = help_text
+
+    def inc(self, name, amount=1, **labels):
+        """Add to a counter"""
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] += amount
+
+    def histogram(self, name, **labels):
+        """The Histogram for a name and labels, created on first use"""
+        key = (name, _label_key(labels))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram(self, name, labels))
+        return histogram
+
+    def observe(self, name, seconds, **labels):
+        """Record a duration in a histogram"""
+        if self.enabled:
+            self.histogram(name, **labels).observe(seconds)
+
+    def timer(self, name, **labels):
+        """Context manager recording the duration of its block"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self.histogram(name, **labels))
+
+    def collect(self, name, callback, kind='gauge', help_text=''):
+        """Read a metric at scrape time
+
+        `callback` returns a number, or a list of (labels dict, number)
+        pairs; `kind` is 'gauge' or 'counter'. A callback that raises is
+        skipped for that scrape.
+        """
+        self._collectors.append((name, kind, help_text, callback))
+
+    def start_trace(self):
+        """Keep the spans recorded on this thread from now on, returning a token for end_trace()"""
+        return _spans.set([])
+
+    def end_trace(self, token):
+        """Stop tracing, returning [(span, total seconds, count)] in order of first appearance"""
+        spans = _spans.get() or []
+        _spans.reset(token)
+        totals = {}
+        for span, seconds in spans:
+            total, count = totals.get(span, (0.0, 0))
+            totals[span] = (total + seconds, count + 1)
+        return [(span, total, count) for span, (total, count) in totals.items()]
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, (list(h.counts), h.sum, h.count))
+                                for key, h in self._histograms.items() if h.count)
+
+        constant = _label_key(self.labels)
+        lines = []
+        written = set()
+
+        def header(name, kind, help_text=''):
+            if name in written:
+                return
+            written.add(name)
+            lines.append(f'# HELP {name} {help_text or self._help.get(name, name)}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        for (name, labels), value in counters:
+            header(name, 'counter')
+            lines.append(f'{name}{_format_labels(constant + labels)} {_format_value(value)}')
+
+        for (name, labels), (counts, total, count) in histograms:
+            header(name, 'histogram')
+            labels = constant + labels
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket
+                le = labels + (('le', bound if bound == '+Inf' else _format_value(float(bound))),)
+                lines.append(f'{name}_bucket{_format_labels(le)} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(total)}')
+            lines.append(f'{name}_count{_format_labels(labels)} {count}')
+
+        for name, kind, help_text, callback in self._collectors:
+            try:
+                value = callback()
+            except Exception:
+                continue
+            samples = value if isinstance(value, list) else [({}, value)]
+            header(name, kind, help_text)
+            for labels, sample in samples:
+                lines.append(f'{name}{_format_labels(constant + _label_key(labels))} {_format_value(sample)}')
+
+        return '\n'.join(lines) + '\n'
+
+# Shared by every component of the process; app.py applies METRICS_ENABLED
+metrics = Metrics()
@@ -1,27 +1,81 @@
-import openai
-import PyPDF2
-from pptx import Presentation
-import speech_recognition as sr
 import json
 import re
 from datetime import datetime
 import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from result_cache import hash_file, hash_text
+from speech_engine import create_speech_engine
+from conversation_context import ConversationContext
+from shared_state import MemorySharedState
+from slide_content import pdf_pages, powerpoint_slides, records_key
+from answer_grading import last_question
+from metrics import metrics
+from incremental_scoring import IncrementalScorer, clamp_scores, criteria_listing, criteria_slides
+from llm_gateway import (PRIORITY_BACKGROUND, PRIORITY_LIVE, PRIORITY_SCORING, as_gateway,
+                         count_tokens, truncate_tokens)
+
+COMPLEXITY_LEVELS = ['beginner', 'intermediate', 'advanced']
+
+# A live reply arriving later than this is no use to the student
+REPLY_TIMEOUT = 20
+FALLBACK_REPLY = "I understand. Could you please elaborate more on that point?"
+
+# One live turn of a session at a time across worker processes: a turn holds
+# the session's lease for at most TURN_LEASE seconds and the next one waits
+# up to TURN_WAIT for it
+TURN_LEASE = 60
+TURN_WAIT = 30
+TURN_COUNT_TTL = 24 * 3600
 
 class PresentationEvaluator:
-    def __init__(self, openai_client):
-        self.client = openai_client
-        self.recognizer = sr.Recognizer()
+    def __init__(self, openai_client, cache=None, speech=None, context=None, scorer=None, shared=None,
+                 slides_per_criterion=3, max_prompt_tokens=6000, group_tokens=3000, analysis_concurrency=4,
+                 max_sessions=1000, visuals=None, questions=None, answers=None):
+        # Every LLM call goes through the gateway's scheduler, rate limits and retries
+        self.llm = as_gateway(openai_client)
+        self.cache = cache
+        self.speech = speech if speech is not None else create_speech_engine()
+        self.context = context if context is not None else ConversationContext(self.llm)
+        # Scores the talk in segments as it is given, so the final scoring is a merge
+        self.scorer = scorer if scorer is not None else IncrementalScorer(self.llm)
+        # Leases and turn counts shared with the other worker processes
+        self.shared = shared if shared is not None else MemorySharedState()
+        self.slides_per_criterion = slides_per_criterion
+        # Inspects the images of the design slides when scoring
+        self.visuals = visuals
+        # Prepared questions served as replies without an LLM call (None: every reply is generated)
+        self.questions = questions
+        # Grades the student's answers to the questions asked (None: answers are not recorded)
+        self.answers = answers
+        self.max_sessions = max_sessions
+        self._turns_seen = OrderedDict()  # session_id -> turn count when this process last took part
+        self._turns_lock = threading.Lock()
         
-    def extract_presentation_content(self, file_path):
-        """Extract text content from PPT/PPTX or PDF files"""
+        # Decks longer than max_prompt_tokens are analyzed in slide groups
+        self.max_prompt_tokens = max_prompt_tokens
+        self.group_tokens = group_tokens
+        # Shared by every job, so it bounds concurrent analysis calls process-wide
+        self._analysis_pool = ThreadPoolExecutor(max_workers=analysis_concurrency,
+                                                 thread_name_prefix='analysis')
+        
+    @staticmethod
+    def extract_presentation_content(file_path):
+        """Extract the content of PPT/PPTX or PDF files, one record per slide
+
+        Static so that it can be shipped to a worker process.
+        """
         content = []
         file_extension = file_path.lower().split('.')[-1]
         
         try:
             if file_extension in ['ppt', 'pptx']:
-                content = self._extract_from_powerpoint(file_path)
+                content = PresentationEvaluator._extract_from_powerpoint(file_path)
             elif file_extension == 'pdf':
-                content = self._extract_from_pdf(file_path)
+                content = PresentationEvaluator._extract_from_pdf(file_path)
             else:
                 raise ValueError(f"Unsupported file format: {file_extension}")
                 
@@ -30,121 +84,313 @@ class PresentationEvaluator:
         except Exception as e:
             raise Exception(f"Error extracting content: {str(e)}")
     
-    def _extract_from_powerpoint(self, file_path):
-        """Extract text from PowerPoint slides"""
-        slides_content = []
-        
+    @staticmethod
+    def _extract_from_powerpoint(file_path, start=0, stop=None):
+        """Extract text, notes and layout from PowerPoint slides, optionally only slides [start, stop)"""
         try:
-            prs = Presentation(file_path)
-            for i, slide in enumerate(prs.slides):
-                slide_text = []
-                for shape in slide.shapes:
-                    if hasattr(shape, "text"):
-                        slide_text.append(shape.text)
-                
-                if slide_text:
-                    slides_content.append({
-                        'slide_number': i + 1,
-                        'content': '\n'.join(slide_text)
-                    })
-                    
+            return powerpoint_slides(file_path, start, stop)
         except Exception as e:
             raise Exception(f"Error reading PowerPoint file: {str(e)}")
-            
-        return slides_content
     
-    def _extract_from_pdf(self, file_path):
-        """Extract text from PDF pages"""
-        pages_content = []
-        
+    @staticmethod
+    def _extract_from_pdf(file_path, start=0, stop=None):
+        """Extract text and layout from PDF pages, optionally only pages [start, stop)"""
         try:
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                for i, page in enumerate(pdf_reader.pages):
-                    text = page.extract_text()
-                    if text.strip():
-                        pages_content.append({
-                            'slide_number': i + 1,
-                            'content': text
-                        })
-                        
+            return pdf_pages(file_path, start, stop)
         except Exception as e:
             raise Exception(f"Error reading PDF file: {str(e)}")
-            
-        return pages_content
+    
+    def process_file(self, file_path, extractor=None, file_hash=None):
+        """Extract and analyze a presentation file, returning (content, analysis)
+
+        Re-uploads of the same file skip extraction through the cache
+        (`file_hash` saves reading the file again when the upload already
+        hashed it). With an ExtractionEngine, slides are extracted on its
+        process pool while the analysis consumes them: a long deck's slide
+        groups are analyzed as soon as they are extracted.
+        """
+        with metrics.timer('stage_seconds', stage='process_file'):
+            file_hash = file_hash or hash_file(file_path)
+            content = self.cache.get('slides', records_key(file_hash)) if self.cache is not None else None
+            if content is not None:
+                return content, self.analyze_presentation(content)
+            
+            content = []
+            
+            def slides():
+                start = time.perf_counter()
+                if extractor is not None:
+                    source = extractor.iter_slides(file_path)
+                else:
+                    source = self.extract_presentation_content(file_path)
+                for slide in source:
+                    content.append(slide)
+                    yield slide
+                # Overlaps the analysis it feeds, so it is timed on its own
+                metrics.observe('stage_seconds', time.perf_counter() - start, stage='extraction')
+            
+            analysis = self.analyze_presentation(slides())
+            if self.cache is not None:
+                self.cache.put('slides', records_key(file_hash), content)
+            return content, analysis
     
     def analyze_presentation(self, content):
-        """Analyze presentation content and generate evaluation criteria"""
+        """Analyze presentation content and generate evaluation criteria
+
+        `content` may be a list of slides or a generator yielding them while
+        they are still being extracted. A deck that fits one prompt needs all
+        of its text first; a longer one is map-reduced, and each slide group
+        goes to the analysis pool as soon as it fills, while later slides are
+        still arriving.
+        """
+        futures = []
         try:
-            # Combine all content for analysis
+            slides = []
+            deck_tokens = 0
+            streaming = not isinstance(content, list)
+            
+            def arriving():
+                nonlocal deck_tokens
+                for slide in content:
+                    slides.append(slide)
+                    deck_tokens += count_tokens(slide['content'])
+                    yield slide
+            
+            groups = []
+            for group in self._slide_groups(arriving()):
+                groups.append(group)
+                if streaming and deck_tokens > self.max_prompt_tokens:
+                    # Too long for one prompt: analyze the groups filled so far as the rest arrive
+                    futures += [self._analysis_pool.submit(self._analyze_group, group)
+                                for group in groups[len(futures):]]
+            content = slides
             full_text = '\n'.join([slide['content'] for slide in content])
             
-            # Use OpenAI to analyze the presentation
-            prompt = f"""
-            Analyze this presentation content and provide a structured analysis:
-            
-            Content:
-            {full_text}
-            
-            Please provide:
-            1. Main topic/theme
-            2. Key concepts covered
-            3. Technical algorithms/methodologies mentioned
-            4. Project complexity level
-            5. Suggested evaluation questions
-            6. Areas where students might need deeper explanation
-            
-            Format as JSON with keys: topic, concepts, algorithms, complexity, suggested_questions, focus_areas
-            """
-            
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are an expert presentation evaluator analyzing technical content."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3
-            )
+            # Reuse the analysis of a deck with the same text. An edited long deck
+            # reuses the analyses of its unchanged slide groups instead.
+            text_hash = hash_text(full_text)
+            if self.cache is not None:
+                analysis = self.cache.get('analysis', text_hash)
+                if analysis is not None:
+                    for future in futures:
+                        future.cancel()
+                    analysis['slide_count'] = len(content)
+                    return analysis
+            
+            with metrics.timer('stage_seconds', stage='analysis'):
+                if deck_tokens <= self.max_prompt_tokens:
+                    analysis = self._analyze_text(full_text)
+                else:
+                    futures += [self._analysis_pool.submit(self._analyze_group, group)
+                                for group in groups[len(futures):]]
+                    analysis = self._merge_analyses([future.result() for future in futures])
             
-            analysis = json.loads(response.choices[0].message.content)
+            if self.cache is not None:
+                self.cache.put('analysis', text_hash, analysis)
             
-            # Add slide-specific analysis
+            # The slides themselves are stored once, as the session's content
             analysis['slide_count'] = len(content)
-            analysis['slides'] = content
             
             return analysis
             
         except Exception as e:
+            for future in futures:
+                future.cancel()
+            metrics.inc('errors_total', stage='analysis', type=type(e).__name__)
             raise Exception(f"Error analyzing presentation: {str(e)}")
     
+    def _analyze_text(self, text, scope=''):
+        """One LLM analysis call over `text`, returning the parsed JSON"""
+        # Use OpenAI to analyze the presentation
+        prompt = f"""
+        Analyze this presentation content and provide a structured analysis:
+        {scope}
+        Content:
+        {text}
+        
+        Please provide:
+        1. Main topic/theme
+        2. Key concepts covered
+        3. Technical algorithms/methodologies mentioned
+        4. Project complexity level
+        5. Suggested evaluation questions
+        6. Areas where students might need deeper explanation
+        
+        Format as JSON with keys: topic, concepts, algorithms, complexity, suggested_questions, focus_areas
+        """
+        
+        response = self.llm.complete(
+            purpose='analysis',
+            priority=PRIORITY_BACKGROUND,
+            messages=[
+                {"role": "system", "content": "You are an expert presentation evaluator analyzing technical content."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.3
+        )
+        
+        return json.loads(response.choices[0].message.content)
+    
+    def _slide_groups(self, slides):
+        """Consecutive slides packed into groups of at most group_tokens tokens, each yielded once full"""
+        group = []
+        size = 0
+        for slide in slides:
+            text = truncate_tokens(slide['content'], self.group_tokens)
+            tokens = count_tokens(text)
+            if group and size + tokens > self.group_tokens:
+                yield group
+                group = []
+                size = 0
+            group.append((slide['slide_number'], text))
+            size += tokens
+        if group:
+            yield group
+    
+    def _analyze_group(self, group):
+        """Analyze one slide group, reusing the cached result for unchanged groups"""
+        text = '\n'.join(text for _, text in group)
+        key = hash_text(text)
+        if self.cache is not None:
+            analysis = self.cache.get('analysis-group', key)
+            if analysis is not None:
+                return analysis
+        
+        scope = f"This is one part of a longer deck (slides {group[0][0]}-{group[-1][0]})."
+        analysis = self._analyze_text(text, scope)
+        if self.cache is not None:
+            self.cache.put('analysis-group', key, analysis)
+        return analysis
+    
+    @staticmethod
+    def _merge_analyses(partials):
+        """Combine per-group analyses into one with the single-call schema"""
+        def as_list(value):
+            if value is None:
+                return []
+            return value if isinstance(value, list) else [value]
+        
+        def most_common(key, limit):
+            # Frequency across groups first, then order of first appearance
+            counts = Counter()
+            names = {}
+            for partial in partials:
+                for item in as_list(partial.get(key)):
+                    name = str(item).strip()
+                    if name:
+                        names.setdefault(name.lower(), name)
+                        counts[name.lower()] += 1
+            return [names[name] for name, _ in counts.most_common(limit)]
+        
+        def interleaved(key, limit):
+            # Round-robin so every part of the deck gets questions
+            merged = []
+            seen = set()
+            columns = [as_list(partial.get(key)) for partial in partials]
+            for row in range(max((len(column) for column in columns), default=0)):
+                for column in columns:
+                    if row < len(column) and str(column[row]).lower() not in seen:
+                        seen.add(str(column[row]).lower())
+                        merged.append(column[row])
+            return merged[:limit]
+        
+        complexities = [str(partial.get('complexity', '')).lower() for partial in partials]
+        ranked = [level for level in complexities if level in COMPLEXITY_LEVELS]
+        
+        return {
+            'topic': (most_common('topic', 1) or ['presentation'])[0],
+            'concepts': most_common('concepts', 20),
+            'algorithms': most_common('algorithms', 15),
+            'complexity': max(ranked, key=COMPLEXITY_LEVELS.index) if ranked else (complexities[0] if complexities else ''),
+            'suggested_questions': interleaved('suggested_questions', 10),
+            'focus_areas': most_common('focus_areas', 10)
+        }
+    
+    @contextmanager
+    def turn(self, session_id):
+        """Hold a session's live turn lease for the block
+
+        Any worker process may serve any turn. Each turn bumps a shared
+        count; a process that finds the count moved since it last took part
+        has missed turns served elsewhere, so it reloads the conversation
+        context and running scores from the database first.
+        """
+        with self.shared.lease(f'turn:{session_id}', TURN_LEASE, TURN_WAIT):
+            self.sync(session_id)
+            try:
+                yield
+            finally:
+                self._seen(session_id, self.shared.incr(f'turns:{session_id}', ttl=TURN_COUNT_TTL))
+
+    def sync(self, session_id):
+        """Drop what this process holds about a session if another one has served it since"""
+        count = int(self.shared.get(f'turns:{session_id}') or 0)
+        with self._turns_lock:
+            seen = self._turns_seen.get(session_id, 0)
+        if seen != count:
+            self.context.forget(session_id)
+            self.scorer.reload(session_id)
+            if self.questions is not None:
+                self.questions.forget(session_id)
+            self._seen(session_id, count)
+
+    def _seen(self, session_id, count):
+        with self._turns_lock:
+            self._turns_seen[session_id] = count
+            self._turns_seen.move_to_end(session_id)
+            while len(self._turns_seen) > self.max_sessions:
+                self._turns_seen.popitem(last=False)
+
     def speech_to_text(self, audio_file_path):
-        """Convert speech audio to text"""
+        """Convert speech audio (a WAV path or file-like object) to text"""
         try:
-            with sr.AudioFile(audio_file_path) as source:
-                audio = self.recognizer.record(source)
-                
-            # Using Google Speech Recognition
-            text = self.recognizer.recognize_google(audio)
-            return text
+            # Batched with concurrent requests by the configured STT backend
+            with metrics.timer('stage_seconds', stage='stt'):
+                return self.speech.transcribe(audio_file_path)
             
-        except sr.UnknownValueError:
-            return "Could not understand audio"
-        except sr.RequestError as e:
-            return f"Error with speech recognition: {str(e)}"
         except Exception as e:
+            metrics.inc('errors_total', stage='stt', type=type(e).__name__)
             return f"Error processing audio: {str(e)}"
     
     def generate_response(self, transcript, session_id):
         """Generate AI response or question based on student's speech"""
+        return ''.join(self.stream_response(transcript, session_id))
+    
+    def stream_response(self, transcript, session_id):
+        """Generate the reply to the student's speech, yielding its text as the LLM produces it"""
+        pieces = []
+        reply = None
+        question = None
+        prompt_tokens = 0
+        start = time.perf_counter()
+        if self.answers is not None:
+            # What the student just said answers the question the last reply asked, if any
+            try:
+                self.answers.answer(session_id, transcript)
+            except Exception as e:
+                metrics.inc('errors_total', stage='answers', type=type(e).__name__)
         try:
-            # Get session context (would need database access)
-            # For now, generate contextual responses
-            
-            prompt = f"""
+            # A prepared question on the slide the student is talking about needs no LLM call
+            if self.questions is not None:
+                try:
+                    question = self.questions.pick(session_id, transcript)
+                except Exception as e:
+                    metrics.inc('errors_total', stage='question_bank', type=type(e).__name__)
+            if question is not None:
+                metrics.inc('replies_total', source='question_bank')
+                metrics.observe('stage_seconds', time.perf_counter() - start, stage='reply')
+                pieces.append(question['question'])
+                reply = question['question']
+                yield reply
+                return
+            metrics.inc('replies_total', source='llm')
+            
+            # Session memory: deck brief, running summary, related slides and recent turns
+            messages = self.context.build_messages(session_id, transcript, """
             You are evaluating a student's presentation. The student just said:
             "{transcript}"
             
-            Based on this, provide one of the following:
+            Based on this and the presentation so far, provide one of the following:
             1. An encouraging acknowledgment if they're doing well
             2. A clarifying question if something needs more detail
             3. A probing question to test deeper understanding
@@ -152,95 +398,122 @@ class PresentationEvaluator:
             
             Be supportive but challenging. Keep responses concise and conversational.
             Focus on testing understanding of algorithms, concepts, and methodology.
-            """
-            
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are an expert technical presentation evaluator having a conversation with a student."},
-                    {"role": "user", "content": prompt}
-                ],
+            Do not repeat a question you have already asked.
+            """)
+            prompt_tokens = sum(count_tokens(message['content']) for message in messages)
+            
+            for piece in self.llm.stream(
+                purpose='reply',
+                priority=PRIORITY_LIVE,
+                timeout=REPLY_TIMEOUT,
+                messages=messages,
                 temperature=0.7,
                 max_tokens=150
-            )
-            
-            return response.choices[0].message.content
-            
+            ):
+                if not pieces:
+                    metrics.observe('stage_seconds', time.perf_counter() - start, stage='reply_first_token')
+                pieces.append(piece)
+                yield piece
+            reply = ''.join(pieces)
+            metrics.observe('stage_seconds', time.perf_counter() - start, stage='reply')
+            
+        except GeneratorExit:
+            # The client went away mid-reply: record the part it was sent
+            reply = ''.join(pieces) or None
+            raise
         except Exception as e:
-            return f"I understand. Could you please elaborate more on that point?"
+            metrics.inc('errors_total', stage='reply', type=type(e).__name__)
+            # Keep whatever part of the reply the student has already seen
+            reply = ''.join(pieces) or None
+            if not pieces:
+                yield FALLBACK_REPLY
+        finally:
+            self.context.record_turn(session_id, transcript, reply, prompt_tokens)
+            self.scorer.add_turn(session_id, transcript, reply)
+            if self.answers is not None:
+                try:
+                    if question is not None:
+                        self.answers.ask(session_id, question['question'], question['keypoints'])
+                    else:
+                        self.answers.ask(session_id, last_question(reply))
+                except Exception as e:
+                    metrics.inc('errors_total', stage='answers', type=type(e).__name__)
     
-    def calculate_final_scores(self, evaluation_data, session_data):
-        """Calculate final scores based on evaluation criteria"""
-        try:
-            # Get analysis and transcript
-            analysis = session_data.get('analysis', {})
-            transcript = evaluation_data.get('transcript', [])
-            questions_asked = evaluation_data.get('questions_asked', [])
-            answers_given = evaluation_data.get('answers_given', [])
-            
-            # Combine all student speech for analysis
-            full_transcript = ' '.join(transcript)
-            
-            prompt = f"""
-            Evaluate this presentation based on the following criteria:
-            
-            Student's Full Presentation Transcript:
-            {full_transcript}
-            
-            Questions Asked: {questions_asked}
-            Answers Given: {answers_given}
-            
-            Presentation Analysis: {json.dumps(analysis)}
-            
-            Provide scores (out of the maximum points indicated):
-            1. Project Content (20 points) - Depth, relevance, correctness of the topic
-            2. Algorithm Used (15 points) - Choice and justification of ML algorithms
-            3. Student Skill Level (15 points) - Mastery of concepts, confidence, and critical thinking
-            4. Slide Design & Visuals (10 points) - Clarity, aesthetics, and information delivery
-            5. Communication & Delivery (20 points) - Oral presentation skill, engagement, flow
-            6. Handling of Questions (10 points) - Ability to answer, clarity, and adaptability
-            7. Research Process & Methodology (10 points) - Approach, application, reproducibility
-            
-            Also provide detailed feedback for each category and overall suggestions for improvement.
-            
-            Format as JSON with keys: scores (object with category names as keys), feedback (object with category names as keys), total_score
-            """
-            
-            response = self.client.chat.completions.create(
-                model="gpt-4",
+    def score_presentation(self, evaluation_data, session_data):
+        """Score a whole presentation in one LLM call, raising if it fails"""
+        # Get analysis and transcript
+        analysis = {key: value for key, value in (session_data.get('analysis') or {}).items()
+                    if key != 'slides'}
+        transcript = evaluation_data.get('transcript', [])
+        questions_asked = evaluation_data.get('questions_asked', [])
+        answers_given = evaluation_data.get('answers_given', [])
+        
+        # Combine all student speech for analysis
+        full_transcript = ' '.join(entry['text'] if isinstance(entry, dict) else entry
+                                   for entry in transcript)
+        
+        # Only the slides relevant to each criterion, not the whole deck
+        slides, slide_text = criteria_slides(session_data, self.slides_per_criterion, self.visuals)
+        criteria = criteria_listing(slides).replace('\n', '\n        ')
+        
+        prompt = f"""
+        Evaluate this presentation based on the following criteria:
+        
+        Student's Full Presentation Transcript:
+        {full_transcript}
+        
+        Questions Asked: {questions_asked}
+        Answers Given: {answers_given}
+        
+        Presentation Analysis: {json.dumps(analysis)}
+        
+        Relevant Slides:
+        {slide_text}
+        
+        Provide scores (out of the maximum points indicated):
+        {criteria}
+        
+        Also provide detailed feedback for each category and overall suggestions for improvement.
+        
+        Format as JSON with keys: scores (object with category names as keys), feedback (object with category names as keys), total_score
+        """
+        
+        with metrics.timer('stage_seconds', stage='scoring'):
+            response = self.llm.complete(
+                purpose='scoring',
+                priority=PRIORITY_SCORING,
                 messages=[
                     {"role": "system", "content": "You are an expert evaluator providing detailed, fair, and constructive feedback."},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.3
             )
-            
-            result = json.loads(response.choices[0].message.content)
-            
-            # Ensure scores are within limits
-            max_scores = {
-                'Project Content': 20,
-                'Algorithm Used': 15,
-                'Student Skill Level': 15,
-                'Slide Design & Visuals': 10,
-                'Communication & Delivery': 20,
-                'Handling of Questions': 10,
-                'Research Process & Methodology': 10
-            }
-            
-            scores = result.get('scores', {})
-            for category, max_score in max_scores.items():
-                if category in scores:
-                    scores[category] = min(max_score, max(0, scores[category]))
-                else:
-                    scores[category] = 0
-            
-            result['scores'] = scores
-            result['total_score'] = sum(scores.values())
-            
+        
+        result = json.loads(response.choices[0].message.content)
+        
+        # Ensure scores are within limits
+        scores = clamp_scores(result.get('scores', {}))
+        
+        result['scores'] = scores
+        result['total_score'] = sum(scores.values())
+        
+        return result
+    
+    def calculate_final_scores(self, evaluation_data, session_data):
+        """Calculate final scores from the whole transcript in one call
+
+        The slow path, for presentations the incremental scorer has not
+        scored (see IncrementalScorer.finalize). Falls back to default
+        scores if the call fails.
+        """
+        try:
+            result = self.score_presentation(evaluation_data, session_data)
+            if self.answers is not None:
+                result = self.answers.apply(evaluation_data.get('session_id'), result)
             return result
             
         except Exception as e:
+            metrics.inc('errors_total', stage='scoring', type=type(e).__name__)
             # Return default scores if AI evaluation fails
             default_scores = {
                 'Project Content': 10,
@@ -256,4 +529,4 @@ class PresentationEvaluator:
                 'scores': default_scores,
                 'total_score': sum(default_scores.values()),
                 'feedback': {'error': f'AI evaluation failed: {str(e)}'}
-            }
\ No newline at end of file
+            }
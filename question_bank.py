@@ -0,0 +1,222 @@
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_gateway import PRIORITY_BACKGROUND, as_gateway, count_tokens, truncate_tokens
+from result_cache import hash_text
+from slide_index import SlideIndex, tokenize
+
+class SessionQuestions:
+    """The question bank of one presentation and what has been asked from it"""
+
+    def __init__(self, questions, slide_index, asked):
+        self.questions = questions
+        self.slide_index = slide_index
+        self.asked = asked  # IDs of questions served
+        self.lock = threading.Lock()
+
+class QuestionBank:
+    """Questions prepared per slide while a deck is processed, served during the talk
+
+    build() runs in the processing job: slide groups of at most
+    `group_tokens` tokens are sent concurrently to the LLM, which writes up
+    to `per_slide` questions per slide, most important first, each with the
+    keypoints a good answer covers. The deck analysis's suggested questions
+    are added after them, without keypoints, so answers to them are graded
+    by the LLM. The bank is stored with the session.
+
+    During the talk, pick() matches what the student just said against the
+    session's slide index. When a slide scores at least `min_score` and
+    still has a question not asked, that question is the reply, with no LLM
+    call. Otherwise the caller falls back to a generated reply. Questions
+    served are saved with the evaluation, so no worker process repeats one.
+    """
+
+    def __init__(self, llm, db=None, cache=None, per_slide=2, group_tokens=3000, concurrency=4,
+                 min_score=2.0, slides_per_turn=2, max_sessions=1000):
+        self.llm = as_gateway(llm)
+        self.db = db
+        self.cache = cache
+        self.per_slide = per_slide
+        self.group_tokens = group_tokens
+        self.min_score = min_score
+        self.slides_per_turn = slides_per_turn
+        self.max_sessions = max_sessions
+
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='question-bank')
+
+    def build(self, content, analysis=None):
+        """Ranked questions for a deck: [{'id', 'slide_number', 'question', 'keypoints'}]"""
+        groups = [[]]
+        size = 0
+        for slide in content:
+            text = truncate_tokens(slide.get('content', ''), self.group_tokens)
+            tokens = count_tokens(text)
+            if not tokens:
+                continue
+            if groups[-1] and size + tokens > self.group_tokens:
+                groups.append([])
+                size = 0
+            groups[-1].append((slide['slide_number'], text))
+            size += tokens
+
+        futures = [self._pool.submit(self._questions_for, group) for group in groups if group]
+        questions = [question for future in futures for question in future.result()]
+        questions += self._suggested(content, (analysis or {}).get('suggested_questions'))
+
+        bank = []
+        seen = set()
+        for question in questions:
+            key = question['question'].strip().lower()
+            if key not in seen:
+                seen.add(key)
+                bank.append(dict(question, id=len(bank)))
+        return bank
+
+    def _questions_for(self, group):
+        """Questions for one slide group, reusing the cached ones for an unchanged group"""
+        text = '\n'.join(f"Slide {number}: {slide_text}" for number, slide_text in group)
+        key = hash_text(f'{self.per_slide}\n{text}')
+        if self.cache is not None:
+            questions = self.cache.get('questions', key)
+            if questions is not None:
+                return questions
+
+        prompt = f"""
+        Prepare the questions an examiner would ask a student presenting these slides.
+        For each slide, write up to {self.per_slide} short questions, most important first,
+        that test whether the student understands the slide rather than has memorized it.
+        With each question, list the 2-5 keypoints a good answer covers, a few words each.
+
+        Slides:
+        {text}
+
+        Format as JSON with keys: questions (list of objects with keys slide, question, keypoints)
+        """
+        try:
+            response = self.llm.complete(
+                purpose='questions',
+                priority=PRIORITY_BACKGROUND,
+                messages=[
+                    {"role": "system", "content": "You are an expert presentation evaluator preparing questions."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.3
+            )
+            items = json.loads(response.choices[0].message.content).get('questions') or []
+        except Exception:
+            # The bank is an optimization: replies fall back to the LLM for these slides
+            return []
+
+        numbers = set(number for number, _ in group)
+        per_slide = {}
+        questions = []
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            try:
+                number = int(item.get('slide'))
+            except (TypeError, ValueError):
+                continue
+            question = str(item.get('question') or '').strip()
+            if number not in numbers or not question or per_slide.get(number, 0) >= self.per_slide:
+                continue
+            per_slide[number] = per_slide.get(number, 0) + 1
+            keypoints = item.get('keypoints') or []
+            keypoints = [str(point) for point in (keypoints if isinstance(keypoints, list) else [keypoints])][:5]
+            questions.append({'slide_number': number, 'question': question, 'keypoints': keypoints})
+
+        if self.cache is not None:
+            self.cache.put('questions', key, questions)
+        return questions
+
+    @staticmethod
+    def _suggested(content, suggested):
+        """The analysis's suggested questions, each placed on the slide it is most about
+
+        The analysis gives no answer keypoints for them; the question's own
+        words would only reward echoing it back.
+        """
+        if not suggested or not content:
+            return []
+        slide_index = SlideIndex.build(content)
+        questions = []
+        for question in suggested if isinstance(suggested, list) else [suggested]:
+            question = str(question).strip()
+            best = slide_index.search(question, 1)
+            if question and best:
+                questions.append({'slide_number': best[0][0], 'question': question, 'keypoints': None})
+        return questions
+
+    def _state(self, session_id):
+        """The session's bank, loaded from the database on first use"""
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if state is not None:
+                self._sessions.move_to_end(session_id)
+                return state
+
+        state = self._load(session_id)
+        with self._lock:
+            state = self._sessions.setdefault(session_id, state)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return state
+
+    def _load(self, session_id):
+        if self.db is None:
+            return SessionQuestions([], None, set())
+        session = self.db.get_session_fields(session_id, 'question_bank', 'slide_index') or {}
+        questions, slide_index = (json.loads(value) if isinstance(value, str) else value
+                                  for value in (session.get('question_bank'), session.get('slide_index')))
+        asked = (self.db.get_evaluation_fields(session_id, 'bank_asked') or {}).get('bank_asked')
+        asked = json.loads(asked) if isinstance(asked, str) else asked
+        return SessionQuestions(questions or [], SlideIndex.from_dict(slide_index) if slide_index else None,
+                                set(asked or []))
+
+    def pick(self, session_id, transcript):
+        """The next question for what the student just said, marked as asked, or None
+
+        Taken from the best-matching slide that still has one: the question
+        sharing most words and keypoints with what was said, then the
+        highest ranked.
+        """
+        state = self._state(session_id)
+        if not state.questions or state.slide_index is None:
+            return None
+
+        said = set(tokenize(transcript))
+        with state.lock:
+            question = None
+            for number, score in state.slide_index.search(transcript, self.slides_per_turn):
+                if score < self.min_score:
+                    break
+                candidates = [question for question in state.questions
+                              if question['slide_number'] == number and question['id'] not in state.asked]
+                if candidates:
+                    question = max(candidates, key=lambda question: (
+                        len(said & set(tokenize(question['question'] + ' ' + ' '.join(question['keypoints'] or [])))),
+                        -question['id']))
+                    break
+            if question is None:
+                return None
+            state.asked.add(question['id'])
+            asked = sorted(state.asked)
+
+        if self.db is not None:
+            self.db.update_evaluation_fields(session_id, bank_asked=asked)
+        return question
+
+    def stats(self, session_id):
+        """Questions in a session's bank and how many have been asked"""
+        state = self._state(session_id)
+        with state.lock:
+            return {'questions': len(state.questions), 'asked': len(state.asked)}
+
+    def forget(self, session_id):
+        """Drop a session's bank, reloading it on next use"""
+        with self._lock:
+            self._sessions.pop(session_id, None)
@@ -0,0 +1,199 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    namespace TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_cache_access ON cache (last_access);
+DROP TABLE IF EXISTS slide_hashes;
+"""
+
+# Reads note the entries they touch in memory; the access times are written
+# with the next put, or once this many are waiting or this many seconds passed
+ACCESS_FLUSH_ENTRIES = 256
+ACCESS_FLUSH_SECONDS = 60
+
+def hash_file(file_path, block_size=1024 * 1024):
+    """SHA-256 of a file's bytes"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def normalize_text(text):
+    """Lower-case and collapse whitespace so cosmetic edits hash the same"""
+    return re.sub(r'\s+', ' ', text).strip().lower()
+
+def hash_text(text):
+    """SHA-256 of normalized text"""
+    return hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+
+class ResultCache:
+    """Content-addressed cache for extraction and analysis results
+
+    Entries live in their own SQLite file keyed by content hash and are
+    evicted when older than `ttl` seconds or, least recently used first,
+    when the cache grows past `max_bytes`. Reads take no write lock: the
+    access times eviction goes by are kept in memory and written in
+    batches.
+    """
+
+    def __init__(self, data_dir='data', max_bytes=256 * 1024 * 1024, ttl=30 * 24 * 3600):
+        self.cache_file = os.path.join(data_dir, 'cache.db')
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        os.makedirs(data_dir, exist_ok=True)
+
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._hits = defaultdict(int)
+        self._misses = defaultdict(int)
+        self._accessed = {}  # key -> last read, not yet written
+        self._access_written = time.monotonic()
+
+        self._conn.executescript(SCHEMA)
+
+    @property
+    def _conn(self):
+        """Connection owned by the calling thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.cache_file, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _count(self, counter, namespace):
+        """Bump a per-namespace metric"""
+        with self._stats_lock:
+            counter[namespace] += 1
+
+    def get(self, namespace, key):
+        """Return the cached value, or None on a miss"""
+        full_key = f'{namespace}:{key}'
+        row = self._conn.execute(
+            'SELECT value, created_at FROM cache WHERE key = ?', (full_key,)
+        ).fetchone()
+
+        value = None
+        if row is not None and not (self.ttl and time.time() - row[1] > self.ttl):
+            value = json.loads(row[0])
+            self._touch(full_key)
+        self._count(self._misses if value is None else self._hits, namespace)
+        return value
+
+    def _touch(self, full_key):
+        """Note a read, writing the waiting access times once there are enough of them or they are old"""
+        with self._stats_lock:
+            self._accessed[full_key] = time.time()
+            due = (len(self._accessed) >= ACCESS_FLUSH_ENTRIES
+                   or time.monotonic() - self._access_written >= ACCESS_FLUSH_SECONDS)
+        if due and self._write_lock.acquire(blocking=False):
+            # Skipped while a put is writing; it takes the access times with it
+            try:
+                conn = self._conn
+                conn.execute('BEGIN IMMEDIATE')
+                try:
+                    self._write_access(conn)
+                    conn.execute('COMMIT')
+                except Exception:
+                    conn.execute('ROLLBACK')
+                    raise
+            finally:
+                self._write_lock.release()
+
+    def _write_access(self, conn):
+        """Write the access times noted by reads since the last write"""
+        with self._stats_lock:
+            accessed, self._accessed = self._accessed, {}
+            self._access_written = time.monotonic()
+        conn.executemany('UPDATE cache SET last_access = ? WHERE key = ?',
+                         [(when, key) for key, when in accessed.items()])
+
+    def put(self, namespace, key, value):
+        """Store a value"""
+        full_key = f'{namespace}:{key}'
+        encoded = json.dumps(value)
+        now = time.time()
+
+        with self._write_lock:
+            conn = self._conn
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute(
+                    'INSERT OR REPLACE INTO cache (key, namespace, value, size, created_at, last_access) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (full_key, namespace, encoded, len(encoded), now, now)
+                )
+                self._write_access(conn)
+                self._evict(conn)
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+    def _evict(self, conn):
+        """Drop expired entries, then least recently used ones over max_bytes"""
+        if self.ttl:
+            expired = [key for (key,) in conn.execute(
+                'SELECT key FROM cache WHERE created_at < ?', (time.time() - self.ttl,))]
+            self._delete(conn, expired)
+
+        if self.max_bytes:
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM cache').fetchone()[0]
+            if total > self.max_bytes:
+                victims = []
+                for key, size in conn.execute('SELECT key, size FROM cache ORDER BY last_access'):
+                    if total <= self.max_bytes:
+                        break
+                    victims.append(key)
+                    total -= size
+                self._delete(conn, victims)
+
+    def _delete(self, conn, keys):
+        """Remove entries"""
+        conn.executemany('DELETE FROM cache WHERE key = ?', [(key,) for key in keys])
+
+    def clear(self):
+        """Remove every entry and reset the metrics"""
+        with self._write_lock:
+            self._conn.execute('DELETE FROM cache')
+        with self._stats_lock:
+            self._hits.clear()
+            self._misses.clear()
+            self._accessed.clear()
+
+    def stats(self):
+        """Hit/miss counts per namespace plus entry count and size"""
+        entries, size = self._conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache').fetchone()
+        with self._stats_lock:
+            namespaces = set(self._hits) | set(self._misses)
+            return {
+                'entries': entries,
+                'bytes': size,
+                'namespaces': {
+                    namespace: {
+                        'hits': self._hits[namespace],
+                        'misses': self._misses[namespace],
+                        'hit_rate': self._hits[namespace] / max(1, self._hits[namespace] + self._misses[namespace])
+                    }
+                    for namespace in sorted(namespaces)
+                }
+            }
@@ -0,0 +1,272 @@
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import zlib
+from collections import Counter
+from datetime import datetime, timedelta
+
+from shared_state import worker_id
+
+ARCHIVE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS archived (
+    session_id TEXT PRIMARY KEY,
+    roll_no TEXT,
+    name TEXT,
+    completed_at TEXT,
+    archived_at REAL NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_archived_at ON archived (archived_at);
+"""
+
+# Bulky session fields not worth keeping once results are final
+ARCHIVE_DROPPED_FIELDS = ('content', 'slide_index')
+
+class SessionArchive:
+    """Cold storage for completed evaluations
+
+    Records are zlib-compressed JSON in their own SQLite file, so the live
+    database only holds sessions still in use while old results stay
+    readable (see /api/results).
+    """
+
+    def __init__(self, data_dir='data'):
+        self.archive_file = os.path.join(data_dir, 'archive.db')
+        os.makedirs(data_dir, exist_ok=True)
+        self._local = threading.local()
+        self._conn.executescript(ARCHIVE_SCHEMA)
+
+    @property
+    def _conn(self):
+        """Connection owned by the calling thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.archive_file, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def put(self, session, evaluation):
+        """Archive a session and its evaluation, returning the compressed size"""
+        record = {
+            'session': {key: value for key, value in session.items() if key not in ARCHIVE_DROPPED_FIELDS},
+            'evaluation': evaluation
+        }
+        data = zlib.compress(json.dumps(record).encode('utf-8'))
+        self._conn.execute(
+            'INSERT OR REPLACE INTO archived (session_id, roll_no, name, completed_at, archived_at, data) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (session['session_id'], session.get('roll_no'), session.get('name'),
+             evaluation.get('completed_at'), time.time(), data)
+        )
+        return len(data)
+
+    def get(self, session_id):
+        """The archived {'session', 'evaluation'} record, or None"""
+        row = self._conn.execute('SELECT data FROM archived WHERE session_id = ?', (session_id,)).fetchone()
+        return json.loads(zlib.decompress(row[0])) if row else None
+
+    def expire(self, max_age):
+        """Delete records archived more than `max_age` seconds ago, returning (records, bytes) removed"""
+        cutoff = time.time() - max_age
+        records, size = self._conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM archived WHERE archived_at < ?', (cutoff,)
+        ).fetchone()
+        self._conn.execute('DELETE FROM archived WHERE archived_at < ?', (cutoff,))
+        return records, size
+
+    def stats(self):
+        records, size = self._conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM archived').fetchone()
+        return {'records': records, 'bytes': size}
+
+class Janitor:
+    """Background retention of sessions, uploads and results
+
+    Every `interval` seconds a sweep:
+    - deletes sessions, with their decks, left untouched for longer than
+      the TTL of their status in `ttls` ('uploaded', 'processing', 'ready'
+      or 'error'; seconds, 0 keeps them);
+    - moves evaluations completed more than ttls['completed'] ago to the
+      archive, dropping their rows and deck from the live data;
+    - expires archived records after `archive_ttl`, audio chunk results
+      after `audio_chunk_ttl` and unfinished uploads after
+      `partial_upload_ttl`;
+    - deletes files in the upload folder no session refers to, once older
+      than `orphan_grace`;
+    - expires leases and counters in the shared state;
+    - compacts the database.
+    With several worker processes, only the one holding the 'janitor'
+    lease in `shared` sweeps. Decks outside the upload folder (batch grading reads them in place)
+    are never touched. stats() reports what was reclaimed and the session
+    read latency after the last sweep.
+    """
+
+    def __init__(self, db, upload_store, archive, ttls, archive_ttl=0, audio_chunk_ttl=24 * 3600,
+                 partial_upload_ttl=24 * 3600, orphan_grace=3600, interval=3600, latency_samples=50,
+                 shared=None):
+        self.db = db
+        self.upload_store = upload_store
+        self.archive = archive
+        self.ttls = ttls
+        self.archive_ttl = archive_ttl
+        self.audio_chunk_ttl = audio_chunk_ttl
+        self.partial_upload_ttl = partial_upload_ttl
+        self.orphan_grace = orphan_grace
+        self.interval = interval
+        self.latency_samples = latency_samples
+        self.shared = shared
+
+        self._sweep_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._stats_lock = threading.Lock()
+        self._totals = Counter()
+        self._last = {}
+
+    def start(self):
+        """Sweep every `interval` seconds on a background thread (not at all when 0)"""
+        if not self.interval:
+            return
+        self._thread = threading.Thread(target=self._run, name='retention-janitor', daemon=True)
+        self._thread.start()
+
+    def shutdown(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            # The leader keeps renewing its lease; another worker takes over if it stops
+            if self.shared is not None and not self.shared.acquire('janitor', worker_id(), self.interval * 1.5):
+                continue
+            try:
+                self.sweep()
+            except Exception as e:
+                with self._stats_lock:
+                    self._last['error'] = str(e)
+
+    def sweep(self):
+        """Run one retention pass now, returning what it removed"""
+        with self._sweep_lock:
+            start = time.monotonic()
+            removed = Counter()
+            kept = self._sweep_sessions(removed)
+
+            upload_dir = os.path.realpath(self.upload_store.upload_dir)
+            self._remove_orphans(upload_dir, {os.path.realpath(path) for path in kept.values() if path}, removed)
+            if self.partial_upload_ttl:
+                files, size = self.upload_store.expire(self.partial_upload_ttl)
+                removed['uploads_deleted'] += files
+                removed['bytes_reclaimed'] += size
+            if self.audio_chunk_ttl:
+                before = (datetime.now() - timedelta(seconds=self.audio_chunk_ttl)).isoformat()
+                removed['audio_chunks_deleted'] += self.db.delete_audio_chunks(before)
+            if self.archive_ttl:
+                records, _ = self.archive.expire(self.archive_ttl)
+                removed['archive_expired'] += records
+            if self.shared is not None:
+                removed['shared_expired'] += self.shared.expire()
+            removed['bytes_reclaimed'] += self.db.compact()
+
+            latencies = self._read_latencies(list(kept))
+            with self._stats_lock:
+                self._totals.update(removed)
+                self._totals['sweeps'] += 1
+                self._last = dict(
+                    removed,
+                    finished_at=datetime.now().isoformat(),
+                    duration_ms=(time.monotonic() - start) * 1000,
+                    sessions=len(kept),
+                    read_latency_p50_ms=latencies[len(latencies) // 2] if latencies else 0,
+                    read_latency_p95_ms=latencies[int(len(latencies) * 0.95)] if latencies else 0
+                )
+            return dict(removed)
+
+    def _sweep_sessions(self, removed):
+        """Delete or archive expired sessions, returning {session_id: file_path} of those kept"""
+        now = datetime.now()
+        busy = {job['session_id'] for job in self.db.get_unfinished_jobs()}
+        kept = {}
+        for session in self.db.list_sessions('status', 'created_at', 'updated_at', 'file_path'):
+            session_id = session['session_id']
+            status = session['status'] or ''
+            ttl = self.ttls.get('error' if status.startswith('error') else status, 0)
+            last_active = max(filter(None, (session['created_at'], session['updated_at'],
+                                            session['evaluation_updated_at'])), default=None)
+            if (not ttl or session_id in busy or last_active is None
+                    or last_active >= (now - timedelta(seconds=ttl)).isoformat()):
+                kept[session_id] = session['file_path']
+                continue
+
+            if status == 'completed' and self._archive(session_id):
+                removed['sessions_archived'] += 1
+            else:
+                self.db.delete_session(session_id)
+                removed['sessions_deleted'] += 1
+            size = self._remove_upload(session['file_path'])
+            if size is not None:
+                removed['uploads_deleted'] += 1
+                removed['bytes_reclaimed'] += size
+        return kept
+
+    def _archive(self, session_id):
+        """Move a completed session to the archive, False if it is gone or has no evaluation"""
+        session = self.db.get_session(session_id)
+        evaluation = self.db.get_evaluation(session_id)
+        if session is None or evaluation is None:
+            return False
+        self.archive.put(session, evaluation)
+        self.db.delete_session(session_id)
+        return True
+
+    def _in_upload_folder(self, path):
+        return os.path.dirname(os.path.realpath(path)) == os.path.realpath(self.upload_store.upload_dir)
+
+    def _remove_upload(self, file_path):
+        """Delete a session's deck if it is in the upload folder, returning its size (None if nothing was deleted)"""
+        if not file_path or not self._in_upload_folder(file_path):
+            return None
+        try:
+            size = os.path.getsize(file_path)
+            os.remove(file_path)
+            return size
+        except FileNotFoundError:
+            return None
+
+    def _remove_orphans(self, upload_dir, referenced, removed):
+        """Delete files in the upload folder no session refers to"""
+        cutoff = time.time() - self.orphan_grace
+        for entry in os.scandir(upload_dir):
+            try:
+                if not entry.is_file() or os.path.realpath(entry.path) in referenced:
+                    continue
+                stat = entry.stat()
+                if stat.st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed['uploads_deleted'] += 1
+                    removed['bytes_reclaimed'] += stat.st_size
+            except FileNotFoundError:
+                continue
+
+    def _read_latencies(self, session_ids):
+        """Sorted milliseconds to load a sample of the remaining sessions"""
+        latencies = []
+        for session_id in random.sample(session_ids, min(self.latency_samples, len(session_ids))):
+            start = time.perf_counter()
+            self.db.get_session(session_id)
+            latencies.append((time.perf_counter() - start) * 1000)
+        return sorted(latencies)
+
+    def stats(self):
+        """Totals since start, the last sweep's results and the current data sizes"""
+        with self._stats_lock:
+            stats = dict(self._totals, last_sweep=dict(self._last))
+        stats['database_bytes'] = self.db.size()
+        stats['archive'] = self.archive.stats()
+        return stats
@@ -0,0 +1,13 @@
+"""Development server: python serve.py (or python app.py, which runs this)
+
+Extraction runs on spawned worker processes, and spawned processes import
+the main module again. Kept apart from app.py, that module is this small
+file, so the workers never repeat the app's setup: its database, LLM
+gateway, caches, thread pools and speech-to-text engine.
+"""
+import os
+
+if __name__ == '__main__':
+    from app import app
+
+    app.run(host='0.0.0.0', port=int(os.getenv('PORT', 5000)), debug=True, use_reloader=False)
@@ -0,0 +1,187 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+SHARED_SCHEMA = """
+CREATE TABLE IF NOT EXISTS shared (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    expires_at REAL
+);
+"""
+
+def worker_id():
+    """Identifies this process among the workers of a deployment"""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+def holder_id():
+    """Identifies the calling thread, the holder of the leases it takes"""
+    return f'{worker_id()}:{threading.get_ident()}'
+
+class _SharedStateBase:
+    """Lease helper common to the backends"""
+
+    @contextmanager
+    def lease(self, name, ttl, wait, poll=0.02):
+        """Hold lease `name` for the block, waiting up to `wait` seconds for it
+
+        Yields whether it was acquired: past `wait` the block runs anyway,
+        so a holder that died without releasing only delays others.
+        """
+        owner = holder_id()
+        deadline = time.monotonic() + wait
+        acquired = self.acquire(name, owner, ttl)
+        while not acquired and time.monotonic() < deadline:
+            time.sleep(poll)
+            acquired = self.acquire(name, owner, ttl)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                self.release(name, owner)
+
+class SQLiteSharedState(_SharedStateBase):
+    """Leases and counters shared by the worker processes of one host
+
+    Kept in their own SQLite file in the data directory; BEGIN IMMEDIATE
+    makes each operation atomic across processes. Values past their
+    expiry read as missing and are removed by expire().
+    """
+
+    def __init__(self, data_dir='data'):
+        self.path = os.path.join(data_dir, 'shared.db')
+        os.makedirs(data_dir, exist_ok=True)
+        self._local = threading.local()
+        self._conn.executescript(SHARED_SCHEMA)
+
+    @property
+    def _conn(self):
+        """Connection owned by the calling thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _write(self, operation):
+        conn = self._conn
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            result = operation(conn)
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        return result
+
+    def get(self, key):
+        """The value of `key`, None if missing or expired"""
+        row = self._conn.execute(
+            'SELECT value FROM shared WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)',
+            (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def put(self, key, value, ttl=None):
+        """Set `key`, expiring after `ttl` seconds if given"""
+        self._write(lambda conn: conn.execute(
+            'INSERT OR REPLACE INTO shared (key, value, expires_at) VALUES (?, ?, ?)',
+            (key, str(value), time.time() + ttl if ttl else None)))
+
+    def incr(self, key, ttl=None):
+        """Add one to the counter `key` (missing counts as 0), returning the new value"""
+        def increment(conn):
+            now = time.time()
+            row = conn.execute(
+                'SELECT value FROM shared WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)',
+                (key, now)).fetchone()
+            value = int(row[0]) + 1 if row else 1
+            conn.execute('INSERT OR REPLACE INTO shared (key, value, expires_at) VALUES (?, ?, ?)',
+                         (key, str(value), now + ttl if ttl else None))
+            return value
+        return self._write(increment)
+
+    def acquire(self, name, owner, ttl):
+        """Take or renew lease `name` for `ttl` seconds, False if someone else holds it"""
+        def take(conn):
+            now = time.time()
+            row = conn.execute('SELECT value, expires_at FROM shared WHERE key = ?', (name,)).fetchone()
+            if row is not None and row[0] != owner and row[1] is not None and row[1] > now:
+                return False
+            conn.execute('INSERT OR REPLACE INTO shared (key, value, expires_at) VALUES (?, ?, ?)',
+                         (name, owner, now + ttl))
+            return True
+        return self._write(take)
+
+    def release(self, name, owner):
+        """Give up lease `name` if `owner` still holds it"""
+        self._write(lambda conn: conn.execute(
+            'DELETE FROM shared WHERE key = ? AND value = ?', (name, owner)))
+
+    def expire(self):
+        """Delete expired values, returning how many"""
+        return self._write(lambda conn: conn.execute(
+            'DELETE FROM shared WHERE expires_at IS NOT NULL AND expires_at <= ?', (time.time(),)
+        ).rowcount)
+
+class MemorySharedState(_SharedStateBase):
+    """In-process stand-in for SQLiteSharedState, for a single worker and for tests"""
+
+    def __init__(self):
+        self._values = {}  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+
+    def _live(self, key, now):
+        value, expires_at = self._values.get(key, (None, None))
+        return value if expires_at is None or expires_at > now else None
+
+    def get(self, key):
+        with self._lock:
+            return self._live(key, time.time())
+
+    def put(self, key, value, ttl=None):
+        with self._lock:
+            self._values[key] = (str(value), time.time() + ttl if ttl else None)
+
+    def incr(self, key, ttl=None):
+        with self._lock:
+            now = time.time()
+            value = int(self._live(key, now) or 0) + 1
+            self._values[key] = (str(value), now + ttl if ttl else None)
+            return value
+
+    def acquire(self, name, owner, ttl):
+        with self._lock:
+            now = time.time()
+            holder = self._live(name, now)
+            if holder is not None and holder != owner:
+                return False
+            self._values[name] = (owner, now + ttl)
+            return True
+
+    def release(self, name, owner):
+        with self._lock:
+            if self._values.get(name, (None,))[0] == owner:
+                del self._values[name]
+
+    def expire(self):
+        with self._lock:
+            now = time.time()
+            expired = [key for key, (_, expires_at) in self._values.items()
+                       if expires_at is not None and expires_at <= now]
+            for key in expired:
+                del self._values[key]
+            return len(expired)
+
+def create_shared_state(backend='memory', data_dir='data'):
+    """Shared state for SHARED_STATE: 'sqlite' (every worker on the host) or 'memory' (one worker)"""
+    if backend == 'sqlite':
+        return SQLiteSharedState(data_dir)
+    if backend == 'memory':
+        return MemorySharedState()
+    raise Exception(f"Unknown shared state backend: {backend}")
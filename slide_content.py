@@ -0,0 +1,234 @@
+import io
+
+import PyPDF2
+from pptx import Presentation
+from pptx.enum.shapes import MSO_SHAPE_TYPE
+
+try:
+    from PIL import Image, ImageStat
+except ImportError:  # image sizes and byte counts only, no contrast or colour figures
+    Image = None
+
+# Bumped whenever the fields of a slide record change, so records cached in an
+# older shape are extracted again rather than served without the new fields
+RECORD_VERSION = 2
+
+# Images narrower or shorter than this look blurry projected on a classroom screen
+LOW_RESOLUTION_PIXELS = 300
+# Decoded images are shrunk to this before their pixels are measured
+THUMBNAIL_SIZE = (96, 96)
+
+def _compact(record):
+    """Drop empty and zero values, which are most of them on a typical slide"""
+    return {key: value for key, value in record.items() if value}
+
+def _record(slide_number, content, **optional):
+    """A slide record: 'slide_number' and 'content' always, the optional fields only when set"""
+    return dict({'slide_number': slide_number, 'content': content}, **_compact(optional))
+
+def records_key(file_hash):
+    """Result cache key of a file's slide records, in the current record shape"""
+    return f'{file_hash}:v{RECORD_VERSION}'
+
+def _walk_shapes(shapes):
+    """Shapes of a slide with groups flattened, in z-order"""
+    for shape in shapes:
+        if shape.shape_type == MSO_SHAPE_TYPE.GROUP:
+            yield from _walk_shapes(shape.shapes)
+        else:
+            yield shape
+
+def _picture(shape):
+    """The shape's image, None for anything that is not a filled picture"""
+    try:
+        return shape.image
+    except (AttributeError, ValueError):
+        return None
+
+def _table_rows(table):
+    return [' | '.join(cell.text.strip() for cell in row.cells) for row in table.rows]
+
+def powerpoint_slides(file_path, start=0, stop=None, prs=None):
+    """Records of PowerPoint slides [start, stop)
+
+    `prs` is the file already opened with python-pptx, to read several
+    ranges of one deck from a single parse.
+
+    Each record holds the slide's text (text boxes, grouped shapes, table
+    rows as `a | b | c` lines and chart titles) under 'content', its
+    speaker notes and a compact 'layout' of counts: words, text boxes,
+    bullets, pictures, tables, charts, whether it has a title and the
+    fraction of the slide its shapes cover. Empty notes, layout and counts
+    are left out; 'content' is '' on a slide with only pictures or notes.
+    """
+    prs = prs if prs is not None else Presentation(file_path)
+    slide_area = (prs.slide_width or 0) * (prs.slide_height or 0)
+    records = []
+    for i, slide in enumerate(list(prs.slides)[start:stop], start):
+        text = []
+        layout = dict.fromkeys(('words', 'text_boxes', 'bullets', 'pictures', 'tables', 'charts'), 0)
+        covered = 0
+        for shape in _walk_shapes(slide.shapes):
+            if shape.width and shape.height:
+                covered += shape.width * shape.height
+            if shape.has_text_frame and shape.text_frame.text.strip():
+                text.append(shape.text_frame.text)
+                layout['text_boxes'] += 1
+                layout['bullets'] += sum(1 for paragraph in shape.text_frame.paragraphs if paragraph.text.strip())
+            elif getattr(shape, 'has_table', False) and shape.has_table:
+                text.append('\n'.join(_table_rows(shape.table)))
+                layout['tables'] += 1
+            elif getattr(shape, 'has_chart', False) and shape.has_chart:
+                layout['charts'] += 1
+                chart = shape.chart
+                if chart.has_title and chart.chart_title.has_text_frame:
+                    text.append(chart.chart_title.text_frame.text)
+            elif _picture(shape) is not None:
+                layout['pictures'] += 1
+
+        notes = slide.notes_slide.notes_text_frame.text.strip() \
+            if slide.has_notes_slide and slide.notes_slide.notes_text_frame is not None else ''
+        if not text and not notes and not layout['pictures'] + layout['tables'] + layout['charts']:
+            continue
+
+        content = '\n'.join(text)
+        title = slide.shapes.title
+        layout['words'] = len(content.split())
+        layout['title'] = int(title is not None and bool(title.text_frame.text.strip()))
+        layout['coverage'] = round(min(1.0, covered / slide_area), 2) if slide_area else 0
+        records.append(_record(i + 1, content, notes=notes, layout=_compact(layout)))
+    return records
+
+def _pdf_images(page):
+    """Image XObjects drawn on a PDF page, read from its resources without decoding them"""
+    resources = page.get('/Resources')
+    xobjects = resources.get_object().get('/XObject') if resources is not None else None
+    if xobjects is None:
+        return []
+    return [obj for obj in (ref.get_object() for ref in xobjects.get_object().values())
+            if obj.get('/Subtype') == '/Image']
+
+def pdf_pages(file_path, start=0, stop=None, pdf_reader=None):
+    """Records of PDF pages [start, stop): 'content' text and a 'layout' of words, lines and pictures
+
+    `pdf_reader` is the file already opened with PyPDF2, to read several
+    ranges of one document from a single parse.
+    """
+    pdf_reader = pdf_reader if pdf_reader is not None else PyPDF2.PdfReader(file_path)
+    records = []
+    stop = len(pdf_reader.pages) if stop is None else min(stop, len(pdf_reader.pages))
+    for i in range(start, stop):
+        page = pdf_reader.pages[i]
+        text = page.extract_text()
+        pictures = len(_pdf_images(page))
+        if not text.strip() and not pictures:
+            continue
+        records.append(_record(i + 1, text if text.strip() else '', layout=_compact({
+            'words': len(text.split()),
+            'lines': sum(1 for line in text.splitlines() if line.strip()),
+            'pictures': pictures
+        })))
+    return records
+
+def _pixel_stats(data):
+    """(contrast, saturation) of an encoded image, each 0-1, or None without Pillow or for an unreadable image"""
+    if Image is None:
+        return None
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.draft('RGB', THUMBNAIL_SIZE)  # JPEGs decode straight at a reduced size
+            image = image.convert('RGB')
+            image.thumbnail(THUMBNAIL_SIZE)
+            contrast = ImageStat.Stat(image.convert('L')).stddev[0] / 128
+            saturation = ImageStat.Stat(image.convert('HSV')).mean[1] / 255
+            return min(1.0, contrast), saturation
+    except Exception:
+        return None
+
+def _summarize_images(images):
+    """Per-slide statistics from (width, height, bytes, coverage, pixel stats) of each image"""
+    if not images:
+        return {}
+    measured = [stats for *_, stats in images if stats is not None]
+    coverage = [area for _, _, _, area, _ in images if area is not None]
+    return _compact({
+        'images': len(images),
+        'megapixels': round(sum(width * height for width, height, *_ in images) / 1e6, 2),
+        'kb': round(sum(size for _, _, size, _, _ in images) / 1024),
+        'low_res': sum(1 for width, height, *_ in images if min(width, height) < LOW_RESOLUTION_PIXELS),
+        'coverage': round(min(1.0, sum(coverage)), 2) if coverage else None,
+        'contrast': round(sum(c for c, _ in measured) / len(measured), 2) if measured else None,
+        'saturation': round(sum(s for _, s in measured) / len(measured), 2) if measured else None
+    })
+
+def inspect_images(file_path, slide_numbers):
+    """{slide_number: image statistics} for the given slides of a .pptx or .pdf
+
+    The slow part of looking at a deck's design: every picture is read and,
+    with Pillow installed, decoded to measure its contrast and colour
+    saturation. Slides without pictures map to {}.
+    """
+    wanted = set(slide_numbers)
+    found = {number: [] for number in wanted}
+    if file_path.lower().endswith('.pptx'):
+        prs = Presentation(file_path)
+        slide_area = (prs.slide_width or 0) * (prs.slide_height or 0)
+        for number, slide in enumerate(prs.slides, 1):
+            if number not in wanted:
+                continue
+            for shape in _walk_shapes(slide.shapes):
+                image = _picture(shape)
+                if image is None:
+                    continue
+                width, height = image.size
+                area = (shape.width * shape.height / slide_area) if slide_area and shape.width and shape.height else None
+                found[number].append((width, height, len(image.blob), area, _pixel_stats(image.blob)))
+    else:
+        with open(file_path, 'rb') as file:
+            pdf_reader = PyPDF2.PdfReader(file)
+            for number in sorted(wanted):
+                if number > len(pdf_reader.pages):
+                    continue
+                page = pdf_reader.pages[number - 1]
+                images = _pdf_images(page)
+                data = []
+                if Image is not None and images:
+                    try:
+                        data = [image.data for image in page.images]
+                    except Exception:
+                        data = []
+                for index, obj in enumerate(images):
+                    stats = _pixel_stats(data[index]) if index < len(data) else None
+                    found[number].append((int(obj.get('/Width', 0)), int(obj.get('/Height', 0)),
+                                          int(obj.get('/Length', 0)), None, stats))
+    return {number: _summarize_images(images) for number, images in found.items()}
+
+def describe_design(slide, images=None):
+    """One line on a slide's layout and pictures, for the design criterion of a scoring prompt
+
+    None for a slide extracted without a layout and with no image statistics.
+    """
+    layout = slide.get('layout') or {}
+    if not layout and not images:
+        return None
+    parts = [f"{layout.get('words', 0)} words"]
+    if layout.get('text_boxes'):
+        parts[0] += f" in {layout['text_boxes']} text boxes"
+    for key, singular in (('bullets', 'bullet line'), ('pictures', 'picture'), ('tables', 'table'),
+                          ('charts', 'chart')):
+        if layout.get(key):
+            parts.append(f"{layout[key]} {singular}{'s' if layout[key] > 1 else ''}")
+    if 'coverage' in layout:
+        parts.append(f"shapes cover {layout['coverage']:.0%} of the slide")
+    if 'text_boxes' in layout and not layout.get('title'):
+        parts.append('no title')
+    if slide.get('notes'):
+        parts.append('has speaker notes')
+    if images:
+        picture = f"images {images.get('megapixels', 0)} MP"
+        if images.get('low_res'):
+            picture += f", {images['low_res']} low-resolution"
+        if 'contrast' in images:
+            picture += f", contrast {images['contrast']:.2f}, saturation {images.get('saturation', 0):.2f}"
+        parts.append(picture)
+    return f"Slide {slide['slide_number']}: " + ', '.join(parts)
@@ -0,0 +1,238 @@
+import math
+import multiprocessing
+import os
+import re
+import threading
+import time
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import PyPDF2
+from pptx import Presentation
+
+from presentation_evaluator import PresentationEvaluator
+from result_cache import hash_file
+from slide_content import inspect_images, pdf_pages, powerpoint_slides
+
+# Documents a worker process keeps parsed, so that the ranges of one file it
+# is given share a single parse instead of re-reading the whole file each
+PARSED_DOCUMENTS = 2
+_parsed = OrderedDict()  # (path, mtime, size) -> Presentation or PdfReader
+
+class ExtractionBudgetExceeded(Exception):
+    """Raised when a presentation takes more time or memory than allowed"""
+
+def _limit_worker_memory(memory_budget):
+    """Process pool initializer capping each worker's address space"""
+    if not memory_budget:
+        return
+    try:
+        import resource
+        resource.setrlimit(resource.RLIMIT_AS, (memory_budget, memory_budget))
+    except (ImportError, ValueError, OSError):
+        # Not supported on this platform; run without a cap
+        pass
+
+def _parsed_document(file_path, file_extension):
+    """The file opened with PyPDF2 or python-pptx, parsed once by this worker process"""
+    stat = os.stat(file_path)
+    key = (file_path, stat.st_mtime_ns, stat.st_size)
+    document = _parsed.pop(key, None)
+    if document is None:
+        document = PyPDF2.PdfReader(file_path) if file_extension == 'pdf' else Presentation(file_path)
+    _parsed[key] = document
+    while len(_parsed) > PARSED_DOCUMENTS:
+        _parsed.popitem(last=False)
+    return document
+
+def _extract_range(file_path, file_extension, start, stop):
+    """Worker task: extract slides [start, stop) of one presentation"""
+    try:
+        document = _parsed_document(file_path, file_extension)
+        if file_extension == 'pdf':
+            return pdf_pages(file_path, start, stop, pdf_reader=document)
+        return powerpoint_slides(file_path, start, stop, prs=document)
+    except MemoryError:
+        raise ExtractionBudgetExceeded(f"Slides {start + 1}-{stop} exceeded the memory budget")
+    except Exception as e:
+        raise Exception(f"Error reading {'PDF' if file_extension == 'pdf' else 'PowerPoint'} file: {str(e)}")
+
+def _inspect_slides(file_path, slide_numbers):
+    """Worker task: image statistics of some slides of one presentation"""
+    try:
+        return inspect_images(file_path, slide_numbers)
+    except MemoryError:
+        raise ExtractionBudgetExceeded(f"Images of slides {slide_numbers} exceeded the memory budget")
+
+def count_slides(file_path):
+    """Count the pages or slides of a presentation without extracting them"""
+    file_extension = file_path.lower().split('.')[-1]
+
+    if file_extension == 'pdf':
+        with open(file_path, 'rb') as file:
+            return len(PyPDF2.PdfReader(file).pages)
+
+    if file_extension == 'pptx':
+        # The slide list lives in presentation.xml; no need to parse every slide part
+        with zipfile.ZipFile(file_path) as package:
+            presentation_xml = package.read('ppt/presentation.xml').decode('utf-8', 'replace')
+        return len(re.findall(r'<p:sldId\b', presentation_xml))
+
+    raise ValueError(f"Unsupported file format: {file_extension}")
+
+class ExtractionEngine:
+    """Extract slide text in parallel across a pool of worker processes
+
+    A presentation is split into about two ranges per worker (never fewer
+    than `chunk_size` slides, to keep the per-task overhead small) which
+    are extracted concurrently. A worker parses a file once and reads every
+    range of it it is given from that parse; iter_slides() yields them in slide order as
+    soon as each range is done, so analysis can start before the last page
+    is parsed. Each file gets a wall-clock `time_budget` (seconds) and each
+    worker process an address-space `memory_budget` (bytes).
+    """
+
+    def __init__(self, max_workers=None, chunk_size=8, time_budget=120, memory_budget=1024 ** 3):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.time_budget = time_budget
+        self.memory_budget = memory_budget
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    @property
+    def pool(self):
+        """Process pool, started on first use"""
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_limit_worker_memory,
+                    initargs=(self.memory_budget,)
+                )
+            return self._pool
+
+    def shutdown(self, wait=True):
+        """Stop the worker processes"""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
+
+    def _discard(self, pool):
+        """Replace a pool broken by a dying worker, stopping its other processes and management thread"""
+        with self._pool_lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def iter_slides(self, file_path):
+        """Yield slide dicts ({'slide_number', 'content', 'notes', 'layout'}) in order as they are extracted"""
+        file_extension = file_path.lower().split('.')[-1]
+        if file_extension not in ('pdf', 'pptx'):
+            # Legacy .ppt and anything else goes through the single-process path
+            yield from PresentationEvaluator.extract_presentation_content(file_path)
+            return
+
+        deadline = time.monotonic() + self.time_budget if self.time_budget else None
+
+        try:
+            slide_count = count_slides(file_path)
+        except Exception as e:
+            raise Exception(f"Error extracting content: {str(e)}")
+
+        chunk_size = max(self.chunk_size, math.ceil(slide_count / (self.max_workers * 2)))
+        pool = self.pool
+        futures = [
+            pool.submit(_extract_range, file_path, file_extension, start,
+                             min(start + chunk_size, slide_count))
+            for start in range(0, slide_count, chunk_size)
+        ]
+
+        try:
+            for future in futures:
+                timeout = max(0, deadline - time.monotonic()) if deadline else None
+                try:
+                    slides = future.result(timeout=timeout)
+                except FutureTimeoutError:
+                    raise ExtractionBudgetExceeded(
+                        f"Extraction exceeded the {self.time_budget}s time budget")
+                except ExtractionBudgetExceeded:
+                    raise
+                except BrokenProcessPool:
+                    # A worker died, most likely killed for exceeding the memory cap
+                    self._discard(pool)
+                    raise ExtractionBudgetExceeded("Extraction worker exceeded the memory budget")
+                except Exception as e:
+                    raise Exception(f"Error extracting content: {str(e)}")
+                yield from slides
+        finally:
+            # Stop queued ranges if the caller bails out or a budget is exceeded
+            for future in futures:
+                future.cancel()
+
+    def extract(self, file_path):
+        """Extract every slide, returning the same list as extract_presentation_content"""
+        return list(self.iter_slides(file_path))
+
+    def inspect_visuals(self, file_path, slide_numbers):
+        """{slide_number: image statistics} of some slides, their images decoded on the pool
+
+        Much slower per slide than extraction, so it is only run for the
+        slides a prompt is about to show, not for the whole deck.
+        """
+        slide_numbers = sorted(set(slide_numbers))
+        if not slide_numbers:
+            return {}
+        # About one group of slides per worker; each group re-opens the file
+        size = math.ceil(len(slide_numbers) / self.max_workers)
+        pool = self.pool
+        futures = [pool.submit(_inspect_slides, file_path, slide_numbers[i:i + size])
+                   for i in range(0, len(slide_numbers), size)]
+        visuals = {}
+        try:
+            for future in futures:
+                try:
+                    visuals.update(future.result(timeout=self.time_budget or None))
+                except FutureTimeoutError:
+                    raise ExtractionBudgetExceeded(
+                        f"Image inspection exceeded the {self.time_budget}s time budget")
+                except BrokenProcessPool:
+                    self._discard(pool)
+                    raise ExtractionBudgetExceeded("Extraction worker exceeded the memory budget")
+        finally:
+            for future in futures:
+                future.cancel()
+        return visuals
+
+class SlideVisuals:
+    """Image statistics of a presentation's slides, computed when first asked for
+
+    Extraction keeps only counts of a slide's pictures; decoding the images
+    themselves waits until a scoring prompt needs the design slides. Results
+    are cached by file content under the 'visuals' namespace, so slides
+    already inspected are never decoded again, by any worker process.
+    """
+
+    def __init__(self, engine=None, cache=None):
+        self.engine = engine
+        self.cache = cache
+
+    def __call__(self, file_path, slide_numbers):
+        file_hash = hash_file(file_path)
+        known = (self.cache.get('visuals', file_hash) if self.cache is not None else None) or {}
+        # JSON keys come back as strings
+        known = {int(number): stats for number, stats in known.items()}
+
+        missing = [number for number in slide_numbers if number not in known]
+        if missing:
+            if self.engine is not None:
+                known.update(self.engine.inspect_visuals(file_path, missing))
+            else:
+                known.update(inspect_images(file_path, missing))
+            if self.cache is not None:
+                self.cache.put('visuals', file_hash, known)
+        return {number: known.get(number, {}) for number in slide_numbers}
@@ -0,0 +1,78 @@
+import math
+import re
+from collections import Counter
+
+STOP_WORDS = {
+    'the', 'and', 'for', 'are', 'with', 'that', 'this', 'from', 'was', 'were', 'has', 'have',
+    'its', 'our', 'their', 'them', 'they', 'you', 'your', 'can', 'will', 'not', 'but', 'all',
+    'into', 'over', 'which', 'when', 'what', 'how', 'why', 'who', 'use', 'used', 'using',
+    'also', 'than', 'then', 'there', 'these', 'those', 'more', 'most', 'such', 'each', 'slide'
+}
+
+def tokenize(text):
+    """Lower-cased content words with a plural 's' stripped"""
+    terms = []
+    for word in re.findall(r'[a-z0-9]+', text.lower()):
+        if len(word) < 3 or word in STOP_WORDS:
+            continue
+        if len(word) > 4 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+class SlideIndex:
+    """BM25 index over the slides of one presentation
+
+    Built once when the deck is processed and stored with the session as a
+    plain dict (to_dict/from_dict), so live turns and scoring can pull the
+    few slides relevant to a query instead of sending the whole deck.
+    Only term statistics and slide numbers are stored; the text stays in
+    the session's content.
+    """
+
+    def __init__(self, slides, doc_freqs, k1=1.5, b=0.75):
+        self.slides = slides  # [{'slide_number': n, 'length': terms, 'terms': {term: count}}]
+        self.doc_freqs = doc_freqs
+        self.k1 = k1
+        self.b = b
+        self.avg_length = sum(slide['length'] for slide in slides) / max(1, len(slides))
+
+    @classmethod
+    def build(cls, content):
+        """Index a list of {'slide_number', 'content'} slides"""
+        slides = []
+        doc_freqs = Counter()
+        for slide in content:
+            terms = Counter(tokenize(slide.get('content', '')))
+            doc_freqs.update(terms.keys())
+            slides.append({'slide_number': slide.get('slide_number'), 'length': sum(terms.values()),
+                           'terms': dict(terms)})
+        return cls(slides, dict(doc_freqs))
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['slides'], data['doc_freqs'], data.get('k1', 1.5), data.get('b', 0.75))
+
+    def to_dict(self):
+        return {'slides': self.slides, 'doc_freqs': self.doc_freqs, 'k1': self.k1, 'b': self.b}
+
+    def search(self, query, k=3):
+        """Top-k (slide_number, score) pairs for a query, best first"""
+        terms = set(tokenize(query))
+        total = len(self.slides)
+        scores = []
+        for slide in self.slides:
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * slide['length'] / (self.avg_length or 1))
+            for term in terms:
+                count = slide['terms'].get(term)
+                if not count:
+                    continue
+                df = self.doc_freqs[term]
+                idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+                score += idf * count * (self.k1 + 1) / (count + norm)
+            if score > 0:
+                scores.append((score, slide['slide_number']))
+
+        scores.sort(key=lambda item: (-item[0], item[1]))
+        return [(number, score) for score, number in scores[:k]]
@@ -0,0 +1,203 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import speech_recognition as sr
+
+try:
+    import numpy as np
+    from transformers import pipeline as hf_pipeline
+except ImportError:  # the local whisper backend is optional
+    hf_pipeline = None
+
+SAMPLE_RATE = 16000
+UNRECOGNIZED = "Could not understand audio"
+
+def load_audio(source):
+    """Decode a WAV/AIFF/FLAC path or file-like object into AudioData"""
+    with sr.AudioFile(source) as audio_file:
+        return sr.Recognizer().record(audio_file)
+
+class GoogleSpeechBackend:
+    """Google Web Speech API, one network request per clip"""
+
+    batch_size = 1
+
+    def __init__(self):
+        self.recognizer = sr.Recognizer()
+
+    def transcribe_batch(self, clips):
+        return [self._transcribe(audio) for audio in clips]
+
+    def _transcribe(self, audio):
+        try:
+            return self.recognizer.recognize_google(audio)
+        except sr.UnknownValueError:
+            return UNRECOGNIZED
+        except sr.RequestError as e:
+            return f"Error with speech recognition: {str(e)}"
+
+class WhisperBackend:
+    """Whisper run locally on CPU (or GPU) through Hugging Face transformers
+
+    A batch of clips is padded and decoded in a single forward pass, so many
+    presenters speaking at once cost little more than one. The model is
+    loaded on the first batch, so processes that never transcribe never
+    hold it.
+    """
+
+    def __init__(self, model='openai/whisper-base.en', batch_size=16, device=-1):
+        if hf_pipeline is None:
+            raise Exception("The whisper STT backend needs the transformers, torch and numpy packages")
+        self.model = model
+        self.device = device
+        self.batch_size = batch_size
+        self._pipeline = None
+        self._lock = threading.Lock()
+
+    @property
+    def pipeline(self):
+        """The Hugging Face pipeline, loaded on first use"""
+        with self._lock:
+            if self._pipeline is None:
+                self._pipeline = hf_pipeline('automatic-speech-recognition', model=self.model, device=self.device)
+            return self._pipeline
+
+    def transcribe_batch(self, clips):
+        inputs = [{
+            'raw': np.frombuffer(audio.get_raw_data(convert_rate=SAMPLE_RATE, convert_width=2),
+                                 dtype=np.int16).astype(np.float32) / 32768.0,
+            'sampling_rate': SAMPLE_RATE
+        } for audio in clips]
+        results = self.pipeline(inputs, batch_size=len(inputs))
+        return [result['text'].strip() or UNRECOGNIZED for result in results]
+
+class FakeSpeechBackend:
+    """Offline stand-in returning a fixed sentence, for benchmarks and local runs
+
+    Each call sleeps `batch_latency` plus `clip_latency` per clip, the cost
+    shape of batched model inference.
+    """
+
+    def __init__(self, batch_size=16, batch_latency=0.0, clip_latency=0.0,
+                 text='We use gradient descent to train the random forest model.'):
+        self.batch_size = batch_size
+        self.batch_latency = batch_latency
+        self.clip_latency = clip_latency
+        self.text = text
+
+    def transcribe_batch(self, clips):
+        time.sleep(self.batch_latency + self.clip_latency * len(clips))
+        return [self.text for _ in clips]
+
+class SpeechEngine:
+    """Thread-safe speech-to-text front end batching concurrent requests
+
+    transcribe() decodes the audio on the calling thread and queues it.
+    One of `workers` threads then gathers whatever else arrives within
+    `max_wait` seconds, up to the backend's batch size, and sends it all
+    to the backend in one call. Worker threads start on first use.
+    """
+
+    def __init__(self, backend, workers=1, max_wait=0.05):
+        self.backend = backend
+        self.workers = workers
+        self.max_wait = max_wait
+
+        self._pending = deque()  # (audio, future)
+        self._condition = threading.Condition()
+        self._threads = []
+        self._stopping = False
+        self._batches = 0
+        self._clips = 0
+
+    def transcribe(self, source):
+        """Transcribe a WAV path or file-like object, blocking until done"""
+        audio = load_audio(source)
+        future = Future()
+        with self._condition:
+            if not self._threads:
+                self._start()
+            self._pending.append((audio, future))
+            self._condition.notify()
+        return future.result()
+
+    def stats(self):
+        """Backend calls made, clips transcribed, clips waiting and the mean batch size"""
+        with self._condition:
+            return {
+                'pending': len(self._pending),
+                'batches': self._batches,
+                'clips': self._clips,
+                'mean_batch_size': self._clips / max(1, self._batches)
+            }
+
+    def shutdown(self):
+        """Stop the workers once the queued clips are transcribed"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+    def _start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f'stt-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _next_batch(self):
+        """Block until clips are queued, then let the batch fill for up to max_wait"""
+        batch_size = self.backend.batch_size
+        with self._condition:
+            while not self._pending:
+                if self._stopping:
+                    return None
+                self._condition.wait()
+
+            deadline = time.monotonic() + self.max_wait
+            while len(self._pending) < batch_size and not self._stopping:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            batch = [self._pending.popleft() for _ in range(min(batch_size, len(self._pending)))]
+            if batch:
+                self._batches += 1
+                self._clips += len(batch)
+            return batch
+
+    def _worker(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            if not batch:
+                # Another worker took the clips while this one waited
+                continue
+
+            try:
+                texts = self.backend.transcribe_batch([audio for audio, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), text in zip(batch, texts):
+                future.set_result(text)
+
+def create_speech_engine(backend='google', model=None, batch_size=16, max_wait=0.05, workers=None, latency=0.0):
+    """Build a SpeechEngine for the named backend: google, whisper or fake (taking `latency` seconds per batch)"""
+    if backend == 'google':
+        # Network bound: no batching, many requests in flight
+        return SpeechEngine(GoogleSpeechBackend(), workers=workers or 16, max_wait=0)
+    if backend == 'whisper':
+        # One model instance whose batches already use every core
+        return SpeechEngine(WhisperBackend(model or 'openai/whisper-base.en', batch_size=batch_size),
+                            workers=workers or 1, max_wait=max_wait)
+    if backend == 'fake':
+        return SpeechEngine(FakeSpeechBackend(batch_size=batch_size, batch_latency=latency), workers=workers or 1,
+                            max_wait=max_wait)
+    raise Exception(f"Unknown STT backend: {backend}")
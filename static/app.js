@@ -1,8 +1,13 @@
+// Decks larger than this are sent through the resumable /api/uploads endpoints
+const CHUNKED_UPLOAD_BYTES = 8 * 1024 * 1024;
+
 class PresentationEvaluator {
     constructor() {
         this.currentSessionId = null;
         this.mediaRecorder = null;
         this.audioChunks = [];
+        this.streamSocket = null;
+        this.audioCapture = null;
         this.isRecording = false;
         this.evaluationActive = false;
         
@@ -74,12 +79,19 @@ class PresentationEvaluator {
     }
     
     async uploadPresentation() {
+        const file = document.getElementById('fileInput').files[0];
         const formData = new FormData();
         formData.append('roll_no', document.getElementById('rollNo').value);
         formData.append('name', document.getElementById('studentName').value);
-        formData.append('file', document.getElementById('fileInput').files[0]);
         
         try {
+            // Large decks go up in resumable chunks, surviving dropped connections
+            if (file && file.size > CHUNKED_UPLOAD_BYTES) {
+                formData.append('upload_id', await this.uploadInChunks(file));
+            } else {
+                formData.append('file', file);
+            }
+            
             const response = await fetch('/api/submit', {
                 method: 'POST',
                 body: formData
@@ -90,7 +102,7 @@ class PresentationEvaluator {
             if (response.ok) {
                 this.currentSessionId = result.session_id;
                 this.showStatusSection();
-                this.pollStatus(result.session_id);
+                this.watchStatus(result.session_id);
             } else {
                 this.showError(result.error);
             }
@@ -99,6 +111,47 @@ class PresentationEvaluator {
         }
     }
     
+    async uploadInChunks(file) {
+        const response = await fetch('/api/uploads', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ filename: file.name, size: file.size })
+        });
+        const upload = await response.json();
+        if (!response.ok) {
+            throw new Error(upload.error);
+        }
+        
+        let offset = upload.offset;
+        let failures = 0;
+        while (offset < file.size) {
+            let chunk;
+            try {
+                chunk = await fetch(`${upload.upload_url}?offset=${offset}`, {
+                    method: 'PUT',
+                    body: file.slice(offset, offset + upload.chunk_bytes)
+                });
+            } catch (error) {
+                // Connection lost: back off and send the chunk again
+                if (++failures > 5) {
+                    throw error;
+                }
+                await new Promise(resolve => setTimeout(resolve, 1000 * failures));
+                continue;
+            }
+            
+            const result = await chunk.json();
+            // A 409 carries the offset the server actually reached
+            if (!chunk.ok && chunk.status !== 409) {
+                throw new Error(result.error);
+            }
+            offset = result.offset;
+            failures = 0;
+            this.updateFileName(`${file.name} (${Math.floor(100 * offset / file.size)}% uploaded)`);
+        }
+        return upload.upload_id;
+    }
+    
     showStatusSection() {
         document.getElementById('uploadSection').style.display = 'none';
         document.getElementById('statusSection').style.display = 'block';
@@ -132,30 +185,72 @@ class PresentationEvaluator {
         progressBar.style.width = `${progressMap[status] || 0}%`;
     }
     
+    watchStatus(sessionId) {
+        // Server-sent events push each status change; fall back to polling without them
+        if (!window.EventSource) {
+            this.pollStatus(sessionId);
+            return;
+        }
+        
+        const source = new EventSource(`/api/status-stream/${sessionId}`);
+        
+        source.addEventListener('status', (event) => {
+            const result = JSON.parse(event.data);
+            if (result.status === 'ready') {
+                return;  // the 'ready' event with the analysis follows
+            }
+            if (this.handleStatus(result)) {
+                source.close();
+            }
+        });
+        
+        source.addEventListener('ready', (event) => {
+            source.close();
+            this.handleStatus(JSON.parse(event.data));
+        });
+        
+        source.onerror = () => {
+            // The browser reconnects by itself unless the server refused the stream
+            if (source.readyState === EventSource.CLOSED) {
+                this.pollStatus(sessionId);
+            }
+        };
+    }
+    
+    handleStatus(result) {
+        // Returns true once the status is final and no more updates are expected
+        if (result.status.startsWith('error')) {
+            this.updateStatus('error', this.getStatusMessage('error'));
+            this.showError('Processing failed: ' + result.status);
+            return true;
+        }
+        
+        this.updateStatus(result.status, this.getStatusMessage(result.status));
+        
+        if (result.status === 'ready') {
+            // Show start presentation button
+            document.getElementById('statusMessage').innerHTML = `
+                <div class="text-center">
+                    <h5>Your presentation is ready for evaluation!</h5>
+                    <button class="btn btn-success btn-lg" onclick="app.startPresentation()">
+                        <i class="fas fa-play"></i> Start Presentation
+                    </button>
+                </div>
+            `;
+            return true;
+        }
+        
+        return result.status === 'completed';
+    }
+    
     async pollStatus(sessionId) {
         try {
-            const response = await fetch(`/api/status/${sessionId}`);
+            const response = await fetch(`/api/status/${sessionId}?fields=status,queue_position`);
             const result = await response.json();
             
-            if (response.ok) {
-                this.updateStatus(result.status, this.getStatusMessage(result.status));
-                
-                if (result.status === 'ready') {
-                    // Show start presentation button
-                    document.getElementById('statusMessage').innerHTML = `
-                        <div class="text-center">
-                            <h5>Your presentation is ready for evaluation!</h5>
-                            <button class="btn btn-success btn-lg" onclick="app.startPresentation()">
-                                <i class="fas fa-play"></i> Start Presentation
-                            </button>
-                        </div>
-                    `;
-                } else if (result.status === 'error') {
-                    this.showError('Processing failed: ' + result.status);
-                } else if (result.status !== 'completed') {
-                    // Continue polling
-                    setTimeout(() => this.pollStatus(sessionId), 3000);
-                }
+            if (response.ok && !this.handleStatus(result)) {
+                // Continue polling
+                setTimeout(() => this.pollStatus(sessionId), 3000);
             }
         } catch (error) {
             console.error('Status polling error:', error);
@@ -227,6 +322,32 @@ class PresentationEvaluator {
         this.scrollToBottom();
     }
     
+    appendAgentText(text) {
+        // Grow the reply being streamed, starting it on the first piece
+        let reply = document.getElementById('streamingReply');
+        if (!reply) {
+            const conversationHistory = document.getElementById('conversationHistory');
+            const messageDiv = document.createElement('div');
+            messageDiv.className = 'agent-message';
+            messageDiv.innerHTML = '<i class="fas fa-robot"></i> <span id="streamingReply"></span>';
+            conversationHistory.appendChild(messageDiv);
+            reply = document.getElementById('streamingReply');
+        }
+        reply.textContent += text;
+        this.scrollToBottom();
+    }
+    
+    finishAgentMessage(message) {
+        // The complete reply replaces the streamed pieces, or is shown whole if none arrived
+        const reply = document.getElementById('streamingReply');
+        if (reply) {
+            reply.textContent = message;
+            reply.removeAttribute('id');
+        } else {
+            this.addAgentMessage(message);
+        }
+    }
+    
     addStudentMessage(message) {
         const conversationHistory = document.getElementById('conversationHistory');
         const messageDiv = document.createElement('div');
@@ -244,6 +365,19 @@ class PresentationEvaluator {
     }
     
     async startRecording() {
+        const config = window.EVALUATOR_CONFIG || {};
+        
+        // Prefer streaming raw audio over the WebSocket; fall back to chunk uploads
+        if (config.wsPort && window.WebSocket && (window.AudioContext || window.webkitAudioContext)) {
+            try {
+                await this.startStreaming(config.wsPort);
+                this.setRecordingUi(true);
+                return;
+            } catch (error) {
+                console.warn('Audio streaming unavailable, uploading recordings instead:', error);
+            }
+        }
+        
         try {
             const stream = await navigator.mediaDevices.getUserMedia({ audio: true });
             this.mediaRecorder = new MediaRecorder(stream);
@@ -259,12 +393,7 @@ class PresentationEvaluator {
             
             this.mediaRecorder.start();
             this.isRecording = true;
-            
-            // Update UI
-            document.getElementById('startRecording').style.display = 'none';
-            document.getElementById('stopRecording').style.display = 'inline-block';
-            document.getElementById('recordingStatus').className = 'badge bg-danger recording';
-            document.getElementById('recordingStatus').textContent = 'Recording...';
+            this.setRecordingUi(true);
             
         } catch (error) {
             this.showError('Microphone access denied: ' + error.message);
@@ -272,21 +401,137 @@ class PresentationEvaluator {
     }
     
     stopRecording() {
-        if (this.mediaRecorder && this.isRecording) {
+        if (this.audioCapture) {
+            this.stopStreaming();
+            this.setRecordingUi(false);
+        } else if (this.mediaRecorder && this.isRecording) {
             this.mediaRecorder.stop();
             this.isRecording = false;
-            
-            // Update UI
-            document.getElementById('startRecording').style.display = 'inline-block';
-            document.getElementById('stopRecording').style.display = 'none';
-            document.getElementById('recordingStatus').className = 'badge bg-secondary';
-            document.getElementById('recordingStatus').textContent = 'Not Recording';
+            this.setRecordingUi(false);
             
             // Stop all tracks
             this.mediaRecorder.stream.getTracks().forEach(track => track.stop());
         }
     }
     
+    setRecordingUi(recording) {
+        document.getElementById('startRecording').style.display = recording ? 'none' : 'inline-block';
+        document.getElementById('stopRecording').style.display = recording ? 'inline-block' : 'none';
+        document.getElementById('recordingStatus').className = recording ? 'badge bg-danger recording' : 'badge bg-secondary';
+        document.getElementById('recordingStatus').textContent = recording ? 'Recording...' : 'Not Recording';
+    }
+    
+    async openStreamSocket(wsPort) {
+        if (this.streamSocket && this.streamSocket.readyState === WebSocket.OPEN) {
+            return this.streamSocket;
+        }
+        
+        const protocol = location.protocol === 'https:' ? 'wss' : 'ws';
+        const socket = new WebSocket(`${protocol}://${location.hostname}:${wsPort}/ws/${this.currentSessionId}`);
+        socket.binaryType = 'arraybuffer';
+        
+        await new Promise((resolve, reject) => {
+            socket.onopen = resolve;
+            socket.onerror = () => reject(new Error('WebSocket connection failed'));
+        });
+        
+        socket.onmessage = (event) => this.handleStreamMessage(JSON.parse(event.data));
+        this.streamSocket = socket;
+        return socket;
+    }
+    
+    async startStreaming(wsPort) {
+        const socket = await this.openStreamSocket(wsPort);
+        const stream = await navigator.mediaDevices.getUserMedia({ audio: true });
+        
+        const AudioContextClass = window.AudioContext || window.webkitAudioContext;
+        const context = new AudioContextClass();
+        const source = context.createMediaStreamSource(stream);
+        const processor = context.createScriptProcessor(4096, 1, 1);
+        const targetRate = 16000;
+        
+        socket.send(JSON.stringify({ type: 'start', sample_rate: targetRate }));
+        
+        processor.onaudioprocess = (event) => {
+            if (socket.readyState === WebSocket.OPEN) {
+                socket.send(this.toPcm16(event.inputBuffer.getChannelData(0), context.sampleRate, targetRate));
+            }
+        };
+        
+        source.connect(processor);
+        processor.connect(context.destination);
+        
+        this.audioCapture = { stream, context, source, processor };
+        this.isRecording = true;
+    }
+    
+    stopStreaming() {
+        const { stream, context, source, processor } = this.audioCapture;
+        processor.disconnect();
+        source.disconnect();
+        stream.getTracks().forEach(track => track.stop());
+        context.close();
+        this.audioCapture = null;
+        this.isRecording = false;
+        
+        // Close the current utterance; the socket stays open for the reply
+        if (this.streamSocket && this.streamSocket.readyState === WebSocket.OPEN) {
+            this.streamSocket.send(JSON.stringify({ type: 'end' }));
+        }
+    }
+    
+    closeStreamSocket() {
+        if (this.streamSocket) {
+            this.streamSocket.close();
+            this.streamSocket = null;
+        }
+    }
+    
+    toPcm16(samples, inputRate, targetRate) {
+        // Downsample to the target rate and convert to 16-bit little-endian PCM
+        const ratio = inputRate / targetRate;
+        const length = Math.floor(samples.length / ratio);
+        const pcm = new Int16Array(length);
+        for (let i = 0; i < length; i++) {
+            const sample = Math.max(-1, Math.min(1, samples[Math.floor(i * ratio)]));
+            pcm[i] = sample < 0 ? sample * 0x8000 : sample * 0x7FFF;
+        }
+        return pcm.buffer;
+    }
+    
+    handleStreamMessage(message) {
+        if (message.type === 'partial') {
+            this.showPartialTranscript(message.text);
+        } else if (message.type === 'transcript') {
+            this.showPartialTranscript(null);
+            this.addStudentMessage(message.text);
+        } else if (message.type === 'response_delta') {
+            this.appendAgentText(message.text);
+        } else if (message.type === 'response') {
+            this.finishAgentMessage(message.text);
+        } else if (message.type === 'error') {
+            this.showError('Audio processing failed: ' + message.text);
+        }
+    }
+    
+    showPartialTranscript(text) {
+        let partial = document.getElementById('partialTranscript');
+        if (text === null) {
+            if (partial) partial.remove();
+            return;
+        }
+        
+        if (!partial) {
+            partial = document.createElement('div');
+            partial.id = 'partialTranscript';
+            partial.className = 'student-message';
+            partial.style.opacity = '0.6';
+            document.getElementById('conversationHistory').appendChild(partial);
+        }
+        partial.innerHTML = `<i class="fas fa-user"></i> ${text}...`;
+        this.scrollToBottom();
+    }
+    
     async processAudio() {
         const audioBlob = new Blob(this.audioChunks, { type: 'audio/wav' });
         const formData = new FormData();
@@ -301,8 +546,71 @@ class PresentationEvaluator {
             const result = await response.json();
             
             if (response.ok) {
+                // The server answers straight away; the reply streams in as it is generated
+                if (window.EventSource && result.stream_url) {
+                    this.followAudioResult(result.stream_url, result.result_url);
+                } else {
+                    this.awaitAudioResult(result.result_url);
+                }
+            } else {
+                this.showError('Audio processing failed: ' + result.error);
+            }
+        } catch (error) {
+            this.showError('Network error: ' + error.message);
+        }
+    }
+    
+    followAudioResult(streamUrl, resultUrl) {
+        // Server-sent events carry the transcript, then the reply piece by piece
+        const source = new EventSource(streamUrl);
+        let transcriptShown = false;
+        
+        source.addEventListener('transcript', (event) => {
+            transcriptShown = true;
+            this.addStudentMessage(JSON.parse(event.data).text);
+        });
+        
+        source.addEventListener('delta', (event) => {
+            this.appendAgentText(JSON.parse(event.data).text);
+        });
+        
+        source.addEventListener('done', (event) => {
+            source.close();
+            const result = JSON.parse(event.data);
+            if (!transcriptShown) {
                 this.addStudentMessage(result.transcript);
-                this.addAgentMessage(result.response);
+            }
+            this.finishAgentMessage(result.response);
+            
+            if (!result.continue) {
+                this.completeEvaluation();
+            }
+        });
+        
+        source.addEventListener('error', (event) => {
+            // Either the server's own error event or a dropped connection
+            source.close();
+            if (event.data) {
+                this.showError('Audio processing failed: ' + JSON.parse(event.data).error);
+            } else {
+                this.awaitAudioResult(resultUrl, transcriptShown);
+            }
+        });
+    }
+    
+    async awaitAudioResult(resultUrl, transcriptShown = false) {
+        try {
+            const response = await fetch(resultUrl);
+            const result = await response.json();
+            
+            if (response.status === 202) {
+                // Still transcribing - check again shortly
+                setTimeout(() => this.awaitAudioResult(resultUrl, transcriptShown), 500);
+            } else if (response.ok) {
+                if (!transcriptShown) {
+                    this.addStudentMessage(result.transcript);
+                }
+                this.finishAgentMessage(result.response);
                 
                 if (!result.continue) {
                     this.completeEvaluation();
@@ -311,7 +619,8 @@ class PresentationEvaluator {
                 this.showError('Audio processing failed: ' + result.error);
             }
         } catch (error) {
-            this.showError('Network error: ' + error.message);
+            console.error('Audio result error:', error);
+            setTimeout(() => this.awaitAudioResult(resultUrl, transcriptShown), 1000);
         }
     }
     
@@ -324,6 +633,7 @@ class PresentationEvaluator {
         if (this.isRecording) {
             this.stopRecording();
         }
+        this.closeStreamSocket();
         
         try {
             const response = await fetch(`/api/complete-evaluation/${this.currentSessionId}`, {
@@ -434,6 +744,7 @@ class PresentationEvaluator {
         // Reset all forms and variables
         this.currentSessionId = null;
         this.evaluationActive = false;
+        this.closeStreamSocket();
         
         // Reset form
         document.getElementById('uploadForm').reset();
@@ -0,0 +1,42 @@
+import itertools
+import threading
+from collections import OrderedDict
+
+class StatusBroadcaster:
+    """In-process fan-out of session status changes to waiting clients
+
+    Publishers record each transition with publish(); subscribers block in
+    wait() until the session's status moves past the version they last saw,
+    so an idle client costs a sleeping thread rather than repeated requests.
+    Only the latest status per session is kept, for at most `max_sessions`
+    recently changed sessions.
+    """
+
+    def __init__(self, max_sessions=10000):
+        self.max_sessions = max_sessions
+        self._latest = OrderedDict()  # session_id -> (version, status)
+        self._versions = itertools.count(1)
+        self._condition = threading.Condition()
+
+    def publish(self, session_id, status):
+        """Record a new status and wake everyone waiting on the session"""
+        with self._condition:
+            self._latest.pop(session_id, None)
+            self._latest[session_id] = (next(self._versions), status)
+            while len(self._latest) > self.max_sessions:
+                self._latest.popitem(last=False)
+            self._condition.notify_all()
+
+    def version(self, session_id):
+        """Version of the session's latest published status, 0 if none"""
+        with self._condition:
+            return self._latest.get(session_id, (0, None))[0]
+
+    def wait(self, session_id, after_version, timeout):
+        """Return (version, status) once newer than after_version, or None on timeout"""
+        def newer():
+            latest = self._latest.get(session_id)
+            return latest if latest and latest[0] > after_version else None
+
+        with self._condition:
+            return self._condition.wait_for(newer, timeout)
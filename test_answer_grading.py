@@ -0,0 +1,70 @@
+"""Local grading of answers and escalation of ambiguous ones to the LLM"""
+
+from answer_grading import QUESTION_CRITERION, AnswerGrader, grade_locally, last_question
+from database import Database
+from fake_llm import FakeOpenAIClient
+
+QUESTION = 'Why did you use dropout in the network?'
+KEYPOINTS = ['dropout reduces overfitting', 'regularization']
+
+def test_answer_covering_keypoints_scores_high():
+    grade = grade_locally(QUESTION, 'Dropout reduces overfitting; it is a kind of regularization.', KEYPOINTS)
+
+    assert grade['coverage'] == 1.0
+    assert grade['score'] > 0.7
+
+def test_hedged_and_short_answers_score_low():
+    assert grade_locally(QUESTION, "I don't know, maybe it regularizes the dropout overfitting",
+                         KEYPOINTS)['score'] <= 0.2
+    assert grade_locally(QUESTION, 'Dropout', KEYPOINTS)['score'] <= 0.1
+
+def test_last_question():
+    assert last_question('Good. What is a loss function? And why this one?') == 'And why this one?'
+    assert last_question('Thank you.') is None
+
+def test_escalates_only_ambiguous_grades():
+    grader = AnswerGrader(FakeOpenAIClient())
+
+    assert grader.escalates({'score': 0.5, 'coverage': 0.5, 'similarity': 0.5, 'words': 10})
+    assert not grader.escalates({'score': 0.9, 'coverage': 1.0, 'similarity': 1.0, 'words': 10})
+    assert not grader.escalates({'score': 0.1, 'coverage': 0.0, 'similarity': 0.0, 'words': 2})
+    # On topic, but nothing to check it against
+    assert grader.escalates({'score': 0.9, 'coverage': None, 'similarity': 0.9, 'words': 10})
+
+def test_open_question_is_answered_by_the_next_turn():
+    grader = AnswerGrader(FakeOpenAIClient())
+    grader.ask('s1', QUESTION, KEYPOINTS)
+
+    grade = grader.answer('s1', 'Dropout reduces overfitting, which is regularization.')
+
+    assert grade['method'] == 'local'
+    assert grader.answer('s1', 'Another turn') is None
+    assert grader.entries('s1')[0]['question'] == QUESTION
+
+def test_ambiguous_answer_is_regraded_by_the_llm():
+    grader = AnswerGrader(FakeOpenAIClient())
+
+    grader.record('s1', QUESTION, 'It helps the network on data it has not seen before, I think.')
+
+    grades = grader.grades('s1', wait=5)
+    assert grades[0]['method'] == 'llm'
+    assert 'local_score' in grades[0]
+
+def test_apply_replaces_question_points(tmp_path):
+    db = Database(str(tmp_path))
+    db.create_evaluation({'session_id': 's1', 'status': 'in_progress'})
+    grader = AnswerGrader(FakeOpenAIClient(), db=db)
+    grader.record('s1', QUESTION, 'Dropout reduces overfitting, which is regularization.', KEYPOINTS)
+    result = {'scores': {QUESTION_CRITERION: 2, 'Project Content': 15}, 'total_score': 17,
+              'feedback': {QUESTION_CRITERION: 'Answered.'}}
+
+    result = grader.apply('s1', result)
+
+    assert result['scores'][QUESTION_CRITERION] > 7
+    assert result['total_score'] == 15 + result['scores'][QUESTION_CRITERION]
+    assert result['feedback'][QUESTION_CRITERION].startswith('Answered. 1 questions answered')
+
+def test_apply_without_answers_leaves_result():
+    result = {'scores': {QUESTION_CRITERION: 6}, 'total_score': 6}
+
+    assert AnswerGrader(FakeOpenAIClient()).apply('s1', dict(result)) == result
@@ -0,0 +1,130 @@
+"""SQLite storage of sessions, evaluations and their entries"""
+
+import json
+import threading
+
+import pytest
+
+from database import Database
+
+@pytest.fixture
+def db(tmp_path):
+    db = Database(str(tmp_path))
+    yield db
+    db.close()
+
+def _session(db, session_id='s1'):
+    db.create_session({'session_id': session_id, 'roll_no': '42', 'name': 'Ada', 'status': 'uploaded'})
+    db.create_evaluation({'session_id': session_id, 'status': 'in_progress'})
+
+def test_status_update_keeps_the_rest_of_the_record(db):
+    _session(db)
+
+    assert db.update_session_status('s1', 'analyzed')
+
+    session = db.get_session('s1')
+    assert session['status'] == 'analyzed'
+    assert session['name'] == 'Ada'
+
+def test_evaluation_fields_are_set_in_place(db):
+    _session(db)
+    db.add_transcript_entry('s1', 'hello')
+
+    assert db.update_evaluation_fields('s1', open_question={'question': 'Why?', 'keypoints': ['data']},
+                                       pending_turns=2)
+
+    evaluation = db.get_evaluation('s1')
+    assert evaluation['open_question'] == {'question': 'Why?', 'keypoints': ['data']}
+    assert evaluation['pending_turns'] == 2
+    assert evaluation['status'] == 'in_progress'
+    assert evaluation['transcript'][0]['text'] == 'hello'
+
+def test_fields_with_any_name_round_trip(db):
+    _session(db)
+
+    assert db.update_evaluation_fields('s1', **{'bank.asked': [1, 2], 'open-question': None})
+
+    assert db.get_evaluation_fields('s1', 'bank.asked', 'open-question', 'status') == {
+        'bank.asked': '[1,2]', 'open-question': None, 'status': 'in_progress'}
+
+def test_updates_of_missing_records_report_it(db):
+    assert not db.update_session_status('missing', 'analyzed')
+    assert not db.update_evaluation_fields('missing', status='completed')
+    assert not db.add_transcript_entry('missing', 'hello')
+    assert not db.add_question_answer('missing', 'Why?', 'Because')
+
+def test_entries_come_back_in_order(db):
+    _session(db)
+    for text in ('one', 'two', 'three'):
+        db.add_transcript_entry('s1', text)
+    db.add_question_answer('s1', 'Why?', 'Because')
+
+    evaluation = db.get_evaluation('s1')
+    assert [entry['text'] for entry in evaluation['transcript']] == ['one', 'two', 'three']
+    assert evaluation['questions_asked'][0]['question'] == 'Why?'
+    assert evaluation['answers_given'][0]['answer'] == 'Because'
+
+def test_concurrent_writes_are_not_lost(db):
+    _session(db)
+
+    def write(worker):
+        for i in range(25):
+            db.add_transcript_entry('s1', f'{worker}-{i}')
+            db.update_session_status('s1', f'{worker}-{i}')
+
+    threads = [threading.Thread(target=write, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    texts = [entry['text'] for entry in db.get_evaluation('s1')['transcript']]
+    assert sorted(texts) == sorted(f'{worker}-{i}' for worker in range(4) for i in range(25))
+    assert db.get_session('s1')['status'].endswith('-24')
+
+def test_failed_transaction_is_rolled_back(db):
+    _session(db)
+
+    with pytest.raises(RuntimeError):
+        with db._transaction():
+            db._conn.execute('DELETE FROM sessions WHERE session_id = ?', ('s1',))
+            raise RuntimeError('interrupted')
+
+    assert db.get_session('s1') is not None
+
+def test_complete_evaluation(db):
+    _session(db)
+
+    assert db.complete_evaluation('s1', {'scores': {'Project Content': 15}, 'total_score': 15})
+
+    evaluation = db.get_evaluation('s1')
+    assert evaluation['status'] == 'completed'
+    assert evaluation['total_score'] == 15
+    assert evaluation['name'] == 'Ada'
+    assert db.get_session('s1')['status'] == 'completed'
+
+def test_delete_session_removes_its_entries(db):
+    _session(db)
+    db.add_transcript_entry('s1', 'hello')
+
+    assert db.delete_session('s1')
+    assert db.get_session('s1') is None
+    assert db.get_evaluation('s1') is None
+    assert not db.delete_session('s1')
+
+def test_json_files_are_migrated_once(tmp_path):
+    sessions = {'s1': {'session_id': 's1', 'roll_no': '42', 'name': 'Ada', 'status': 'completed'}}
+    evaluations = {'s1': {'session_id': 's1', 'status': 'completed',
+                          'transcript': [{'text': 'hello', 'timestamp': '2024-01-01T00:00:00'}],
+                          'questions_asked': [{'question': 'Why?'}], 'answers_given': [{'answer': 'Because'}]}}
+    for name, records in (('sessions.json', sessions), ('evaluations.json', evaluations)):
+        with open(tmp_path / name, 'w') as f:
+            json.dump(records, f)
+
+    db = Database(str(tmp_path))
+
+    assert db.get_session('s1')['name'] == 'Ada'
+    assert db.get_evaluation('s1')['transcript'][0]['text'] == 'hello'
+    assert (tmp_path / 'sessions.json.migrated').exists()
+    assert db.migrate_from_json() == 0
+    db.close()
@@ -0,0 +1,119 @@
+"""Segment-by-segment scoring of a presentation while it is given"""
+
+import time
+
+import pytest
+
+from database import Database
+from fake_llm import FakeOpenAIClient
+from incremental_scoring import (SCORING_CRITERIA, IncrementalScorer, clamp_scores, criteria_listing,
+                                 criteria_slides)
+
+TURNS = [
+    'Our project predicts crop yield from satellite images.',
+    'We trained a random forest and compared it with gradient boosting.',
+    'Cross validation gave an accuracy of 87 percent on held out farms.',
+    'The main limitation is cloud cover in the monsoon season.',
+]
+
+@pytest.fixture
+def db(tmp_path):
+    db = Database(str(tmp_path))
+    db.create_session({'session_id': 's1', 'roll_no': '42', 'name': 'Ada', 'status': 'analyzed',
+                       'content': [{'slide_number': 1, 'content': 'Crop yield from satellite images'}]})
+    db.create_evaluation({'session_id': 's1', 'status': 'in_progress'})
+    yield db
+    db.close()
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+def _present(db, scorer, turns):
+    for turn in turns:
+        db.add_transcript_entry('s1', turn)
+        scorer.add_turn('s1', turn, 'Can you say more?')
+
+def test_clamp_scores_fills_and_bounds_every_criterion():
+    scores = clamp_scores({'Project Content': 99, 'Algorithm Used': -3, 'Student Skill Level': 'n/a'})
+
+    assert set(scores) == set(name for name, _, _ in SCORING_CRITERIA)
+    assert scores['Project Content'] == 20
+    assert scores['Algorithm Used'] == 0
+    assert scores['Student Skill Level'] == 0
+
+def test_criteria_listing_points_at_slides():
+    listing = criteria_listing({'Project Content': [1, 3]})
+
+    assert listing.startswith('1. Project Content (20 points)')
+    assert '[see slides 1, 3]' in listing
+
+def test_criteria_slides_are_found_with_the_deck_analysis():
+    content = [{'slide_number': 1, 'content': 'Crop yield prediction from satellite images'},
+               {'slide_number': 2, 'content': 'Random forest and gradient boosting models'},
+               {'slide_number': 3, 'content': 'Accuracy chart', 'layout': {'charts': 1}},
+               {'slide_number': 4, 'content': 'Thank you'}]
+    analysis = {'topic': 'crop yield prediction', 'concepts': ['satellite images'],
+                'algorithms': ['random forest', 'gradient boosting']}
+
+    slides, text = criteria_slides({'content': content, 'analysis': analysis}, per_criterion=1)
+
+    assert slides['Project Content'] == [1]
+    assert slides['Algorithm Used'] == [2]
+    assert slides['Slide Design & Visuals'] == [3]
+    # Nothing in the analysis reads like question handling: the best match for the whole deck
+    assert slides['Handling of Questions'] == [1]
+    assert 'Slide 4' not in text
+
+def test_segments_are_scored_during_the_talk(db):
+    scorer = IncrementalScorer(FakeOpenAIClient(), db=db, segment_turns=2)
+
+    def scored():
+        return (db.get_evaluation('s1').get('running_scores') or {}).get('turns_scored')
+
+    _present(db, scorer, TURNS[:2])
+    assert _wait_for(lambda: scored() == 2)
+    _present(db, scorer, TURNS[2:])
+    assert _wait_for(lambda: scored() == 4)
+    result = scorer.finalize('s1', db.get_evaluation('s1'))
+    assert result['pending_turns'] == 0
+    assert result['total_score'] == sum(result['scores'].values())
+
+def test_turns_left_at_the_end_are_folded_in_after_close(db):
+    scorer = IncrementalScorer(FakeOpenAIClient(), db=db, segment_turns=2, finalize_wait=0)
+    _present(db, scorer, TURNS[:2])
+    assert _wait_for(lambda: db.get_evaluation('s1').get('running_scores'))
+    _present(db, scorer, TURNS[2:3])
+
+    result = scorer.finalize('s1', db.get_evaluation('s1'))
+    assert result['pending_turns'] == 1
+    db.complete_evaluation('s1', result)
+    scorer.close('s1')
+
+    assert _wait_for(lambda: db.get_evaluation('s1')['running_scores']['turns_scored'] == 3)
+    assert db.get_evaluation('s1')['pending_turns'] == 0
+
+def test_nothing_scored_yet_gives_none(db):
+    scorer = IncrementalScorer(FakeOpenAIClient(), db=db, segment_turns=3)
+    _present(db, scorer, TURNS[:1])
+
+    assert scorer.finalize('s1', db.get_evaluation('s1')) is None
+
+def test_short_talk_keeps_the_one_shot_result(db):
+    client = FakeOpenAIClient()
+    scorer = IncrementalScorer(client, db=db, segment_turns=3)
+    _present(db, scorer, TURNS[:1])
+
+    assert scorer.finalize('s1', db.get_evaluation('s1')) is None
+    db.complete_evaluation('s1', {'scores': {'Project Content': 12}, 'total_score': 12})
+    calls = client.calls
+    scorer.close('s1')
+
+    time.sleep(0.1)
+    assert client.calls == calls
+    assert db.get_evaluation('s1')['total_score'] == 12
+    assert 'running_scores' not in db.get_evaluation('s1')
@@ -0,0 +1,135 @@
+"""Persistent background job queue: retries, capacity, leases and recovery"""
+
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from database import Database
+from job_queue import JobQueue, QueueFullError
+
+class FlakyDatabase(Database):
+    """Fails to delete the first finished job, as when the database stays busy past its timeout"""
+
+    def __init__(self, data_dir):
+        super().__init__(data_dir)
+        self.delete_failures = 1
+
+    def delete_job(self, job_id):
+        if self.delete_failures:
+            self.delete_failures -= 1
+            raise RuntimeError('database is locked')
+        return super().delete_job(job_id)
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+def _queue(db, handler, **options):
+    queue = JobQueue(db, handler, **dict(dict(workers=1, retry_delay=0.01, poll_interval=0.01), **options))
+    queue.start()
+    return queue
+
+def test_failed_job_is_retried(tmp_path):
+    db = Database(str(tmp_path))
+    calls = []
+    done = threading.Event()
+
+    def handler(session_id, **payload):
+        calls.append(payload)
+        if len(calls) == 1:
+            raise RuntimeError('first attempt fails')
+        done.set()
+
+    queue = _queue(db, handler)
+    queue.submit('s1', file_path='deck.pptx')
+    try:
+        assert done.wait(5)
+        assert _wait_for(lambda: not db.get_unfinished_jobs())
+    finally:
+        queue.shutdown()
+    assert calls == [{'file_path': 'deck.pptx'}] * 2
+
+def test_job_gives_up_after_max_attempts(tmp_path):
+    db = Database(str(tmp_path))
+    attempts = []
+    failures = []
+
+    def handler(session_id, **payload):
+        attempts.append(session_id)
+        raise ValueError('bad deck')
+
+    queue = _queue(db, handler, max_attempts=3, on_failure=lambda session_id, error: failures.append(error))
+    queue.submit('s1')
+    try:
+        assert _wait_for(lambda: failures)
+    finally:
+        queue.shutdown()
+    assert len(attempts) == 3
+    assert isinstance(failures[0], ValueError)
+    assert db.count_jobs('failed') == 1
+
+def test_worker_survives_failed_bookkeeping(tmp_path):
+    db = FlakyDatabase(str(tmp_path))
+    handled = []
+
+    queue = _queue(db, lambda session_id, **payload: handled.append(session_id))
+    queue.submit('s1')
+    try:
+        assert _wait_for(lambda: handled == ['s1'])
+        queue.submit('s2')
+        assert _wait_for(lambda: 's2' in handled)
+    finally:
+        queue.shutdown()
+
+def test_full_queue_rejects_jobs(tmp_path):
+    queue = JobQueue(Database(str(tmp_path)), lambda session_id, **payload: None, max_queued=1)
+    queue.submit('s1')
+
+    assert queue.position('s1') == 1
+    with pytest.raises(QueueFullError):
+        queue.submit('s2')
+
+def test_jobs_submitted_elsewhere_are_picked_up(tmp_path):
+    db = Database(str(tmp_path))
+    # Another worker process sharing the database queues a job
+    JobQueue(db, lambda session_id, **payload: None).submit('s1', file_path='deck.pptx')
+    handled = []
+
+    queue = _queue(db, lambda session_id, **payload: handled.append((session_id, payload)))
+    try:
+        assert _wait_for(lambda: handled == [('s1', {'file_path': 'deck.pptx'})])
+    finally:
+        queue.shutdown()
+
+def test_lapsed_lease_is_claimed_again(tmp_path):
+    db = Database(str(tmp_path))
+    queue = JobQueue(db, lambda session_id, **payload: None)
+    job_id = queue.submit('s1')
+
+    assert db.claim_job('other-host:1', lease=30)['job_id'] == job_id
+    assert queue.position('s1') == 0
+    assert db.claim_job('this-host:2', lease=30) is None
+    assert db.renew_jobs([job_id], 'other-host:1', lease=-1) == 1
+
+    job = db.claim_job('this-host:2', lease=30)
+    assert job['job_id'] == job_id
+    assert job['attempts'] == 2
+
+def test_recover_requeues_jobs_of_stopped_processes(tmp_path):
+    db = Database(str(tmp_path))
+    queue = JobQueue(db, lambda session_id, **payload: None)
+    queue.submit('s1')
+    stopped = subprocess.Popen([sys.executable, '-c', 'pass'])
+    stopped.wait()
+    db.claim_job(f'{socket.gethostname()}:{stopped.pid}', lease=30)
+
+    assert queue.recover() == 1
+    assert queue.position('s1') == 1
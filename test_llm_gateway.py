@@ -0,0 +1,103 @@
+"""Scheduling, rate limiting and retries of the shared LLM gateway"""
+
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from llm_gateway import PRIORITY_BACKGROUND, PRIORITY_LIVE, LLMError, LLMGateway, LLMTimeoutError, TokenBucket
+
+class APIError(Exception):
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f'HTTP {status_code}')
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers={'retry-after': retry_after} if retry_after else {})
+
+class ScriptedClient:
+    """OpenAI-style client raising the scripted errors in turn, then answering with the prompt"""
+
+    def __init__(self, errors=(), gate=None):
+        self.errors = list(errors)
+        self.gate = gate
+        self.prompts = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, messages, **params):
+        self.prompts.append(messages[-1]['content'])
+        if self.gate is not None:
+            self.gate.wait(5)
+        if self.errors:
+            raise self.errors.pop(0)
+        message = SimpleNamespace(content=messages[-1]['content'])
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+def _gateway(client, **options):
+    return LLMGateway(client, **dict(dict(requests_per_minute=None, tokens_per_minute=None, backoff=0.01), **options))
+
+def _ask(gateway, prompt, **options):
+    return gateway.complete([{'role': 'user', 'content': prompt}], **options).choices[0].message.content
+
+def test_server_errors_are_retried():
+    client = ScriptedClient([APIError(503), APIError(502)])
+    gateway = _gateway(client)
+
+    assert _ask(gateway, 'hello', purpose='live') == 'hello'
+    assert len(client.prompts) == 3
+    assert gateway.stats()['live']['retries'] == 2
+
+def test_client_errors_fail_at_once():
+    client = ScriptedClient([APIError(400)])
+    gateway = _gateway(client)
+
+    with pytest.raises(LLMError):
+        _ask(gateway, 'hello', purpose='live')
+    assert len(client.prompts) == 1
+    assert gateway.stats()['live']['errors'] == 1
+
+def test_rate_limit_waits_for_retry_after():
+    client = ScriptedClient([APIError(429, retry_after='0.2')])
+    gateway = _gateway(client)
+
+    start = time.monotonic()
+    assert _ask(gateway, 'hello', purpose='scoring') == 'hello'
+    assert time.monotonic() - start >= 0.2
+    assert gateway.stats()['scoring']['rate_limited'] == 1
+
+def test_retries_give_up_at_the_deadline():
+    client = ScriptedClient([APIError(429, retry_after='5')])
+    gateway = _gateway(client)
+
+    with pytest.raises(LLMTimeoutError):
+        _ask(gateway, 'hello', timeout=0.5)
+
+def test_live_calls_go_ahead_of_background_calls():
+    gate = threading.Event()
+    client = ScriptedClient(gate=gate)
+    gateway = _gateway(client, max_concurrency=1)
+
+    threads = [threading.Thread(target=_ask, args=(gateway, 'first'))]
+    threads[0].start()
+    while not client.prompts:
+        time.sleep(0.01)
+    for prompt, priority in (('background', PRIORITY_BACKGROUND), ('live', PRIORITY_LIVE)):
+        threads.append(threading.Thread(target=_ask, args=(gateway, prompt), kwargs={'priority': priority}))
+        threads[-1].start()
+        time.sleep(0.05)
+    gate.set()
+    for thread in threads:
+        thread.join()
+
+    assert client.prompts == ['first', 'live', 'background']
+
+def test_token_bucket_refills_and_keeps_a_reserve():
+    bucket = TokenBucket(per_minute=600, burst_seconds=1)  # 10 a second, holding 10
+
+    assert bucket.wait_time(10, now=bucket.updated) == 0
+    bucket.take(10, now=bucket.updated)
+    assert bucket.wait_time(5, now=bucket.updated) == pytest.approx(0.5)
+    assert bucket.wait_time(5, now=bucket.updated + 1) == 0
+    bucket.take(5, now=bucket.updated)
+    # 5 left: enough for 5, but not for 5 with 20% of the bucket kept back
+    assert bucket.wait_time(5, now=bucket.updated) == 0
+    assert bucket.wait_time(5, now=bucket.updated, reserve=0.2) == pytest.approx(0.2)
@@ -0,0 +1,75 @@
+"""Prometheus rendering of counters, histograms and collected gauges"""
+
+from metrics import Metrics
+
+def test_counters_render_with_escaped_labels():
+    metrics = Metrics()
+    metrics.describe('errors_total', 'Errors by stage')
+    metrics.inc('errors_total', stage='llm', type='Timeout')
+    metrics.inc('errors_total', 2, stage='llm', type='Timeout')
+    metrics.inc('errors_total', stage='db', type='say "locked"')
+
+    lines = metrics.render().splitlines()
+
+    assert lines[:2] == ['# HELP errors_total Errors by stage', '# TYPE errors_total counter']
+    assert 'errors_total{stage="llm",type="Timeout"} 3.0' in lines
+    assert 'errors_total{stage="db",type="say \\"locked\\""} 1.0' in lines
+
+def test_histogram_buckets_are_cumulative():
+    metrics = Metrics(buckets=(0.1, 1))
+    for seconds in (0.05, 0.5, 0.7, 3):
+        metrics.observe('request_seconds', seconds, route='status')
+
+    lines = metrics.render().splitlines()
+
+    assert 'request_seconds_bucket{route="status",le="0.1"} 1' in lines
+    assert 'request_seconds_bucket{route="status",le="1.0"} 3' in lines
+    assert 'request_seconds_bucket{route="status",le="+Inf"} 4' in lines
+    assert 'request_seconds_count{route="status"} 4' in lines
+    assert 'request_seconds_sum{route="status"} 4.25' in lines
+
+def test_collectors_are_read_at_scrape_time():
+    metrics = Metrics()
+    depth = [3]
+    metrics.collect('queue_depth', lambda: depth[0], help_text='Jobs waiting')
+    metrics.collect('cache_entries', lambda: [({'kind': 'slides'}, 2), ({'kind': 'analysis'}, 1)])
+    metrics.collect('broken', lambda: 1 / 0)
+
+    depth[0] = 5
+    text = metrics.render()
+
+    assert '# HELP queue_depth Jobs waiting\n# TYPE queue_depth gauge\nqueue_depth 5\n' in text
+    assert 'cache_entries{kind="analysis"} 1' in text
+    assert 'broken' not in text
+
+def test_disabled_metrics_record_nothing():
+    metrics = Metrics(enabled=False)
+    metrics.inc('errors_total', stage='llm')
+    with metrics.timer('request_seconds', route='status'):
+        pass
+
+    assert metrics.render() == '\n'
+
+def test_trace_collects_spans_of_this_thread():
+    metrics = Metrics()
+    token = metrics.start_trace()
+    metrics.observe('db_seconds', 0.25, op='read')
+    metrics.observe('db_seconds', 0.25, op='read')
+    metrics.observe('llm_seconds', 1.5, purpose='live')
+
+    assert metrics.end_trace(token) == [('db_read', 0.5, 2), ('llm_live', 1.5, 1)]
+    metrics.observe('db_seconds', 0.25, op='read')
+    assert metrics.render().count('db_seconds_count{op="read"} 3') == 1
+
+def test_constant_labels_mark_every_series():
+    metrics = Metrics(buckets=(1,), labels={'worker': 'host:1'})
+    metrics.inc('errors_total', stage='llm')
+    metrics.observe('request_seconds', 0.5)
+    metrics.collect('queue_depth', lambda: 2)
+
+    lines = metrics.render().splitlines()
+
+    assert 'errors_total{worker="host:1",stage="llm"} 1.0' in lines
+    assert 'request_seconds_bucket{worker="host:1",le="1.0"} 1' in lines
+    assert 'request_seconds_count{worker="host:1"} 1' in lines
+    assert 'queue_depth{worker="host:1"} 2' in lines
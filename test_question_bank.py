@@ -0,0 +1,78 @@
+"""Per-slide question bank built during processing and served during the talk"""
+
+import pytest
+
+from database import Database
+from fake_llm import FakeOpenAIClient
+from question_bank import QuestionBank
+from result_cache import ResultCache
+from slide_index import SlideIndex
+
+CONTENT = [
+    {'slide_number': 1, 'content': 'Gradient descent minimizes the training loss with momentum'},
+    {'slide_number': 2, 'content': 'Dropout regularization prevents overfitting in networks'},
+    {'slide_number': 3, 'content': ''},
+]
+
+@pytest.fixture
+def db(tmp_path):
+    db = Database(str(tmp_path))
+    yield db
+    db.close()
+
+def _store(db, bank):
+    db.create_session({'session_id': 's1', 'status': 'ready', 'content': CONTENT})
+    db.create_evaluation({'session_id': 's1', 'status': 'in_progress'})
+    db.update_session_analysis('s1', CONTENT, {}, SlideIndex.build(CONTENT).to_dict(), bank)
+
+def test_build_ranks_questions_per_slide():
+    bank = QuestionBank(FakeOpenAIClient(), per_slide=2).build(CONTENT)
+
+    assert [question['id'] for question in bank] == list(range(len(bank)))
+    assert {question['slide_number'] for question in bank} == {1, 2}
+    assert all(len([q for q in bank if q['slide_number'] == number]) <= 2 for number in (1, 2))
+    assert all(question['keypoints'] for question in bank)
+
+def test_unchanged_slides_reuse_cached_questions(tmp_path):
+    client = FakeOpenAIClient()
+    cache = ResultCache(str(tmp_path))
+
+    first = QuestionBank(client, cache=cache).build(CONTENT)
+    calls = client.calls
+    assert QuestionBank(client, cache=cache).build(CONTENT) == first
+    assert client.calls == calls
+
+def test_failed_llm_call_leaves_an_empty_bank():
+    client = FakeOpenAIClient()
+    client.chat.completions.create = lambda **params: 1 / 0
+
+    assert QuestionBank(client).build(CONTENT) == []
+
+def test_pick_serves_each_question_once_across_workers(db):
+    bank = QuestionBank(FakeOpenAIClient(), db=db)
+    _store(db, bank.build(CONTENT))
+
+    said = 'So we used dropout regularization against overfitting'
+    first = bank.pick('s1', said)
+    assert first['slide_number'] == 2
+    # Another worker process loads the bank and what was asked from the database
+    second = QuestionBank(FakeOpenAIClient(), db=db).pick('s1', said)
+    assert second['slide_number'] == 2
+    assert second['id'] != first['id']
+    assert QuestionBank(FakeOpenAIClient(), db=db).stats('s1') == {'questions': 4, 'asked': 2}
+
+def test_pick_falls_back_when_nothing_matches(db):
+    bank = QuestionBank(FakeOpenAIClient(), db=db)
+    _store(db, bank.build(CONTENT))
+
+    assert bank.pick('s1', 'Thank you all for listening') is None
+
+def test_suggested_questions_have_no_keypoints(db):
+    bank = QuestionBank(FakeOpenAIClient(), db=db)
+    questions = bank.build(CONTENT, {'suggested_questions': ['Why does momentum speed up gradient descent?']})
+
+    suggested = questions[-1]
+    assert suggested['slide_number'] == 1
+    assert suggested['keypoints'] is None
+    _store(db, [suggested])
+    assert bank.pick('s1', 'Gradient descent with momentum minimizes the loss') == suggested
@@ -0,0 +1,51 @@
+"""Field selection, ETags and compression of the status and results responses"""
+
+import gzip
+import os
+
+import pytest
+
+@pytest.fixture(scope='module')
+def app_module(tmp_path_factory):
+    root = tmp_path_factory.mktemp('app')
+    os.environ.update(LLM_BACKEND='fake', DATA_DIR=str(root / 'data'), UPLOAD_FOLDER=str(root / 'uploads'))
+    import app
+    return app
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+def _session(app_module, session_id, **fields):
+    app_module.db.create_session(dict({'session_id': session_id, 'roll_no': '42', 'name': 'Ada',
+                                       'status': 'uploaded', 'created_at': '2024-01-01T00:00:00'}, **fields))
+
+def test_unchanged_status_answers_304(app_module, client):
+    _session(app_module, 'etag')
+
+    first = client.get('/api/status/etag')
+    etag = first.headers['ETag']
+    assert etag.startswith('W/')
+    assert client.get('/api/status/etag', headers={'If-None-Match': etag}).status_code == 304
+
+    app_module.db.update_session_status('etag', 'analyzed')
+    changed = client.get('/api/status/etag', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.get_json()['status'] == 'analyzed'
+
+def test_fields_limit_the_response(app_module, client):
+    _session(app_module, 'fields')
+
+    assert client.get('/api/status/fields?fields=status').get_json() == {'status': 'uploaded'}
+    assert client.get('/api/status/fields?fields=status,slides').status_code == 400
+
+def test_large_responses_are_compressed(app_module, client):
+    content = [{'slide_number': i, 'content': f'Slide {i} about gradient descent'} for i in range(200)]
+    _session(app_module, 'large', content=content)
+
+    response = client.get('/api/status/large?fields=content', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert b'gradient descent' in gzip.decompress(response.get_data())
+    small = client.get('/api/status/large?fields=status', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in small.headers
@@ -0,0 +1,95 @@
+"""Retention sweeps: expiring sessions, archiving results and removing stray uploads"""
+
+import os
+
+import pytest
+
+from database import Database
+from job_queue import JobQueue
+from retention import Janitor, SessionArchive
+from upload_store import UploadStore
+
+LONG_AGO = '2020-01-01T00:00:00'
+DAY = 24 * 3600
+
+@pytest.fixture
+def store(tmp_path):
+    return UploadStore(str(tmp_path / 'uploads'))
+
+@pytest.fixture
+def db(tmp_path):
+    db = Database(str(tmp_path / 'data'))
+    yield db
+    db.close()
+
+def _janitor(db, store, tmp_path, **options):
+    ttls = {'uploaded': DAY, 'processing': DAY, 'ready': DAY, 'error': DAY, 'completed': DAY}
+    return Janitor(db, store, SessionArchive(str(tmp_path / 'data')), ttls,
+                   **dict(dict(orphan_grace=0, interval=0), **options))
+
+def _deck(store, name):
+    path = os.path.join(store.upload_dir, name)
+    with open(path, 'wb') as f:
+        f.write(b'%PDF-1.4 ' + b'x' * 100)
+    return path
+
+def _session(db, session_id, status, file_path=None, created_at=LONG_AGO):
+    db.create_session({'session_id': session_id, 'roll_no': '42', 'name': 'Ada', 'status': status,
+                       'created_at': created_at, 'file_path': file_path,
+                       'content': [{'slide_number': 1, 'content': 'Gradient descent'}]})
+
+def test_expired_sessions_are_deleted_with_their_decks(db, store, tmp_path):
+    old_deck, new_deck = _deck(store, 'old.pdf'), _deck(store, 'new.pdf')
+    _session(db, 'old', 'uploaded', old_deck)
+    _session(db, 'new', 'uploaded', new_deck, created_at='2999-01-01T00:00:00')
+
+    removed = _janitor(db, store, tmp_path).sweep()
+
+    assert removed['sessions_deleted'] == 1
+    assert db.get_session('old') is None
+    assert not os.path.exists(old_deck)
+    assert db.get_session('new') is not None
+    assert os.path.exists(new_deck)
+
+def test_completed_sessions_are_archived_without_their_slides(db, store, tmp_path):
+    _session(db, 'done', 'completed')
+    db.create_evaluation({'session_id': 'done', 'status': 'completed', 'total_score': 70,
+                          'completed_at': LONG_AGO, 'updated_at': LONG_AGO})
+    janitor = _janitor(db, store, tmp_path)
+
+    assert janitor.sweep()['sessions_archived'] == 1
+
+    assert db.get_evaluation('done') is None
+    record = janitor.archive.get('done')
+    assert record['evaluation']['total_score'] == 70
+    assert 'content' not in record['session']
+
+def test_sessions_with_queued_jobs_are_kept(db, store, tmp_path):
+    _session(db, 'queued', 'processing')
+    JobQueue(db, lambda session_id, **payload: None).submit('queued')
+
+    _janitor(db, store, tmp_path).sweep()
+
+    assert db.get_session('queued') is not None
+
+def test_unreferenced_uploads_are_removed_after_the_grace_period(db, store, tmp_path):
+    kept = _deck(store, 'kept.pdf')
+    orphan = _deck(store, 'orphan.pdf')
+    _session(db, 'kept', 'ready', kept, created_at='2999-01-01T00:00:00')
+
+    assert _janitor(db, store, tmp_path, orphan_grace=3600).sweep()['uploads_deleted'] == 0
+    os.utime(orphan, (0, 0))
+    assert _janitor(db, store, tmp_path, orphan_grace=3600).sweep()['uploads_deleted'] == 1
+
+    assert os.path.exists(kept)
+    assert not os.path.exists(orphan)
+
+def test_archive_expires_old_records(tmp_path):
+    archive = SessionArchive(str(tmp_path))
+    archive.put({'session_id': 's1'}, {'status': 'completed'})
+
+    assert archive.expire(3600) == (0, 0)
+    records, size = archive.expire(-1)
+    assert records == 1
+    assert size > 0
+    assert archive.get('s1') is None
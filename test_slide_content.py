@@ -0,0 +1,67 @@
+"""Slide records extracted from PowerPoint and PDF decks"""
+
+import io
+
+from PIL import Image
+from pptx import Presentation
+from pptx.util import Inches
+
+from fake_llm import FakeOpenAIClient
+from presentation_evaluator import PresentationEvaluator
+from result_cache import ResultCache, hash_file
+from slide_content import describe_design, inspect_images, powerpoint_slides, records_key
+
+def _png(width, height):
+    data = io.BytesIO()
+    Image.new('RGB', (width, height), (200, 40, 40)).save(data, 'PNG')
+    data.seek(0)
+    return data
+
+def _deck(path, picture_size=(640, 480)):
+    """A text slide, then a slide with nothing but a picture"""
+    prs = Presentation()
+    slide = prs.slides.add_slide(prs.slide_layouts[1])
+    slide.shapes.title.text = 'Gradient descent'
+    slide.placeholders[1].text = 'Learning rate\nMomentum'
+    slide = prs.slides.add_slide(prs.slide_layouts[6])
+    slide.shapes.add_picture(_png(*picture_size), Inches(1), Inches(1), width=Inches(4))
+    prs.save(path)
+    return str(path)
+
+def test_every_record_has_content(tmp_path):
+    records = powerpoint_slides(_deck(tmp_path / 'deck.pptx'))
+
+    assert [record['slide_number'] for record in records] == [1, 2]
+    assert 'Gradient descent' in records[0]['content']
+    assert records[1]['content'] == ''
+    assert records[1]['layout']['pictures'] == 1
+    assert 'notes' not in records[1]
+
+def test_image_only_slide_is_analyzed(tmp_path):
+    evaluator = PresentationEvaluator(FakeOpenAIClient(), speech=object())
+
+    content, analysis = evaluator.process_file(_deck(tmp_path / 'deck.pptx'))
+
+    assert len(content) == 2
+    assert analysis['slide_count'] == 2
+
+def test_records_cached_under_current_version(tmp_path):
+    deck = _deck(tmp_path / 'deck.pptx')
+    cache = ResultCache(str(tmp_path / 'cache'))
+    # A record cached before notes and layout were extracted
+    cache.put('slides', hash_file(deck), [{'slide_number': 1, 'content': 'stale'}])
+    evaluator = PresentationEvaluator(FakeOpenAIClient(), cache=cache, speech=object())
+
+    content, _ = evaluator.process_file(deck)
+
+    assert content[1]['layout']['pictures'] == 1
+    assert cache.get('slides', records_key(hash_file(deck))) == content
+
+def test_tiny_image_is_described(tmp_path):
+    deck = _deck(tmp_path / 'deck.pptx', picture_size=(8, 8))
+    record = powerpoint_slides(deck)[1]
+
+    images = inspect_images(deck, [2])[2]
+    assert images['low_res'] == 1
+    assert 'megapixels' not in images
+    assert describe_design(record, images).startswith('Slide 2: 0 words')
@@ -0,0 +1,89 @@
+"""Streamed and chunked presentation uploads"""
+
+import hashlib
+import io
+import os
+
+import pytest
+
+from upload_store import UploadError, UploadStore
+
+PDF = b'%PDF-1.4\n' + b'x' * 1000
+
+@pytest.fixture
+def store(tmp_path):
+    return UploadStore(str(tmp_path / 'uploads'), max_bytes=4096, chunk_bytes=400)
+
+def test_ingest_hashes_and_moves_the_file(store, tmp_path):
+    ingest = store.ingest('deck.pdf')
+    ingest.write(PDF[:3])
+    ingest.write(PDF[3:])
+    target = str(tmp_path / 'deck.pdf')
+
+    assert store.commit(ingest, target) == hashlib.sha256(PDF).hexdigest()
+    with open(target, 'rb') as f:
+        assert f.read() == PDF
+    assert os.listdir(store.partial_dir) == []
+
+def test_ingest_rejects_wrong_content(store):
+    ingest = store.ingest('deck.pptx')
+
+    with pytest.raises(UploadError):
+        ingest.write(PDF)
+    assert os.listdir(store.partial_dir) == []
+
+def test_ingest_rejects_oversized_files(store):
+    ingest = store.ingest('deck.pdf')
+
+    with pytest.raises(UploadError) as error:
+        ingest.write(PDF * 5)
+    assert error.value.status == 413
+
+def test_ingest_rejects_other_extensions(store):
+    with pytest.raises(UploadError):
+        store.ingest('notes.txt')
+
+def test_chunked_upload_resumes_from_its_offset(store, tmp_path):
+    upload_id = store.start('deck.pdf', len(PDF))['upload_id']
+    store.append(upload_id, 0, io.BytesIO(PDF[:400]), 400)
+
+    with pytest.raises(UploadError) as error:
+        store.append(upload_id, 0, io.BytesIO(PDF[:400]), 400)
+    assert error.value.status == 409
+
+    # A fresh store, as after a restart, resumes from the part file
+    store = UploadStore(store.upload_dir, max_bytes=4096, chunk_bytes=400)
+    offset = store.status(upload_id)['offset']
+    while offset < len(PDF):
+        chunk = PDF[offset:offset + 400]
+        offset = store.append(upload_id, offset, io.BytesIO(chunk), len(chunk))['offset']
+
+    target = str(tmp_path / 'deck.pdf')
+    assert store.finish(upload_id, target) == ('deck.pdf', hashlib.sha256(PDF).hexdigest())
+    with open(target, 'rb') as f:
+        assert f.read() == PDF
+    assert store.status(upload_id) is None
+
+def test_incomplete_upload_cannot_finish(store, tmp_path):
+    upload_id = store.start('deck.pdf', len(PDF))['upload_id']
+    store.append(upload_id, 0, io.BytesIO(PDF[:400]), 400)
+
+    with pytest.raises(UploadError) as error:
+        store.finish(upload_id, str(tmp_path / 'deck.pdf'))
+    assert error.value.status == 409
+
+def test_unknown_upload(store):
+    assert store.status('not-an-id') is None
+    with pytest.raises(UploadError) as error:
+        store.append('00000000-0000-0000-0000-000000000000', 0, io.BytesIO(b''), 0)
+    assert error.value.status == 404
+
+def test_expire_removes_abandoned_uploads(store):
+    upload_id = store.start('deck.pdf', len(PDF))['upload_id']
+    store.append(upload_id, 0, io.BytesIO(PDF[:400]), 400)
+
+    assert store.expire(max_age=3600) == (0, 0)
+    files, size = store.expire(max_age=-1)
+    assert files == 2
+    assert size > 400
+    assert store.status(upload_id) is None
@@ -0,0 +1,278 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+import zipfile
+from datetime import datetime
+
+from result_cache import hash_file
+
+# Leading bytes of each accepted presentation format
+SIGNATURES = {
+    'pdf': b'%PDF-',
+    'pptx': b'PK\x03\x04',  # Office Open XML is a zip archive
+    'ppt': b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1',  # OLE2 compound document
+}
+HEADER_BYTES = max(len(signature) for signature in SIGNATURES.values())
+BLOCK_SIZE = 64 * 1024
+
+class UploadError(Exception):
+    """Raised when an upload is rejected; `status` is the HTTP status to answer with"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+def file_kind(filename):
+    """'pdf', 'pptx' or 'ppt' from a file name, None for anything else"""
+    extension = os.path.splitext(filename or '')[1].lower().lstrip('.')
+    return extension if extension in SIGNATURES else None
+
+def check_header(header, kind):
+    """Reject a file whose first bytes are not those of its format"""
+    if not header.startswith(SIGNATURES[kind]):
+        raise UploadError(f"File content is not a valid .{kind} file")
+
+def check_file(path, kind):
+    """Checks that need the whole file: a .pptx must be a zip holding a presentation"""
+    if kind != 'pptx':
+        return
+    try:
+        with zipfile.ZipFile(path) as archive:
+            if 'ppt/presentation.xml' not in archive.namelist():
+                raise UploadError("File content is not a valid .pptx file")
+    except zipfile.BadZipFile:
+        raise UploadError("File content is not a valid .pptx file")
+
+class IngestFile:
+    """Upload target that validates, hashes and stores a file as it arrives
+
+    Werkzeug's form parser writes the upload into it (see
+    UploadStore.ingest), so the bytes go straight to a part file in the
+    upload folder in one pass, never buffered whole in memory nor copied
+    afterwards. UploadStore.commit() renames it into place; closing it
+    uncommitted deletes it.
+    """
+
+    def __init__(self, path, kind, max_bytes):
+        self.path = path
+        self.kind = kind
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.header = b''
+        self.committed = False
+        self._digest = hashlib.sha256()
+        self._file = open(path, 'wb+')
+
+    def write(self, data):
+        try:
+            self.size += len(data)
+            if self.size > self.max_bytes:
+                raise UploadError(f"File is larger than {self.max_bytes // (1024 * 1024)} MB", 413)
+            if len(self.header) < HEADER_BYTES:
+                self.header += data[:HEADER_BYTES - len(self.header)]
+                if len(self.header) == HEADER_BYTES:
+                    check_header(self.header, self.kind)
+            self._digest.update(data)
+            return self._file.write(data)
+        except Exception:
+            self.close()
+            raise
+
+    def hexdigest(self):
+        return self._digest.hexdigest()
+
+    # The parser rewinds the file and FileStorage may read it back
+    def seek(self, offset, whence=0):
+        return self._file.seek(offset, whence)
+
+    def tell(self):
+        return self._file.tell()
+
+    def read(self, size=-1):
+        return self._file.read(size)
+
+    def readline(self, size=-1):
+        return self._file.readline(size)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+        if not self.committed and os.path.exists(self.path):
+            os.remove(self.path)
+
+class UploadStore:
+    """Presentation uploads, streamed to disk with bounded memory
+
+    Single-request uploads go through an IngestFile. Large decks can be
+    sent instead as a resumable chunked upload: start() reserves it,
+    append() writes each chunk at its offset and finish() moves the
+    completed file into place. Chunks live in `<upload_dir>/partial` with a
+    JSON sidecar and the part file's size is the offset to resume from, so
+    an upload survives restarts and can continue on any worker process.
+    """
+
+    def __init__(self, upload_dir, max_bytes=100 * 1024 * 1024, chunk_bytes=8 * 1024 * 1024):
+        self.upload_dir = upload_dir
+        self.partial_dir = os.path.join(upload_dir, 'partial')
+        self.max_bytes = max_bytes
+        self.chunk_bytes = chunk_bytes
+        os.makedirs(self.partial_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._upload_locks = {}
+        self._digests = {}  # upload_id -> (bytes hashed, sha256 so far)
+
+    def ingest(self, filename):
+        """A fresh IngestFile for a single-request upload of `filename`"""
+        kind = file_kind(filename)
+        if kind is None:
+            raise UploadError('Only PPT, PPTX, and PDF files are allowed')
+        path = os.path.join(self.partial_dir, f'{uuid.uuid4()}.part')
+        return IngestFile(path, kind, self.max_bytes)
+
+    def commit(self, ingest, file_path):
+        """Move a fully received IngestFile to file_path, returning its SHA-256"""
+        if len(ingest.header) < HEADER_BYTES:
+            check_header(ingest.header, ingest.kind)
+        ingest.flush()
+        try:
+            check_file(ingest.path, ingest.kind)
+        except UploadError:
+            ingest.close()
+            raise
+        ingest.committed = True
+        ingest.close()
+        os.replace(ingest.path, file_path)
+        return ingest.hexdigest()
+
+    def expire(self, max_age):
+        """Delete uploads left unfinished for `max_age` seconds, returning (files, bytes) removed"""
+        cutoff = time.time() - max_age
+        files = size = 0
+        for entry in os.scandir(self.partial_dir):
+            try:
+                stat = entry.stat()
+                if entry.is_file() and stat.st_mtime < cutoff:
+                    os.remove(entry.path)
+                    files += 1
+                    size += stat.st_size
+            except FileNotFoundError:
+                continue
+        with self._lock:
+            for upload_id in [upload_id for upload_id in self._digests if self.status(upload_id) is None]:
+                self._digests.pop(upload_id, None)
+                self._upload_locks.pop(upload_id, None)
+        return files, size
+
+    def _paths(self, upload_id):
+        base = os.path.join(self.partial_dir, upload_id)
+        return base + '.part', base + '.json'
+
+    def _upload_lock(self, upload_id):
+        with self._lock:
+            return self._upload_locks.setdefault(upload_id, threading.Lock())
+
+    def start(self, filename, size):
+        """Reserve a chunked upload of `size` bytes, returning its status"""
+        if file_kind(filename) is None:
+            raise UploadError('Only PPT, PPTX, and PDF files are allowed')
+        if size <= 0:
+            raise UploadError('Upload size must be positive')
+        if size > self.max_bytes:
+            raise UploadError(f"File is larger than {self.max_bytes // (1024 * 1024)} MB", 413)
+
+        upload_id = str(uuid.uuid4())
+        part_path, meta_path = self._paths(upload_id)
+        open(part_path, 'wb').close()
+        with open(meta_path, 'w') as f:
+            json.dump({'filename': filename, 'size': size, 'created_at': datetime.now().isoformat()}, f)
+        return self.status(upload_id)
+
+    def status(self, upload_id):
+        """Filename, size and offset to resume from, or None for an unknown upload"""
+        try:
+            uuid.UUID(upload_id)
+            part_path, meta_path = self._paths(upload_id)
+            with open(meta_path) as f:
+                meta = json.load(f)
+            offset = os.path.getsize(part_path)
+        except (ValueError, OSError):
+            return None
+        return {'upload_id': upload_id, 'filename': meta['filename'], 'size': meta['size'],
+                'offset': offset, 'chunk_bytes': self.chunk_bytes}
+
+    def append(self, upload_id, offset, stream, length):
+        """Write a chunk of `length` bytes read from stream at `offset`, returning the new status
+
+        The offset must be where the upload stands (409 otherwise, with the
+        client expected to ask for the status and resume from there).
+        Whatever part of the chunk arrived before a disconnect is kept.
+        """
+        with self._upload_lock(upload_id):
+            status = self.status(upload_id)
+            if status is None:
+                raise UploadError('Upload not found', 404)
+            if offset != status['offset']:
+                raise UploadError(f"Upload is at offset {status['offset']}, not {offset}", 409)
+            if length > self.chunk_bytes:
+                raise UploadError(f"Chunks are at most {self.chunk_bytes} bytes", 413)
+            if offset + length > status['size']:
+                raise UploadError('Chunk runs past the end of the upload', 400)
+
+            hashed, digest = self._digests.get(upload_id, (0, None))
+            if digest is None or hashed != offset:
+                # Started on another process or before a restart: hashed at finish() instead
+                hashed, digest = (0, hashlib.sha256()) if offset == 0 else (offset, None)
+
+            part_path, _ = self._paths(upload_id)
+            header = b'' if offset == 0 else None
+            with open(part_path, 'r+b') as part:
+                part.seek(offset)
+                remaining = length
+                while remaining:
+                    block = stream.read(min(BLOCK_SIZE, remaining))
+                    if not block:
+                        break
+                    if header is not None:
+                        # Reject a wrong file type on its first chunk rather than at finish()
+                        header += block[:HEADER_BYTES - len(header)]
+                        if len(header) == HEADER_BYTES:
+                            check_header(header, file_kind(status['filename']))
+                            header = None
+                    part.write(block)
+                    if digest is not None:
+                        digest.update(block)
+                    remaining -= len(block)
+            if digest is not None:
+                self._digests[upload_id] = (offset + length - remaining, digest)
+            return self.status(upload_id)
+
+    def finish(self, upload_id, file_path):
+        """Move a completed chunked upload to file_path, returning its filename and SHA-256"""
+        with self._upload_lock(upload_id):
+            status = self.status(upload_id)
+            if status is None:
+                raise UploadError('Upload not found', 404)
+            if status['offset'] != status['size']:
+                raise UploadError(f"Upload is incomplete: {status['offset']} of {status['size']} bytes", 409)
+
+            part_path, meta_path = self._paths(upload_id)
+            kind = file_kind(status['filename'])
+            with open(part_path, 'rb') as part:
+                check_header(part.read(HEADER_BYTES), kind)
+            check_file(part_path, kind)
+            hashed, digest = self._digests.pop(upload_id, (0, None))
+            file_hash = digest.hexdigest() if digest is not None and hashed == status['size'] \
+                else hash_file(part_path)
+            os.replace(part_path, file_path)
+            # Age from now: the retention janitor spares recent unreferenced files
+            os.utime(file_path)
+            os.remove(meta_path)
+        with self._lock:
+            self._upload_locks.pop(upload_id, None)
+        return status['filename'], file_hash
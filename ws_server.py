@@ -0,0 +1,238 @@
+import asyncio
+import io
+import json
+import math
+import sys
+import threading
+import wave
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+import websockets
+
+from live_pipeline import answer_turn
+
+SAMPLE_WIDTH = 2  # bytes per sample; clients send 16-bit little-endian mono PCM
+
+def frame_rms(frame):
+    """Root-mean-square amplitude of a 16-bit PCM frame"""
+    samples = array('h', frame[:len(frame) - len(frame) % SAMPLE_WIDTH])
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    if not samples:
+        return 0
+    return math.sqrt(sum(sample * sample for sample in samples) / len(samples))
+
+class AudioStreamSession:
+    """Per-connection state for one presenter's live audio stream
+
+    Frames are appended as they arrive. An utterance ends when the client
+    says so or when `silence_seconds` of quiet audio follow speech, so the
+    reply can start without waiting for the student to press stop.
+    """
+
+    def __init__(self, sample_rate=16000, silence_seconds=0.8, silence_threshold=500,
+                 partial_seconds=2.0):
+        self.sample_rate = sample_rate
+        self.silence_seconds = silence_seconds
+        self.silence_threshold = silence_threshold
+        self.partial_seconds = partial_seconds
+        self.reset()
+
+    def reset(self):
+        """Start a new utterance"""
+        self.buffer = bytearray()
+        self.heard_speech = False
+        self.silent_bytes = 0
+        self.last_partial_at = 0
+
+    def bytes_per_second(self):
+        """Bytes of PCM audio per second at this stream's sample rate"""
+        return self.sample_rate * SAMPLE_WIDTH
+
+    def add_frame(self, frame):
+        """Append a PCM frame, returning True once the utterance has ended in silence"""
+        self.buffer.extend(frame)
+        if frame_rms(frame) >= self.silence_threshold:
+            self.heard_speech = True
+            self.silent_bytes = 0
+        else:
+            self.silent_bytes += len(frame)
+            if not self.heard_speech:
+                # Only keep a short lead-in of the silence before speech starts
+                del self.buffer[:-self.bytes_per_second() // 2]
+        return self.heard_speech and self.silent_bytes >= self.silence_seconds * self.bytes_per_second()
+
+    def wants_partial(self):
+        """Whether enough new audio arrived to refresh the partial transcript"""
+        return (self.heard_speech and
+                len(self.buffer) - self.last_partial_at >= self.partial_seconds * self.bytes_per_second())
+
+    def as_wav(self):
+        """The buffered utterance as an in-memory WAV file"""
+        wav_file = io.BytesIO()
+        with wave.open(wav_file, 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(SAMPLE_WIDTH)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes(bytes(self.buffer))
+        wav_file.seek(0)
+        return wav_file
+
+class AudioStreamServer:
+    """WebSocket endpoint streaming live audio in and transcripts/replies out
+
+    Connect to ws://host:<port>/ws/<session_id>. The client sends
+    {"type": "start", "sample_rate": 16000}, then binary 16-bit mono PCM
+    frames, and optionally {"type": "end"} to close an utterance early.
+    The server pushes {"type": "partial"|"transcript"|"response_delta"|
+    "response"|"error", "text": ...} messages as soon as each is available:
+    the reply streams as response_delta pieces, then arrives whole as
+    "response" with the turn's "timings".
+    """
+
+    def __init__(self, db, evaluator, host='0.0.0.0', port=5001, workers=16):
+        self.db = db
+        self.evaluator = evaluator
+        self.host = host
+        self.port = port
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ws-turn')
+        self._loop = None
+        self._server = None
+
+    def start(self):
+        """Serve on a background thread with its own event loop"""
+        ready = threading.Event()
+        errors = []
+
+        async def serve():
+            return await websockets.serve(self._handle, self.host, self.port,
+                                          reuse_port=True, max_size=2 ** 20)
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            try:
+                self._server = self._loop.run_until_complete(serve())
+            except Exception as e:
+                errors.append(e)
+                return
+            finally:
+                ready.set()
+            self._loop.run_forever()
+
+        threading.Thread(target=run, name='ws-server', daemon=True).start()
+        ready.wait()
+        if errors:
+            raise Exception(f"Could not start audio streaming server: {errors[0]}")
+        return self
+
+    def stop(self):
+        """Close the server and its event loop"""
+        if self._loop is None:
+            return
+
+        async def close():
+            self._server.close()
+            await self._server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._executor.shutdown(wait=False)
+
+    async def _handle(self, websocket, path=None):
+        # websockets < 10 passes the path, later versions expose it on the connection
+        path = path or getattr(websocket, 'path', None) or websocket.request.path
+        session_id = path.rstrip('/').rsplit('/', 1)[-1]
+
+        if not path.startswith('/ws/') or not await self._run(self.db.get_evaluation, session_id):
+            await websocket.send(json.dumps({'type': 'error', 'text': 'Evaluation session not found'}))
+            await websocket.close()
+            return
+
+        stream = AudioStreamSession()
+        turn = None
+
+        async for message in websocket:
+            if isinstance(message, bytes):
+                ended = stream.add_frame(message)
+                if ended:
+                    turn = await self._finish_utterance(websocket, session_id, stream, turn)
+                elif stream.wants_partial() and (turn is None or turn.done()):
+                    stream.last_partial_at = len(stream.buffer)
+                    asyncio.ensure_future(self._send_partial(websocket, stream.as_wav()))
+                continue
+
+            try:
+                control = json.loads(message)
+                if not isinstance(control, dict):
+                    raise ValueError('expected a JSON object')
+                sample_rate = int(control.get('sample_rate', 16000))
+                if sample_rate <= 0:
+                    raise ValueError(f'bad sample_rate {sample_rate}')
+            except (ValueError, TypeError) as e:
+                # A bad control frame is the client's mistake: say so and keep the connection
+                await self._send(websocket, 'error', f'Invalid control message: {e}')
+                continue
+
+            if control.get('type') == 'start':
+                stream = AudioStreamSession(sample_rate=sample_rate)
+            elif control.get('type') == 'end' and stream.buffer:
+                turn = await self._finish_utterance(websocket, session_id, stream, turn)
+
+        if turn is not None:
+            await turn
+
+    async def _finish_utterance(self, websocket, session_id, stream, previous_turn):
+        """Start transcribing and answering the buffered utterance"""
+        wav_file = stream.as_wav()
+        stream.reset()
+        return asyncio.ensure_future(self._answer(websocket, session_id, wav_file, previous_turn))
+
+    async def _run(self, func, *args):
+        """Run blocking work (STT, LLM, database) on the thread pool"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def _send(self, websocket, message_type, text, **fields):
+        try:
+            await websocket.send(json.dumps(dict(fields, type=message_type, text=text)))
+        except websockets.ConnectionClosed:
+            pass
+
+    async def _send_partial(self, websocket, wav_file):
+        text = await self._run(self.evaluator.speech_to_text, wav_file)
+        await self._send(websocket, 'partial', text)
+
+    async def _answer(self, websocket, session_id, wav_file, previous_turn):
+        # Keep turns in order: the previous reply goes out before this transcript
+        if previous_turn is not None:
+            await previous_turn
+
+        # The turn runs on the pool; its events come back through a queue as they happen
+        loop = asyncio.get_running_loop()
+        events = asyncio.Queue()
+
+        def produce():
+            try:
+                for item in answer_turn(self.db, self.evaluator, session_id, wav_file):
+                    loop.call_soon_threadsafe(events.put_nowait, item)
+            except Exception as e:
+                loop.call_soon_threadsafe(events.put_nowait, ('error', str(e)))
+            finally:
+                loop.call_soon_threadsafe(events.put_nowait, None)
+
+        producer = loop.run_in_executor(self._executor, produce)
+        while True:
+            item = await events.get()
+            if item is None:
+                break
+            event, data = item
+            if event == 'transcript':
+                await self._send(websocket, 'transcript', data)
+            elif event == 'delta':
+                await self._send(websocket, 'response_delta', data)
+            elif event == 'done':
+                await self._send(websocket, 'response', data['reply'], timings=data['timings'])
+            else:
+                await self._send(websocket, 'error', data)
+        await producer